@@ -0,0 +1,47 @@
+-- ELT mode: set-based build of fact_metrics (and the wide extract) from the staging tables.
+-- Countries resolve by M49 code (FAO) or ISO3 code with a name-alias fallback (World Bank), products through
+-- the catalog items, years to the January date_id. fact_ids follow the pandas path order:
+-- source (consumption, production, trade, population), then year, then source row.
+
+ANALYZE stg_metric_rows;
+
+TRUNCATE TABLE fact_metrics;
+
+INSERT INTO fact_metrics (fact_id, date_id, product_id, country_id, metric_type, value)
+WITH resolved AS (
+    SELECT
+        e.source_rank,
+        s.year,
+        s.source_row,
+        e.metric_type,
+        s.value,
+        COALESCE(e.product_id, p.product_id) AS product_id,
+        COALESCE(c_m49.country_id, c_iso.country_id, a.country_id) AS country_id
+    FROM stg_metric_rows s
+    JOIN stg_metric_elements e
+        ON e.source = s.source
+        AND (e.element_code IS NULL OR e.element_code = s.element_code)
+        AND (e.element IS NULL OR e.element = s.element)
+    LEFT JOIN stg_product_items i ON i.source = s.source AND i.item_code = s.item_code
+    LEFT JOIN dim_product p ON p.product_name = i.product_name
+    LEFT JOIN dim_country c_m49 ON c_m49.m49_code = s.m49_code
+    LEFT JOIN dim_country c_iso ON c_iso.iso3_code = s.iso3_code
+    LEFT JOIN stg_country_aliases a ON c_iso.country_id IS NULL AND a.alias = s.country_alias
+)
+SELECT
+    ROW_NUMBER() OVER (ORDER BY r.source_rank, r.year, r.source_row) AS fact_id,
+    d.date_id,
+    r.product_id,
+    r.country_id,
+    r.metric_type,
+    r.value
+FROM resolved r
+JOIN dim_date d ON d.year = r.year AND d.month = 1
+WHERE r.product_id IS NOT NULL
+    AND r.country_id IS NOT NULL;
+
+-- Wide extract for Tableau, from the view over the star schema
+TRUNCATE TABLE fact_metrics_wide;
+
+INSERT INTO fact_metrics_wide
+SELECT * FROM v_fact_metrics_wide;
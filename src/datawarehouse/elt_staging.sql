@@ -0,0 +1,44 @@
+-- ELT mode: unlogged staging tables (no WAL, rebuilt on every run) filled with COPY by load_fact_metrics_elt
+
+-- Slimmed raw rows in long format (one row per source row and year with a value)
+CREATE UNLOGGED TABLE IF NOT EXISTS stg_metric_rows (
+    source VARCHAR(50) NOT NULL,
+    source_row INT NOT NULL,
+    m49_code INT,
+    iso3_code VARCHAR(3),
+    country_alias VARCHAR(255),
+    item_code INT,
+    element_code INT,
+    element VARCHAR(255),
+    year INT NOT NULL,
+    value DOUBLE PRECISION NOT NULL
+);
+
+-- Product catalog items (source item code -> canonical product name)
+CREATE UNLOGGED TABLE IF NOT EXISTS stg_product_items (
+    source VARCHAR(50) NOT NULL,
+    item_code INT NOT NULL,
+    product_name VARCHAR(255) NOT NULL
+);
+
+-- Source elements kept as metrics; source_rank orders fact_ids like the pandas path
+-- (NULL element_code / element match any row, product_id is set for product-less metrics)
+CREATE UNLOGGED TABLE IF NOT EXISTS stg_metric_elements (
+    source VARCHAR(50) NOT NULL,
+    element_code INT,
+    element VARCHAR(255),
+    metric_type VARCHAR(50) NOT NULL,
+    product_id INT,
+    source_rank INT NOT NULL
+);
+
+-- Normalized country name aliases (name fallback for World Bank rows)
+CREATE UNLOGGED TABLE IF NOT EXISTS stg_country_aliases (
+    alias VARCHAR(255) NOT NULL,
+    country_id INT NOT NULL
+);
+
+TRUNCATE TABLE stg_metric_rows, stg_product_items, stg_metric_elements, stg_country_aliases;
+
+-- One country per alias: a duplicated alias would multiply the rows it resolves in elt_fact_metrics.sql
+CREATE UNIQUE INDEX IF NOT EXISTS stg_country_aliases_alias_key ON stg_country_aliases (alias);
@@ -18,7 +18,9 @@ CREATE TABLE dim_product (
 CREATE TABLE dim_country (
     country_id SERIAL PRIMARY KEY,
     country_name VARCHAR(255) NOT NULL,
-    continent_name VARCHAR(100)
+    continent_name VARCHAR(100),
+    m49_code INT NOT NULL UNIQUE,
+    iso3_code CHAR(3)
 );
 
 -- Table: fact_metrics (long version)
@@ -28,7 +30,7 @@ CREATE TABLE fact_metrics (
     product_id INT NOT NULL,
     country_id INT NOT NULL,
     metric_type VARCHAR(50) NOT NULL, -- 'production', 'consumption', 'import', 'export', 'population'
-    value DECIMAL(10, 2),
+    value DECIMAL(14, 2), -- wide enough for population (~1.4e9)
     FOREIGN KEY (date_id) REFERENCES dim_date(date_id),
     FOREIGN KEY (product_id) REFERENCES dim_product(product_id),
     FOREIGN KEY (country_id) REFERENCES dim_country(country_id)
@@ -43,26 +45,103 @@ CREATE TABLE fact_prices (
     avg_annual_price DECIMAL(10,2),
     price_annual_change_pct DECIMAL(10,2),
     price_month_change_pct DECIMAL(10,2),
+    price_yoy_change_pct DECIMAL(10,2),
+    price_rolling_mean_3m DECIMAL(10,2),
+    price_rolling_mean_6m DECIMAL(10,2),
+    price_rolling_mean_12m DECIMAL(10,2),
+    price_volatility_12m DECIMAL(10,2),
+    price_drawdown_12m_pct DECIMAL(10,2),
+    real_price_usd_per_ton DECIMAL(10,2),
     FOREIGN KEY (date_id) REFERENCES dim_date(date_id),
     FOREIGN KEY (product_id) REFERENCES dim_product(product_id)
 );
 
+-- Table: fact_metrics_wide (denormalized extract for Tableau, one row per country x product x year)
+CREATE TABLE fact_metrics_wide (
+    year SMALLINT NOT NULL,
+    country_id INT NOT NULL,
+    country_name VARCHAR(255) NOT NULL,
+    continent_name VARCHAR(100),
+    product_id INT NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
+    production DECIMAL(14, 2),
+    consumption DECIMAL(14, 2),
+    import DECIMAL(14, 2),
+    export DECIMAL(14, 2),
+    population DECIMAL(14, 2),
+    PRIMARY KEY (country_id, product_id, year)
+);
+
+-- View: v_fact_metrics_wide (same shape computed from the star schema, for ad-hoc use without the extract)
+CREATE VIEW v_fact_metrics_wide AS
+SELECT
+    d.year,
+    c.country_id,
+    c.country_name,
+    c.continent_name,
+    p.product_id,
+    p.product_name,
+    SUM(f.value) FILTER (WHERE f.metric_type = 'production') AS production,
+    SUM(f.value) FILTER (WHERE f.metric_type = 'consumption') AS consumption,
+    SUM(f.value) FILTER (WHERE f.metric_type = 'import') AS import,
+    SUM(f.value) FILTER (WHERE f.metric_type = 'export') AS export,
+    pop.population
+FROM fact_metrics f
+JOIN dim_date d ON d.date_id = f.date_id
+JOIN dim_country c ON c.country_id = f.country_id
+JOIN dim_product p ON p.product_id = f.product_id
+LEFT JOIN (
+    SELECT pf.country_id, pd.year, SUM(pf.value) AS population
+    FROM fact_metrics pf
+    JOIN dim_date pd ON pd.date_id = pf.date_id
+    WHERE pf.metric_type = 'population'
+    GROUP BY pf.country_id, pd.year
+) pop ON pop.country_id = f.country_id AND pop.year = d.year
+WHERE f.metric_type <> 'population'
+GROUP BY d.year, c.country_id, c.country_name, c.continent_name, p.product_id, p.product_name, pop.population;
+
 -- Indexes
 CREATE INDEX idx_fact_metrics_date ON fact_metrics(date_id);
 CREATE INDEX idx_fact_metrics_product ON fact_metrics(product_id);
 CREATE INDEX idx_fact_metrics_country ON fact_metrics(country_id);
 CREATE INDEX idx_fact_prices_date ON fact_prices(date_id);
 CREATE INDEX idx_fact_prices_product ON fact_prices(product_id);
+CREATE INDEX idx_fact_metrics_wide_year ON fact_metrics_wide(year);
 
 -- Table and column comments    
 COMMENT ON TABLE dim_date IS 'Time dimension table (monthly aggregation)';
 COMMENT ON COLUMN dim_date.date_id IS 'Unique month identifier (e.g., 202501 for January 2025)';
 COMMENT ON TABLE dim_product IS 'Product dimension table (Maize, Potatoes, Rice, Soya, Wheat)';
 COMMENT ON TABLE dim_country IS 'Countries and continents dimension table';
+COMMENT ON COLUMN dim_country.m49_code IS 'UN M49 numeric area code (FAO Area Code (M49))';
+COMMENT ON COLUMN dim_country.iso3_code IS 'ISO 3166-1 alpha-3 code (World Bank Country Code)';
 COMMENT ON TABLE fact_metrics IS 'Fact table with data on production, consumption, import, export, and population of products and countries over time';
 COMMENT ON COLUMN fact_metrics.metric_type IS 'Type of metric: production, consumption, import, export, or population';
 COMMENT ON COLUMN fact_metrics.value IS 'Metric value (unit depends on metric type)';
+COMMENT ON TABLE fact_metrics_wide IS 'Denormalized extract of fact_metrics for Tableau: metrics pivoted into columns, dimension names joined';
+COMMENT ON COLUMN fact_metrics_wide.population IS 'Country population in the year (repeated on every product row)';
 COMMENT ON TABLE fact_prices IS 'Fact table with product pricing data';
 COMMENT ON COLUMN fact_prices.avg_annual_price IS 'Average annual product price in USD';
 COMMENT ON COLUMN fact_prices.price_annual_change_pct IS 'Year-over-year percentage change in price';
 COMMENT ON COLUMN fact_prices.price_month_change_pct IS 'Month-over-month percentage change in price';
+COMMENT ON COLUMN fact_prices.price_yoy_change_pct IS 'Percentage change against the same month of the previous year';
+COMMENT ON COLUMN fact_prices.price_rolling_mean_12m IS 'Trailing 12-month mean price in USD (3m and 6m columns likewise)';
+COMMENT ON COLUMN fact_prices.price_volatility_12m IS 'Standard deviation of the last 12 month-over-month changes, in percentage points';
+COMMENT ON COLUMN fact_prices.price_drawdown_12m_pct IS 'Percentage below the trailing 12-month high price';
+COMMENT ON COLUMN fact_prices.real_price_usd_per_ton IS 'Price deflated to the base period of the price deflator resource';
+
+-- Table: pipeline_run_ledger (one row per pipeline run and step, written by the dispatcher with RUN_LEDGER_URL=warehouse)
+CREATE TABLE pipeline_run_ledger (
+    run_id VARCHAR(64) NOT NULL,
+    step VARCHAR(100) NOT NULL,
+    started_at VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    duration_s DOUBLE PRECISION,
+    peak_rss_mb DOUBLE PRECISION,
+    input_rows BIGINT,
+    output_rows BIGINT,
+    dropped_rows TEXT,
+    s3_bytes_read BIGINT,
+    s3_bytes_written BIGINT,
+    PRIMARY KEY (run_id, step)
+);
@@ -1,12 +1,13 @@
-import boto3
-import requests
 from io import BytesIO
 import os
-import zipfile
+
+from src.helpers.s3_utils import get_s3_client
+
 
 def lambda_handler(event, context):
     """
     Downloads data from FAOSTAT and World Bank and saves it to an AWS S3 bucket.
+    (World Bank population is fetched incrementally by fetch_wb_population.)
 
     Environment variables:
     - S3_BUCKET_PROJECT_1: the name of the S3 bucket to write to
@@ -15,6 +16,9 @@ def lambda_handler(event, context):
     Returns:
         dict: {"status": "success"} if all downloads were successful.
     """
+
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import requests
     data_sources = {
         "faostat_production": "https://bulks-faostat.fao.org/production/Value_of_Production_E_All_Data.zip",
         "faostat_export_import": "https://bulks-faostat.fao.org/production/Trade_CropsLivestock_E_All_Data.zip",
@@ -22,7 +26,7 @@ def lambda_handler(event, context):
         "wb_prices": "https://thedocs.worldbank.org/en/doc/18675f1d1639c7a34d463f59263ba0a2-0050012025/related/CMO-Historical-Data-Monthly.xlsx"
     }
 
-    s3 = boto3.client("s3")
+    s3 = get_s3_client()
     s3_bucket = os.environ["S3_BUCKET_PROJECT_1"]
     raw_prefix = os.environ.get("S3_PREFIX_RAW", "raw/")
 
@@ -36,20 +40,6 @@ def lambda_handler(event, context):
         else:
             raise Exception(f"Failed to download {filename}")
 
-    # Downloading population data from the World Bank API (in ZIP format)
-    population_url = "https://api.worldbank.org/v2/en/indicator/SP.POP.TOTL?downloadformat=csv"
-    response = requests.get(population_url, stream=True)
-    if response.status_code == 200:
-        buffer = BytesIO(response.content)
-        with zipfile.ZipFile(buffer) as z:
-            for file_name in z.namelist():
-                if file_name.endswith(".csv") and "Metadata" not in file_name:
-                    extracted = z.read(file_name)
-                    s3.put_object(Bucket=s3_bucket, Key=f"{raw_prefix}wb_population.csv", Body=extracted)
-                    break
-    else:
-        raise Exception("Failed to download population data")
-
     return {"status": "success"}
 
         
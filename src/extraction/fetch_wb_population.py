@@ -0,0 +1,106 @@
+import os
+from datetime import datetime, timezone
+
+from src.helpers.s3_utils import get_s3_client
+
+INDICATOR = 'SP.POP.TOTL'
+DEFAULT_API_URL = 'https://api.worldbank.org/v2'
+PER_PAGE = 1000
+MAX_WORKERS = 4
+REQUEST_TIMEOUT_S = 60
+# Years before the watermark requested again: countries publish a year later than others (late rows)
+LATE_DATA_YEARS = 2
+
+
+def lambda_handler(event, context):
+    """
+    Incremental fetch of World Bank population (SP.POP.TOTL) from the paged JSON indicator API.
+    - Only the trailing years are requested (date=<watermark - LATE_DATA_YEARS>:<current year>), so values
+      published late for years other countries already reported are fetched again;
+      event {'full_refresh': true} (or an empty store) requests every year.
+    - Pages after the first are fetched concurrently.
+    - Fetched rows are merged into the compact population store (Parquet, raw zone) by (country, year),
+      together with the new watermark; the store is only rewritten when a value changed.
+
+    Environment variables:
+    - S3_BUCKET_PROJECT_1: the name of the S3 bucket to write to
+    - S3_PREFIX_RAW: prefix for S3 keys (default is "raw/")
+    - WB_API_URL: base URL of the indicator API (default https://api.worldbank.org/v2, e.g. a local stand-in in tests)
+    """
+
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import requests
+    from src.helpers.population_store import (
+        parse_api_records, merge_population, population_changed, read_population_store, read_watermark,
+        write_population_store
+    )
+
+    event = event or {}
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
+    api_url = os.environ.get('WB_API_URL', DEFAULT_API_URL).rstrip('/')
+    store_key = f"{raw_prefix}WB/wb_population.parquet"
+
+    s3_client = get_s3_client()
+
+    # Requested years: a trailing window ending at the current year (the watermark is the latest year of any country)
+    watermark = None if event.get('full_refresh') else read_watermark(s3_client, s3_bucket, store_key)
+    current_year = datetime.now(timezone.utc).year
+    date_range = None if watermark is None else f"{min(watermark, current_year) - LATE_DATA_YEARS}:{current_year}"
+
+    with requests.Session() as session:
+        records, pages = fetch_indicator(session, api_url, INDICATOR, date_range,
+                                         per_page=event.get('per_page', PER_PAGE))
+    fetched = parse_api_records(records)
+    print(f"Fetched {len(fetched)} population values for date range {date_range or 'all'} ({pages} pages)")
+
+    if fetched.empty:
+        return {'status': 'up_to_date', 'watermark': watermark, 'fetched_rows': 0, 'pages': pages}
+
+    existing = None if event.get('full_refresh') else read_population_store(s3_client, s3_bucket, store_key)
+    store = merge_population(existing, fetched)
+    if not population_changed(existing, store):
+        return {'status': 'up_to_date', 'watermark': watermark, 'fetched_rows': len(fetched), 'pages': pages}
+    new_watermark = write_population_store(s3_client, s3_bucket, store_key, store)
+
+    return {
+        'status': 'success',
+        'watermark': new_watermark,
+        'previous_watermark': watermark,
+        'fetched_rows': len(fetched),
+        'stored_rows': len(store),
+        'pages': pages
+    }
+
+
+def fetch_indicator(session, api_url: str, indicator: str, date_range: str = None, per_page: int = PER_PAGE,
+                    max_workers: int = MAX_WORKERS) -> tuple:
+    """
+    All records of an indicator for all countries. The first page gives the page count,
+    the remaining pages are requested concurrently. Returns (records, pages).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    url = f"{api_url}/country/all/indicator/{indicator}"
+    params = {'format': 'json', 'per_page': per_page}
+    if date_range:
+        params['date'] = date_range
+
+    def get_page(page):
+        response = session.get(url, params=dict(params, page=page), timeout=REQUEST_TIMEOUT_S)
+        if response.status_code != 200:
+            raise Exception(f"Failed to download {indicator} page {page} (HTTP {response.status_code})")
+        payload = response.json()
+        # Errors come back as [{"message": [...]}] with HTTP 200
+        if not isinstance(payload, list) or 'message' in payload[0]:
+            raise Exception(f"World Bank API error for {indicator}: {payload}")
+        return payload[0], payload[1] if len(payload) > 1 else None
+
+    meta, records = get_page(1)
+    records = list(records or [])
+    pages = int(meta.get('pages') or 0)
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, pages - 1), thread_name_prefix='wb-api') as executor:
+            for _, page_records in executor.map(get_page, range(2, pages + 1)):
+                records.extend(page_records or [])
+    return records, pages
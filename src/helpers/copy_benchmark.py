@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import statistics
+
+# Loaders whose tables are benchmarked: table -> (loader module, transformed file)
+TABLES = {
+    'fact_metrics': ('src.load.load_fact_metrics', 'fact_metrics.csv'),
+    'fact_prices': ('src.load.load_fact_prices', 'fact_prices.csv')
+}
+FORMATS = ('csv', 'binary')
+
+# Content hash of a loaded table, to check both COPY formats load the same values
+FINGERPRINT_SQL = "SELECT COUNT(*), md5(string_agg(t::text, ';' ORDER BY t::text)) FROM {table} t"
+
+
+def read_table_frame(table: str):
+    from src.helpers.s3_utils import read_csv_from_s3
+
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    return read_csv_from_s3(os.environ['S3_BUCKET_PROJECT_1'], f"{transformed_prefix}{TABLES[table][1]}")
+
+
+class _DrainingCursor:
+    """
+    Stand-in cursor whose copy_expert drains the COPY source in 8 KB reads, as psycopg2 does.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+
+    def copy_expert(self, sql, file, size=8192):
+        while True:
+            data = file.read(size)
+            if not data:
+                break
+            self.bytes += len(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+def encode_timings(df, column_types: dict, runs: int = 3) -> dict:
+    """
+    Client side only (no database): the full copy_dataframe path per format, encoding plus streaming the
+    payload through copy_expert's 8 KB reads, so a slow COPY source shows up as well as slow encoding.
+    """
+    from src.helpers.pg_copy import copy_dataframe
+
+    report = {}
+    for copy_format in FORMATS:
+        seconds = []
+        for _ in range(runs):
+            cursor = _DrainingCursor()
+            started = time.perf_counter()
+            copy_dataframe(cursor, 'benchmark', df, column_types, copy_format)
+            seconds.append(time.perf_counter() - started)
+        report[copy_format] = {'median_s': round(statistics.median(seconds), 4), 'bytes': cursor.bytes}
+    return report
+
+
+def copy_timings(conn, table: str, df, column_types: dict, runs: int = 3) -> dict:
+    """
+    End-to-end COPY (encoding + server parse + insert) per format. Every run is rolled back;
+    the last run of each format is fingerprinted before its rollback.
+    """
+    from src.helpers.pg_copy import copy_dataframe
+
+    report = {}
+    cursor = conn.cursor()
+    for copy_format in FORMATS:
+        seconds = []
+        for _ in range(runs):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+            started = time.perf_counter()
+            copy_dataframe(cursor, table, df, column_types, copy_format)
+            seconds.append(time.perf_counter() - started)
+            cursor.execute(FINGERPRINT_SQL.format(table=table))
+            rows, digest = cursor.fetchone()
+            conn.rollback()
+        report[copy_format] = {'median_s': round(statistics.median(seconds), 4), 'rows': rows, 'fingerprint': digest}
+    cursor.close()
+    report['same_result'] = report['csv']['fingerprint'] == report['binary']['fingerprint']
+    return report
+
+
+def benchmark(tables, runs: int = 3, encode_only: bool = False) -> dict:
+    report = {}
+    conn = None
+    if not encode_only:
+        from src.helpers.db_utils import get_db_connection
+        conn = get_db_connection()
+
+    for table in tables:
+        column_types = importlib.import_module(TABLES[table][0]).COLUMN_TYPES
+        df = read_table_frame(table)
+        report[table] = {'rows': len(df), 'encode': encode_timings(df, column_types, runs)}
+        if conn is not None:
+            copy_report = copy_timings(conn, table, df, column_types, runs)
+            copy_report['speedup'] = round(copy_report['csv']['median_s'] / copy_report['binary']['median_s'], 2) \
+                if copy_report['binary']['median_s'] else None
+            report[table]['copy'] = copy_report
+
+    if conn is not None:
+        conn.close()
+    return report
+
+
+def main(argv=None) -> int:
+    """
+    CLI: benchmark binary COPY against the text (CSV) COPY path for the fact tables.
+    - S3_BUCKET_PROJECT_1 / S3_PREFIX_TRANSFORMED select the transformed files (AWS_ENDPOINT_URL can point boto3 at a local S3 stand-in)
+    - RDS_* variables point at a local PostgreSQL with the food_dw.sql schema (not needed with --encode-only)
+    Exit code is 1 when the two formats load different table contents.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark binary COPY against text COPY for the fact tables.')
+    parser.add_argument('--tables', nargs='+', choices=sorted(TABLES), default=sorted(TABLES))
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per format')
+    parser.add_argument('--encode-only', action='store_true', help='Only time client-side encoding and streaming (no database)')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.tables, args.runs, args.encode_only)
+    same_result = True
+    for table, table_report in report.items():
+        encode = table_report['encode']
+        print(f"{table}: {table_report['rows']} rows, encode csv {encode['csv']['median_s']:.4f} s "
+              f"({encode['csv']['bytes']} B), binary {encode['binary']['median_s']:.4f} s ({encode['binary']['bytes']} B)")
+        if 'copy' in table_report:
+            copy = table_report['copy']
+            print(f"{table}: COPY csv {copy['csv']['median_s']:.4f} s, binary {copy['binary']['median_s']:.4f} s, "
+                  f"speedup {copy['speedup']}x, same result: {copy['same_result']}")
+            same_result = same_result and copy['same_result']
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if same_result else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
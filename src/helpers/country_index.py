@@ -0,0 +1,127 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# M49 codes are 3-digit numbers, so a dense array covers the whole code space
+M49_CODE_SPACE = 1000
+UNMATCHED_ID = 0
+
+
+def normalize_country_name(name) -> str:
+    """
+    Normalize a country name for alias lookups (case, accents, punctuation and spacing are ignored).
+    """
+    if not isinstance(name, str):
+        return ''
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    cleaned = ''.join(ch if ch.isalnum() else ' ' for ch in ascii_name.casefold())
+    return ' '.join(cleaned.split())
+
+
+def parse_m49_codes(codes: pd.Series) -> pd.Series:
+    """
+    Convert FAO 'Area Code (M49)' values (e.g. "'004") to nullable integers.
+    """
+    if pd.api.types.is_numeric_dtype(codes):
+        return codes.astype('Int64')
+    cleaned = codes.astype('string').str.replace("'", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').astype('Int64')
+
+
+def build_alias_table(dim_country: pd.DataFrame, code_aliases: list = None) -> pd.DataFrame:
+    """
+    Precompute the alias table (normalized alias -> country_id) used for name-based fallbacks.
+    - Canonical names from dim_country always win over aliases.
+    - code_aliases: DataFrames with 'alias' and 'm49_code' columns (e.g. curated spellings, M49 resource names).
+    """
+    frames = [dim_country[['country_name', 'country_id']].rename(columns={'country_name': 'alias'})]
+
+    m49_to_id = dim_country[['m49_code', 'country_id']].dropna()
+    for df_alias in code_aliases or []:
+        df_alias = df_alias[['alias', 'm49_code']].copy()
+        df_alias['m49_code'] = parse_m49_codes(df_alias['m49_code'])
+        frames.append(df_alias.merge(m49_to_id, on='m49_code', how='inner')[['alias', 'country_id']])
+
+    aliases = pd.concat(frames, ignore_index=True)
+    aliases['alias'] = aliases['alias'].map(normalize_country_name)
+    aliases = aliases[aliases['alias'] != ''].drop_duplicates(subset='alias', keep='first')
+    aliases['country_id'] = aliases['country_id'].astype(int)
+    return aliases.reset_index(drop=True)
+
+
+class CountryIndex:
+    """
+    Country key resolver keyed by M49 and ISO3 codes, with an alias table for name-based fallbacks.
+    Every resolve_* call records how many rows (and distinct keys) could not be matched.
+    """
+
+    def __init__(self, dim_country: pd.DataFrame, aliases: pd.DataFrame = None):
+        # Integer-keyed path: dense M49 -> country_id array
+        self._m49_lookup = np.full(M49_CODE_SPACE, UNMATCHED_ID, dtype=np.int64)
+        if 'm49_code' in dim_country.columns:
+            with_code = dim_country.dropna(subset=['m49_code'])
+            self._m49_lookup[with_code['m49_code'].astype(int).to_numpy()] = with_code['country_id'].astype(int).to_numpy()
+
+        self._iso3_lookup = {}
+        if 'iso3_code' in dim_country.columns:
+            with_iso = dim_country.dropna(subset=['iso3_code'])
+            self._iso3_lookup = dict(zip(with_iso['iso3_code'].str.upper(), with_iso['country_id'].astype(int)))
+
+        if aliases is None:
+            aliases = build_alias_table(dim_country)
+        self._name_lookup = dict(zip(aliases['alias'], aliases['country_id'].astype(int)))
+
+        self.unmatched = {}
+        self._unmatched_keys = {}
+
+    def resolve_m49(self, codes: pd.Series, source: str = 'm49') -> pd.Series:
+        """
+        Resolve M49 codes (ints or FAO "'004" strings) to country_id.
+        """
+        m49 = parse_m49_codes(codes)
+        values = m49.to_numpy(dtype=np.int64, na_value=-1)
+        in_range = (values >= 0) & (values < M49_CODE_SPACE)
+        ids = np.full(len(values), UNMATCHED_ID, dtype=np.int64)
+        ids[in_range] = self._m49_lookup[values[in_range]]
+        return self._finish(ids, m49, codes.index, source)
+
+    def resolve_iso3(self, codes: pd.Series, source: str = 'iso3') -> pd.Series:
+        """
+        Resolve ISO 3166 alpha-3 codes to country_id.
+        """
+        return self._resolve_by_dict(codes.astype('string').str.strip().str.upper(), self._iso3_lookup, codes.index, source)
+
+    def resolve_names(self, names: pd.Series, source: str = 'name') -> pd.Series:
+        """
+        Resolve country names through the alias table.
+        """
+        return self._resolve_by_dict(names, self._name_lookup, names.index, source, key_fn=normalize_country_name)
+
+    def report(self) -> dict:
+        """
+        Return unmatched counts for every source resolved so far.
+        """
+        return {source: dict(stats) for source, stats in self.unmatched.items()}
+
+    def _resolve_by_dict(self, keys, lookup, index, source, key_fn=None):
+        # Hash every distinct key once, then gather ids with integer codes
+        codes, uniques = pd.factorize(keys)
+        unique_ids = np.array(
+            [lookup.get(key_fn(key) if key_fn else key, UNMATCHED_ID) for key in uniques],
+            dtype=np.int64
+        )
+        ids = np.full(len(codes), UNMATCHED_ID, dtype=np.int64)
+        has_key = codes >= 0
+        ids[has_key] = unique_ids[codes[has_key]]
+        return self._finish(ids, pd.Series(keys, index=index), index, source)
+
+    def _finish(self, ids, keys, index, source):
+        missing = ids == UNMATCHED_ID
+        stats = self.unmatched.setdefault(source, {'rows': 0, 'keys': 0})
+        stats['rows'] += int(missing.sum())
+        # Distinct keys over all calls of a source (chunked transforms resolve their rows batch by batch)
+        unmatched_keys = self._unmatched_keys.setdefault(source, set())
+        unmatched_keys.update(pd.Series(keys.to_numpy()[missing]).dropna().unique().tolist())
+        stats['keys'] = len(unmatched_keys)
+
+        return pd.Series(pd.arrays.IntegerArray(ids, missing), index=index)
@@ -12,3 +12,19 @@ def get_db_connection():
         user=os.environ['RDS_USER'],
         password=os.environ['RDS_PASSWORD']
     )
+
+def get_db_pool(minconn: int = 1, maxconn: int = 8):
+    """
+    Create a thread-safe pool of PostgreSQL connections (same environment variables as get_db_connection)
+    for long-running readers such as the query API; use getconn() / putconn() around each request.
+    """
+    from psycopg2.pool import ThreadedConnectionPool
+
+    return ThreadedConnectionPool(
+        minconn, maxconn,
+        host=os.environ['RDS_HOST'],
+        port=os.environ.get('RDS_PORT', 5432),
+        dbname=os.environ['RDS_DATABASE'],
+        user=os.environ['RDS_USER'],
+        password=os.environ['RDS_PASSWORD']
+    )
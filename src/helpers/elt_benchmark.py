@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import statistics
+
+# Pandas path: partial fact transforms, the final union, then a COPY of fact_metrics.csv into the warehouse
+PANDAS_STEPS = (
+    'src.transformation.transform_fact_metrics_production',
+    'src.transformation.transform_fact_metrics_consumption',
+    'src.transformation.transform_fact_metrics_trade',
+    'src.transformation.transform_fact_metrics_population',
+    'src.transformation.transform_fact_metrics_final'
+)
+ELT_STEP = 'src.load.load_fact_metrics_elt'
+FACT_COLUMNS = ['fact_id', 'date_id', 'product_id', 'country_id', 'metric_type', 'value']
+
+# Content hash of fact_metrics, to check both paths produce the same table
+FINGERPRINT_SQL = """
+    SELECT COUNT(*), md5(string_agg(concat_ws(',', fact_id, date_id, product_id, country_id, metric_type, value),
+                                    ';' ORDER BY fact_id))
+    FROM fact_metrics
+"""
+
+
+def run_pandas_path() -> dict:
+    """
+    Run the pandas transforms (memo bypassed) and load fact_metrics.csv with COPY.
+    """
+    from io import StringIO
+    from src.helpers.s3_utils import read_csv_from_s3
+    from src.helpers.db_utils import get_db_connection
+
+    for module in PANDAS_STEPS:
+        importlib.import_module(module).lambda_handler({'force_refresh': True}, None)
+
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    df = read_csv_from_s3(os.environ['S3_BUCKET_PROJECT_1'], f'{transformed_prefix}fact_metrics.csv')
+    buffer = StringIO()
+    df[FACT_COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE TABLE fact_metrics")
+    cursor.copy_expert(f"COPY fact_metrics({', '.join(FACT_COLUMNS)}) FROM STDIN WITH CSV", buffer)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return {'fact_rows': len(df)}
+
+
+def run_elt_path() -> dict:
+    """
+    Run the ELT handler (staging COPY + set-based SQL).
+    """
+    response = importlib.import_module(ELT_STEP).lambda_handler({}, None)
+    return {'fact_rows': response['fact_rows'], 'timings': response['timings']}
+
+
+def fact_metrics_fingerprint() -> tuple:
+    from src.helpers.db_utils import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(FINGERPRINT_SQL)
+    rows, digest = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return rows, digest
+
+
+def benchmark(runs: int = 3) -> dict:
+    """
+    Time both paths on the same inputs and compare the resulting fact_metrics tables.
+    The first run of each path is a warm-up (it may build slim artifacts) and is not timed.
+    """
+    report = {}
+    for name, run in (('pandas', run_pandas_path), ('elt', run_elt_path)):
+        run()
+        seconds, details = [], None
+        for _ in range(runs):
+            started = time.perf_counter()
+            details = run()
+            seconds.append(time.perf_counter() - started)
+        rows, digest = fact_metrics_fingerprint()
+        report[name] = {
+            'median_s': round(statistics.median(seconds), 3),
+            'runs_s': [round(s, 3) for s in seconds],
+            'fact_rows': rows,
+            'fingerprint': digest,
+            'details': details
+        }
+
+    report['speedup'] = round(report['pandas']['median_s'] / report['elt']['median_s'], 2) if report['elt']['median_s'] else None
+    report['same_result'] = report['pandas']['fingerprint'] == report['elt']['fingerprint']
+    return report
+
+
+def main(argv=None) -> int:
+    """
+    CLI: benchmark the ELT mode against the pandas path on a local PostgreSQL.
+    - RDS_* variables point at the local database (schema from food_dw.sql, dimensions loaded)
+    - S3_BUCKET_PROJECT_1 / S3_PREFIX_* select the inputs (AWS_ENDPOINT_URL can point boto3 at a local S3 stand-in)
+    Exit code is 1 when the two paths produce different fact_metrics tables.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark ELT (staging + SQL) against the pandas fact_metrics path.')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per path (after one warm-up run)')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.runs)
+    for name in ('pandas', 'elt'):
+        print(f"{name:6} median {report[name]['median_s']:8.3f} s  rows {report[name]['fact_rows']}")
+    print(f"speedup {report['speedup']}x, same result: {report['same_result']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['same_result'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
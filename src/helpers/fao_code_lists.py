@@ -0,0 +1,72 @@
+import io
+import zipfile
+import pandas as pd
+
+from src.helpers.slim_cache import S3RangeFile, RANGE_READ_SIZE, SlimSpec, read_slim_frame
+
+# FAOSTAT bulk archives ship small code-list members next to the data file, e.g.
+# Value_of_Production_E_AreaCodes.csv (Area Code, M49 Code, Area)
+AREA_CODES_SUFFIX = '_AreaCodes.csv'
+AREA_COLUMNS = ['Area Code (M49)', 'Area']
+# Code lists name the M49 column differently from the data files
+AREA_COLUMN_ALIASES = {'M49 Code': 'Area Code (M49)'}
+
+
+def fao_area_spec(name: str, member: str = None) -> SlimSpec:
+    """
+    Slim spec for the fallback scan: distinct (M49 code, area) pairs of an FAO data file.
+    """
+    return SlimSpec(
+        name=name,
+        member=member,
+        columns=tuple(AREA_COLUMNS),
+        distinct=True,
+        read_csv_kwargs={'encoding': 'utf-8'}
+    )
+
+
+def read_code_list_member(s3_client, bucket: str, source_key: str, suffix: str = AREA_CODES_SUFFIX) -> pd.DataFrame:
+    """
+    Read the code-list member of an FAO ZIP with range reads (central directory + that member only).
+    Returns None when the source is not a ZIP or has no member ending with suffix.
+    """
+    if not source_key.endswith('.zip'):
+        return None
+
+    size = s3_client.head_object(Bucket=bucket, Key=source_key)['ContentLength']
+    source = io.BufferedReader(S3RangeFile(s3_client, bucket, source_key, size), buffer_size=RANGE_READ_SIZE)
+    with zipfile.ZipFile(source) as z:
+        members = [name for name in z.namelist() if name.endswith(suffix)]
+        if not members:
+            return None
+        raw = z.read(members[0])
+
+    # Older bulk files use latin-1 code lists
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    print(f"Read code list {members[0]} from {source_key} ({len(raw)} bytes)")
+    return pd.read_csv(io.StringIO(text), dtype=str).rename(columns=AREA_COLUMN_ALIASES)
+
+
+def read_fao_areas(s3_client, bucket: str, source_key: str, spec: SlimSpec, slim_prefix: str = 'slim/') -> pd.DataFrame:
+    """
+    Distinct areas ('Area Code (M49)', 'Area') of one FAO source.
+    - Prefer the *_AreaCodes.csv member of the archive.
+    - Fall back to a streaming distinct scan of the data file (slim artifact, rebuilt only when the raw file changes).
+    """
+    areas = read_code_list_member(s3_client, bucket, source_key)
+    if areas is None or not set(AREA_COLUMNS) <= set(areas.columns):
+        print(f"No area code list in {source_key}, scanning distinct areas of the data file")
+        areas = read_slim_frame(s3_client, bucket, source_key, spec, slim_prefix)
+    return areas[AREA_COLUMNS]
+
+
+def merge_code_lists(frames: list, key: str) -> pd.DataFrame:
+    """
+    Union of code lists across sources, one row per key.
+    The first source wins on conflicting names and keeps its order, so surrogate ids of earlier sources stay stable.
+    """
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.drop_duplicates(subset=key).reset_index(drop=True)
@@ -0,0 +1,103 @@
+from io import BytesIO
+
+# Stdlib only at import time: handlers import this module on the cold-start path
+
+
+class FaoFactRun:
+    """
+    Execution modes shared by the FAO fact transforms (production, consumption) of one slim source:
+    - 'single': one pass in memory, or chunked (the slim artifact streamed batch by batch) when the estimated
+      working set does not fit in memory
+    - 'product_batches': catalog products in parallel batches, one CSV partition per product plus the combined table
+    - 'parallel': country partitions on all cores, put back into single-run order
+    Every mode writes the same fact table (product_batches groups rows by product).
+    Usage: load_rows() while the dimensions are still being fetched, then write() once they are available.
+    """
+
+    def __init__(self, s3_client, bucket: str, name: str, source_key: str, spec, slim_prefix: str, select_rows,
+                 mode: str = 'single'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.name = name
+        self.source_key = source_key
+        self.spec = spec
+        self.slim_prefix = slim_prefix
+        self.select_rows = select_rows
+        self.mode = mode
+        self.execution_mode = None
+        self.rows = None
+
+    def load_rows(self) -> None:
+        """
+        Pick the execution mode of a single run and read the selected slim rows (chunked runs read them in write()).
+        """
+        from src.helpers.memory_guard import CHUNKED
+        from src.helpers.slim_cache import read_slim_frame, slim_execution_mode
+
+        if self.mode == 'single':
+            self.execution_mode, reason = slim_execution_mode(self.s3_client, self.bucket, self.source_key, self.spec)
+            print(f"{self.name}: {self.execution_mode} execution ({reason})")
+        if self.execution_mode != CHUNKED:
+            self.rows = self.select_rows(read_slim_frame(self.s3_client, self.bucket, self.source_key, self.spec,
+                                                         self.slim_prefix))
+
+    def write(self, event: dict, build_facts, country_index, metric_type: str, output_key: str, partition_prefix: str,
+              dim_product, catalog) -> None:
+        """
+        Build the fact table in the run's mode and upload it (with its statistics sidecar).
+        - build_facts(rows, order_keys=False): fact rows of source rows whose 'country_id' is resolved;
+          order_keys adds the ORDER_COLUMNS used to put partitioned or chunked results back into single-run order
+        - country_index: resolves 'Area Code (M49)' and collects the unmatched codes under metric_type
+        """
+        from src.helpers.memory_guard import CHUNKED
+        from src.helpers.parallel_transform import available_cores, partition_by_key, run_partitions, concat_in_order
+        from src.helpers.product_batches import (
+            DEFAULT_BATCH_SIZE, DEFAULT_MAX_WORKERS, write_product_partitions, combine_partitions
+        )
+        from src.helpers.reshape import ORDER_COLUMNS
+        from src.helpers.slim_cache import ensure_slim_file, iter_slim_batches
+        from src.helpers.table_stats import put_table_with_stats
+
+        # Resolve countries by M49 code (before melting, once per source row)
+        if self.rows is not None:
+            self.rows['country_id'] = country_index.resolve_m49(self.rows['Area Code (M49)'], source=metric_type)
+
+        if self.mode == 'product_batches':
+            # Per-product partitions, combined into the usual table (rows grouped by product)
+            partitions = write_product_partitions(
+                self.s3_client, self.bucket, partition_prefix, self.rows, build_facts, dim_product, catalog,
+                batch_size=int(event.get('batch_size', DEFAULT_BATCH_SIZE)),
+                max_workers=int(event.get('max_workers', DEFAULT_MAX_WORKERS))
+            )
+            self.s3_client.put_object(Bucket=self.bucket, Key=output_key, Body=combine_partitions(partitions))
+            return
+
+        if self.mode == 'parallel':
+            # Country partitions on all cores, put back into single-run order
+            self.rows.reset_index(drop=True, inplace=True)
+            workers = int(event.get('workers') or available_cores())
+            partitions = partition_by_key(self.rows['Area Code (M49)'], workers)
+            frames = run_partitions(lambda df_rows: build_facts(df_rows, order_keys=True), self.rows, partitions,
+                                    workers=workers, executor=event.get('executor', 'process'))
+            fact_metrics = concat_in_order(frames, ORDER_COLUMNS)
+        elif self.execution_mode == CHUNKED:
+            # Slim rows batch by batch, put back into single-run order
+            slim_key = ensure_slim_file(self.s3_client, self.bucket, self.source_key, self.spec, self.slim_prefix)
+            frames = []
+            for df_batch in iter_slim_batches(self.s3_client, self.bucket, slim_key):
+                df_rows = self.select_rows(df_batch)
+                df_rows['country_id'] = country_index.resolve_m49(df_rows['Area Code (M49)'], source=metric_type)
+                frames.append(build_facts(df_rows, order_keys=True))
+            fact_metrics = concat_in_order(frames, ORDER_COLUMNS)
+        else:
+            fact_metrics = build_facts(self.rows)
+
+        # Final fact table
+        fact_metrics.reset_index(drop=True, inplace=True)
+        fact_metrics['fact_id'] = fact_metrics.index + 1
+        fact_metrics = fact_metrics[['fact_id'] + [col for col in fact_metrics.columns if col != 'fact_id']]
+
+        # Upload to S3
+        csv_buffer = BytesIO()
+        fact_metrics.to_csv(csv_buffer, index=False, encoding='utf-8')
+        put_table_with_stats(self.s3_client, self.bucket, output_key, fact_metrics, csv_buffer.getvalue(), keys=['fact_id'])
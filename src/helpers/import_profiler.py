@@ -0,0 +1,115 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# Handler packages (one Lambda per module) and the import budget their module load must fit in
+HANDLER_PACKAGES = ('extraction', 'transformation', 'load', 'orchestration')
+DEFAULT_IMPORT_BUDGET_MS = 100.0
+IMPORT_BUDGETS_MS = {}
+
+# Modules that must only be imported inside the handlers (first invocation), never at module load
+HEAVY_MODULES = ('pandas', 'numpy', 'boto3', 'botocore', 'pyarrow', 'openpyxl', 'requests')
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def discover_handlers(root: str = REPO_ROOT) -> list:
+    """
+    Return module names of all Lambda handler modules (e.g. 'src.transformation.transform_dim_date').
+    """
+    handlers = []
+    for package in HANDLER_PACKAGES:
+        package_dir = os.path.join(root, 'src', package)
+        for filename in sorted(os.listdir(package_dir)):
+            if filename.endswith('.py') and filename != '__init__.py':
+                handlers.append(f"src.{package}.{filename[:-3]}")
+    return handlers
+
+
+def get_import_budget_ms(module: str) -> float:
+    """
+    Import budget of a handler: per-handler override, IMPORT_BUDGET_MS env variable or the default.
+    """
+    if module in IMPORT_BUDGETS_MS:
+        return IMPORT_BUDGETS_MS[module]
+    return float(os.environ.get('IMPORT_BUDGET_MS', DEFAULT_IMPORT_BUDGET_MS))
+
+
+def parse_importtime(stderr: str, module: str) -> dict:
+    """
+    Parse `python -X importtime` output of `import <module>` into a cold-start profile.
+    Only imports triggered by the module (its subtree in the output) are counted.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    # importtime prints children before their parent: the module's own (level 0) line closes its subtree
+    end = max((i for i, entry in enumerate(entries) if entry[0] == module and entry[3] == 0), default=None)
+    if end is None:
+        raise ValueError(f"No import time recorded for {module}")
+    start = max((i + 1 for i, entry in enumerate(entries[:end]) if entry[3] == 0), default=0)
+    own = entries[start:end + 1]
+
+    total_us = entries[end][2]
+    heavy = sorted({name.split('.')[0] for name, _, _, _ in own if name.split('.')[0] in HEAVY_MODULES})
+    slowest = sorted(own, key=lambda entry: entry[2], reverse=True)[:5]
+    return {
+        'module': module,
+        'import_ms': round(total_us / 1000, 2),
+        'heavy_imports': heavy,
+        'slowest': [{'name': name, 'cumulative_ms': round(cumulative / 1000, 2)} for name, _, cumulative, _ in slowest]
+    }
+
+
+def profile_import(module: str, root: str = REPO_ROOT) -> dict:
+    """
+    Import a module in a fresh interpreter (a cold start) with -X importtime and return its profile.
+    """
+    env = dict(os.environ, PYTHONPATH=root)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=root, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    profile = parse_importtime(completed.stderr, module)
+    profile['budget_ms'] = get_import_budget_ms(module)
+    profile['within_budget'] = profile['import_ms'] <= profile['budget_ms']
+    return profile
+
+
+def main(argv=None) -> int:
+    """
+    CLI: profile the cold-start import cost of every handler, optionally writing a JSON report.
+    Exit code is 1 when a handler exceeds its budget or imports a heavy module at load time.
+    """
+    parser = argparse.ArgumentParser(description='Profile Lambda handler import (cold-start) time.')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    parser.add_argument('modules', nargs='*', help='Handler modules (default: all handlers)')
+    args = parser.parse_args(argv)
+
+    profiles = [profile_import(module) for module in (args.modules or discover_handlers())]
+    for profile in profiles:
+        status = 'OK' if profile['within_budget'] and not profile['heavy_imports'] else 'OVER'
+        print(f"{status:4} {profile['import_ms']:8.2f} ms / {profile['budget_ms']:.0f} ms  {profile['module']}"
+              f"{'  heavy: ' + ', '.join(profile['heavy_imports']) if profile['heavy_imports'] else ''}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(profiles, f, indent=2)
+
+    failed = [p for p in profiles if not p['within_budget'] or p['heavy_imports']]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import os
+import time
+import resource
+import functools
+import threading
+
+# Stdlib only at import time, so handlers can be decorated without loading pandas
+
+MB = 1024 * 1024
+IN_MEMORY = 'in_memory'
+CHUNKED = 'chunked'
+EXECUTION_MODES = (IN_MEMORY, CHUNKED)
+
+# Share of the available memory an in-memory parse may use (the rest is left to the transform itself)
+MEMORY_SAFETY_FACTOR = 0.6
+# cgroup limit files (v2, then v1); values above UNLIMITED_BYTES mean "no limit"
+CGROUP_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+UNLIMITED_BYTES = 1 << 60
+RSS_SAMPLE_INTERVAL_S = 0.05
+
+
+def memory_limit_bytes() -> int:
+    """
+    Memory the process may use: Lambda memory size, else the cgroup limit, else physical memory (None if unknown).
+    """
+    lambda_mb = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+    if lambda_mb:
+        return int(lambda_mb) * MB
+
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < UNLIMITED_BYTES:
+            return int(value)
+
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process (falls back to the peak RSS where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def available_memory_bytes() -> int:
+    """
+    Memory left for new allocations: the limit minus what the process already holds.
+    """
+    limit = memory_limit_bytes()
+    return None if limit is None else max(limit - current_rss_bytes(), 0)
+
+
+def choose_execution_mode(estimated_bytes: int, available_bytes: int = None, safety_factor: float = MEMORY_SAFETY_FACTOR,
+                          override: str = None) -> tuple:
+    """
+    Pick the in-memory or chunked (spill to local disk) path for a working set of estimated_bytes.
+    - override (or the EXECUTION_MODE env variable) forces a mode; 'auto' or empty means decide by memory.
+    Returns (mode, reason).
+    """
+    override = override or os.environ.get('EXECUTION_MODE', 'auto')
+    if override != 'auto':
+        if override not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{override}', expected 'auto' or one of {EXECUTION_MODES}")
+        return override, f"forced by EXECUTION_MODE={override}"
+
+    available_bytes = available_memory_bytes() if available_bytes is None else available_bytes
+    if available_bytes is None:
+        return IN_MEMORY, "available memory is unknown"
+
+    budget = available_bytes * safety_factor
+    comparison = f"estimated working set {estimated_bytes / MB:.1f} MB, budget {budget / MB:.1f} MB " \
+                 f"({safety_factor:.0%} of {available_bytes / MB:.1f} MB available)"
+    if estimated_bytes <= budget:
+        return IN_MEMORY, comparison
+    return CHUNKED, comparison
+
+
+class PeakRSSTracker:
+    """
+    Sample the process RSS in a background thread and keep the peak of the tracked block.
+    (ru_maxrss is not enough on warm Lambdas: it keeps the peak of earlier invocations.)
+    """
+
+    def __init__(self, interval_s: float = RSS_SAMPLE_INTERVAL_S):
+        self.interval_s = interval_s
+        self.start_bytes = None
+        self.peak_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+        return False
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+            time.sleep(self.interval_s)
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / MB, 1)
+
+
+def track_peak_rss(handler):
+    """
+    Decorator for Lambda handlers: log the peak RSS of each invocation and add it to dict responses ('peak_rss_mb').
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        with PeakRSSTracker() as tracker:
+            response = handler(event, context)
+        limit = memory_limit_bytes()
+        limit_text = f" of {limit / MB:.0f} MB limit" if limit else ""
+        print(f"{handler.__module__}: peak RSS {tracker.peak_mb} MB{limit_text} "
+              f"(started at {tracker.start_bytes / MB:.1f} MB)")
+        if isinstance(response, dict):
+            response = dict(response, peak_rss_mb=tracker.peak_mb)
+        return response
+    return wrapper
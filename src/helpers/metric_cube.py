@@ -0,0 +1,224 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from src.helpers.run_ledger import dropna_rows
+
+# Cube axes in storage order; query keywords use the same names
+CUBE_AXES = ('metric_type', 'product', 'country', 'year')
+VALUES_FILE = 'values.npy'
+AXES_FILE = 'axes.json'
+AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'count')
+
+
+def build_metric_cube(fact_metrics: pd.DataFrame, dim_product: pd.DataFrame, dim_country: pd.DataFrame,
+                      dim_date: pd.DataFrame) -> 'MetricCube':
+    """
+    Turn fact_metrics (long format) into a dense [metric_type, product, country, year] float array.
+    - Missing cells are NaN, so "no data" and 0 stay distinct; facts of the same cell are summed.
+    - Product and country axes follow dimension ids (product_id 0 is the 'N/A' product of population facts);
+      the year axis covers every year between the first and last fact year.
+    """
+    facts = fact_metrics.merge(dim_date[['date_id', 'year']], on='date_id', how='left')
+    facts = dropna_rows(facts, 'metric_cube_facts', subset=['metric_type', 'product_id', 'country_id', 'year'])
+
+    product_names = dict(zip(dim_product['product_id'].astype(int), dim_product['product_name']))
+    product_ids = sorted(set(product_names) | set(facts['product_id'].astype(int)))
+    dim_country = dim_country.sort_values('country_id')
+    country_ids = dim_country['country_id'].astype(int).tolist()
+    years = list(range(int(facts['year'].min()), int(facts['year'].max()) + 1)) if len(facts) else []
+
+    axes = {
+        'metric_type': sorted(facts['metric_type'].unique()),
+        'product': product_ids,
+        'country': country_ids,
+        'year': years
+    }
+    labels = {
+        'product': [product_names.get(pid, 'N/A') for pid in product_ids],
+        'country': dim_country['country_name'].tolist(),
+        'continent': dim_country['continent_name'].fillna('Unknown').tolist()
+    }
+
+    # Cell coordinates of every fact
+    coords = []
+    for axis, column in zip(CUBE_AXES, ['metric_type', 'product_id', 'country_id', 'year']):
+        keys = facts[column] if axis == 'metric_type' else facts[column].astype(int)
+        positions = pd.Index(axes[axis]).get_indexer(keys)
+        if (positions < 0).any():
+            raise ValueError(f"fact_metrics has {int((positions < 0).sum())} rows with {column} missing from the dimensions")
+        coords.append(positions)
+
+    # Several source items can map to one product, so facts of the same cell are summed (as a group-by would)
+    shape = tuple(len(axes[axis]) for axis in CUBE_AXES)
+    size = int(np.prod(shape))
+    flat = np.ravel_multi_index(coords, shape) if len(facts) else np.array([], dtype=np.int64)
+    fact_values = facts['value'].astype(float).to_numpy()
+    has_value = ~np.isnan(fact_values)
+    totals = np.bincount(flat[has_value], weights=fact_values[has_value], minlength=size)
+    counts = np.bincount(flat[has_value], minlength=size)
+
+    values = np.where(counts > 0, totals, np.nan).reshape(shape)
+    return MetricCube(values, axes, labels)
+
+
+class MetricCube:
+    """
+    Dense metric cube with id -> index maps for O(1) slicing and vectorized aggregation along any axis.
+    - values: ndarray (or read-only memmap) shaped [metric_type, product, country, year]
+    - axes: keys of every axis (metric type names, product_ids, country_ids, years)
+    - labels: display names per axis position ('product', 'country') and grouping labels ('continent')
+
+    Queries use the axis names as keywords; a scalar key drops the axis, a list keeps it:
+        cube.select(metric_type='production', product=1, year=2020)     # -> values per country
+        cube.aggregate('sum', over='country', metric_type='import')     # -> [product, year]
+        cube.rollup('continent', metric_type='production', year=2020)   # -> {continent: values per product}
+    """
+
+    def __init__(self, values: np.ndarray, axes: dict, labels: dict = None):
+        shape = tuple(len(axes[axis]) for axis in CUBE_AXES)
+        if values.shape != shape:
+            raise ValueError(f"Cube values have shape {values.shape}, axes expect {shape}")
+        self.values = values
+        self.axes = {axis: list(axes[axis]) for axis in CUBE_AXES}
+        self.labels = labels or {}
+        self._positions = {axis: {key: i for i, key in enumerate(keys)} for axis, keys in self.axes.items()}
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def index(self, axis: str, key) -> int:
+        """
+        Position of a key on an axis.
+        """
+        try:
+            return self._positions[axis][key]
+        except KeyError:
+            raise ValueError(f"Unknown {axis} key: {key!r}") from None
+
+    def select(self, **keys) -> np.ndarray:
+        """
+        Slice of the cube (a view when only scalar keys are given). Remaining axes keep CUBE_AXES order.
+        """
+        return self._select(keys)[0]
+
+    def aggregate(self, how: str = 'sum', over='country', **keys) -> np.ndarray:
+        """
+        Aggregate the selection along one or more remaining axes, ignoring missing cells.
+        Cells without any data aggregate to NaN (0 for 'count').
+        """
+        values, remaining = self._select(keys)
+        over = (over,) if isinstance(over, str) else tuple(over)
+        missing = [axis for axis in over if axis not in remaining]
+        if missing:
+            raise ValueError(f"Cannot aggregate over {missing}: axes left after selection are {remaining}")
+        return _aggregate(values, how, tuple(remaining.index(axis) for axis in over))
+
+    def rollup(self, group_by: str = 'continent', how: str = 'sum', **keys) -> dict:
+        """
+        Aggregate countries into groups (e.g. continents): {group label: aggregate over its countries}.
+        """
+        if 'country' in keys:
+            raise ValueError("rollup aggregates over countries, do not select a country")
+        if group_by not in self.labels:
+            raise ValueError(f"Unknown country grouping '{group_by}', available: {sorted(self.labels)}")
+
+        values, remaining = self._select(keys)
+        country_axis = remaining.index('country')
+        groups = np.asarray(self.labels[group_by])
+        return {
+            label: _aggregate(np.take(values, np.flatnonzero(groups == label), axis=country_axis), how, (country_axis,))
+            for label in sorted(set(self.labels[group_by]))
+        }
+
+    def ranking(self, axis: str = 'country', **keys) -> list:
+        """
+        [(key, value)] of a one-dimensional selection along axis, highest value first (missing cells excluded).
+        """
+        values, remaining = self._select(keys)
+        if remaining != [axis]:
+            raise ValueError(f"Ranking needs a selection along '{axis}' only, got axes {remaining}")
+        order = np.argsort(-values, kind='stable')
+        return [(self.axes[axis][i], float(values[i])) for i in order if not np.isnan(values[i])]
+
+    def save(self, directory: str):
+        """
+        Persist the cube as values.npy (memory-mappable) and axes.json.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VALUES_FILE), np.ascontiguousarray(self.values))
+        with open(os.path.join(directory, AXES_FILE), 'w', encoding='utf-8') as f:
+            f.write(self.axes_json())
+
+    def axes_json(self) -> str:
+        return json.dumps({'axes': self.axes, 'labels': self.labels}, default=int)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r') -> 'MetricCube':
+        """
+        Open a persisted cube; values are memory-mapped, so only the slices that are read get paged in.
+        """
+        with open(os.path.join(directory, AXES_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(directory, VALUES_FILE), mmap_mode=mmap_mode)
+        return cls(values, meta['axes'], meta['labels'])
+
+    @classmethod
+    def from_s3(cls, s3_client, bucket: str, prefix: str, cache_dir: str = '/tmp/metric_cube') -> 'MetricCube':
+        """
+        Download a cube written by transform_metric_cube to a local directory (e.g. Lambda /tmp) and memory-map it.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in (VALUES_FILE, AXES_FILE):
+            s3_client.download_file(bucket, f"{prefix}{name}", os.path.join(cache_dir, name))
+        return cls.load(cache_dir)
+
+    def _select(self, keys):
+        unknown = set(keys) - set(CUBE_AXES)
+        if unknown:
+            raise ValueError(f"Unknown cube axes: {sorted(unknown)}, expected {CUBE_AXES}")
+
+        index, remaining = [], []
+        for axis in CUBE_AXES:
+            key = keys.get(axis)
+            if key is None:
+                index.append(slice(None))
+                remaining.append(axis)
+            elif isinstance(key, (list, tuple)):
+                index.append([self.index(axis, k) for k in key])
+                remaining.append(axis)
+            else:
+                index.append(self.index(axis, key))
+
+        # Apply list keys one axis at a time (numpy would broadcast several index lists together)
+        values = self.values[tuple(i if not isinstance(i, list) else slice(None) for i in index)]
+        kept = 0
+        for i in index:
+            if isinstance(i, list):
+                values = np.take(values, i, axis=kept)
+            if not isinstance(i, int):
+                kept += 1
+        return values, remaining
+
+
+def _aggregate(values, how, axis):
+    if how not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{how}', expected one of {AGGREGATIONS}")
+
+    present = ~np.isnan(values)
+    count = present.sum(axis=axis)
+    if how == 'count':
+        return count
+
+    if how in ('sum', 'mean'):
+        result = np.where(present, values, 0.0).sum(axis=axis)
+        if how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = result / count
+    elif how == 'min':
+        result = np.where(present, values, np.inf).min(axis=axis)
+    else:
+        result = np.where(present, values, -np.inf).max(axis=axis)
+    return np.where(count > 0, result, np.nan)
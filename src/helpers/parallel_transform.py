@@ -0,0 +1,128 @@
+import os
+import traceback
+import multiprocessing
+
+from src.helpers import run_ledger
+
+# Stdlib only at import time; numpy / pandas are imported where they are used
+
+PARALLEL_EXECUTORS = ('process', 'serial')
+# Global row position and year column position: together they give the single-run row order of stacked facts
+ROW_ORDER_COLUMN = '_row'
+YEAR_ORDER_COLUMN = '_year_pos'
+
+# Work of the current run_partitions call, inherited by the forked workers (never pickled)
+_TASK = None
+
+
+def available_cores() -> int:
+    """
+    CPU cores this process may run on (Lambda: 1 vCPU per 1769 MB, up to 6).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def partition_by_key(keys, partition_count: int) -> list:
+    """
+    Split row positions into at most partition_count partitions; all rows of a key (e.g. a country code)
+    stay in one partition and partitions get similar row counts (largest keys placed first).
+    Positions keep their original order inside every partition. Returns a list of numpy arrays.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, _ = pd.factorize(pd.Series(keys).reset_index(drop=True), use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    partition_count = max(1, min(partition_count, len(sizes)))
+
+    # Longest-processing-time-first: every key goes to the currently smallest partition
+    loads = np.zeros(partition_count, dtype='int64')
+    partition_of_key = np.empty(len(sizes), dtype='int64')
+    for key in np.argsort(-sizes, kind='stable'):
+        target = int(np.argmin(loads))
+        partition_of_key[key] = target
+        loads[target] += sizes[key]
+
+    partition_of_row = partition_of_key[codes]
+    return [np.flatnonzero(partition_of_row == p) for p in range(partition_count) if loads[p]]
+
+
+def run_partitions(func, frame, partitions: list, workers: int = None, executor: str = 'process') -> list:
+    """
+    Run func(frame rows of a partition) for every partition and return the results in partition order.
+    - 'process': one forked worker process per core. Workers inherit frame and everything func closes over
+      (dimension tables, lookup arrays) copy-on-write, so read-only inputs are shared, not copied or pickled;
+      only results travel back (through pipes: Lambda has no /dev/shm, so multiprocessing pools and queues
+      are not available there).
+    - 'serial': run the partitions in this process (also used with one worker or where fork is unavailable).
+    """
+    global _TASK
+
+    if executor not in PARALLEL_EXECUTORS:
+        raise ValueError(f"Unknown parallel executor '{executor}', expected one of {PARALLEL_EXECUTORS}")
+    workers = min(workers or available_cores(), len(partitions))
+    if executor == 'serial' or workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [func(frame.iloc[rows]) for rows in partitions]
+
+    context = multiprocessing.get_context('fork')
+    _TASK = (func, frame, partitions)
+    try:
+        processes = []
+        for worker in range(workers):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_worker, args=(worker, workers, sender), daemon=True)
+            process.start()
+            sender.close()
+            processes.append((process, receiver))
+
+        results = [None] * len(partitions)
+        errors = []
+        for worker, (process, receiver) in enumerate(processes):
+            try:
+                status, payload, counts = receiver.recv()
+            except EOFError:
+                status, payload, counts = 'error', f"worker {worker} exited without a result", None
+            finally:
+                receiver.close()
+                process.join()
+            # Rows read, written and dropped by the worker count towards the step in the run ledger
+            run_ledger.merge_worker_counts(counts)
+            if status == 'error':
+                errors.append(payload)
+            else:
+                for index, result in payload:
+                    results[index] = result
+    finally:
+        _TASK = None
+
+    if errors:
+        raise RuntimeError(f"Parallel transform failed: {errors[0]}")
+    return results
+
+
+def concat_in_order(frames: list, order_columns=(YEAR_ORDER_COLUMN, ROW_ORDER_COLUMN)):
+    """
+    Concatenate partition results and restore the single-run row order from their order columns
+    (which are dropped), so the output does not depend on the partitioning or the worker count.
+    """
+    import pandas as pd
+
+    combined = pd.concat(frames, ignore_index=True)
+    combined.sort_values(list(order_columns), kind='stable', inplace=True)
+    return combined.drop(columns=list(order_columns)).reset_index(drop=True)
+
+
+def _run_worker(worker, workers, sender):
+    func, frame, partitions = _TASK
+    run_ledger.start_worker()
+    try:
+        # Static round-robin assignment: worker w runs partitions w, w + workers, ...
+        payload = [(index, func(frame.iloc[partitions[index]])) for index in range(worker, len(partitions), workers)]
+        sender.send(('ok', payload, run_ledger.worker_counts()))
+    except Exception:
+        sender.send(('error', traceback.format_exc(), run_ledger.worker_counts()))
+    finally:
+        sender.close()
@@ -0,0 +1,211 @@
+import re
+import struct
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from src.helpers.run_ledger import record_rows
+
+# COPY ... FROM STDIN (FORMAT binary): signature, flags, header extension length, then tuples and a -1 trailer
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+COPY_FORMATS = ('csv', 'binary')
+BATCH_ROWS = 100_000
+
+INTEGER_WIDTHS = {'int2': 2, 'int4': 4, 'int8': 8}
+FLOAT_WIDTHS = {'float4': 4, 'float8': 8}
+NUMERIC_TYPE = re.compile(r'numeric\((\d+),\s*(\d+)\)')
+NUMERIC_POS, NUMERIC_NEG = 0x0000, 0x4000
+NBASE, DEC_DIGITS = 10000, 4
+
+
+def copy_dataframe(cursor, table: str, df: pd.DataFrame, column_types: dict, copy_format: str = 'csv',
+                   progress=None) -> int:
+    """
+    COPY the column_types columns of df into table and return the number of rows.
+    - 'csv': text COPY from a CSV buffer (PostgreSQL parses every field).
+    - 'binary': typed columns encoded straight into the binary COPY protocol (see encode_binary_copy).
+    column_types maps column -> PostgreSQL type: int2/int4/int8, float4/float8, numeric(p,s) or text.
+    progress (optional) is called with the number of rows sent so far (after every binary batch, once for CSV).
+    """
+    if copy_format not in COPY_FORMATS:
+        raise ValueError(f"Unknown COPY format '{copy_format}', expected one of {COPY_FORMATS}")
+
+    columns = list(column_types)
+    if copy_format == 'binary':
+        stream = BinaryCopyStream(encode_binary_copy(df, column_types, progress=progress))
+        cursor.copy_expert(f"COPY {table}({', '.join(columns)}) FROM STDIN (FORMAT binary)", stream)
+    else:
+        buffer = StringIO()
+        df[columns].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table}({', '.join(columns)}) FROM STDIN WITH CSV", buffer)
+        if progress is not None:
+            progress(len(df))
+    record_rows('output', len(df))
+    return len(df)
+
+
+def encode_binary_copy(df: pd.DataFrame, column_types: dict, batch_rows: int = BATCH_ROWS, progress=None):
+    """
+    Yield the binary COPY payload of df: header, one chunk per batch of rows, trailer.
+    Every batch is encoded column by column with numpy (no per-row Python code); NaN/None become NULL.
+    """
+    yield PGCOPY_HEADER
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        yield _encode_tuples([encode_column(batch[col], pg_type) for col, pg_type in column_types.items()])
+        if progress is not None:
+            progress(start + len(batch))
+    yield PGCOPY_TRAILER
+
+
+def print_copy_progress(table: str, total_rows: int):
+    """
+    Progress callback for copy_dataframe printing rows sent out of total_rows (e.g. from the statistics sidecar).
+    """
+    def report(rows):
+        share = rows / total_rows if total_rows else 1.0
+        print(f"{table}: {rows}/{total_rows} rows sent ({share:.0%})")
+    return report
+
+
+def encode_column(values: pd.Series, pg_type: str) -> tuple:
+    """
+    Binary field values of one column: (field lengths as int32 with -1 for NULL, concatenated bytes of the non-NULL values).
+    """
+    null = values.isna().to_numpy()
+    present = values[~null]
+
+    if pg_type in INTEGER_WIDTHS:
+        width = INTEGER_WIDTHS[pg_type]
+        numbers = present.to_numpy(dtype='float64') if present.dtype.kind == 'f' else present.to_numpy(dtype='int64')
+        if numbers.dtype.kind == 'f':
+            if not np.array_equal(numbers, np.trunc(numbers)):
+                raise ValueError(f"Column {values.name} has non-integer values for {pg_type}")
+            numbers = numbers.astype('int64')
+        limit = 1 << (8 * width - 1)
+        if len(numbers) and (numbers.min() < -limit or numbers.max() >= limit):
+            raise ValueError(f"Column {values.name} has values out of range for {pg_type}")
+        data = numbers.astype(f'>i{width}').view(np.uint8)
+        return _fixed_lengths(null, width), data
+
+    if pg_type in FLOAT_WIDTHS:
+        width = FLOAT_WIDTHS[pg_type]
+        data = present.to_numpy(dtype='float64').astype(f'>f{width}').view(np.uint8)
+        return _fixed_lengths(null, width), data
+
+    match = NUMERIC_TYPE.fullmatch(pg_type)
+    if match:
+        return _encode_numeric(values, null, present.to_numpy(dtype='float64'), int(match.group(1)), int(match.group(2)))
+
+    if pg_type in ('text', 'varchar'):
+        return _encode_text(values, null)
+
+    raise ValueError(f"Unsupported binary COPY type '{pg_type}' for column {values.name}")
+
+
+class BinaryCopyStream:
+    """
+    File-like reader over encoded chunks, so copy_expert streams batches without joining the whole payload.
+    The current chunk is served through a memoryview and a read offset: copy_expert reads a few KB at a time,
+    and re-slicing the rest of a multi-MB batch on every read would make streaming quadratic.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b'')
+        self._offset = 0
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        remaining = -1 if size is None or size < 0 else size
+        while remaining:
+            if self._offset >= len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk, self._offset = memoryview(chunk), 0
+                continue
+            end = len(self._chunk) if remaining < 0 else min(self._offset + remaining, len(self._chunk))
+            parts.append(self._chunk[self._offset:end])
+            if remaining > 0:
+                remaining -= end - self._offset
+            self._offset = end
+        return b''.join(parts)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+
+def _fixed_lengths(null, width):
+    return np.where(null, -1, width).astype('int32')
+
+
+def _encode_numeric(values, null, numbers, precision, scale):
+    # numeric on the wire: ndigits, weight, sign, dscale (int16 each), then ndigits base-10000 digits.
+    # All values of a batch share one digit layout (leading zero digits are allowed, PostgreSQL strips them).
+    frac_digits = -(-scale // DEC_DIGITS)
+    magnitude = np.abs(numbers)
+    if len(numbers) and magnitude.max() * 10 ** (frac_digits * DEC_DIGITS) >= 2 ** 62:
+        raise ValueError(f"Column {values.name} has values too large for binary numeric encoding")
+
+    # Round to the column scale half away from zero (as PostgreSQL does for text input)
+    scaled = np.floor(magnitude * 10 ** scale + 0.5).astype('int64')
+    # PostgreSQL would reject the whole COPY with "numeric field overflow": name the column instead
+    if len(scaled) and scaled.max() >= 10 ** precision:
+        raise ValueError(f"Column {values.name} has values out of range for numeric({precision},{scale})")
+    units = scaled * 10 ** (frac_digits * DEC_DIGITS - scale)
+    integer_part = int(units.max()) // NBASE ** frac_digits if len(units) else 0
+    int_digits = 1
+    while integer_part >= NBASE ** int_digits:
+        int_digits += 1
+    ndigits = int_digits + frac_digits
+
+    words = np.empty((len(units), 4 + ndigits), dtype='>u2')
+    words[:, 0] = ndigits
+    words[:, 1] = int_digits - 1
+    words[:, 2] = np.where(numbers < 0, NUMERIC_NEG, NUMERIC_POS)
+    words[:, 3] = scale
+    for position in range(ndigits):
+        words[:, 4 + position] = (units // NBASE ** (ndigits - 1 - position)) % NBASE
+    return _fixed_lengths(null, 2 * (4 + ndigits)), words.reshape(-1).view(np.uint8)
+
+
+def _encode_text(values, null):
+    # Encode each distinct string once, then gather the bytes per row
+    codes, uniques = pd.factorize(values)
+    encoded = [str(value).encode('utf-8') for value in uniques]
+    unique_lengths = np.array([len(b) for b in encoded], dtype='int64')
+    unique_starts = np.concatenate([[0], np.cumsum(unique_lengths)[:-1]]) if len(encoded) else np.array([], dtype='int64')
+    flat = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    lengths = np.where(null, -1, unique_lengths[codes] if len(encoded) else -1).astype('int32')
+    present_codes = codes[~null]
+    return lengths, flat[_gather_index(unique_starts[present_codes], unique_lengths[present_codes])]
+
+
+def _gather_index(starts, lengths):
+    # Byte positions of consecutive runs [start, start + length) for every run, in order
+    total = int(lengths.sum())
+    run_offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - run_offsets, lengths) + np.arange(total)
+
+
+def _encode_tuples(fields):
+    n_rows = len(fields[0][0]) if fields else 0
+    sizes = [4 + np.maximum(lengths, 0).astype('int64') for lengths, _ in fields]
+    row_sizes = 2 + np.sum(sizes, axis=0)
+    row_starts = np.cumsum(row_sizes) - row_sizes
+    buffer = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+
+    # Tuple header: field count (int16)
+    buffer[row_starts[:, None] + np.arange(2)] = np.frombuffer(struct.pack('>h', len(fields)), dtype=np.uint8)
+    offsets = row_starts + 2
+    for (lengths, data), size in zip(fields, sizes):
+        buffer[offsets[:, None] + np.arange(4)] = lengths.astype('>i4').view(np.uint8).reshape(n_rows, 4)
+        has_data = lengths > 0
+        buffer[_gather_index(offsets[has_data] + 4, lengths[has_data].astype('int64'))] = data
+        offsets = offsets + size
+    return buffer.tobytes()
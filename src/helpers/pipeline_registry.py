@@ -0,0 +1,214 @@
+import os
+
+# Stdlib only: the dispatcher plans runs without loading any handler
+
+# Pipeline steps in their default run order. Keys use zone placeholders resolved from the S3_PREFIX_* variables.
+# - inputs: raw / resource / transformed objects the step reads
+# - outputs: objects (or warehouse tables, 'table:<name>') the step writes
+PIPELINE = {
+    'transform_dim_date': {
+        'module': 'src.transformation.transform_dim_date',
+        'inputs': [],
+        'outputs': ['{transformed}dim_date.csv']
+    },
+    'transform_dim_product': {
+        'module': 'src.transformation.transform_dim_product',
+        'inputs': ['{resources}product_catalog.csv'],
+        'outputs': ['{transformed}dim_product.csv']
+    },
+    'transform_dim_country': {
+        'module': 'src.transformation.transform_dim_country',
+        'inputs': [
+            '{raw}faostat_production.zip',
+            '{raw}FAO/FoodBalance/faostat_consumption.zip',
+            '{raw}FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv',
+            '{resources}m49_continents.csv',
+            '{resources}m49_iso3.csv',
+            '{resources}country_aliases.csv'
+        ],
+        'outputs': ['{transformed}dim_country.csv', '{transformed}country_aliases.csv']
+    },
+    'transform_fact_metrics_production': {
+        'module': 'src.transformation.transform_fact_metrics_production',
+        'inputs': [
+            '{raw}FAO/FoodBalance/faostat_consumption.zip',
+            '{resources}product_catalog.csv',
+            '{transformed}dim_country.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics_production.csv']
+    },
+    'transform_fact_metrics_consumption': {
+        'module': 'src.transformation.transform_fact_metrics_consumption',
+        'inputs': [
+            '{raw}FAO/FoodBalance/faostat_consumption.zip',
+            '{resources}product_catalog.csv',
+            '{transformed}dim_country.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics_consumption.csv']
+    },
+    'transform_fact_metrics_trade': {
+        'module': 'src.transformation.transform_fact_metrics_trade',
+        'inputs': [
+            '{raw}FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv',
+            '{resources}product_catalog.csv',
+            '{transformed}dim_country.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics_trade.csv']
+    },
+    'transform_fact_metrics_population': {
+        'module': 'src.transformation.transform_fact_metrics_population',
+        'inputs': [
+            '{raw}WB/wb_population.parquet',
+            '{transformed}dim_country.csv',
+            '{transformed}country_aliases.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics_population.csv']
+    },
+    'transform_fact_metrics_final': {
+        'module': 'src.transformation.transform_fact_metrics_final',
+        'inputs': [
+            '{transformed}fact_metrics_consumption.csv',
+            '{transformed}fact_metrics_production.csv',
+            '{transformed}fact_metrics_trade.csv',
+            '{transformed}fact_metrics_population.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics.csv']
+    },
+    'transform_fact_metrics_wide': {
+        'module': 'src.transformation.transform_fact_metrics_wide',
+        'inputs': [
+            '{transformed}fact_metrics.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_country.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_metrics_wide.parquet']
+    },
+    'transform_metric_cube': {
+        'module': 'src.transformation.transform_metric_cube',
+        'inputs': [
+            '{transformed}fact_metrics.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_country.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}metric_cube/values.npy', '{transformed}metric_cube/axes.json']
+    },
+    'transform_fact_prices': {
+        'module': 'src.transformation.transform_fact_prices',
+        'inputs': [
+            '{raw}WB/CMO-Historical-Data-Monthly.xlsx',
+            '{resources}product_catalog.csv',
+            '{resources}price_deflator.csv',
+            '{transformed}dim_product.csv',
+            '{transformed}dim_date.csv'
+        ],
+        'outputs': ['{transformed}fact_prices.csv']
+    },
+    'load_dim_product': {
+        'module': 'src.load.load_dim_product',
+        'inputs': ['{transformed}dim_product.csv'],
+        'outputs': ['table:dim_product']
+    },
+    'load_fact_metrics': {
+        'module': 'src.load.load_fact_metrics',
+        'inputs': ['{transformed}fact_metrics.csv'],
+        'outputs': ['table:fact_metrics']
+    },
+    'load_fact_prices': {
+        'module': 'src.load.load_fact_prices',
+        'inputs': ['{transformed}fact_prices.csv'],
+        'outputs': ['table:fact_prices']
+    },
+    'load_fact_metrics_wide': {
+        'module': 'src.load.load_fact_metrics_wide',
+        'inputs': ['{transformed}fact_metrics_wide.parquet'],
+        'outputs': ['table:fact_metrics_wide']
+    }
+}
+
+
+def get_prefixes() -> dict:
+    """
+    Zone prefixes used to resolve registry keys (same environment variables as the handlers).
+    """
+    return {
+        'raw': os.environ.get('S3_PREFIX_RAW', 'raw/'),
+        'transformed': os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/'),
+        'resources': os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
+    }
+
+
+def resolve_registry(registry: dict = None, prefixes: dict = None) -> dict:
+    """
+    Return a copy of the registry with zone placeholders replaced by the actual S3 prefixes.
+    """
+    registry = PIPELINE if registry is None else registry
+    prefixes = get_prefixes() if prefixes is None else prefixes
+    return {
+        name: dict(step,
+                   inputs=[key.format(**prefixes) for key in step['inputs']],
+                   outputs=[key.format(**prefixes) for key in step['outputs']])
+        for name, step in registry.items()
+    }
+
+
+def upstream_steps(registry: dict) -> dict:
+    """
+    Map every step to the steps producing its inputs.
+    """
+    producers = {key: name for name, step in registry.items() for key in step['outputs']}
+    return {
+        name: {producers[key] for key in step['inputs'] if key in producers and producers[key] != name}
+        for name, step in registry.items()
+    }
+
+
+def affected_steps(changed_keys, registry: dict) -> set:
+    """
+    Steps that consume any of the changed keys, plus everything downstream of them.
+    """
+    changed_keys = set(changed_keys)
+    affected = {name for name, step in registry.items() if changed_keys.intersection(step['inputs'])}
+
+    upstream = upstream_steps(registry)
+    grew = True
+    while grew:
+        downstream = {name for name, deps in upstream.items() if deps & affected} - affected
+        affected |= downstream
+        grew = bool(downstream)
+    return affected
+
+
+def topological_order(steps, registry: dict) -> list:
+    """
+    Order steps so that every step runs after the steps producing its inputs.
+    Ties keep the registry order; a dependency cycle raises ValueError.
+    """
+    steps = set(steps)
+    upstream = {name: deps & steps for name, deps in upstream_steps(registry).items() if name in steps}
+
+    ordered = []
+    done = set()
+    while len(ordered) < len(steps):
+        ready = [name for name in registry if name in steps and name not in done and upstream[name] <= done]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {sorted(steps - done)}")
+        ordered.append(ready[0])
+        done.add(ready[0])
+    return ordered
+
+
+def plan_runs(changed_keys, registry: dict = None, prefixes: dict = None) -> list:
+    """
+    Steps to run (in order) after the given S3 keys changed.
+    """
+    resolved = resolve_registry(registry, prefixes)
+    return topological_order(affected_steps(changed_keys, resolved), resolved)
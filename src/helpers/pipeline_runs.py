@@ -0,0 +1,39 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+# Stdlib only at import time (used by the dispatcher and long-running readers such as the query API)
+
+# Marker of the last completed pipeline run, stored in the transformed zone
+LATEST_RUN_FILE = '_latest_run.json'
+
+
+def new_run_id() -> str:
+    """
+    Sortable, unique pipeline run ID: UTC start time plus a random suffix (e.g. 20240131T120000Z-1a2b3c4d).
+    """
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+
+
+def latest_run_key(transformed_prefix: str) -> str:
+    return f"{transformed_prefix}{LATEST_RUN_FILE}"
+
+
+def write_latest_run(s3_client, bucket: str, key: str, run: dict) -> None:
+    """
+    Publish a finished run (run_id, steps, ...) as the latest one; readers invalidate cached results when it changes.
+    """
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(run).encode('utf-8'))
+
+
+def read_latest_run_id(s3_client, bucket: str, key: str) -> str:
+    """
+    ID of the latest finished run (None before the first dispatched run).
+    """
+    try:
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    except s3_client.exceptions.ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise
+    return json.loads(body).get('run_id')
@@ -0,0 +1,94 @@
+from io import BytesIO
+import pandas as pd
+
+# Compact long-format store of World Bank population: one row per (country_code, year)
+STORE_COLUMNS = ['country_code', 'country_name', 'year', 'value']
+STORE_DTYPES = {'country_code': 'category', 'country_name': 'category', 'year': 'int16', 'value': 'int64'}
+# S3 object metadata key holding the last year with data
+WATERMARK_METADATA = 'watermark'
+
+
+def parse_api_records(records: list) -> pd.DataFrame:
+    """
+    Store rows from World Bank indicator API records (JSON page payloads).
+    - Records without a value (years not published yet) are dropped, so they are fetched again next run.
+    - Aggregates without an ISO3 code keep their 2-letter API id, so every row has a country code.
+    """
+    rows = [
+        ((record.get('countryiso3code') or record['country']['id']).strip().upper(),
+         record['country']['value'],
+         int(record['date']),
+         record['value'])
+        for record in records
+        if record.get('value') is not None
+    ]
+    return _typed(pd.DataFrame(rows, columns=STORE_COLUMNS))
+
+
+def merge_population(existing: pd.DataFrame, fetched: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add fetched rows to the store; fetched values replace stored ones for the same (country_code, year).
+    Rows are ordered by year, then country code.
+    """
+    frames = [df.astype({'country_code': 'string', 'country_name': 'string'}) for df in (existing, fetched) if df is not None]
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(subset=['country_code', 'year'], keep='last')
+    return _typed(merged.sort_values(['year', 'country_code'], kind='stable').reset_index(drop=True))
+
+
+def population_changed(existing: pd.DataFrame, store: pd.DataFrame) -> bool:
+    """
+    Whether a merged store differs from the stored one (rows and values; category dtypes are not compared).
+    """
+    if existing is None:
+        return True
+    as_text = {'country_code': 'string', 'country_name': 'string'}
+    return not existing.astype(as_text).equals(store.astype(as_text))
+
+
+def store_watermark(df: pd.DataFrame) -> int:
+    """
+    Last year with data in the store (None for an empty store).
+    """
+    return int(df['year'].max()) if df is not None and len(df) else None
+
+
+def read_population_store(s3_client, bucket: str, key: str) -> pd.DataFrame:
+    """
+    Read the store from S3 (None when it does not exist yet).
+    """
+    try:
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return _typed(pd.read_parquet(BytesIO(body)))
+
+
+def read_watermark(s3_client, bucket: str, key: str) -> int:
+    """
+    Watermark persisted with the store (object metadata, no download needed; None when there is no store).
+    """
+    try:
+        metadata = s3_client.head_object(Bucket=bucket, Key=key)['Metadata']
+    except s3_client.exceptions.ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise
+    watermark = metadata.get(WATERMARK_METADATA)
+    return int(watermark) if watermark else store_watermark(read_population_store(s3_client, bucket, key))
+
+
+def write_population_store(s3_client, bucket: str, key: str, df: pd.DataFrame) -> int:
+    """
+    Write the store as Parquet with its watermark in the object metadata. Returns the watermark.
+    """
+    watermark = store_watermark(df)
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue(),
+                         Metadata={WATERMARK_METADATA: str(watermark or '')})
+    return watermark
+
+
+def _typed(df):
+    return df[STORE_COLUMNS].astype(STORE_DTYPES)
@@ -0,0 +1,234 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+FEATURE_COLUMNS = ['avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct']
+STATE_COLUMNS = ['last_year', 'last_month', 'last_price', 'year_sum', 'year_count', 'prior_year_avg', 'history_hash']
+
+# Multi-horizon features (recomputed over the whole history on every run, so they need no incremental state)
+ROLLING_MEAN_WINDOWS = (3, 6, 12)
+VOLATILITY_WINDOW = 12
+DRAWDOWN_WINDOW = 12
+HORIZON_COLUMNS = ['price_yoy_change_pct'] + [f'price_rolling_mean_{w}m' for w in ROLLING_MEAN_WINDOWS] + \
+                  [f'price_volatility_{VOLATILITY_WINDOW}m', f'price_drawdown_{DRAWDOWN_WINDOW}m_pct', 'real_price_usd_per_ton']
+
+
+def _nan_to_none(value):
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+
+def history_hash(prices: pd.DataFrame) -> str:
+    """
+    Fingerprint of one product's price history (year, month, price), used to detect revised months.
+    """
+    ordered = prices.sort_values(['year', 'month'])
+    payload = np.concatenate([
+        ordered['year'].to_numpy(dtype='float64'),
+        ordered['month'].to_numpy(dtype='float64'),
+        np.nan_to_num(ordered['price_usd_per_ton'].to_numpy(dtype='float64'), nan=-1.0)
+    ])
+    return hashlib.sha256(payload.tobytes()).hexdigest()
+
+
+def compute_price_features(df: pd.DataFrame, state: dict = None):
+    """
+    Compute avg_annual_price, price_month_change_pct and price_annual_change_pct for the given months.
+    - df: product_name, year, month, price_usd_per_ton (only months after the state of each product).
+    - state: per-product state persisted by the previous run (see STATE_COLUMNS); None means full recompute.
+    Annual sums are accumulated month by month in the same order in both modes,
+    so appending months to a persisted state gives exactly the values of a full recompute.
+    Returns (features DataFrame sorted by product and month, new per-product state).
+    """
+    df = df.sort_values(['product_name', 'year', 'month'], kind='stable').reset_index(drop=True)
+    state = state or {}
+
+    products = df['product_name'].to_numpy(dtype=object)
+    years = df['year'].to_numpy(dtype='int64')
+    prices = df['price_usd_per_ton'].to_numpy(dtype='float64')
+    n_rows = len(df)
+
+    # Groups = (product, year) runs in sorted order
+    first_of_product = np.ones(n_rows, dtype=bool)
+    first_of_product[1:] = products[1:] != products[:-1]
+    first_of_group = first_of_product.copy()
+    first_of_group[1:] |= years[1:] != years[:-1]
+    group = np.cumsum(first_of_group) - 1
+    group_rows = np.flatnonzero(first_of_group)
+    group_first_of_product = first_of_product[group_rows]
+
+    # Per-group view of the persisted state (only meaningful for the first group of each product)
+    state_df = pd.DataFrame.from_dict(state, orient='index').reindex(columns=STATE_COLUMNS)
+    group_state = state_df.reindex(products[group_rows])
+    has_state = group_state['last_year'].notna().to_numpy() & group_first_of_product
+    continues_year = has_state & (group_state['last_year'].to_numpy(dtype='float64') == years[group_rows])
+
+    sums = np.where(continues_year, group_state['year_sum'].to_numpy(dtype='float64'), 0.0)
+    counts = np.where(continues_year, group_state['year_count'].to_numpy(dtype='float64'), 0.0)
+
+    # Running annual sums: one vectorized step per month position (at most 12), never per group
+    position = np.arange(n_rows) - group_rows[group]
+    for pos in range(int(position.max()) + 1 if n_rows else 0):
+        rows = np.flatnonzero((position == pos) & ~np.isnan(prices))
+        sums[group[rows]] += prices[rows]
+        counts[group[rows]] += 1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        group_avg = np.where(counts > 0, sums / counts, np.nan)
+
+    # Month-over-month change: previous row, or the persisted last price for the first new month
+    prev_price = np.empty(n_rows)
+    prev_price[1:] = prices[:-1]
+    first_rows = np.flatnonzero(first_of_product)
+    prev_price[first_rows] = state_df['last_price'].reindex(products[first_rows]).to_numpy(dtype='float64')
+
+    # Annual change compares each row's annual average with the previous row's annual average
+    state_year_avg = np.where(
+        group_state['year_count'].to_numpy(dtype='float64') > 0,
+        group_state['year_sum'].to_numpy(dtype='float64') / group_state['year_count'].to_numpy(dtype='float64'),
+        np.nan
+    )
+    group_prev_avg = np.empty(len(group_rows))
+    group_prev_avg[1:] = group_avg[:-1]
+    group_prev_avg[group_first_of_product] = np.where(
+        continues_year, group_avg, np.where(has_state, state_year_avg, np.nan)
+    )[group_first_of_product]
+    prev_avg = np.where(first_of_group, group_prev_avg[group], group_avg[group])
+
+    avg = group_avg[group]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features = df.copy()
+        features['avg_annual_price'] = avg
+        features['price_month_change_pct'] = (prices / prev_price - 1) * 100
+        features['price_annual_change_pct'] = (avg / prev_avg - 1) * 100
+
+    # New state: last month of each product plus the running sums of its last year
+    new_state = {product: dict(values) for product, values in state.items()}
+    last_rows = np.r_[first_rows[1:], n_rows] - 1 if n_rows else np.array([], dtype=int)
+    for first_row, last_row in zip(first_rows, last_rows):
+        product = products[last_row]
+        last_group = group[last_row]
+        if last_group > group[first_row]:
+            prior_year_avg = group_avg[last_group - 1]
+        elif continues_year[last_group]:
+            prior_year_avg = state[product].get('prior_year_avg')
+        else:
+            prior_year_avg = state_year_avg[last_group] if has_state[last_group] else np.nan
+        new_state[product] = {
+            'last_year': int(years[last_row]),
+            'last_month': int(df['month'].iat[last_row]),
+            'last_price': _nan_to_none(float(prices[last_row])),
+            'year_sum': float(sums[last_group]),
+            'year_count': int(counts[last_group]),
+            'prior_year_avg': _nan_to_none(None if prior_year_avg is None else float(prior_year_avg)),
+            'history_hash': state.get(product, {}).get('history_hash')
+        }
+    return features, new_state
+
+
+def compute_horizon_features(df: pd.DataFrame, deflator: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Multi-horizon price features on a dense [product, calendar month] array (one row per product,
+    one column per month between the first and last month), so every window is a calendar window
+    and all products are processed by the same numpy operations.
+    - df: product_name, year, month, price_usd_per_ton (one row per product and month).
+    - deflator: year, month, deflator (price index, 100 = base period); None leaves real prices empty.
+    Features (a window with a missing month gives NaN, except for the 12-month high):
+    - price_yoy_change_pct: change against the same month of the previous year
+    - price_rolling_mean_{3,6,12}m: trailing means including the current month
+    - price_volatility_12m: standard deviation of the last 12 month-over-month changes (in %)
+    - price_drawdown_12m_pct: distance from the trailing 12-month high (<= 0)
+    - real_price_usd_per_ton: price deflated to the base period of the deflator
+    Returns df with the HORIZON_COLUMNS added (same row order).
+    """
+    if df.duplicated(subset=['product_name', 'year', 'month']).any():
+        raise ValueError("Price features need one row per product and month")
+
+    product_codes, products = pd.factorize(df['product_name'])
+    month_index = df['year'].to_numpy(dtype='int64') * 12 + df['month'].to_numpy(dtype='int64') - 1
+    first_month = int(month_index.min()) if len(df) else 0
+    column = month_index - first_month
+    n_months = int(column.max()) + 1 if len(df) else 0
+
+    # Scatter rows into the product x month array (gaps stay NaN)
+    prices = np.full((len(products), n_months), np.nan)
+    prices[product_codes, column] = df['price_usd_per_ton'].to_numpy(dtype='float64')
+
+    features = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features['price_yoy_change_pct'] = (prices / _lag(prices, 12) - 1) * 100
+        for window in ROLLING_MEAN_WINDOWS:
+            features[f'price_rolling_mean_{window}m'] = _trailing_windows(prices, window).mean(axis=-1)
+
+        monthly_change = (prices / _lag(prices, 1) - 1) * 100
+        features[f'price_volatility_{VOLATILITY_WINDOW}m'] = _trailing_windows(monthly_change, VOLATILITY_WINDOW).std(axis=-1, ddof=1)
+
+        windows = _trailing_windows(prices, DRAWDOWN_WINDOW)
+        high = np.where(np.isnan(windows), -np.inf, windows).max(axis=-1)
+        features[f'price_drawdown_{DRAWDOWN_WINDOW}m_pct'] = (prices / np.where(np.isinf(high), np.nan, high) - 1) * 100
+
+        deflators = np.full(n_months, np.nan)
+        if deflator is not None and len(deflator) and n_months:
+            deflator_column = deflator['year'].to_numpy(dtype='int64') * 12 + deflator['month'].to_numpy(dtype='int64') - 1 - first_month
+            in_range = (deflator_column >= 0) & (deflator_column < n_months)
+            deflators[deflator_column[in_range]] = deflator['deflator'].to_numpy(dtype='float64')[in_range]
+        features['real_price_usd_per_ton'] = prices * 100 / deflators
+
+    # Gather back to the input rows
+    result = df.copy()
+    for name in HORIZON_COLUMNS:
+        result[name] = features[name][product_codes, column]
+    return result
+
+
+def _lag(values, months):
+    lagged = np.full_like(values, np.nan)
+    lagged[:, months:] = values[:, :-months]
+    return lagged
+
+
+def _trailing_windows(values, window):
+    # [product, month, window] view of the months ending at each month (NaN before the first month)
+    padded = np.concatenate([np.full((values.shape[0], window - 1), np.nan), values], axis=1)
+    return sliding_window_view(padded, window, axis=1)
+
+
+def refresh_current_year(existing: pd.DataFrame, features: pd.DataFrame, state: dict) -> pd.DataFrame:
+    """
+    Update persisted rows of each product's current year once new months of that year were computed:
+    avg_annual_price becomes the new annual average and the annual change is recomputed
+    (0 within the year, the first month against the persisted prior-year average).
+    - existing / features: product_name, year, month plus the feature columns.
+    """
+    existing = existing.copy()
+    for product, product_state in state.items():
+        current_year = product_state['last_year']
+        new_months = features[(features['product_name'] == product) & (features['year'] == current_year)]
+        year_rows = (existing['product_name'] == product) & (existing['year'] == current_year)
+        if new_months.empty or not year_rows.any():
+            continue
+
+        avg = np.float64(new_months['avg_annual_price'].iat[0])
+        prior_year_avg = np.float64(np.nan if product_state.get('prior_year_avg') is None else product_state['prior_year_avg'])
+        first_row = year_rows & (existing['month'] == existing.loc[year_rows, 'month'].min())
+        with np.errstate(invalid='ignore', divide='ignore'):
+            existing.loc[year_rows, 'avg_annual_price'] = avg
+            existing.loc[year_rows, 'price_annual_change_pct'] = (avg / avg - 1) * 100
+            existing.loc[first_row, 'price_annual_change_pct'] = (avg / prior_year_avg - 1) * 100
+    return existing
+
+
+def state_to_json(state: dict, max_price_id: int, row_count: int) -> bytes:
+    """
+    Serialize the incremental state persisted next to fact_prices.
+    """
+    return json.dumps({'max_price_id': max_price_id, 'row_count': row_count, 'products': state},
+                      indent=2, sort_keys=True).encode('utf-8')
+
+
+def state_from_json(payload: bytes) -> dict:
+    """
+    Parse the persisted incremental state.
+    """
+    return json.loads(payload.decode('utf-8'))
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_MAX_WORKERS = 4
+FACT_COLUMNS = ['date_id', 'product_id', 'country_id', 'metric_type', 'value']
+
+
+def partition_key(partition_prefix: str, product_id: int) -> str:
+    """
+    S3 key of one product partition.
+    """
+    return f"{partition_prefix}product_id={int(product_id)}.csv"
+
+
+def write_product_partitions(s3_client, bucket: str, partition_prefix: str, df_rows, build_facts,
+                             dim_product, catalog, batch_size: int = DEFAULT_BATCH_SIZE,
+                             max_workers: int = DEFAULT_MAX_WORKERS) -> list:
+    """
+    Transform source rows in product batches (batches run in parallel) and write one CSV partition per product.
+    - df_rows: wide source rows with a 'product_name' column (countries already resolved)
+    - build_facts(rows): fact rows (FACT_COLUMNS, missing keys dropped) of the given source rows
+    Only one batch of long rows is in memory per worker, so adding products grows the work linearly.
+    Partitions of products no longer produced are deleted.
+    Returns [(product_id, key, csv bytes)] ordered by product_id.
+    """
+    product_ids = dict(zip(dim_product['product_name'], dim_product['product_id'].astype(int)))
+    batches = catalog.batches(batch_size, products=set(df_rows['product_name'].dropna()) & set(product_ids))
+
+    def run_batch(batch):
+        facts = build_facts(df_rows[df_rows['product_name'].isin(batch)])
+        facts = facts.astype({'date_id': 'Int64', 'product_id': 'Int64', 'country_id': 'Int64'})
+        written = []
+        for product_name in batch:
+            product_id = product_ids[product_name]
+            payload = facts.loc[facts['product_id'] == product_id, FACT_COLUMNS].to_csv(
+                index=False, lineterminator='\n').encode('utf-8')
+            key = partition_key(partition_prefix, product_id)
+            s3_client.put_object(Bucket=bucket, Key=key, Body=payload)
+            written.append((product_id, key, payload))
+        return written
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        partitions = sorted(item for written in pool.map(run_batch, batches) for item in written)
+
+    _delete_stale_partitions(s3_client, bucket, partition_prefix, {key for _, key, _ in partitions})
+    return partitions
+
+
+def combine_partitions(partitions: list) -> bytes:
+    """
+    Concatenate product partitions into one fact CSV with a running fact_id (no DataFrame is rebuilt).
+    """
+    lines = [('fact_id,' + ','.join(FACT_COLUMNS)).encode('utf-8')]
+    fact_id = 0
+    for _, _, payload in partitions:
+        for row in payload.splitlines()[1:]:
+            fact_id += 1
+            lines.append(str(fact_id).encode('utf-8') + b',' + row)
+    return b'\n'.join(lines) + b'\n'
+
+
+def _delete_stale_partitions(s3_client, bucket, partition_prefix, current_keys):
+    stale = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=partition_prefix):
+        stale.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'] not in current_keys)
+    for i in range(0, len(stale), 1000):
+        s3_client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in stale[i:i + 1000]]})
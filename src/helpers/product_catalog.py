@@ -0,0 +1,89 @@
+import pandas as pd
+from io import BytesIO
+
+CATALOG_COLUMNS = ['source', 'item_code', 'item_name', 'product_name']
+
+# Catalog sources used by the transforms
+FAO_PRODUCTION = 'fao_production'
+FAO_FOOD_BALANCE = 'fao_food_balance'
+FAO_TRADE = 'fao_trade'
+WB_CMO = 'wb_cmo'
+
+
+class ProductCatalog:
+    """
+    Central product catalog: source items (FAO item codes, World Bank CMO column names) mapped to canonical products.
+    - Canonical product order is the order of first appearance in the catalog, so product_ids stay stable
+      when items are appended.
+    - FAO sources are matched by 'Item Code'; sources without item codes (WB CMO) by item name.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        missing = [col for col in CATALOG_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Product catalog is missing columns: {missing}")
+
+        df = df[CATALOG_COLUMNS].copy()
+        df['source'] = df['source'].str.strip()
+        df['item_name'] = df['item_name'].str.strip()
+        df['product_name'] = df['product_name'].str.strip()
+        df['item_code'] = pd.to_numeric(df['item_code'], errors='coerce').astype('Int64')
+        if df['product_name'].isna().any() or (df['product_name'] == '').any():
+            raise ValueError("Every catalog item must map to a product_name.")
+
+        duplicated = df.duplicated(subset=['source', 'item_code', 'item_name'])
+        if duplicated.any():
+            raise ValueError(f"Duplicate catalog items: {df.loc[duplicated, ['source', 'item_name']].values.tolist()}")
+        self._df = df.reset_index(drop=True)
+
+    @classmethod
+    def from_csv_bytes(cls, payload: bytes) -> 'ProductCatalog':
+        return cls(pd.read_csv(BytesIO(payload), dtype={'item_code': 'string'}, keep_default_na=False, na_values=['']))
+
+    @classmethod
+    def load(cls, s3_client, bucket: str, key: str) -> 'ProductCatalog':
+        """
+        Read the catalog CSV from S3 (resources zone).
+        """
+        return cls.from_csv_bytes(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+    def products(self) -> list:
+        """
+        Canonical product names in catalog order.
+        """
+        return self._df['product_name'].drop_duplicates().tolist()
+
+    def item_codes(self, source: str) -> list:
+        """
+        Sorted FAO item codes of a source.
+        """
+        return sorted(int(code) for code in self._items(source)['item_code'].dropna())
+
+    def code_mapping(self, source: str) -> dict:
+        """
+        {item_code: product_name} of a source.
+        """
+        items = self._items(source).dropna(subset=['item_code'])
+        return dict(zip(items['item_code'].astype(int), items['product_name']))
+
+    def name_mapping(self, source: str) -> dict:
+        """
+        {item_name: product_name} of a source (for sources identified by names, e.g. CMO price columns).
+        """
+        items = self._items(source)
+        return dict(zip(items['item_name'], items['product_name']))
+
+    def batches(self, batch_size: int, products: list = None) -> list:
+        """
+        Split canonical products (or the given subset, keeping catalog order) into batches.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        products = self.products() if products is None else [p for p in self.products() if p in set(products)]
+        return [products[i:i + batch_size] for i in range(0, len(products), batch_size)]
+
+    def _items(self, source):
+        items = self._df[self._df['source'] == source]
+        if items.empty:
+            raise ValueError(f"Product catalog has no items for source '{source}'")
+        return items
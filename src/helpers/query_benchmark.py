@@ -0,0 +1,118 @@
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+# Dashboard questions benchmarked: name -> HTTP endpoint of the query server
+QUERIES = {
+    'top_producers': '/top-producers',
+    'country_series': '/country-series',
+    'continent_shares': '/continent-shares'
+}
+PERCENTILES = (50, 90, 95, 99)
+
+
+def sample_requests(dimensions: dict, count: int, distinct: int, seed: int = 0) -> list:
+    """
+    Request mix of a dashboard: count requests drawn from distinct parameter combinations
+    (repeated questions, as when many users open the same views). Returns (query, params) pairs.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        query = rng.choice(sorted(QUERIES))
+        if query == 'country_series':
+            params = {'country': rng.choice(dimensions['countries'])}
+        else:
+            params = {'product': rng.choice(dimensions['products']), 'year': rng.choice(dimensions['years'])}
+        pool.append((query, params))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def latency_report(seconds: list) -> dict:
+    cuts = statistics.quantiles(seconds, n=100, method='inclusive') if len(seconds) > 1 else seconds * 99
+    report = {f"p{p}_ms": round(cuts[p - 1] * 1000, 3) for p in PERCENTILES}
+    report.update({
+        'requests': len(seconds),
+        'mean_ms': round(statistics.fmean(seconds) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3),
+        'throughput_rps': round(len(seconds) / sum(seconds), 1) if sum(seconds) else None
+    })
+    return report
+
+
+def run_requests(call, requests: list) -> list:
+    seconds = []
+    for query, params in requests:
+        started = time.perf_counter()
+        call(query, params)
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def library_call(queries):
+    return lambda query, params: getattr(queries, query)(**params)
+
+
+def http_call(url: str):
+    def call(query, params):
+        with urlopen(f"{url.rstrip('/')}{QUERIES[query]}?{urlencode(params)}") as response:
+            return response.read()
+    return call
+
+
+def benchmark(backend: str = 'files', count: int = 1000, distinct: int = 50, url: str = None, seed: int = 0) -> dict:
+    """
+    Latency of the same request mix without a result cache (every request computed) and with it.
+    With url, the cached pass goes to a running query server instead (HTTP and JSON encoding included).
+    """
+    from src.query.dashboard_queries import create_queries
+
+    uncached = create_queries(backend, max_entries=0)
+    requests = sample_requests(uncached.dimensions(), count, distinct, seed)
+
+    report = {'backend': backend, 'distinct_requests': len(set((q, tuple(sorted(p.items()))) for q, p in requests))}
+    report['uncached'] = latency_report(run_requests(library_call(uncached), requests))
+    if url:
+        report['http'] = latency_report(run_requests(http_call(url), requests))
+    else:
+        cached = create_queries(backend)
+        report['cached'] = latency_report(run_requests(library_call(cached), requests))
+        report['cache'] = cached.cache.stats()
+    return report
+
+
+def main(argv=None) -> int:
+    """
+    CLI: latency percentiles of the dashboard queries, uncached against cached (or over HTTP with --url).
+    - files backend: S3_BUCKET_PROJECT_1 / S3_PREFIX_TRANSFORMED (and STORAGE_URL) locate the wide extract
+    - warehouse backend: RDS_* variables point at a PostgreSQL with a loaded fact_metrics_wide table
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the cached dashboard queries.')
+    parser.add_argument('--backend', choices=('files', 'warehouse'), default='files')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per pass')
+    parser.add_argument('--distinct', type=int, default=50, help='Distinct questions in the request mix')
+    parser.add_argument('--url', help='Send the cached pass to a running query server (e.g. http://127.0.0.1:8080)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.backend, args.requests, args.distinct, args.url, args.seed)
+    for name in ('uncached', 'cached', 'http'):
+        if name in report:
+            latency = report[name]
+            print(f"{name}: {latency['requests']} requests, p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, "
+                  f"p99 {latency['p99_ms']} ms, {latency['throughput_rps']} req/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Order keys of stacked rows: year column position, source row (index label)
+ORDER_COLUMNS = ['_year_pos', '_row']
+
+
+def parse_year_columns(columns, year_pattern: str = r'Y(\d{4})') -> dict:
+    """
+    Map year value columns to their year, parsing each label once.
+    - year_pattern must fully match the label and capture the year (e.g. r'Y(\\d{4})' or r'(\\d{4})').
+    """
+    regex = re.compile(year_pattern)
+    years = {}
+    for col in columns:
+        match = regex.fullmatch(str(col))
+        if match:
+            years[col] = int(match.group(1))
+    return years
+
+
+def stack_years(df: pd.DataFrame, id_columns: list, year_pattern: str = r'Y(\d{4})', order_keys: bool = False) -> pd.DataFrame:
+    """
+    Reshape wide year columns into a long frame with id_columns, 'year' and 'value',
+    keeping only non-null values (same row order as melt + dropna on value).
+    - Year labels are parsed once per column, values are stacked straight from a float64 matrix.
+    - Id columns are factorized once per source row and returned as categoricals (codes + categories).
+    - order_keys: also return ORDER_COLUMNS (year column position, source index label). Stacking row subsets
+      of a frame with a monotonic index and sorting the concatenated results by them gives the same order
+      as stacking the whole frame.
+    """
+    year_map = parse_year_columns(df.columns, year_pattern)
+    year_cols = list(year_map)
+
+    values = df[year_cols].to_numpy(dtype='float64', na_value=np.nan)
+    # Column-major order matches melt: all rows of the first year, then the next year, ...
+    col_idx, row_idx = np.nonzero(~np.isnan(values.T))
+
+    stacked = {}
+    for col in id_columns:
+        codes, categories = _codes_and_categories(df[col])
+        stacked[col] = pd.Categorical.from_codes(codes[row_idx], categories=categories)
+    stacked['year'] = np.array([year_map[col] for col in year_cols], dtype='int64')[col_idx]
+    stacked['value'] = values[row_idx, col_idx]
+    if order_keys:
+        stacked['_year_pos'] = col_idx.astype('int64')
+        stacked['_row'] = df.index.to_numpy(dtype='int64')[row_idx]
+    return pd.DataFrame(stacked)
+
+
+def _codes_and_categories(series: pd.Series):
+    # Categorical columns (slim artifacts) already carry codes; other columns are factorized
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series)
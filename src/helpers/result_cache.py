@@ -0,0 +1,95 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Stdlib only at import time
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_S = 15 * 60
+# How often the pipeline run ID is polled (a cheap GET, but not one per query)
+DEFAULT_RUN_CHECK_INTERVAL_S = 5.0
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results with a time-to-live, invalidated by pipeline runs.
+    - At most max_entries results; the least recently used one is evicted first.
+    - Entries expire ttl_s seconds after they were computed.
+    - run_id (optional callable) returns the ID of the latest pipeline run; it is polled at most every
+      run_check_interval_s seconds and the whole cache is cleared when it changes.
+
+    Usage:
+        cache = ResultCache(run_id=lambda: read_latest_run_id(s3_client, bucket, key))
+        result = cache.get_or_compute(('top_producers', 'Wheat', 2020), lambda: compute(...))
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_s: float = DEFAULT_TTL_S, run_id=None,
+                 run_check_interval_s: float = DEFAULT_RUN_CHECK_INTERVAL_S, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.run_check_interval_s = run_check_interval_s
+        self._run_id_fn = run_id
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._run_id = None
+        self._run_checked_at = None
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def current_run_id(self) -> str:
+        """
+        Latest pipeline run ID (polled at most every run_check_interval_s); clears the cache when it changed.
+        """
+        if self._run_id_fn is None:
+            return None
+        now = self._clock()
+        with self._lock:
+            if self._run_checked_at is not None and now - self._run_checked_at < self.run_check_interval_s:
+                return self._run_id
+            self._run_checked_at = now
+        run_id = self._run_id_fn()
+        with self._lock:
+            if run_id != self._run_id:
+                if self._entries:
+                    self.counters['invalidations'] += 1
+                self._entries.clear()
+                self._run_id = run_id
+        return run_id
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached result for key, computed (outside the lock) on a miss.
+        """
+        run_id = self.current_run_id()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, computed_at = entry
+                if now - computed_at < self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return value
+                del self._entries[key]
+                self.counters['expirations'] += 1
+            self.counters['misses'] += 1
+
+        value = compute()
+        with self._lock:
+            # A run published while computing makes the result stale: return it, but do not keep it
+            if run_id == self._run_id:
+                self._entries[key] = (value, self._clock())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, size=len(self._entries), max_entries=self.max_entries, ttl_s=self.ttl_s,
+                        run_id=self._run_id)
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from src.helpers.memory_guard import PeakRSSTracker
+from src.helpers.storage import open_object
+
+# Stdlib only at import time: transforms import dropna_rows at module load
+
+LEDGER_TABLE = 'pipeline_run_ledger'
+LEDGER_COLUMNS = [
+    'run_id', 'step', 'started_at', 'status', 'duration_s', 'peak_rss_mb', 'input_rows', 'output_rows',
+    'dropped_rows', 's3_bytes_read', 's3_bytes_written'
+]
+LEDGER_DDL = f"""
+CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+    run_id VARCHAR(64) NOT NULL,
+    step VARCHAR(100) NOT NULL,
+    started_at VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    duration_s DOUBLE PRECISION,
+    peak_rss_mb DOUBLE PRECISION,
+    input_rows BIGINT,
+    output_rows BIGINT,
+    dropped_rows TEXT,
+    s3_bytes_read BIGINT,
+    s3_bytes_written BIGINT,
+    PRIMARY KEY (run_id, step)
+)
+"""
+
+# Regression checks: metric -> direction that is a regression (+1: an increase, -1: a decrease)
+CHECKED_METRICS = {'duration_s': 1, 'peak_rss_mb': 1, 'input_rows': -1, 'output_rows': -1, 'dropped_rows': 1}
+DEFAULT_WINDOW = 10
+DEFAULT_MIN_BASELINE = 3
+# Modified z-score above which a value is an outlier of the baseline (Iglewicz and Hoaglin)
+DEFAULT_Z_THRESHOLD = 3.5
+# Smallest relative change reported per metric (timings are noisy, row counts are not)
+MIN_RELATIVE_CHANGE = {'duration_s': 0.2, 'peak_rss_mb': 0.1, 'input_rows': 0.001, 'output_rows': 0.001,
+                       'dropped_rows': 0.001}
+
+# Step record being collected (steps run one at a time; S3 prefetch threads add to it under the lock)
+_active = None
+_lock = threading.Lock()
+
+
+class StepRecord:
+    """
+    Measurements of one pipeline step: duration, peak RSS, rows read and written, rows dropped at every
+    dropna site (see dropna_rows) and S3 bytes moved (see metered_client). Use as a context manager
+    around the handler call; set response to the handler response (cache hits are recorded as 'cached').
+    """
+
+    def __init__(self, run_id: str, step: str):
+        self.run_id = run_id
+        self.step = step
+        self.started_at = None
+        self.status = None
+        self.duration_s = None
+        self.response = None
+        self.counters = {'input_rows': 0, 'output_rows': 0, 's3_bytes_read': 0, 's3_bytes_written': 0}
+        self.dropped = {}
+        self._tracker = PeakRSSTracker()
+
+    def __enter__(self):
+        global _active
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._started = time.perf_counter()
+        self._tracker.__enter__()
+        _active = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        _active = None
+        self._tracker.__exit__(exc_type, exc, tb)
+        self.duration_s = round(time.perf_counter() - self._started, 3)
+        if exc_type is not None:
+            self.status = 'error'
+        elif isinstance(self.response, dict) and self.response.get('cache_hit'):
+            self.status = 'cached'
+        else:
+            self.status = 'ok'
+        return False
+
+    def as_row(self) -> dict:
+        return dict(self.counters, run_id=self.run_id, step=self.step, started_at=self.started_at, status=self.status,
+                    duration_s=self.duration_s, peak_rss_mb=self._tracker.peak_mb, dropped_rows=dict(self.dropped))
+
+
+def record_rows(kind: str, rows: int) -> None:
+    """
+    Count rows read ('input') or written ('output') by the current step (no-op outside a recorded step).
+    """
+    _add(f"{kind}_rows", rows)
+
+
+def record_dropped(site: str, rows: int) -> None:
+    with _lock:
+        if _active is not None:
+            _active.dropped[site] = _active.dropped.get(site, 0) + int(rows)
+
+
+def dropna_rows(df, site: str, **dropna_kwargs):
+    """
+    df.dropna(**dropna_kwargs), with the number of dropped rows recorded under site in the run ledger.
+    """
+    kept = df.dropna(**dropna_kwargs)
+    record_dropped(site, len(df) - len(kept))
+    return kept
+
+
+def start_worker() -> None:
+    """
+    In a forked worker: count from zero (the inherited record already holds the parent's counts).
+    """
+    if _active is not None:
+        _active.counters = dict.fromkeys(_active.counters, 0)
+        _active.dropped = {}
+
+
+def worker_counts():
+    """
+    Counts of a forked worker since start_worker, to be returned to the parent (None outside a recorded step).
+    """
+    return None if _active is None else (dict(_active.counters), dict(_active.dropped))
+
+
+def merge_worker_counts(counts) -> None:
+    if counts is None:
+        return
+    counters, dropped = counts
+    for name, value in counters.items():
+        _add(name, value)
+    for site, rows in dropped.items():
+        record_dropped(site, rows)
+
+
+def _add(name, value):
+    with _lock:
+        if _active is not None:
+            _active.counters[name] += int(value)
+
+
+# S3 bytes
+
+def metered_client(client):
+    """
+    Storage client counting the bytes it reads and writes into the current step, when a ledger is configured
+    (RUN_LEDGER_URL); the client itself otherwise.
+    """
+    return _metered_client(client) if os.environ.get('RUN_LEDGER_URL') else client
+
+
+@lru_cache(maxsize=None)
+def _metered_client(client):
+    return MeteredClient(client)
+
+
+class MeteredClient:
+    """
+    Pass-through storage client that records object bytes read (get / open / download) and written (put).
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_object(self, **kwargs):
+        response = self.client.get_object(**kwargs)
+        return dict(response, Body=_CountingBody(response['Body']))
+
+    def put_object(self, Bucket=None, Key=None, Body=b'', **kwargs):
+        if isinstance(Body, (bytes, bytearray, str)):
+            _add('s3_bytes_written', len(Body))
+        elif hasattr(Body, 'seek'):
+            start = Body.tell()
+            _add('s3_bytes_written', Body.seek(0, os.SEEK_END) - start)
+            Body.seek(start)
+        return self.client.put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+
+    def open_object(self, Bucket=None, Key=None):
+        f = open_object(self.client, Bucket, Key)
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        _add('s3_bytes_read', size)
+        return f
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        start = Fileobj.tell()
+        self.client.download_fileobj(Bucket, Key, Fileobj, **kwargs)
+        _add('s3_bytes_read', Fileobj.tell() - start)
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        self.client.download_file(Bucket, Key, Filename, **kwargs)
+        _add('s3_bytes_read', os.path.getsize(Filename))
+
+
+class _CountingBody:
+    def __init__(self, body):
+        self._body = body
+
+    def __getattr__(self, name):
+        return getattr(self._body, name)
+
+    def read(self, *args):
+        data = self._body.read(*args)
+        _add('s3_bytes_read', len(data))
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._body.close()
+        return False
+
+
+# Ledger storage
+
+class RunLedger(ABC):
+    """
+    Table of step records keyed by run and step: appending a step that was already recorded replaces its row.
+    """
+    placeholder = '?'
+
+    def append(self, row: dict) -> None:
+        values = [json.dumps(row[column], sort_keys=True) if column == 'dropped_rows' else row[column]
+                  for column in LEDGER_COLUMNS]
+        placeholders = ', '.join([self.placeholder] * len(LEDGER_COLUMNS))
+        self._execute(f"DELETE FROM {LEDGER_TABLE} WHERE run_id = {self.placeholder} AND step = {self.placeholder}",
+                      (row['run_id'], row['step']))
+        self._execute(f"INSERT INTO {LEDGER_TABLE} ({', '.join(LEDGER_COLUMNS)}) VALUES ({placeholders})", values)
+
+    def records(self) -> list:
+        """
+        All records, oldest first (dropped_rows decoded).
+        """
+        rows = self._execute(f"SELECT {', '.join(LEDGER_COLUMNS)} FROM {LEDGER_TABLE} ORDER BY started_at, run_id, step")
+        records = [dict(zip(LEDGER_COLUMNS, row)) for row in rows]
+        for record in records:
+            record['dropped_rows'] = json.loads(record['dropped_rows'] or '{}')
+        return records
+
+    @contextmanager
+    def record(self, run_id: str, step: str):
+        """
+        Record a step, also when it fails: with ledger.record(run_id, step) as record: record.response = handler(...)
+        """
+        record = StepRecord(run_id, step)
+        try:
+            with record:
+                yield record
+        finally:
+            self.append(record.as_row())
+
+    @abstractmethod
+    def _execute(self, sql, params=()):
+        """
+        Run one statement and commit; return the fetched rows (empty when the statement returns none).
+        """
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SQLiteRunLedger(RunLedger):
+    """
+    Run ledger in a local SQLite file (created on first use).
+    """
+
+    def __init__(self, path: str):
+        import sqlite3
+
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._execute(LEDGER_DDL)
+
+    def _execute(self, sql, params=()):
+        rows = self._conn.execute(sql, params).fetchall()
+        self._conn.commit()
+        return rows
+
+
+class WarehouseRunLedger(RunLedger):
+    """
+    Run ledger in the warehouse (pipeline_run_ledger table of food_dw.sql).
+    """
+    placeholder = '%s'
+
+    def __init__(self, conn=None):
+        if conn is None:
+            from src.helpers.db_utils import get_db_connection
+            conn = get_db_connection()
+        self._conn = conn
+
+    def _execute(self, sql, params=()):
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else []
+        self._conn.commit()
+        return rows
+
+
+def open_ledger(url: str = None):
+    """
+    Run ledger selected by url or the RUN_LEDGER_URL env variable (None when neither is set):
+    - sqlite:///abs/path.db or sqlite://rel/path.db: local SQLite file
+    - warehouse: pipeline_run_ledger table of the warehouse (RDS_* variables)
+    """
+    url = url or os.environ.get('RUN_LEDGER_URL')
+    if not url:
+        return None
+    if url.startswith('sqlite://'):
+        return SQLiteRunLedger(url[len('sqlite://'):])
+    if url == 'warehouse':
+        return WarehouseRunLedger()
+    raise ValueError(f"Unsupported run ledger URL '{url}', expected sqlite://<path> or warehouse")
+
+
+# Regression detection
+
+def compare_run(records: list, run_id: str = None, window: int = DEFAULT_WINDOW, min_baseline: int = DEFAULT_MIN_BASELINE,
+                z_threshold: float = DEFAULT_Z_THRESHOLD) -> list:
+    """
+    Compare every step of a run (default: the latest one) with the baseline of its previous successful,
+    non-cached executions (at most window of them). A metric is flagged when it moved in the bad direction
+    by at least its minimum relative change and it is an outlier of the baseline: modified z-score
+    0.6745 * (value - median) / MAD above z_threshold (any such change when the baseline does not vary,
+    e.g. stable row counts). Returns the findings, worst first.
+    """
+    measured = [record for record in records if record['status'] == 'ok']
+    if run_id is None:
+        if not measured:
+            return []
+        run_id = measured[-1]['run_id']
+
+    findings = []
+    for current in (record for record in measured if record['run_id'] == run_id):
+        history = [record for record in measured
+                   if record['step'] == current['step'] and record['started_at'] <= current['started_at']
+                   and record['run_id'] != run_id][-window:]
+        if len(history) < min_baseline:
+            continue
+        for metric, direction in CHECKED_METRICS.items():
+            series = {'total': ([_metric(record, metric) for record in history], _metric(current, metric))}
+            if metric == 'dropped_rows':
+                sites = set(current['dropped_rows']).union(*(record['dropped_rows'] for record in history))
+                series = {site: ([record['dropped_rows'].get(site, 0) for record in history],
+                                 current['dropped_rows'].get(site, 0)) for site in sorted(sites)}
+            for name, (baseline, value) in series.items():
+                finding = _check(baseline, value, direction, MIN_RELATIVE_CHANGE[metric], z_threshold)
+                if finding:
+                    label = metric if name == 'total' else f"{metric}[{name}]"
+                    findings.append(dict(finding, run_id=run_id, step=current['step'], metric=label,
+                                         baseline_runs=len(baseline)))
+    # Changes from a zero baseline have no percentage: they sort first
+    return sorted(findings, key=lambda finding: -abs(finding['change_pct']) if finding['change_pct'] is not None else -float('inf'))
+
+
+def _metric(record, metric):
+    if metric == 'dropped_rows':
+        return sum(record['dropped_rows'].values())
+    return record[metric]
+
+
+def _check(baseline, value, direction, min_change, z_threshold):
+    baseline = [item for item in baseline if item is not None]
+    if value is None or not baseline:
+        return None
+    median = statistics.median(baseline)
+    change = (value - median) * direction
+    if change <= 0 or change < min_change * max(abs(median), 1):
+        return None
+    mad = statistics.median(abs(item - median) for item in baseline)
+    score = 0.6745 * change / mad if mad else float('inf')
+    if score <= z_threshold:
+        return None
+    return {'value': value, 'baseline_median': median, 'change_pct': round(100 * (value - median) / median, 1) if median else None,
+            'z_score': round(score, 1) if mad else None}
+
+
+def _format_number(value, spec: str) -> str:
+    # Older rows or failed measurements can leave a metric empty
+    return format('-', f">{spec.split('.')[0]}") if value is None else format(value, spec)
+
+
+def main(argv=None) -> int:
+    """
+    CLI: per-step measurements of a run and the regressions against the rolling baseline.
+    Exit code is 1 when a regression is flagged.
+    """
+    parser = argparse.ArgumentParser(description='Report a pipeline run from the run ledger.')
+    parser.add_argument('--ledger', help='Ledger URL (default: RUN_LEDGER_URL), e.g. sqlite:///tmp/run_ledger.db')
+    parser.add_argument('--run-id', help='Run to report (default: the latest run)')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help='Previous runs in the baseline')
+    parser.add_argument('--min-baseline', type=int, default=DEFAULT_MIN_BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_Z_THRESHOLD, help='Modified z-score threshold')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    ledger = open_ledger(args.ledger)
+    if ledger is None:
+        parser.error('no ledger: pass --ledger or set RUN_LEDGER_URL')
+    records = ledger.records()
+    ledger.close()
+    run_id = args.run_id or (records[-1]['run_id'] if records else None)
+    steps = [record for record in records if record['run_id'] == run_id]
+    findings = compare_run(records, run_id, args.window, args.min_baseline, args.threshold)
+
+    print(f"Run {run_id}: {len(steps)} step(s)")
+    for record in steps:
+        print(f"  {record['step']:<40} {record['status']:<7} {_format_number(record['duration_s'], '8.2f')} s {_format_number(record['peak_rss_mb'], '8.1f')} MB "
+              f"rows {record['input_rows']} -> {record['output_rows']} (dropped {sum(record['dropped_rows'].values())}), "
+              f"S3 {record['s3_bytes_read']} B read / {record['s3_bytes_written']} B written")
+    for finding in findings:
+        print(f"REGRESSION {finding['step']} {finding['metric']}: {finding['value']} vs median {finding['baseline_median']} "
+              f"of {finding['baseline_runs']} run(s) ({finding['change_pct']}%)")
+    if not findings:
+        print("No regressions against the baseline.")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'run_id': run_id, 'steps': steps, 'regressions': findings}, f, indent=2)
+    return 1 if findings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Handlers read at most a handful of objects; botocore's default connection pool holds 10
+DEFAULT_MAX_WORKERS = 8
+
+
+class S3Prefetcher:
+    """
+    Issues a handler's S3 reads concurrently and returns futures for the parsed results.
+    Each download is parsed in its worker thread, so parsing overlaps with the remaining downloads.
+
+    Usage:
+        with S3Prefetcher(s3_client, bucket) as prefetch:
+            dim_country = prefetch.csv(dim_country_key)
+            df_raw = prefetch.submit(read_slim_frame, s3_client, bucket, source_key, spec)
+            ...
+            df_raw.result()
+    """
+
+    def __init__(self, s3_client, bucket: str, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3-prefetch')
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run any loader (e.g. read_slim_frame) in the pool.
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def bytes(self, key: str):
+        """
+        Future for the raw bytes of an object.
+        """
+        return self.submit(self._get_bytes, key)
+
+    def csv(self, key: str, **read_csv_kwargs):
+        """
+        Future for a DataFrame parsed from a CSV object.
+        """
+        return self.submit(self._read_csv, key, read_csv_kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Do not wait for outstanding downloads when the handler already failed
+        if exc_type is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.close()
+        return False
+
+    def _get_bytes(self, key):
+        return self.s3_client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def _read_csv(self, key, read_csv_kwargs):
+        import pandas as pd
+        from src.helpers.storage import open_object
+        from src.helpers.run_ledger import record_rows
+        with open_object(self.s3_client, self.bucket, key) as f:
+            df = pd.read_csv(f, **read_csv_kwargs)
+        record_rows('input', len(df))
+        return df
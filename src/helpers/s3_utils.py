@@ -1,29 +1,56 @@
-import boto3
-import pandas as pd
+import os
 from io import BytesIO
 
-def read_csv_from_s3(bucket: str, key: str, **read_csv_kwargs) -> pd.DataFrame:
+from src.helpers.storage import DEFAULT_STORAGE_URL, get_storage_client, open_object, parquet_source
+from src.helpers.versioned_zone import zone_client
+from src.helpers.run_ledger import metered_client, record_rows
+
+# boto3 and pandas are imported inside the functions, so importing this module stays cheap for Lambda cold starts
+
+def get_s3_client():
+    """
+    Return the storage client selected by the STORAGE_URL env variable, created on first use and reused by later
+    calls (and warm Lambda invocations):
+    - s3:// (default): boto3 S3 client
+    - file://<dir> / memory://<name>: local directory or in-memory backend with the same interface (see storage.py)
+    With TRANSFORMED_LAYOUT=versioned, tables of the transformed zone are read and written as snapshots (see versioned_zone.py);
+    with RUN_LEDGER_URL set, the bytes moved are counted in the run ledger (see run_ledger.py).
+    """
+    return zone_client(metered_client(get_storage_client(os.environ.get('STORAGE_URL', DEFAULT_STORAGE_URL))))
+
+def read_csv_from_s3(bucket: str, key: str, **read_csv_kwargs) -> 'pd.DataFrame':
     """
     Read CSV file from S3 and return as DataFrame.
     """
-    s3_client = boto3.client('s3')  
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    return pd.read_csv(BytesIO(obj['Body'].read()), **read_csv_kwargs)
+    import pandas as pd
+    with open_object(get_s3_client(), bucket, key) as f:
+        df = pd.read_csv(f, **read_csv_kwargs)
+    record_rows('input', len(df))
+    return df
 
-def read_excel_from_s3(bucket: str, key: str, sheet_name=0, skiprows=0, **read_excel_kwargs) -> pd.DataFrame:
+def read_excel_from_s3(bucket: str, key: str, sheet_name=0, skiprows=0, **read_excel_kwargs) -> 'pd.DataFrame':
     """
     Read Excel file from S3 and return as DataFrame.
     """
-    s3_client = boto3.client('s3')  
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    return pd.read_excel(BytesIO(obj['Body'].read()), sheet_name=sheet_name, skiprows=skiprows, **read_excel_kwargs)
+    import pandas as pd
+    with open_object(get_s3_client(), bucket, key) as f:
+        return pd.read_excel(f, sheet_name=sheet_name, skiprows=skiprows, **read_excel_kwargs)
 
-def write_csv_to_s3(df: pd.DataFrame, bucket: str, key: str, encoding='utf-8') -> None:
+def write_csv_to_s3(df: 'pd.DataFrame', bucket: str, key: str, encoding='utf-8') -> None:
     """
     Save DataFrame to CSV and write to S3.
     """
     buffer = BytesIO()
     df.to_csv(buffer, index=False, encoding=encoding)
 
-    s3_client = boto3.client('s3')  
-    s3_client.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
\ No newline at end of file
+    get_s3_client().put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+
+def read_parquet_from_s3(bucket: str, key: str, **read_parquet_kwargs) -> 'pd.DataFrame':
+    """
+    Read Parquet file from S3 and return as DataFrame.
+    """
+    import pandas as pd
+    with open_object(get_s3_client(), bucket, key) as f:
+        df = pd.read_parquet(parquet_source(f), **read_parquet_kwargs)
+    record_rows('input', len(df))
+    return df
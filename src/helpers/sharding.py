@@ -0,0 +1,78 @@
+import json
+import importlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Stdlib only at import time; numpy / boto3 are imported where they are used
+
+SHARD_EXECUTORS = ('process', 'thread', 'lambda')
+
+
+def assign_shards(m49_codes, shard_count: int):
+    """
+    Shard number of every row, by M49 area code modulo shard_count (rows without a code go to shard 0).
+    - m49_codes: nullable integer Series (see country_index.parse_m49_codes).
+    """
+    return (m49_codes.fillna(0).astype('int64') % shard_count).to_numpy()
+
+
+def shard_key(shard_prefix: str, shard_index: int, shard_count: int) -> str:
+    """
+    S3 key of one shard output.
+    """
+    return f"{shard_prefix}part-{shard_index:04d}-of-{shard_count:04d}.parquet"
+
+
+def invoke_handler(module: str, event: dict) -> dict:
+    """
+    Import a handler module and run its lambda_handler (entry point of local pool workers).
+    """
+    return importlib.import_module(module).lambda_handler(event, None)
+
+
+def fan_out(module: str, events: list, executor: str = 'process', max_workers: int = None,
+            function_name: str = None) -> list:
+    """
+    Run one handler invocation per event and return the responses in event order.
+    - 'process': local process pool standing in for the Lambda fan-out
+    - 'thread': local thread pool (same process, e.g. for mocked S3 in tests)
+    - 'lambda': synchronous invocations of function_name (the deployed worker Lambda)
+    """
+    if executor not in SHARD_EXECUTORS:
+        raise ValueError(f"Unknown shard executor '{executor}', expected one of {SHARD_EXECUTORS}")
+
+    if executor == 'lambda':
+        if not function_name:
+            raise ValueError("function_name is required for the 'lambda' shard executor")
+        with ThreadPoolExecutor(max_workers=max_workers or len(events)) as pool:
+            return list(pool.map(lambda event: _invoke_lambda(function_name, event), events))
+
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool_class(max_workers=max_workers) as pool:
+        return list(pool.map(invoke_handler, [module] * len(events), events))
+
+
+def merge_unmatched_reports(reports) -> dict:
+    """
+    Sum CountryIndex.report() outputs of disjoint shards.
+    """
+    merged = {}
+    for report in reports:
+        for source, stats in (report or {}).items():
+            total = merged.setdefault(source, {'rows': 0, 'keys': 0})
+            total['rows'] += stats['rows']
+            total['keys'] += stats['keys']
+    return merged
+
+
+def _invoke_lambda(function_name, event):
+    import boto3
+
+    response = boto3.client('lambda').invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event).encode('utf-8')
+    )
+    payload = json.loads(response['Payload'].read())
+    if response.get('FunctionError'):
+        raise RuntimeError(f"Shard worker {function_name} failed: {payload}")
+    return payload
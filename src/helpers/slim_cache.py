@@ -0,0 +1,422 @@
+import io
+import os
+import re
+import csv
+import json
+import hashlib
+import zipfile
+import tempfile
+import pandas as pd
+from io import BytesIO
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from botocore.exceptions import ClientError
+
+from src.helpers.memory_guard import IN_MEMORY, choose_execution_mode
+from src.helpers.storage import open_object, parquet_source
+from src.helpers.run_ledger import record_rows
+
+
+@dataclass(frozen=True)
+class SlimSpec:
+    """
+    Describes how a raw bulk file is reduced to its slim artifact.
+    - name: artifact folder name in the slim zone (e.g. 'fao_trade')
+    - member: CSV name inside a ZIP source (None for plain CSV; '*.csv' for the first CSV member)
+    - columns: id columns to keep; year_pattern: regex for year value columns to keep
+    - filters: {column: allowed values} applied while streaming the raw file
+    - categories: text columns stored as categoricals
+    - distinct: drop duplicate rows (used by dimension builders)
+    - sheet_name: read an Excel sheet instead of a CSV (header_row is its 0-based header row,
+      skip_after_header drops e.g. a units row, first_column_name names the unlabeled first column)
+    """
+    name: str
+    columns: tuple
+    member: str = None
+    year_pattern: str = None
+    filters: dict = field(default_factory=dict)
+    categories: tuple = ()
+    distinct: bool = False
+    read_csv_kwargs: dict = field(default_factory=dict)
+    sheet_name: str = None
+    header_row: int = 0
+    skip_after_header: int = 0
+    first_column_name: str = None
+
+    def fingerprint(self) -> str:
+        """
+        Short hash of the spec, so a config change (e.g. new products) produces a new artifact.
+        """
+        payload = json.dumps(asdict(self), sort_keys=True, default=sorted)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+
+CHUNK_SIZE = 200_000
+# Parsed (pandas) size of the kept CSV text relative to its size on disk, used for working-set estimates
+PARSE_OVERHEAD = 3.0
+RANGE_READ_SIZE = 64 * 1024
+
+
+def get_etag(s3_client, bucket: str, key: str) -> str:
+    """
+    Return the ETag (without quotes) of an S3 object.
+    """
+    return s3_client.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+
+
+def slim_key_for(spec: SlimSpec, etag: str, slim_prefix: str = 'slim/') -> str:
+    """
+    Build the S3 key of the slim artifact for a given source version.
+    """
+    return f"{slim_prefix}{spec.name}/{etag}-{spec.fingerprint()}.parquet"
+
+
+def build_slim_frame(raw_bytes, spec: SlimSpec) -> pd.DataFrame:
+    """
+    Parse a raw CSV (or CSV inside a ZIP) into a column-pruned, row-filtered, typed DataFrame.
+    The file is streamed in chunks, so only filtered rows are kept in memory.
+    - raw_bytes: the raw file as bytes or as a seekable binary file (e.g. a memory-mapped local file)
+    """
+    raw_file = raw_bytes if hasattr(raw_bytes, 'read') else BytesIO(raw_bytes)
+    if spec.sheet_name is not None:
+        df = read_excel_sheet_streaming(raw_file, spec)
+    else:
+        with _open_csv_source(raw_file, spec) as source:
+            df = pd.concat(list(_filtered_chunks(source, spec)), ignore_index=True)
+    return _finalize_slim_frame(df, spec)
+
+
+def write_slim_file_spilled(raw_file, spec: SlimSpec, path: str) -> int:
+    """
+    Chunked variant of build_slim_frame for sources that do not fit in memory: every filtered chunk is typed
+    and appended to the Parquet file at path (one row group per chunk), so neither the raw source nor the
+    slim frame is held in memory. Read back with read_slim_file, the file gives the same frame as
+    build_slim_frame. Returns the row count.
+    - raw_file: seekable file with the raw source (e.g. downloaded to local disk instead of held as bytes)
+    - distinct: duplicates are dropped across chunks by row hash (only the hashes are kept)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if spec.sheet_name is not None:
+        raise ValueError("Excel sources are streamed row by row and have no chunked path")
+
+    writer, empty, rows, seen = None, None, 0, set()
+    try:
+        with _open_csv_source(raw_file, spec) as source:
+            for chunk in _filtered_chunks(source, spec):
+                chunk = _finalize_slim_frame(chunk.reset_index(drop=True), spec)
+                if spec.distinct:
+                    hashes = pd.util.hash_pandas_object(chunk, index=False).tolist()
+                    chunk = chunk[[h not in seen and not seen.add(h) for h in hashes]].reset_index(drop=True)
+                if chunk.empty:
+                    empty = chunk if empty is None else empty
+                    continue
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, _spill_schema(table.schema))
+                writer.write_table(table.cast(writer.schema))
+                rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        empty.to_parquet(path, index=False)
+    return rows
+
+
+def estimate_slim_working_set(s3_client, bucket: str, source_key: str, spec: SlimSpec) -> dict:
+    """
+    Estimate the memory an in-memory build of the slim frame needs, before downloading the source.
+    - raw_bytes: S3 content length (the in-memory path holds the whole download)
+    - uncompressed_bytes: size of the CSV (the ZIP member size is read from the central directory with range reads)
+    - kept_fraction: share of header columns the spec keeps
+    - estimated_bytes: raw_bytes + uncompressed_bytes * kept_fraction * PARSE_OVERHEAD
+    """
+    raw_bytes = s3_client.head_object(Bucket=bucket, Key=source_key)['ContentLength']
+    source = io.BufferedReader(S3RangeFile(s3_client, bucket, source_key, raw_bytes), buffer_size=RANGE_READ_SIZE)
+
+    if spec.sheet_name is not None:
+        uncompressed_bytes, header = raw_bytes, None
+    elif spec.member is None:
+        uncompressed_bytes, header = raw_bytes, source.readline()
+    else:
+        with zipfile.ZipFile(source) as z:
+            member = _resolve_member(z, spec)
+            uncompressed_bytes = z.getinfo(member).file_size
+            with z.open(member) as f:
+                header = f.readline()
+
+    kept_fraction = 1.0
+    if header:
+        encoding = spec.read_csv_kwargs.get('encoding', 'utf-8')
+        columns = next(csv.reader([header.decode(encoding, errors='replace').lstrip('\ufeff')]), [])
+        if columns:
+            keep_column = _column_filter(spec)
+            kept_fraction = sum(keep_column(col) for col in columns) / len(columns)
+
+    return {
+        'raw_bytes': raw_bytes,
+        'uncompressed_bytes': uncompressed_bytes,
+        'kept_fraction': round(kept_fraction, 4),
+        'estimated_bytes': int(raw_bytes + uncompressed_bytes * kept_fraction * PARSE_OVERHEAD)
+    }
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable view of an S3 object backed by ranged GETs (lets zipfile read a ZIP's
+    central directory without downloading the archive).
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, size: int):
+        self.s3_client, self.bucket, self.key, self.size = s3_client, bucket, key, size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size or len(buffer) == 0:
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end}")
+        data = obj['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def _column_filter(spec):
+    year_regex = re.compile(spec.year_pattern) if spec.year_pattern else None
+
+    def keep_column(col):
+        return col in spec.columns or bool(year_regex and year_regex.fullmatch(col))
+    return keep_column
+
+
+def _resolve_member(z, spec):
+    if spec.member == '*.csv':
+        return [name for name in z.namelist() if name.endswith('.csv')][0]
+    return spec.member
+
+
+@contextmanager
+def _open_csv_source(raw_file, spec):
+    if spec.member is None:
+        yield raw_file
+        return
+    with zipfile.ZipFile(raw_file, 'r') as z:
+        with z.open(_resolve_member(z, spec)) as f:
+            yield f
+
+
+def _filtered_chunks(source, spec):
+    reader = pd.read_csv(source, usecols=_column_filter(spec), chunksize=CHUNK_SIZE, **spec.read_csv_kwargs)
+    for chunk in reader:
+        for col, allowed in spec.filters.items():
+            chunk = chunk[chunk[col].isin(allowed)]
+        if spec.distinct:
+            chunk = chunk.drop_duplicates()
+        yield chunk
+
+
+def _spill_schema(schema):
+    # Chunks get int8 or int16 category codes depending on their own categories: store all of them as int32
+    import pyarrow as pa
+
+    fields = [pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+              for f in schema]
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def _sorted_categories(df):
+    # Row groups written chunk by chunk list categories in order of appearance: sort them like astype('category')
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and not df[col].cat.categories.is_monotonic_increasing:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    return df
+
+
+def _finalize_slim_frame(df, spec):
+    if spec.distinct:
+        df = df.drop_duplicates().reset_index(drop=True)
+
+    # Typed storage: categoricals for repeated text, float64 for year values
+    for col in spec.categories:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if spec.year_pattern:
+        year_regex = re.compile(spec.year_pattern)
+        year_cols = [col for col in df.columns if year_regex.fullmatch(col)]
+        df[year_cols] = df[year_cols].astype('float64')
+    return df
+
+
+def read_excel_sheet_streaming(raw_bytes, spec: SlimSpec) -> pd.DataFrame:
+    """
+    Stream rows of one Excel sheet (openpyxl read-only mode) and keep only the requested columns.
+    Value columns are converted to float64; the first column is kept as text.
+    """
+    from openpyxl import load_workbook
+
+    raw_file = raw_bytes if hasattr(raw_bytes, 'read') else BytesIO(raw_bytes)
+    workbook = load_workbook(raw_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook[spec.sheet_name]
+        header_cells = next(sheet.iter_rows(min_row=spec.header_row + 1, max_row=spec.header_row + 1, values_only=True))
+        header = [str(cell).strip() if cell is not None else '' for cell in header_cells]
+
+        missing = [col for col in spec.columns if col not in header]
+        if missing:
+            raise ValueError(f"Columns not found in sheet '{spec.sheet_name}': {missing}")
+        positions = [header.index(col) for col in spec.columns]
+        names = list(spec.columns)
+        if spec.first_column_name:
+            positions = [0] + positions
+            names = [spec.first_column_name] + names
+
+        # Stream data rows up to the last needed column only (rows without a first-column value are skipped)
+        rows = sheet.iter_rows(min_row=spec.header_row + 2 + spec.skip_after_header,
+                               max_col=max(positions) + 1, values_only=True)
+        records = [tuple(row[pos] for pos in positions) for row in rows if row and row[0] is not None]
+    finally:
+        workbook.close()
+
+    df = pd.DataFrame.from_records(records, columns=names)
+    value_cols = names[1:] if spec.first_column_name else names
+    df[value_cols] = df[value_cols].apply(pd.to_numeric, errors='coerce').astype('float64')
+    if spec.first_column_name:
+        df[spec.first_column_name] = df[spec.first_column_name].astype(str).str.strip()
+    return df
+
+
+def read_slim_frame(s3_client, bucket: str, source_key: str, spec: SlimSpec, slim_prefix: str = 'slim/') -> pd.DataFrame:
+    """
+    Return the slim version of a raw source file.
+    - Reads the slim artifact keyed by the source ETag when it exists.
+    - Otherwise parses the raw file once, stores the artifact in S3 and returns it.
+    """
+    slim_key = slim_key_for(spec, get_etag(s3_client, bucket, source_key), slim_prefix)
+
+    try:
+        return read_slim_file(s3_client, bucket, slim_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            raise
+
+    df = _build_slim_artifact(s3_client, bucket, source_key, spec, slim_key)
+    if df is None:
+        # Built chunked: the frame was never held in memory, read the stored artifact
+        return read_slim_file(s3_client, bucket, slim_key)
+    record_rows('input', len(df))
+    return df
+
+
+def ensure_slim_file(s3_client, bucket: str, source_key: str, spec: SlimSpec, slim_prefix: str = 'slim/') -> str:
+    """
+    Make sure the slim artifact of the current source version exists (building it when missing) and return its key.
+    Coordinators call it once before fanning out, so workers only read the artifact (read_slim_file);
+    chunked transforms call it before streaming the artifact (iter_slim_batches).
+    """
+    slim_key = slim_key_for(spec, get_etag(s3_client, bucket, source_key), slim_prefix)
+    try:
+        s3_client.head_object(Bucket=bucket, Key=slim_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404', 'NotFound'):
+            raise
+        _build_slim_artifact(s3_client, bucket, source_key, spec, slim_key)
+    return slim_key
+
+
+def read_slim_file(s3_client, bucket: str, slim_key: str) -> pd.DataFrame:
+    """
+    Read an existing slim artifact (raises ClientError when it is missing).
+    """
+    with open_object(s3_client, bucket, slim_key) as slim_file:
+        df = _sorted_categories(pd.read_parquet(parquet_source(slim_file)))
+    record_rows('input', len(df))
+    return df
+
+
+def iter_slim_batches(s3_client, bucket: str, slim_key: str, batch_rows: int = None):
+    """
+    Stream an existing slim artifact in frames of at most batch_rows rows (default CHUNK_SIZE), for transforms
+    running in chunked mode. The artifact is read from local disk (downloaded on S3), one batch at a time;
+    every frame is indexed by its global row positions, so stacked rows keep their single-run order keys.
+    """
+    import pyarrow.parquet as pq
+
+    with _local_object(s3_client, bucket, slim_key) as slim_file:
+        parquet = pq.ParquetFile(parquet_source(slim_file))
+        offset = 0
+        for batch in parquet.iter_batches(batch_size=batch_rows or CHUNK_SIZE):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            record_rows('input', len(df))
+            yield df
+        if offset == 0:
+            yield parquet.schema_arrow.empty_table().to_pandas()
+        del parquet
+
+
+def slim_execution_mode(s3_client, bucket: str, source_key: str, spec: SlimSpec) -> tuple:
+    """
+    In-memory or chunked processing of a source, from the estimated working set of its parse (the slim frame
+    and the transform of it are smaller). Returns (mode, reason), see choose_execution_mode.
+    """
+    if spec.sheet_name is not None:
+        return IN_MEMORY, "Excel sheets are streamed row by row"
+    estimate = estimate_slim_working_set(s3_client, bucket, source_key, spec)
+    return choose_execution_mode(estimate['estimated_bytes'])
+
+
+@contextmanager
+def _local_object(s3_client, bucket, key):
+    # Seekable file on local disk: the local backend's own file, otherwise a temporary download
+    if hasattr(s3_client, 'open_object'):
+        with s3_client.open_object(Bucket=bucket, Key=key) as f:
+            yield f
+        return
+    with tempfile.TemporaryFile() as f:
+        s3_client.download_fileobj(bucket, key, f)
+        f.seek(0)
+        yield f
+
+
+def _build_slim_artifact(s3_client, bucket, source_key, spec, slim_key):
+    """
+    Rebuild a missing slim artifact (new source version): in memory when the estimated working set fits the
+    available memory, otherwise chunked with the raw file and the artifact on local disk.
+    Returns the frame when it was built in memory, None when it was built chunked.
+    """
+    mode, reason = slim_execution_mode(s3_client, bucket, source_key, spec)
+    print(f"Building slim {spec.name} from {source_key}: {mode} mode ({reason})")
+
+    if mode == IN_MEMORY:
+        with open_object(s3_client, bucket, source_key) as raw_file:
+            df = build_slim_frame(raw_file, spec)
+        buffer = BytesIO()
+        df.to_parquet(buffer, index=False)
+        s3_client.put_object(Bucket=bucket, Key=slim_key, Body=buffer.getvalue())
+        return df
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        slim_path = os.path.join(spill_dir, 'slim.parquet')
+        with _local_object(s3_client, bucket, source_key) as raw_file:
+            write_slim_file_spilled(raw_file, spec, slim_path)
+        with open(slim_path, 'rb') as slim_file:
+            s3_client.put_object(Bucket=bucket, Key=slim_key, Body=slim_file)
+    return None
@@ -0,0 +1,376 @@
+import io
+import os
+import json
+import mmap
+import shutil
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Stdlib only at import time (botocore is imported when an error has to be raised)
+
+DEFAULT_STORAGE_URL = 's3://'
+# Local files at least this large are memory-mapped instead of read through a file buffer
+MMAP_THRESHOLD = 1024 * 1024
+# Object metadata of the local backend (S3 user metadata such as the population watermark)
+METADATA_DIR = '.storage-metadata'
+
+
+@lru_cache(maxsize=None)
+def get_storage_client(url: str = DEFAULT_STORAGE_URL):
+    """
+    Storage client for a URL, created once per URL. All backends expose the subset of the boto3 S3 client
+    the pipeline uses (get/put/head/delete objects, list_objects_v2 paginator, downloads, error codes):
+    - s3://             boto3 S3 client (bucket names come from the callers, as before)
+    - file:///abs/dir   local directory; keys are paths below the directory (the bucket name is ignored)
+    - file://rel/dir    same, relative to the working directory (e.g. file://data for the repo's data/ folder)
+    - memory://name     in-process dictionary, e.g. for tests and benchmarks without moto
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        import boto3
+        return boto3.client('s3')
+    if parsed.scheme == 'file':
+        return LocalStorageClient(os.path.join(parsed.netloc, parsed.path.lstrip('/')) if parsed.netloc else parsed.path)
+    if parsed.scheme == 'memory':
+        return MemoryStorageClient()
+    raise ValueError(f"Unsupported storage URL '{url}', expected s3://, file:// or memory://")
+
+
+def open_object(client, bucket: str, key: str):
+    """
+    Readable, seekable file for an object: a memory-mapped handle on the local backend (pages are read
+    on demand instead of loading the whole file up front), an in-memory buffer of the downloaded body on S3.
+    Use as a context manager; pass it through parquet_source() for zero-copy Parquet reads.
+    """
+    if hasattr(client, 'open_object'):
+        return client.open_object(Bucket=bucket, Key=key)
+    return io.BytesIO(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+
+def parquet_source(f):
+    """
+    Source for pyarrow / pd.read_parquet over a file from open_object: a pyarrow buffer over the file's own
+    memory (the mapping of a MappedFile, the bytes of a BytesIO), so Parquet pages are decoded in place instead of
+    being copied out by read() first; other files are returned as they are. Drop the source before closing f.
+    """
+    if not hasattr(f, 'getbuffer'):
+        return f
+    import pyarrow as pa
+
+    return pa.BufferReader(pa.py_buffer(f.getbuffer()))
+
+
+class MappedFile(io.RawIOBase):
+    """
+    Read-only file over a memory-mapped local file. read() returns a copy of the requested range and
+    readinto() copies straight into the caller's buffer (text parsers such as pd.read_csv); getbuffer() exposes
+    the mapping itself without copying, for Parquet readers (see parquet_source) and numpy.frombuffer.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._map)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def read(self, size=-1):
+        end = len(self._map) if size is None or size < 0 else min(self._position + size, len(self._map))
+        data = self._map[self._position:end]
+        self._position = max(end, self._position)
+        return data
+
+    def readinto(self, buffer):
+        end = min(self._position + len(buffer), len(self._map))
+        size = max(end - self._position, 0)
+        with memoryview(self._map) as view:
+            buffer[:size] = view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._map)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._map.close()
+            except BufferError:
+                # A zero-copy view is still alive: the mapping is released together with the last view
+                pass
+            self._file.close()
+        super().close()
+
+
+class _Body:
+    """
+    Stand-in for botocore's StreamingBody.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    def read(self, size=-1):
+        try:
+            return self._file.read(size)
+        finally:
+            if size is None or size < 0:
+                self._file.close()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class _Exceptions:
+    """
+    client.exceptions namespace (ClientError and NoSuchKey, as raised by boto3).
+    """
+
+    @property
+    def ClientError(self):
+        from botocore.exceptions import ClientError
+        return ClientError
+
+    @property
+    def NoSuchKey(self):
+        return _no_such_key_class()
+
+
+@lru_cache(maxsize=None)
+def _no_such_key_class():
+    from botocore.exceptions import ClientError
+    return type('NoSuchKey', (ClientError,), {})
+
+
+def _client_error(code: str, operation: str, key: str):
+    error_class = _no_such_key_class() if code == 'NoSuchKey' else _Exceptions().ClientError
+    return error_class({'Error': {'Code': code, 'Message': f"Not found: {key}", 'Key': key}}, operation)
+
+
+class _ListPaginator:
+    def __init__(self, client):
+        self._client = client
+
+    def paginate(self, Bucket=None, Prefix='', **kwargs):
+        contents = self._client._list(Prefix)
+        page = {'KeyCount': len(contents), 'IsTruncated': False, 'Prefix': Prefix}
+        if contents:
+            page['Contents'] = contents
+        yield page
+
+
+class _ObjectStoreClient:
+    """
+    S3-compatible surface shared by the local and in-memory backends; subclasses store bytes and metadata.
+    """
+    exceptions = _Exceptions()
+
+    def get_object(self, Bucket=None, Key=None, Range=None, **kwargs):
+        stat = self._stat(Key)
+        if stat is None:
+            raise _client_error('NoSuchKey', 'GetObject', Key)
+        if Range:
+            start, _, end = Range.replace('bytes=', '').partition('-')
+            start, end = int(start), min(int(end) if end else stat['size'] - 1, stat['size'] - 1)
+            with self._open(Key) as f:
+                f.seek(start)
+                body = io.BytesIO(f.read(max(end - start + 1, 0)))
+        else:
+            body = self._open(Key)
+        return dict(self._head(Key, stat), Body=_Body(body))
+
+    def head_object(self, Bucket=None, Key=None, **kwargs):
+        stat = self._stat(Key)
+        if stat is None:
+            raise _client_error('404', 'HeadObject', Key)
+        return self._head(Key, stat)
+
+    def put_object(self, Bucket=None, Key=None, Body=b'', Metadata=None, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        self._write(Key, bytes(Body), dict(Metadata or {}))
+        return {'ETag': self._head(Key, self._stat(Key))['ETag']}
+
+    def delete_objects(self, Bucket=None, Delete=None, **kwargs):
+        keys = [item['Key'] for item in (Delete or {}).get('Objects', [])]
+        for key in keys:
+            self._delete(key)
+        return {'Deleted': [{'Key': key} for key in keys]}
+
+    def delete_object(self, Bucket=None, Key=None, **kwargs):
+        self._delete(Key)
+        return {}
+
+    def get_paginator(self, operation: str):
+        if operation != 'list_objects_v2':
+            raise ValueError(f"Unsupported paginator '{operation}'")
+        return _ListPaginator(self)
+
+    def list_objects_v2(self, Bucket=None, Prefix='', **kwargs):
+        return next(_ListPaginator(self).paginate(Bucket=Bucket, Prefix=Prefix))
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        if self._stat(Key) is None:
+            raise _client_error('404', 'HeadObject', Key)
+        with self._open(Key) as f:
+            shutil.copyfileobj(f, Fileobj)
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with open(Filename, 'wb') as f:
+            self.download_fileobj(Bucket, Key, f)
+
+    def open_object(self, Bucket=None, Key=None):
+        if self._stat(Key) is None:
+            raise _client_error('NoSuchKey', 'GetObject', Key)
+        return self._open(Key)
+
+    def _head(self, key, stat):
+        return {
+            'ContentLength': stat['size'],
+            'ETag': f'"{stat["etag"]}"',
+            'LastModified': stat['last_modified'],
+            'Metadata': self._metadata(key)
+        }
+
+
+class LocalStorageClient(_ObjectStoreClient):
+    """
+    Objects as files below a root directory. Large files are memory-mapped on read, writes are atomic
+    (temporary file + rename). ETags come from size and modification time, so no file is hashed.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Key '{key}' resolves outside the storage root")
+        return path
+
+    def _metadata_path(self, key):
+        return os.path.join(self.root, METADATA_DIR, f"{key}.json")
+
+    def _stat(self, key):
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        if not os.path.isfile(self._path(key)):
+            return None
+        return {
+            'size': st.st_size,
+            'etag': hashlib.md5(f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}".encode()).hexdigest(),
+            'last_modified': datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+        }
+
+    def _open(self, key):
+        path = self._path(key)
+        if os.path.getsize(path) >= MMAP_THRESHOLD:
+            return MappedFile(path)
+        return open(path, 'rb')
+
+    def _metadata(self, key):
+        try:
+            with open(self._metadata_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, key, data, metadata):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+
+        metadata_path = self._metadata_path(key)
+        if metadata:
+            os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+            with open(metadata_path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f)
+        elif os.path.exists(metadata_path):
+            os.remove(metadata_path)
+
+    def _delete(self, key):
+        for path in (self._path(key), self._metadata_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _list(self, prefix):
+        contents = []
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d != METADATA_DIR or directory != self.root)
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(directory, filename), self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    stat = self._stat(key)
+                    contents.append({'Key': key, 'Size': stat['size'], 'ETag': f'"{stat["etag"]}"',
+                                     'LastModified': stat['last_modified']})
+        return sorted(contents, key=lambda item: item['Key'])
+
+
+class MemoryStorageClient(_ObjectStoreClient):
+    """
+    Objects in a dictionary (thread-safe), for tests and in-process benchmarks.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, key):
+        with self._lock:
+            entry = self._objects.get(key)
+        if entry is None:
+            return None
+        return {'size': len(entry['data']), 'etag': entry['etag'], 'last_modified': entry['last_modified']}
+
+    def _open(self, key):
+        with self._lock:
+            return io.BytesIO(self._objects[key]['data'])
+
+    def _metadata(self, key):
+        with self._lock:
+            return dict(self._objects[key]['metadata'])
+
+    def _write(self, key, data, metadata):
+        entry = {'data': data, 'metadata': metadata, 'etag': hashlib.md5(data).hexdigest(),
+                 'last_modified': datetime.now(timezone.utc)}
+        with self._lock:
+            self._objects[key] = entry
+
+    def _delete(self, key):
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def _list(self, prefix):
+        with self._lock:
+            items = sorted((key, entry) for key, entry in self._objects.items() if key.startswith(prefix))
+        return [{'Key': key, 'Size': len(entry['data']), 'ETag': f'"{entry["etag"]}"', 'LastModified': entry['last_modified']}
+                for key, entry in items]
@@ -0,0 +1,178 @@
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.helpers.run_ledger import record_rows
+
+# Statistics sidecar stored next to every transformed output (like the memo fingerprint)
+STATS_SUFFIX = '.stats.json'
+STATS_VERSION = 1
+# HyperLogLog registers: 2^14 registers, ~0.8% standard error on distinct counts
+HLL_PRECISION = 14
+# String columns with at most this many distinct values also record the values (allowed-values checks)
+MAX_LISTED_VALUES = 64
+
+
+def stats_key(key: str) -> str:
+    return f"{key}{STATS_SUFFIX}"
+
+
+def compute_table_stats(df: pd.DataFrame, payload: bytes, keys=()) -> dict:
+    """
+    Statistics of a table from the frame and the serialized payload already in memory:
+    - row count, column order, per-column dtype, null count, min and max
+    - exact distinct counts for the key columns, HyperLogLog estimates for the other columns
+      (plus the values themselves for low-cardinality string columns)
+    - an order-independent content hash of the payload rows (see content_hash)
+    """
+    column_stats = {}
+    for column in df.columns:
+        values = df[column]
+        present = values.dropna()
+        stats = {'dtype': str(values.dtype), 'nulls': int(len(values) - len(present))}
+        stats['min'], stats['max'] = _json_value(present, 'min'), _json_value(present, 'max')
+        if column in keys:
+            stats['distinct'] = int(present.nunique())
+        else:
+            stats['distinct_estimate'] = estimate_distinct(present)
+            if values.dtype.kind in 'OSUT' and stats['distinct_estimate'] <= MAX_LISTED_VALUES:
+                stats['values'] = sorted(str(value) for value in present.unique())
+        column_stats[column] = stats
+
+    return {
+        'version': STATS_VERSION,
+        'row_count': int(len(df)),
+        'columns': [str(column) for column in df.columns],
+        'keys': list(keys),
+        'column_stats': column_stats,
+        'content_hash': content_hash(payload),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+
+
+def content_hash(payload: bytes) -> str:
+    """
+    Order-independent hash of the data rows of a CSV payload: the sum (mod 2^64) of the row hashes.
+    The same rows in any order (e.g. after a re-sort or a sharded rebuild) give the same hash;
+    a rescan of the written file reproduces it exactly.
+    """
+    lines = payload.rstrip(b'\n').split(b'\n')[1:]
+    if not lines:
+        return f"{0:016x}"
+    hashes = pd.util.hash_array(np.array(lines, dtype=object), categorize=False)
+    return f"{int(hashes.sum(dtype=np.uint64)):016x}"
+
+
+def estimate_distinct(values: pd.Series, precision: int = HLL_PRECISION) -> int:
+    """
+    HyperLogLog estimate of the number of distinct non-null values (vectorized, one pass over the hashes).
+    """
+    if len(values) == 0:
+        return 0
+    if values.dtype.kind in 'biuf':
+        hashes = pd.util.hash_array(values.to_numpy(), categorize=False)
+    else:
+        # Strings and other objects: hashed once per distinct value
+        hashes = pd.util.hash_array(values.to_numpy(dtype=object), categorize=True)
+    m = 1 << precision
+    tail_bits = 64 - precision
+    registers = np.zeros(m, dtype=np.uint8)
+    # Register index from the leading bits, rank = position of the first set bit in the remaining bits
+    index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+    rank = tail_bits - _bit_length(hashes & np.uint64((1 << tail_bits) - 1)) + 1
+    np.maximum.at(registers, index, rank.astype(np.uint8))
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty:
+        # Small cardinalities: linear counting is exact enough and unbiased
+        estimate = m * np.log(m / empty)
+    return int(round(estimate))
+
+
+def write_table_stats(s3_client, bucket: str, key: str, df: pd.DataFrame, payload: bytes, etag: str, keys=()) -> dict:
+    """
+    Write the statistics sidecar of an output just written to key (etag is the ETag returned by its put_object).
+    """
+    stats = compute_table_stats(df, payload, keys)
+    stats.update({'key': key, 'etag': etag, 'size': len(payload)})
+    s3_client.put_object(Bucket=bucket, Key=stats_key(key), Body=json.dumps(stats).encode('utf-8'))
+    return stats
+
+
+def put_table_with_stats(s3_client, bucket: str, key: str, df: pd.DataFrame, payload, keys=()) -> dict:
+    """
+    Upload a serialized table (CSV bytes or text) and its statistics sidecar. Returns the statistics.
+    Clients of the versioned transformed zone get the frame too (partition boundaries without a re-parse).
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    if hasattr(s3_client, 'put_table'):
+        response = s3_client.put_table(Bucket=bucket, Key=key, Body=payload, Frame=df)
+    else:
+        response = s3_client.put_object(Bucket=bucket, Key=key, Body=payload)
+    record_rows('output', len(df))
+    return write_table_stats(s3_client, bucket, key, df, payload, response['ETag'], keys)
+
+
+def read_table_stats(s3_client, bucket: str, key: str) -> dict:
+    """
+    Statistics sidecar of an output, or None when it is missing or does not describe the current object
+    (the output was rewritten without its sidecar, e.g. by the partitioned modes).
+    """
+    try:
+        body = s3_client.get_object(Bucket=bucket, Key=stats_key(key))['Body'].read()
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise
+    stats = json.loads(body)
+    if stats.get('version') != STATS_VERSION or stats.get('etag') != head['ETag'] or stats.get('size') != head['ContentLength']:
+        return None
+    return stats
+
+
+def csv_dtypes(stats: dict) -> dict:
+    """
+    read_csv dtypes of the numeric columns recorded in a sidecar (columns are parsed straight into their
+    final types instead of being inferred; None without a sidecar).
+    """
+    if not stats:
+        return None
+    return {column: column_stats['dtype'] for column, column_stats in stats['column_stats'].items()
+            if column_stats['dtype'] in ('int64', 'int32', 'int16', 'float64', 'float32', 'bool')}
+
+
+def check_loaded_rows(stats: dict, key: str, rows: int) -> int:
+    """
+    Row count expected from a sidecar (rows when there is none); raises ValueError when the read file does not match it.
+    """
+    if stats is None:
+        return rows
+    if rows != stats['row_count']:
+        raise ValueError(f"{key} has {rows} rows, its statistics sidecar records {stats['row_count']}")
+    return rows
+
+
+def _json_value(values, reduction):
+    if len(values) == 0:
+        return None
+    try:
+        value = getattr(values, reduction)()
+    except TypeError:
+        # Mixed types without an ordering
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value if isinstance(value, (int, float, bool)) else str(value)
+
+
+def _bit_length(values):
+    # Bit length of every value below 2^53 (exact in float64; 0 for 0)
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+
+# Stdlib only at import time, so handlers can create the memo before their heavy imports are needed
+
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+FINGERPRINT_SUFFIX = '.fingerprint.json'
+
+
+def code_version(handler_file: str) -> str:
+    """
+    Hash of the handler source plus all shared helper modules (any code change invalidates the memo).
+    """
+    paths = [handler_file] + sorted(
+        os.path.join(HELPERS_DIR, name) for name in os.listdir(HELPERS_DIR) if name.endswith('.py')
+    )
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class TransformMemo:
+    """
+    Memoization layer for a transform handler.
+    - The fingerprint covers the ETags of all inputs (sources and dimensions), the handler code version
+      and its config (mappings, slim specs, ...).
+    - It is stored next to the first output key together with the output ETags and the handler response.
+    - A run is skipped when the fingerprint matches and the outputs are unchanged since they were written.
+
+    Usage:
+        memo = TransformMemo(s3_client, bucket, inputs, outputs, config, __file__)
+        if memo.is_fresh(event):
+            return memo.cached_response()
+        ...
+        return memo.save(response)
+    """
+
+    def __init__(self, s3_client, bucket: str, inputs: list, outputs: list, config: dict, handler_file: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config = config
+        self.handler_file = handler_file
+        self.fingerprint_key = f"{self.outputs[0]}{FINGERPRINT_SUFFIX}"
+        self._fingerprint = None
+        self._stored = None
+
+    def fingerprint(self) -> str:
+        """
+        Fingerprint of the current inputs, code and config.
+        """
+        if self._fingerprint is None:
+            payload = {
+                'inputs': {key: self._etag(key) for key in self.inputs},
+                'code_version': code_version(self.handler_file),
+                'config': self.config
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+            self._fingerprint = hashlib.sha256(encoded).hexdigest()
+        return self._fingerprint
+
+    def is_fresh(self, event=None, force: bool = False) -> bool:
+        """
+        True when the stored fingerprint matches and every output still has the ETag it was written with.
+        Pass {"force_refresh": true} in the event (or force=True) to always run the transform.
+        """
+        if force or (event or {}).get('force_refresh'):
+            return False
+
+        self._stored = self._read_stored()
+        if self._stored is None or self._stored.get('fingerprint') != self.fingerprint():
+            return False
+        return all(self._etag(key, missing_ok=True) == etag for key, etag in self._stored.get('outputs', {}).items())
+
+    def cached_response(self, **overrides) -> dict:
+        """
+        Response of the run that produced the current outputs, flagged as a cache hit.
+        - overrides: keys that describe the skipped run itself (e.g. rows_appended=0).
+        """
+        response = dict(self._stored.get('response') or {'statusCode': 200})
+        response.update(overrides, cache_hit=True)
+        return response
+
+    def save(self, response: dict) -> dict:
+        """
+        Store the fingerprint next to the outputs (call after all outputs are written) and return the response.
+        """
+        response = dict(response, cache_hit=False)
+        record = {
+            'fingerprint': self.fingerprint(),
+            'outputs': {key: self._etag(key) for key in self.outputs},
+            'response': response
+        }
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.fingerprint_key,
+                                  Body=json.dumps(record, indent=2, sort_keys=True, default=str).encode('utf-8'))
+        return response
+
+    def _read_stored(self):
+        from botocore.exceptions import ClientError
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket, Key=self.fingerprint_key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(body.decode('utf-8'))
+
+    def _etag(self, key, missing_ok=False):
+        from botocore.exceptions import ClientError
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket, Key=key)['ETag'].strip('"')
+        except ClientError as e:
+            if missing_ok and e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
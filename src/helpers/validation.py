@@ -43,9 +43,10 @@ def check_date_range(df, column, min_date, max_date):
 # 2. Dataset-specific validation functions
 
 def validate_dim_country(df):
-    check_schema(df, ["country_id", "country_name", "continent_name"])
-    check_nulls(df, ["country_id", "country_name"])
+    check_schema(df, ["country_id", "country_name", "continent_name", "m49_code", "iso3_code"])
+    check_nulls(df, ["country_id", "country_name", "m49_code"])
     check_unique(df, "country_id")
+    check_unique(df, "m49_code")
     check_row_count(df)
     check_duplicates(df)
 
@@ -57,7 +58,7 @@ def validate_dim_date(df):
     check_duplicates(df)
     check_date_range(df, "all_date", "1960-01-01", "2026-12-31")
 
-def validate_dim_product(df):
+def validate_dim_product(df, allowed_products=None):
     check_schema(df, ["product_id", "product_name"])
     check_nulls(df, ["product_id"])
     check_unique(df, "product_id")
@@ -72,19 +73,26 @@ def validate_dim_product(df):
     # Replace null with 'N/A' ONLY for product_id == 0
     df.loc[(df["product_id"] == 0) & (df["product_name"].isnull()), "product_name"] = "N/A"
 
-    check_allowed_values(df, {"product_name": ["N/A", "Maize", "Potatoes", "Rice", "Soya", "Wheat"]})
+    check_unique(df, "product_name")
+
+    # Products come from the product catalog, so allowed names are only checked when the catalog is given
+    if allowed_products is not None:
+        check_allowed_values(df, {"product_name": ["N/A"] + list(allowed_products)})
 
 def validate_fact_prices(df):
     check_schema(df, [
         "price_id", "date_id", "product_id",
         "price_usd_per_ton", "avg_annual_price",
-        "price_annual_change_pct", "price_month_change_pct"
+        "price_annual_change_pct", "price_month_change_pct",
+        "price_yoy_change_pct", "price_rolling_mean_3m", "price_rolling_mean_6m", "price_rolling_mean_12m",
+        "price_volatility_12m", "price_drawdown_12m_pct", "real_price_usd_per_ton"
     ])
     check_nulls(df, ["price_id", "date_id", "product_id", "price_usd_per_ton", "avg_annual_price"])
     check_unique(df, "price_id")
     check_row_count(df)
     check_duplicates(df)
     check_value_ranges(df, {"price_usd_per_ton": (0, float("inf")), "avg_annual_price": (0, float("inf"))})
+    check_value_ranges(df.dropna(subset=["price_drawdown_12m_pct"]), {"price_drawdown_12m_pct": (-100, 0)})
 
 def validate_fact_metrics(df):
     check_schema(df, ["fact_id", "date_id", "product_id", "country_id", "metric_type", "value"])
@@ -95,24 +103,150 @@ def validate_fact_metrics(df):
     check_allowed_values(df, {"metric_type": ["production", "consumption", "import", "export", "population"]})
     check_value_ranges(df, {"value": (0, float("inf"))})
 
-# 3. Main validation runner
+# 3. Statistics sidecar checks (same rules, evaluated on the sidecar written by the transform instead of a rescan)
+
+def check_stats_schema(stats, expected_schema):
+    if stats["columns"] != expected_schema:
+        raise ValueError(f"Invalid schema. Expected: {expected_schema}, got: {stats['columns']}")
+
+def check_stats_nulls(stats, required_columns):
+    nulls = {col: stats["column_stats"][col]["nulls"] for col in required_columns if stats["column_stats"][col]["nulls"]}
+    if nulls:
+        raise ValueError(f"Missing values in columns {nulls}")
+
+def check_stats_unique(stats, column):
+    # Only exact distinct counts (key columns) can prove uniqueness
+    column_stats = stats["column_stats"][column]
+    if "distinct" not in column_stats:
+        raise ValueError(f"No exact distinct count for column {column} in the statistics sidecar")
+    if column_stats["distinct"] + column_stats["nulls"] != stats["row_count"] or column_stats["nulls"] > 1:
+        raise ValueError(f"Duplicate values found in column(s): {column}")
+
+def check_stats_value_ranges(stats, column_range: dict, skip_nulls=False):
+    for col, (min_val, max_val) in column_range.items():
+        column_stats = stats["column_stats"][col]
+        if stats["row_count"] > column_stats["nulls"] and column_stats["min"] is None:
+            raise ValueError(f"No min/max for column {col} in the statistics sidecar")
+        # Like Series.between, nulls are out of range unless they are skipped
+        has_nulls = column_stats["nulls"] > 0 and not skip_nulls
+        empty = column_stats["min"] is None
+        if has_nulls or (not empty and not (min_val <= column_stats["min"] and column_stats["max"] <= max_val)):
+            raise ValueError(f"Values in column {col} are out of expected range: ({min_val} to {max_val})")
+
+def check_stats_allowed_values(stats, allowed_values: dict):
+    for col, allowed in allowed_values.items():
+        values = stats["column_stats"][col].get("values")
+        if values is None:
+            raise ValueError(f"No value list for column '{col}' in the statistics sidecar")
+        if not set(values) <= set(allowed):
+            raise ValueError(f"Column '{col}' contains unexpected values: {set(values) - set(allowed)}")
+
+def check_stats_row_count(stats):
+    if stats["row_count"] == 0:
+        raise ValueError("The dataset is empty and it ain't right, you feel me homie? (I watched too much The Wire lately!)")
+
+def check_stats_date_range(stats, column, min_date, max_date):
+    column_stats = stats["column_stats"][column]
+    if column_stats["nulls"] or not (pd.Timestamp(min_date) <= pd.Timestamp(column_stats["min"])
+                                     and pd.Timestamp(column_stats["max"]) <= pd.Timestamp(max_date)):
+        raise ValueError(f"Dates in column '{column}' are outside the expected range ({min_date}, {max_date})")
+
+# Full-row duplicates are ruled out by the unique key checks, so check_duplicates needs no sidecar counterpart.
+# dim_product has row-level rules (names per product_id) and is always rescanned (it is tiny).
 
-def run_all_validations():
-    path = "data/transformed"
+def validate_dim_country_stats(stats):
+    check_stats_schema(stats, ["country_id", "country_name", "continent_name", "m49_code", "iso3_code"])
+    check_stats_nulls(stats, ["country_id", "country_name", "m49_code"])
+    check_stats_unique(stats, "country_id")
+    check_stats_unique(stats, "m49_code")
+    check_stats_row_count(stats)
+
+def validate_dim_date_stats(stats):
+    check_stats_schema(stats, ["date_id", "all_date", "year", "month", "month_name", "quarter"])
+    check_stats_nulls(stats, ["date_id", "all_date", "year", "month"])
+    check_stats_unique(stats, "date_id")
+    check_stats_row_count(stats)
+    check_stats_date_range(stats, "all_date", "1960-01-01", "2026-12-31")
+
+def validate_fact_prices_stats(stats):
+    check_stats_schema(stats, [
+        "price_id", "date_id", "product_id",
+        "price_usd_per_ton", "avg_annual_price",
+        "price_annual_change_pct", "price_month_change_pct",
+        "price_yoy_change_pct", "price_rolling_mean_3m", "price_rolling_mean_6m", "price_rolling_mean_12m",
+        "price_volatility_12m", "price_drawdown_12m_pct", "real_price_usd_per_ton"
+    ])
+    check_stats_nulls(stats, ["price_id", "date_id", "product_id", "price_usd_per_ton", "avg_annual_price"])
+    check_stats_unique(stats, "price_id")
+    check_stats_row_count(stats)
+    check_stats_value_ranges(stats, {"price_usd_per_ton": (0, float("inf")), "avg_annual_price": (0, float("inf"))})
+    check_stats_value_ranges(stats, {"price_drawdown_12m_pct": (-100, 0)}, skip_nulls=True)
+
+def validate_fact_metrics_stats(stats):
+    check_stats_schema(stats, ["fact_id", "date_id", "product_id", "country_id", "metric_type", "value"])
+    check_stats_nulls(stats, ["fact_id", "date_id", "product_id", "country_id", "metric_type"])
+    check_stats_unique(stats, "fact_id")
+    check_stats_row_count(stats)
+    check_stats_allowed_values(stats, {"metric_type": ["production", "consumption", "import", "export", "population"]})
+    check_stats_value_ranges(stats, {"value": (0, float("inf"))})
+
+# 4. Main validation runner
+
+def run_all_validations(storage_url=None):
+    """
+    Validate the transformed files of a storage backend (STORAGE_URL, default: the repo's local data/ folder).
+    Returns how each file was validated: "sidecar" (statistics sidecar) or "rescan" (file read and checked).
+    """
+    from src.helpers.product_catalog import ProductCatalog
+    from src.helpers.storage import get_storage_client, open_object
+    from src.helpers.table_stats import read_table_stats
+    from src.helpers.versioned_zone import zone_client
+
+    client = zone_client(get_storage_client(storage_url or os.environ.get("STORAGE_URL", "file://data")))
+    bucket = os.environ.get("S3_BUCKET_PROJECT_1", "")
+    transformed_prefix = os.environ.get("S3_PREFIX_TRANSFORMED", "transformed/")
+    resources_prefix = os.environ.get("S3_PREFIX_RESOURCES", "resources/")
+
+    with open_object(client, bucket, f"{resources_prefix}product_catalog.csv") as f:
+        catalog = ProductCatalog(pd.read_csv(f, dtype={"item_code": "string"}))
     validators = {
         "dim_country.csv":validate_dim_country,
         "dim_date.csv":validate_dim_date,
-        "dim_product.csv":validate_dim_product,
+        "dim_product.csv":lambda df: validate_dim_product(df, allowed_products=catalog.products()),
         "fact_prices.csv":validate_fact_prices,
         "fact_metrics.csv":validate_fact_metrics
     }
     
+    stats_validators = {
+        "dim_country.csv":validate_dim_country_stats,
+        "dim_date.csv":validate_dim_date_stats,
+        "fact_prices.csv":validate_fact_prices_stats,
+        "fact_metrics.csv":validate_fact_metrics_stats
+    }
+    
+    results = {}
     for filename, validate_fn in validators.items():
-        full_path = os.path.join(path, filename)
         print(f"Validating {filename}...")
-        df = pd.read_csv(full_path)
+        key = f"{transformed_prefix}{filename}"
+
+        # Statistics sidecar first; the file is only rescanned when the sidecar is missing, stale
+        # or reports a problem (the rescan gives the authoritative error)
+        stats = read_table_stats(client, bucket, key)
+        if stats is not None and filename in stats_validators:
+            try:
+                stats_validators[filename](stats)
+                results[filename] = "sidecar"
+                print(f"Validation for {filename} completed successfully (statistics sidecar).")
+                continue
+            except (ValueError, KeyError) as error:
+                print(f"Statistics sidecar check failed for {filename} ({error!r}), rescanning the file")
+
+        with open_object(client, bucket, key) as f:
+            df = pd.read_csv(f)
         validate_fn(df) 
+        results[filename] = "rescan"
         print(f"Validation for {filename} completed successfully.")
+    return results
 
 if __name__ == "__main__":
     run_all_validations()
\ No newline at end of file
@@ -0,0 +1,477 @@
+import io
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from src.helpers.storage import open_object
+from src.helpers.pipeline_runs import LATEST_RUN_FILE, new_run_id
+
+# Stdlib only at import time; numpy / pandas are imported where partitions are computed
+
+TRANSFORMED_LAYOUTS = ('files', 'versioned')
+VERSIONS_DIR = '_versions/'
+POINTER_FILE = 'CURRENT.json'
+# Keys of the transformed zone that are not versioned: the snapshots themselves, shard work files (removed by
+# the reducer) and the latest-run marker (it names the run whose snapshot was published)
+UNVERSIONED_NAMES = (VERSIONS_DIR, 'shards/', LATEST_RUN_FILE)
+MANIFEST_VERSION = 1
+# Fact tables are split into one partition per run of equal date_id (a year: facts are annual), labelled with
+# the metric types of the run; tables without these columns are stored as a single partition
+PARTITION_COLUMNS = ('metric_type', 'date_id')
+# Partitions are downloaded concurrently when a table is read
+READ_WORKERS = 16
+_FIRST_FIELD = re.compile(rb'(?m)^[^,\n]*,')
+
+
+def zone_client(client, transformed_prefix: str = None):
+    """
+    Storage client for the transformed zone layout selected by the TRANSFORMED_LAYOUT env variable:
+    - files (default): tables are overwritten in place (transformed/<table>.csv)
+    - versioned: tables are immutable, content-addressed partitions behind a manifest (see VersionedZoneClient)
+    """
+    layout = os.environ.get('TRANSFORMED_LAYOUT', 'files')
+    if layout not in TRANSFORMED_LAYOUTS:
+        raise ValueError(f"Unknown transformed layout '{layout}', expected one of {TRANSFORMED_LAYOUTS}")
+    if layout == 'files':
+        return client
+    return _versioned_client(client, transformed_prefix or os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/'))
+
+
+@lru_cache(maxsize=None)
+def _versioned_client(client, transformed_prefix: str):
+    return VersionedZoneClient(client, transformed_prefix)
+
+
+class VersionedZoneClient:
+    """
+    Storage client wrapper that keeps every output of the transformed zone (CSV tables, Parquet extracts,
+    the metric cube, statistics sidecars, memo fingerprints, product partitions) as immutable snapshots.
+    Keys outside the zone, shard work files and the latest-run marker pass through to the wrapped client.
+
+    Layout (below <prefix>_versions/):
+    - parts/<sha256>.csv: partition files of CSV tables, named by their content hash. A rewritten table only
+      uploads the partitions whose hash changed; the others are referenced from the previous manifest (identical
+      partitions of different tables, e.g. fact_metrics.csv and its per-metric inputs, are stored once).
+    - objects/<sha256>: every other output, stored whole under its content hash.
+    - manifests/<run_id>-<hash>.json: outputs -> ordered partitions (plus ETag, size, row counts) and the
+      manifest that was current when the run started (its parent).
+    - CURRENT.json: pointer to the current manifest. Readers resolve outputs through it; a rollback only moves it.
+
+    Writes between begin_run and end_run are staged (readers of this client already see them) and published
+    as one manifest by end_run, only when the run succeeded: a run that fails partway never becomes current.
+    Writes outside a run are published one by one.
+
+    Readers see the same objects as with the files layout: get_object / head_object / open_object / downloads
+    of an output return its bytes (a table is its concatenated partitions, byte-identical to the CSV the writer
+    produced; a row-number first column such as fact_id is not stored in the partitions, so inserted or removed
+    rows do not change later partitions) and an ETag derived from the content hashes; listings include the
+    outputs of the snapshot. Keys not in the manifest fall back to the wrapped client (flat files written before
+    the zone was versioned). Writers are serialized by the dispatcher; concurrent writers would race on the pointer.
+    """
+
+    def __init__(self, client, prefix: str = 'transformed/'):
+        self.client = client
+        self.prefix = prefix
+        self.versions_prefix = f"{prefix}{VERSIONS_DIR}"
+        self.pointer_key = f"{self.versions_prefix}{POINTER_FILE}"
+        self._manifests = {}
+        self._run = None
+        # Steps write outputs from worker threads (product batches): staging and publishing are serialized
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        # exceptions, get_paginator, download_file, ... of the wrapped client
+        return getattr(self.client, name)
+
+    def is_versioned(self, key: str) -> bool:
+        name = key[len(self.prefix):] if key and key.startswith(self.prefix) else ''
+        return bool(name) and not name.startswith(UNVERSIONED_NAMES)
+
+    # Runs and manifests
+
+    def begin_run(self, bucket: str, run_id: str) -> None:
+        """
+        Stage the outputs written from now on as one snapshot: they share run_id and the manifest current
+        before the run as their parent, so a rollback undoes the whole run.
+        """
+        pointer = self.read_pointer(bucket)
+        self._run = {'bucket': bucket, 'run_id': run_id, 'parent': pointer['manifest'] if pointer else None,
+                     'tables': {}, 'removed': set()}
+
+    def end_run(self, succeeded: bool = True) -> str:
+        """
+        Publish the staged outputs of the run as one manifest and move the pointer to it, only when the run
+        succeeded (a failed run leaves the previous snapshot current; its uploaded parts are unreferenced).
+        Returns the new manifest key (None when nothing was published).
+        """
+        with self._lock:
+            run, self._run = self._run, None
+            if run is None or not succeeded or not (run['tables'] or run['removed']):
+                return None
+            return self._commit(run['bucket'], run['tables'], run['removed'], run)
+
+    def read_pointer(self, bucket: str) -> dict:
+        try:
+            body = self.client.get_object(Bucket=bucket, Key=self.pointer_key)['Body'].read()
+        except self.client.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return json.loads(body)
+
+    def read_manifest(self, bucket: str, key: str) -> dict:
+        # Manifests are immutable: each one is read once
+        if key not in self._manifests:
+            self._manifests[key] = json.loads(self.client.get_object(Bucket=bucket, Key=key)['Body'].read())
+        return self._manifests[key]
+
+    def current_manifest(self, bucket: str) -> dict:
+        pointer = self.read_pointer(bucket)
+        return self.read_manifest(bucket, pointer['manifest']) if pointer else None
+
+    def history(self, bucket: str) -> list:
+        """
+        Last manifest of every run, oldest first: [{'run_id', 'manifest', 'created_at', 'tables', 'current'}].
+        """
+        pointer = self.read_pointer(bucket)
+        runs = {}
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{self.versions_prefix}manifests/"):
+            for item in page.get('Contents', []):
+                manifest = self.read_manifest(bucket, item['Key'])
+                entry = {'run_id': manifest['run_id'], 'manifest': item['Key'], 'created_at': manifest['created_at'],
+                         'tables': len(manifest['tables'])}
+                if manifest['run_id'] not in runs or entry['created_at'] >= runs[manifest['run_id']]['created_at']:
+                    runs[manifest['run_id']] = entry
+        history = sorted(runs.values(), key=lambda entry: (entry['created_at'], entry['manifest']))
+        for entry in history:
+            entry['current'] = bool(pointer) and pointer['run_id'] == entry['run_id']
+        return history
+
+    def rollback(self, bucket: str, run_id: str = None) -> dict:
+        """
+        Make an earlier snapshot current again (only the pointer is rewritten; no table data moves):
+        the last manifest of run_id, or by default the state before the current run. Returns the new pointer.
+        """
+        pointer = self.read_pointer(bucket)
+        if pointer is None:
+            raise ValueError("The versioned zone has no snapshot to roll back")
+        if run_id is None:
+            target = self.read_manifest(bucket, pointer['manifest'])['parent']
+            if target is None:
+                raise ValueError(f"Run {pointer['run_id']} is the first snapshot, there is nothing to roll back to")
+        else:
+            matches = [entry['manifest'] for entry in self.history(bucket) if entry['run_id'] == run_id]
+            if not matches:
+                raise ValueError(f"No snapshot of run '{run_id}'")
+            target = matches[-1]
+        manifest = self.read_manifest(bucket, target)
+        return self._write_pointer(bucket, target, manifest['run_id'])
+
+    # Table writes
+
+    def put_table(self, Bucket=None, Key=None, Body=b'', Frame=None, Metadata=None, **kwargs) -> dict:
+        """
+        Write an output. CSV tables are split into partitions; Frame (the DataFrame the payload was written
+        from) gives the partition boundaries without parsing the payload again. Other outputs are stored whole.
+        Returns an S3-style response with the ETag plus the partition upload counts.
+        """
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        table = Key[len(self.prefix):]
+        previous = self._tables(Bucket)
+        known = {part['hash']: part['key'] for entry in previous.values() for part in entry['partitions']}
+
+        if table.endswith('.csv'):
+            partitions, row_number_column = split_partitions(Body, Frame)
+        else:
+            partitions, row_number_column = [('all', Body, None)], None
+        entry = {'row_number_column': row_number_column, 'size': len(Body), 'partitions': [],
+                 'metadata': dict(Metadata or {})}
+        uploaded_bytes = 0
+        for label, payload, rows in partitions:
+            digest = hashlib.sha256(payload).hexdigest()
+            if digest not in known:
+                part_name = f"parts/{digest}.csv" if table.endswith('.csv') else f"objects/{digest}"
+                known[digest] = f"{self.versions_prefix}{part_name}"
+                self.client.put_object(Bucket=Bucket, Key=known[digest], Body=payload)
+                uploaded_bytes += len(payload)
+            entry['partitions'].append({'label': label, 'key': known[digest], 'hash': digest, 'rows': rows,
+                                        'size': len(payload)})
+        entry['rows'] = sum(part['rows'] or 0 for part in entry['partitions'])
+        entry['etag'] = _table_etag(entry)
+
+        reused = sum(1 for part in entry['partitions'] if part['hash'] in _hashes(previous.get(table)))
+        self._stage(Bucket, {table: entry})
+        if table.endswith('.csv'):
+            print(f"Versioned {Key}: {len(entry['partitions']) - reused}/{len(entry['partitions'])} partition(s) "
+                  f"changed, {uploaded_bytes} of {len(Body)} bytes uploaded")
+        return {'ETag': entry['etag'], 'partitions': len(entry['partitions']),
+                'reused_partitions': reused, 'uploaded_bytes': uploaded_bytes}
+
+    def _stage(self, bucket, tables: dict, removed=()) -> None:
+        # Inside a run: keep the change for end_run; outside: publish it right away
+        with self._lock:
+            if self._run is None:
+                self._commit(bucket, tables, removed)
+                return
+            self._run['tables'].update(tables)
+            self._run['removed'].difference_update(tables)
+            for name in removed:
+                self._run['tables'].pop(name, None)
+                self._run['removed'].add(name)
+
+    def _tables(self, bucket) -> dict:
+        # Outputs visible to this client: the current snapshot plus the changes staged by the run
+        with self._lock:
+            tables = dict((self.current_manifest(bucket) or {'tables': {}})['tables'])
+            if self._run is not None:
+                for name in self._run['removed']:
+                    tables.pop(name, None)
+                tables.update(self._run['tables'])
+        return tables
+
+    def _commit(self, bucket, tables: dict, removed=(), run=None) -> str:
+        pointer = self.read_pointer(bucket)
+        current = self.read_manifest(bucket, pointer['manifest']) if pointer else {'tables': {}}
+        run = run or {'run_id': new_run_id(), 'parent': pointer['manifest'] if pointer else None}
+
+        merged = {name: entry for name, entry in current['tables'].items() if name not in removed}
+        merged.update(tables)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'run_id': run['run_id'],
+            'parent': run['parent'],
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+            'tables': merged
+        }
+        body = json.dumps(manifest, sort_keys=True).encode('utf-8')
+        key = f"{self.versions_prefix}manifests/{run['run_id']}-{hashlib.sha256(body).hexdigest()[:12]}.json"
+        self.client.put_object(Bucket=bucket, Key=key, Body=body)
+        self._manifests[key] = manifest
+        self._write_pointer(bucket, key, run['run_id'])
+        return key
+
+    def _write_pointer(self, bucket, manifest_key, run_id) -> dict:
+        pointer = {'manifest': manifest_key, 'run_id': run_id,
+                   'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        self.client.put_object(Bucket=bucket, Key=self.pointer_key, Body=json.dumps(pointer).encode('utf-8'))
+        return pointer
+
+    # Table reads
+
+    def _table(self, bucket, key) -> dict:
+        if not self.is_versioned(key):
+            return None
+        return self._tables(bucket).get(key[len(self.prefix):])
+
+    def read_table_bytes(self, bucket: str, entry: dict) -> bytes:
+        keys = [part['key'] for part in entry['partitions']]
+        if len(keys) == 1 and entry['row_number_column'] is None:
+            return self.client.get_object(Bucket=bucket, Key=keys[0])['Body'].read()
+        with ThreadPoolExecutor(max_workers=min(READ_WORKERS, max(len(keys), 1))) as pool:
+            parts = list(pool.map(lambda part_key: self.client.get_object(Bucket=bucket, Key=part_key)['Body'].read(), keys))
+        return join_partitions(parts, entry['row_number_column'])
+
+    # S3 client interface
+
+    def put_object(self, Bucket=None, Key=None, Body=b'', **kwargs):
+        if self.is_versioned(Key):
+            return self.put_table(Bucket=Bucket, Key=Key, Body=Body, Metadata=kwargs.get('Metadata'))
+        return self.client.put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+
+    def get_object(self, Bucket=None, Key=None, **kwargs):
+        entry = self._table(Bucket, Key)
+        if entry is None:
+            return self.client.get_object(Bucket=Bucket, Key=Key, **kwargs)
+        if kwargs.get('Range'):
+            raise ValueError(f"Range reads of versioned table {Key} are not supported")
+        data = self.read_table_bytes(Bucket, entry)
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data), 'ETag': entry['etag'],
+                'Metadata': dict(entry.get('metadata', {}))}
+
+    def head_object(self, Bucket=None, Key=None, **kwargs):
+        entry = self._table(Bucket, Key)
+        if entry is None:
+            return self.client.head_object(Bucket=Bucket, Key=Key, **kwargs)
+        return {'ContentLength': entry['size'], 'ETag': entry['etag'], 'Metadata': dict(entry.get('metadata', {}))}
+
+    def open_object(self, Bucket=None, Key=None):
+        entry = self._table(Bucket, Key)
+        if entry is None:
+            return open_object(self.client, Bucket, Key)
+        return io.BytesIO(self.read_table_bytes(Bucket, entry))
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        entry = self._table(Bucket, Key)
+        if entry is None:
+            return self.client.download_fileobj(Bucket, Key, Fileobj, **kwargs)
+        Fileobj.write(self.read_table_bytes(Bucket, entry))
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        if self._table(Bucket, Key) is None:
+            return self.client.download_file(Bucket, Key, Filename, **kwargs)
+        with open(Filename, 'wb') as f:
+            self.download_fileobj(Bucket, Key, f)
+
+    def delete_object(self, Bucket=None, Key=None, **kwargs):
+        if self._table(Bucket, Key) is not None:
+            self._stage(Bucket, {}, removed=(Key[len(self.prefix):],))
+            return {}
+        return self.client.delete_object(Bucket=Bucket, Key=Key, **kwargs)
+
+    def delete_objects(self, Bucket=None, Delete=None, **kwargs):
+        keys = [item['Key'] for item in (Delete or {}).get('Objects', [])]
+        versioned = [key for key in keys if self._table(Bucket, key) is not None]
+        if versioned:
+            self._stage(Bucket, {}, removed=[key[len(self.prefix):] for key in versioned])
+        others = [{'Key': key} for key in keys if key not in versioned]
+        response = self.client.delete_objects(Bucket=Bucket, Delete={'Objects': others}, **kwargs) if others else {}
+        return {'Deleted': [{'Key': key} for key in versioned] + list(response.get('Deleted', []))}
+
+    def list_objects_v2(self, Bucket=None, Prefix='', **kwargs):
+        return self._merge_listing(Bucket, Prefix, self.client.list_objects_v2(Bucket=Bucket, Prefix=Prefix, **kwargs),
+                                   first_page='ContinuationToken' not in kwargs)
+
+    def get_paginator(self, operation: str):
+        paginator = self.client.get_paginator(operation)
+        return _ZonePaginator(self, paginator) if operation == 'list_objects_v2' else paginator
+
+    def _merge_listing(self, bucket, prefix, page, first_page=True):
+        # Snapshot outputs replace the wrapped client's objects of the same key; the snapshot files stay hidden
+        tables = self._tables(bucket)
+        contents = [item for item in page.get('Contents', [])
+                    if not item['Key'].startswith(self.versions_prefix) and item['Key'][len(self.prefix):] not in tables]
+        if first_page:
+            contents += [{'Key': f"{self.prefix}{name}", 'Size': entry['size'], 'ETag': entry['etag']}
+                         for name, entry in tables.items() if f"{self.prefix}{name}".startswith(prefix)]
+        page = dict(page)
+        if contents:
+            page['Contents'] = sorted(contents, key=lambda item: item['Key'])
+        else:
+            page.pop('Contents', None)
+        page['KeyCount'] = len(contents)
+        return page
+
+
+class _ZonePaginator:
+    def __init__(self, zone, paginator):
+        self.zone, self.paginator = zone, paginator
+
+    def paginate(self, Bucket=None, Prefix='', **kwargs):
+        for number, page in enumerate(self.paginator.paginate(Bucket=Bucket, Prefix=Prefix, **kwargs)):
+            yield self.zone._merge_listing(Bucket, Prefix, page, first_page=number == 0)
+
+
+def split_partitions(payload: bytes, frame=None):
+    """
+    Split a CSV payload into (label, partition bytes, rows) triples whose concatenation (see join_partitions)
+    gives the payload back. Every partition repeats the header. A first column numbering the rows 1..n
+    (fact_id, price_id, ...) is removed from the partitions; its name is returned as the second value.
+    """
+    import numpy as np
+    import pandas as pd
+
+    newlines = np.flatnonzero(np.frombuffer(payload, dtype=np.uint8) == ord('\n'))
+    header = payload[:newlines[0] + 1] if len(newlines) else payload
+    columns = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+    partition_columns = [column for column in PARTITION_COLUMNS if column in columns]
+    if frame is None:
+        usecols = sorted(set(columns[:1] + partition_columns), key=columns.index)
+        frame = pd.read_csv(io.BytesIO(payload), usecols=usecols) if columns else pd.DataFrame()
+
+    # One line per row (no quoted line breaks): otherwise the table is stored as one partition as written
+    if len(newlines) != len(frame) + 1 or list(frame.columns[:1]) != columns[:1]:
+        return [('all', payload, len(frame))], None
+
+    row_number_column = None
+    first = frame[columns[0]] if columns else None
+    if len(columns) > 1 and first.dtype.kind in 'iu' and np.array_equal(first.to_numpy(), np.arange(1, len(frame) + 1)):
+        row_number_column = columns[0]
+
+    partitioned = len(partition_columns) == len(PARTITION_COLUMNS) and len(frame) > 0
+    if partitioned:
+        date_id = frame['date_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, date_id[1:] != date_id[:-1]])
+    else:
+        starts = np.array([0])
+    ends = np.r_[starts[1:], len(frame)]
+
+    partitions = []
+    for start, end in zip(starts, ends):
+        label = 'all'
+        if partitioned:
+            metrics = '_'.join(sorted(str(metric) for metric in pd.unique(frame['metric_type'].iloc[start:end])))
+            label = f"{metrics}/date_id={date_id[start]}"
+        part = header + payload[newlines[start] + 1:newlines[end] + 1]
+        if row_number_column is not None:
+            part = _FIRST_FIELD.sub(b'', part)
+        partitions.append((label, part, int(end - start)))
+    return partitions, row_number_column
+
+
+def join_partitions(parts: list, row_number_column: str = None) -> bytes:
+    """
+    CSV payload of a table from its partition files (inverse of split_partitions).
+    """
+    if not parts:
+        return b''
+    header, _, _ = parts[0].partition(b'\n')
+    body = b''.join(part.partition(b'\n')[2] for part in parts)
+    if row_number_column is None:
+        return parts[0][:len(header) + 1] + body
+    lines = body.split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    numbered = b''.join(b'%d,%s\n' % (number, line) for number, line in enumerate(lines, 1))
+    return f"{row_number_column},".encode('utf-8') + header + b'\n' + numbered
+
+
+def _hashes(entry) -> set:
+    return {part['hash'] for part in entry['partitions']} if entry else set()
+
+
+def _table_etag(entry: dict) -> str:
+    digest = hashlib.sha256(json.dumps(
+        [entry['row_number_column'], [part['hash'] for part in entry['partitions']]]
+    ).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def main(argv=None) -> int:
+    """
+    CLI: list the snapshots of the versioned transformed zone, or roll it back.
+    - python -m src.helpers.versioned_zone history
+    - python -m src.helpers.versioned_zone rollback [--run-id RUN_ID]
+    """
+    from src.helpers.s3_utils import get_s3_client
+
+    parser = argparse.ArgumentParser(description='Snapshots of the versioned transformed zone.')
+    parser.add_argument('command', choices=('history', 'rollback'))
+    parser.add_argument('--run-id', help='Snapshot to roll back to (default: the state before the current run)')
+    args = parser.parse_args(argv)
+
+    bucket = os.environ['S3_BUCKET_PROJECT_1']
+    client = get_s3_client()
+    if not isinstance(client, VersionedZoneClient):
+        client = _versioned_client(client, os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/'))
+    if args.command == 'rollback':
+        pointer = client.rollback(bucket, args.run_id)
+        print(f"Current snapshot: run {pointer['run_id']} ({pointer['manifest']})")
+        return 0
+    for entry in client.history(bucket):
+        print(f"{'*' if entry['current'] else ' '} {entry['run_id']}  {entry['created_at']}  {entry['tables']} table(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,4 @@
 import os
-import pandas as pd
-import psycopg2
 from io import StringIO
 
 from src.helpers.s3_utils import read_csv_from_s3
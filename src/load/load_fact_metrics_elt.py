@@ -0,0 +1,202 @@
+import os
+import time
+from io import StringIO
+
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.db_utils import get_db_connection
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datawarehouse')
+STAGING_COLUMNS = ['source', 'source_row', 'm49_code', 'iso3_code', 'country_alias',
+                   'item_code', 'element_code', 'element', 'year', 'value']
+
+# Metrics kept per source element: (source, element_code, element, metric_type, product_id, source_rank).
+# source_rank follows the order of the partial tables in transform_fact_metrics_final.
+METRIC_ELEMENTS = [
+    ('fao_food_balance', 5142, 'Food', 'consumption', None, 1),
+    ('fao_food_balance', 5510, 'Production', 'production', None, 2),
+    ('fao_trade', 5610, None, 'import', None, 3),
+    ('fao_trade', 5910, None, 'export', None, 3),
+    ('wb_population', None, None, 'population', 0, 4)
+]
+
+UNMATCHED_SQL = """
+    SELECT s.source, COUNT(DISTINCT s.source_row)
+    FROM stg_metric_rows s
+    LEFT JOIN dim_country c_m49 ON c_m49.m49_code = s.m49_code
+    LEFT JOIN dim_country c_iso ON c_iso.iso3_code = s.iso3_code
+    LEFT JOIN stg_country_aliases a ON a.alias = s.country_alias
+    WHERE COALESCE(c_m49.country_id, c_iso.country_id, a.country_id) IS NULL
+    GROUP BY s.source
+"""
+
+
+def lambda_handler(event=None, context=None):
+    """
+    Lambda function for the ELT mode of fact_metrics: instead of joining in pandas and shipping CSVs,
+    COPY the slimmed raw rows (long format) into unlogged staging tables and build fact_metrics
+    (and fact_metrics_wide) with set-based SQL in Amazon RDS (PostgreSQL).
+    - Dimensions must already be loaded in the warehouse.
+    - Slim artifacts are shared with the pandas transforms where the specs are the same (trade); population is read
+      from the population store.
+    """
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    from src.helpers.product_catalog import ProductCatalog
+    from src.helpers.s3_prefetch import S3Prefetcher
+
+    # Environment variables
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
+    product_catalog_key = f'{resources_prefix}product_catalog.csv'
+    country_aliases_key = f'{transformed_prefix}country_aliases.csv'
+
+    s3_client = get_s3_client()
+    timings = {}
+    started = time.perf_counter()
+
+    # Slim source rows in long format, product catalog items and country aliases
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        catalog_future = prefetch.bytes(product_catalog_key)
+        aliases_future = prefetch.csv(country_aliases_key)
+        catalog = ProductCatalog.from_csv_bytes(catalog_future.result())
+        staged_rows = build_staging_rows(s3_client, s3_bucket, catalog, prefetch)
+        country_aliases = aliases_future.result()
+    product_items = catalog_items(catalog)
+    timings['extract_s'] = round(time.perf_counter() - started, 3)
+
+    # Establish DB connection
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Stage: unlogged tables filled with COPY
+    started = time.perf_counter()
+    cursor.execute(_read_sql('elt_staging.sql'))
+    _copy(cursor, 'stg_metric_rows', STAGING_COLUMNS, staged_rows)
+    _copy(cursor, 'stg_product_items', ['source', 'item_code', 'product_name'], product_items)
+    _copy(cursor, 'stg_metric_elements', ['source', 'element_code', 'element', 'metric_type', 'product_id', 'source_rank'],
+          METRIC_ELEMENTS)
+    # First alias wins, like build_alias_table (the staging table is unique on alias)
+    country_aliases = country_aliases.drop_duplicates(subset='alias', keep='first')
+    _copy(cursor, 'stg_country_aliases', ['alias', 'country_id'], country_aliases[['alias', 'country_id']])
+    timings['stage_s'] = round(time.perf_counter() - started, 3)
+
+    # Transform: set-based SQL into the final tables
+    started = time.perf_counter()
+    cursor.execute(_read_sql('elt_fact_metrics.sql'))
+    cursor.execute("SELECT COUNT(*) FROM fact_metrics")
+    fact_rows = cursor.fetchone()[0]
+    cursor.execute(UNMATCHED_SQL)
+    unmatched = {source: rows for source, rows in cursor.fetchall()}
+    timings['transform_s'] = round(time.perf_counter() - started, 3)
+
+    # Commit and clean up
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    print(f"Unmatched source rows (countries): {unmatched}")
+
+    return {
+        'statusCode': 200,
+        'body': 'fact_metrics built in the data warehouse (ELT mode).',
+        'staged_rows': len(staged_rows),
+        'fact_rows': fact_rows,
+        'unmatched_rows': unmatched,
+        'timings': timings
+    }
+
+
+def build_staging_rows(s3_client, s3_bucket, catalog, prefetch):
+    """
+    Read the slim FAO / World Bank sources and stack them into stg_metric_rows layout.
+    Rows are only column-pruned and filtered by element and catalog item; all key resolution happens in SQL.
+    """
+    import pandas as pd
+    from src.helpers.slim_cache import SlimSpec, read_slim_frame
+    from src.helpers.reshape import stack_years
+    from src.helpers.country_index import normalize_country_name, parse_m49_codes
+    from src.helpers.product_catalog import FAO_FOOD_BALANCE, FAO_TRADE
+    from src.helpers.population_store import read_population_store
+
+    raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
+    slim_prefix = os.environ.get('S3_PREFIX_SLIM', 'slim/')
+    element_codes = {source: sorted(code for src, code, *_ in METRIC_ELEMENTS if src == source and code is not None)
+                     for source in ('fao_food_balance', 'fao_trade')}
+
+    # Food balance: production and consumption elements in one pass over the ZIP
+    food_balance_spec = SlimSpec(
+        name='fao_food_balance_elt',
+        member='FoodBalanceSheets_E_All_Data.csv',
+        columns=('Area Code (M49)', 'Item Code', 'Element Code', 'Element'),
+        year_pattern=r'Y\d{4}',
+        filters={'Element Code': element_codes['fao_food_balance'], 'Item Code': catalog.item_codes(FAO_FOOD_BALANCE)},
+        categories=('Area Code (M49)', 'Element'),
+        read_csv_kwargs={'encoding': 'utf-8'}
+    )
+    # Same spec as the pandas trade transform, so its slim artifact is reused
+    trade_spec = SlimSpec(
+        name='fao_trade',
+        columns=('Area Code (M49)', 'Item Code', 'Element Code'),
+        year_pattern=r'Y\d{4}',
+        filters={'Element Code': element_codes['fao_trade'], 'Item Code': catalog.item_codes(FAO_TRADE)},
+        categories=('Area Code (M49)',)
+    )
+
+    futures = {
+        'fao_food_balance': prefetch.submit(read_slim_frame, s3_client, s3_bucket,
+                                            f"{raw_prefix}FAO/FoodBalance/faostat_consumption.zip", food_balance_spec, slim_prefix),
+        'fao_trade': prefetch.submit(read_slim_frame, s3_client, s3_bucket,
+                                     f"{raw_prefix}FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv", trade_spec, slim_prefix),
+        'wb_population': prefetch.submit(read_population_store, s3_client, s3_bucket, f"{raw_prefix}WB/wb_population.parquet")
+    }
+
+    frames = []
+    for source, future in futures.items():
+        df = future.result()
+        if source == 'wb_population':
+            # The store is already long; one source_row per country, so rows keep the store order (year, country code)
+            long_rows = df.assign(source_row=pd.factorize(df['country_code'], sort=True)[0],
+                                  iso3_code=df['country_code'].astype('string'))
+            names = df['country_name'].astype('string')
+            long_rows['country_alias'] = names.map({name: normalize_country_name(name) for name in names.dropna().unique()})
+        else:
+            df = df.assign(source_row=range(len(df)))
+            df['m49_code'] = parse_m49_codes(df['Area Code (M49)'])
+            id_columns = ['source_row', 'm49_code', 'Item Code', 'Element Code'] + (['Element'] if 'Element' in df else [])
+            long_rows = stack_years(df, id_columns, year_pattern=r'Y(\d{4})')
+            long_rows = long_rows.rename(columns={'Item Code': 'item_code', 'Element Code': 'element_code', 'Element': 'element'})
+        long_rows['source'] = source
+        frames.append(long_rows.reindex(columns=STAGING_COLUMNS))
+
+    staged = pd.concat(frames, ignore_index=True)
+    return staged.astype({'source_row': 'int64', 'm49_code': 'Int64', 'item_code': 'Int64',
+                          'element_code': 'Int64', 'year': 'int64'})
+
+
+def catalog_items(catalog):
+    """
+    (source, item_code, product_name) rows of the FAO catalog sources.
+    """
+    import pandas as pd
+    from src.helpers.product_catalog import FAO_FOOD_BALANCE, FAO_TRADE
+
+    frames = [
+        pd.DataFrame({'source': source, 'item_code': list(mapping), 'product_name': list(mapping.values())})
+        for source, mapping in ((src, catalog.code_mapping(src)) for src in (FAO_FOOD_BALANCE, FAO_TRADE))
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_sql(filename):
+    with open(os.path.join(SQL_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+
+def _copy(cursor, table, columns, rows):
+    import pandas as pd
+
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=columns)
+    buffer = StringIO()
+    df[columns].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table}({', '.join(columns)}) FROM STDIN WITH CSV", buffer)
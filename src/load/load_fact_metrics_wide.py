@@ -0,0 +1,49 @@
+import os
+from io import StringIO
+
+from src.helpers.s3_utils import read_parquet_from_s3
+from src.helpers.db_utils import get_db_connection
+
+# Table columns, in the order of the Parquet extract
+WIDE_COLUMNS = [
+    'year', 'country_id', 'country_name', 'continent_name', 'product_id', 'product_name',
+    'production', 'consumption', 'import', 'export', 'population'
+]
+
+def lambda_handler(event=None, context=None):
+    """
+    Lambda function to load the wide fact_metrics extract (Parquet) from S3 to Amazon RDS (PostgreSQL).
+    """
+    # Environment variables
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    transformed_key = f'{transformed_prefix}fact_metrics_wide.parquet'
+
+    # Load data from S3
+    df = read_parquet_from_s3(s3_bucket, transformed_key)
+
+    # Establish DB connection
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Replace the previous extract
+    cursor.execute("TRUNCATE TABLE fact_metrics_wide")
+
+    # Prepare data for copy_expert (missing metrics become empty fields, loaded as NULL)
+    buffer = StringIO()
+    df[WIDE_COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    # Load data using COPY (fast bulk insert)
+    cursor.copy_expert(f"COPY fact_metrics_wide({', '.join(WIDE_COLUMNS)}) FROM STDIN WITH CSV", buffer)
+
+    # Commit and clean up
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    return {
+        'statusCode': 200,
+        'body': 'fact_metrics_wide loaded successfully into data warehouse.',
+        'rows': len(df)
+    }
@@ -0,0 +1,70 @@
+import os
+
+from src.helpers.s3_utils import get_s3_client, read_csv_from_s3
+from src.helpers.db_utils import get_db_connection
+
+# Table columns and their PostgreSQL types (binary COPY encodes values with exactly these types)
+COLUMN_TYPES = {
+    'price_id': 'int4',
+    'date_id': 'int4',
+    'product_id': 'int4',
+    'price_usd_per_ton': 'numeric(10,2)',
+    'avg_annual_price': 'numeric(10,2)',
+    'price_annual_change_pct': 'numeric(10,2)',
+    'price_month_change_pct': 'numeric(10,2)',
+    'price_yoy_change_pct': 'numeric(10,2)',
+    'price_rolling_mean_3m': 'numeric(10,2)',
+    'price_rolling_mean_6m': 'numeric(10,2)',
+    'price_rolling_mean_12m': 'numeric(10,2)',
+    'price_volatility_12m': 'numeric(10,2)',
+    'price_drawdown_12m_pct': 'numeric(10,2)',
+    'real_price_usd_per_ton': 'numeric(10,2)'
+}
+# Numeric-heavy table: binary COPY spares PostgreSQL parsing every INT/DECIMAL field
+COPY_FORMAT = 'binary'
+
+def lambda_handler(event=None, context=None):
+    """
+    Lambda function to load transformed fact_prices.csv from S3 to Amazon RDS (PostgreSQL).
+    - Pass {"copy_format": "csv"} in the event to use the text COPY path instead of binary COPY.
+    """
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    from src.helpers.pg_copy import copy_dataframe, print_copy_progress
+    from src.helpers.table_stats import read_table_stats, csv_dtypes, check_loaded_rows
+
+    # Environment variables
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    transformed_key = f'{transformed_prefix}fact_prices.csv'
+    copy_format = (event or {}).get('copy_format', COPY_FORMAT)
+
+    # Statistics sidecar of the transform (None when missing or stale): column types for the parse,
+    # expected row count for progress and an integrity check
+    stats = read_table_stats(get_s3_client(), s3_bucket, transformed_key)
+
+    # Load data from S3
+    df = read_csv_from_s3(s3_bucket, transformed_key, dtype=csv_dtypes(stats))
+    total_rows = check_loaded_rows(stats, transformed_key, len(df))
+
+    # Establish DB connection
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Replace the previous load
+    cursor.execute("TRUNCATE TABLE fact_prices")
+
+    # Load data using COPY (binary or CSV)
+    rows = copy_dataframe(cursor, 'fact_prices', df, COLUMN_TYPES, copy_format,
+                          progress=print_copy_progress('fact_prices', total_rows))
+
+    # Commit and clean up
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    return {
+        'statusCode': 200,
+        'body': 'fact_prices loaded successfully into data warehouse.',
+        'rows': rows,
+        'copy_format': copy_format
+    }
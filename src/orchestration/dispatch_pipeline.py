@@ -0,0 +1,137 @@
+import os
+import sys
+import argparse
+import importlib
+from urllib.parse import quote_plus, unquote_plus
+
+from src.helpers.pipeline_registry import PIPELINE, plan_runs
+from src.helpers.pipeline_runs import new_run_id, latest_run_key, write_latest_run
+from src.helpers.run_ledger import compare_run, open_ledger
+from src.helpers.s3_utils import get_s3_client
+
+
+def changed_keys_from_event(event: dict) -> list:
+    """
+    Extract changed object keys from an S3 event notification (ObjectCreated records)
+    or from a local event of the form {"changed_keys": [...]}.
+    """
+    event = event or {}
+    if 'changed_keys' in event:
+        return list(event['changed_keys'])
+
+    keys = []
+    for record in event.get('Records', []):
+        if not record.get('eventName', '').startswith('ObjectCreated'):
+            continue
+        # S3 event keys are URL-encoded (spaces arrive as '+')
+        key = unquote_plus(record['s3']['object']['key'])
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def fake_s3_event(keys, bucket: str = 'local-bucket') -> dict:
+    """
+    Build an S3 ObjectCreated event for the given keys (local runs and tests).
+    """
+    return {
+        'Records': [
+            {
+                'eventSource': 'aws:s3',
+                'eventName': 'ObjectCreated:Put',
+                's3': {'bucket': {'name': bucket}, 'object': {'key': quote_plus(key, safe='/')}}
+            }
+            for key in keys
+        ]
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Run only the pipeline steps affected by changed raw / resource objects, in dependency order.
+    - event: S3 event notification (configure it on the raw and resources prefixes)
+      or {"changed_keys": [...]} for local runs.
+    - {"dry_run": true} returns the plan without running it; {"force_refresh": true} is passed to every step.
+    - Every run gets a run ID ({"run_id": ...} or a new one); a run that executed steps is published as the
+      latest run in the transformed zone (readers such as the query API cache invalidate on it).
+    - With RUN_LEDGER_URL set, every step is recorded in the run ledger and the response lists the
+      regressions of the run against the previous ones (python -m src.helpers.run_ledger reports them).
+    """
+    event = event or {}
+    run_id = event.get('run_id') or new_run_id()
+    changed_keys = changed_keys_from_event(event)
+    plan = plan_runs(changed_keys)
+    print(f"Run {run_id}, changed keys: {changed_keys}")
+    print(f"Planned steps: {plan}")
+
+    results = {}
+    regressions = None
+    if not event.get('dry_run'):
+        step_event = {'force_refresh': True} if event.get('force_refresh') else {}
+        s3_client = get_s3_client() if plan else None
+        # Versioned transformed zone: all outputs written by the steps form one snapshot of this run
+        if hasattr(s3_client, 'begin_run'):
+            s3_client.begin_run(os.environ['S3_BUCKET_PROJECT_1'], run_id)
+        # Run ledger (RUN_LEDGER_URL): per-step measurements, compared with the previous runs at the end
+        ledger = open_ledger() if plan else None
+        succeeded = False
+        try:
+            for step in plan:
+                handler = importlib.import_module(PIPELINE[step]['module']).lambda_handler
+                if ledger is None:
+                    results[step] = handler(dict(step_event), context)
+                    continue
+                with ledger.record(run_id, step) as record:
+                    results[step] = record.response = handler(dict(step_event), context)
+            succeeded = True
+        finally:
+            # The snapshot of the run is published only when every step succeeded
+            if hasattr(s3_client, 'end_run'):
+                s3_client.end_run(succeeded)
+            if ledger is not None:
+                regressions = compare_run(ledger.records(), run_id)
+                ledger.close()
+
+        for finding in regressions or []:
+            print(f"REGRESSION {finding['step']} {finding['metric']}: {finding['value']} vs median "
+                  f"{finding['baseline_median']} ({finding['change_pct']}%)")
+
+        if plan:
+            transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+            write_latest_run(s3_client, os.environ['S3_BUCKET_PROJECT_1'], latest_run_key(transformed_prefix), {
+                'run_id': run_id,
+                'steps': plan,
+                'changed_keys': changed_keys
+            })
+
+    return {
+        'statusCode': 200,
+        'body': f"Dispatched {len(plan)} step(s) for {len(changed_keys)} changed key(s).",
+        'run_id': run_id,
+        'changed_keys': changed_keys,
+        'planned_steps': plan,
+        'results': results,
+        'regressions': regressions
+    }
+
+
+def main(argv=None):
+    """
+    Local fake event source: python -m src.orchestration.dispatch_pipeline raw/WB/CMO-Historical-Data-Monthly.xlsx --dry-run
+    """
+    parser = argparse.ArgumentParser(description="Run pipeline steps affected by changed S3 keys.")
+    parser.add_argument('keys', nargs='+', help="Changed S3 keys (with zone prefix, e.g. resources/m49_continents.csv)")
+    parser.add_argument('--dry-run', action='store_true', help="Only print the planned steps")
+    parser.add_argument('--force-refresh', action='store_true', help="Bypass the memoization of every step")
+    args = parser.parse_args(argv)
+
+    event = fake_s3_event(args.keys)
+    event.update(dry_run=args.dry_run, force_refresh=args.force_refresh)
+    response = lambda_handler(event, None)
+    for step, result in response['results'].items():
+        print(f"{step}: {result.get('body')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
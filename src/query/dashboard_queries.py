@@ -0,0 +1,260 @@
+import os
+import threading
+
+import pandas as pd
+
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.storage import open_object, parquet_source
+from src.helpers.result_cache import ResultCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S
+from src.helpers.pipeline_runs import latest_run_key, read_latest_run_id
+
+# Metrics of the wide extract / fact_metrics_wide table (population is a country-level metric)
+PRODUCT_METRICS = ('production', 'consumption', 'import', 'export')
+METRICS = PRODUCT_METRICS + ('population',)
+BACKENDS = ('files', 'warehouse')
+DEFAULT_TOP_N = 10
+
+# Result columns of every query (both backends return exactly these, in this order)
+TOP_PRODUCERS_COLUMNS = ['rank', 'country_name', 'value']
+COUNTRY_SERIES_COLUMNS = ['year', 'value']
+CONTINENT_SHARES_COLUMNS = ['continent_name', 'value', 'share']
+
+
+class FileSource:
+    """
+    Queries over the wide extract in the transformed zone (fact_metrics_wide.parquet, one row per
+    country x product x year). The extract is read once per pipeline run and indexed by (product, year)
+    and by country, so a query only touches the rows it needs. The extract and its indexes are published
+    as one tuple, so a query running during a refresh always sees a consistent snapshot.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self._snapshot = None
+
+    def version(self) -> str:
+        """
+        ETag of the extract: a rewritten extract invalidates cached results even without a run marker.
+        """
+        return self.s3_client.head_object(Bucket=self.bucket, Key=self.key)['ETag']
+
+    def refresh(self) -> None:
+        with open_object(self.s3_client, self.bucket, self.key) as f:
+            wide = pd.read_parquet(parquet_source(f))
+        for column in ('country_name', 'continent_name', 'product_name'):
+            wide[column] = wide[column].astype('category')
+        by_product_year = wide.groupby(['product_name', 'year'], observed=True, sort=False).indices
+        by_country = wide.groupby('country_name', observed=True, sort=False).indices
+        self._snapshot = (wide, by_product_year, by_country)
+
+    def _rows(self, by: str, key) -> pd.DataFrame:
+        wide, by_product_year, by_country = self._snapshot
+        positions = (by_product_year if by == 'product_year' else by_country).get(key)
+        if positions is None:
+            return wide.iloc[:0]
+        return wide.iloc[positions]
+
+    def top_producers(self, product: str, year: int, n: int, metric: str) -> pd.DataFrame:
+        rows = self._rows('product_year', (product, year))
+        values = rows[['country_name', metric]].dropna(subset=[metric])
+        values = values.rename(columns={metric: 'value'})
+        values = values.sort_values(['value', 'country_name'], ascending=[False, True], kind='stable').head(n)
+        values.insert(0, 'rank', range(1, len(values) + 1))
+        return _result(values, TOP_PRODUCERS_COLUMNS)
+
+    def country_series(self, country: str, metric: str, product: str = None) -> pd.DataFrame:
+        rows = self._rows('country', country)
+        if product is not None and metric != 'population':
+            rows = rows[rows['product_name'] == product]
+        rows = rows.dropna(subset=[metric])
+        # Population is repeated on every product row of a country and year: take it once
+        aggregate = 'max' if metric == 'population' else 'sum'
+        series = rows.groupby('year', sort=True)[metric].agg(aggregate).rename('value').reset_index()
+        return _result(series, COUNTRY_SERIES_COLUMNS)
+
+    def continent_shares(self, product: str, year: int, metric: str) -> pd.DataFrame:
+        rows = self._rows('product_year', (product, year)).dropna(subset=['continent_name', metric])
+        totals = rows.groupby('continent_name', observed=True, sort=False)[metric].sum().rename('value').reset_index()
+        return _with_shares(totals)
+
+    def dimensions(self) -> dict:
+        wide = self._snapshot[0]
+        return {
+            'products': sorted(wide['product_name'].cat.categories.astype(str)),
+            'years': sorted(int(year) for year in wide['year'].unique()),
+            'countries': sorted(wide['country_name'].cat.categories.astype(str))
+        }
+
+
+class WarehouseSource:
+    """
+    The same queries as parameterized SQL against the fact_metrics_wide table, on pooled connections
+    (see get_db_pool). Aggregation and ranking run in the database; only result rows travel.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def version(self) -> str:
+        return None
+
+    def refresh(self) -> None:
+        pass
+
+    def _query(self, sql: str, params: tuple) -> list:
+        conn = self.pool.getconn()
+        try:
+            # Read-only queries: no transaction is left open on the pooled connection between requests
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        finally:
+            self.pool.putconn(conn)
+
+    def top_producers(self, product: str, year: int, n: int, metric: str) -> pd.DataFrame:
+        rows = self._query(
+            f"""
+            SELECT country_name, {metric}::float8 AS value
+            FROM fact_metrics_wide
+            WHERE product_name = %s AND year = %s AND {metric} IS NOT NULL
+            ORDER BY value DESC, country_name
+            LIMIT %s
+            """, (product, year, n))
+        values = pd.DataFrame(rows, columns=['country_name', 'value'])
+        values.insert(0, 'rank', range(1, len(values) + 1))
+        return _result(values, TOP_PRODUCERS_COLUMNS)
+
+    def country_series(self, country: str, metric: str, product: str = None) -> pd.DataFrame:
+        aggregate = 'MAX' if metric == 'population' else 'SUM'
+        product_filter, params = '', (country,)
+        if product is not None and metric != 'population':
+            product_filter, params = 'AND product_name = %s', (country, product)
+        rows = self._query(
+            f"""
+            SELECT year, {aggregate}({metric})::float8 AS value
+            FROM fact_metrics_wide
+            WHERE country_name = %s AND {metric} IS NOT NULL {product_filter}
+            GROUP BY year
+            ORDER BY year
+            """, params)
+        return _result(pd.DataFrame(rows, columns=COUNTRY_SERIES_COLUMNS), COUNTRY_SERIES_COLUMNS)
+
+    def continent_shares(self, product: str, year: int, metric: str) -> pd.DataFrame:
+        rows = self._query(
+            f"""
+            SELECT continent_name, SUM({metric})::float8 AS value
+            FROM fact_metrics_wide
+            WHERE product_name = %s AND year = %s AND continent_name IS NOT NULL AND {metric} IS NOT NULL
+            GROUP BY continent_name
+            """, (product, year))
+        return _with_shares(pd.DataFrame(rows, columns=['continent_name', 'value']))
+
+    def dimensions(self) -> dict:
+        return {
+            'products': [row[0] for row in self._query("SELECT DISTINCT product_name FROM fact_metrics_wide ORDER BY 1", ())],
+            'years': [int(row[0]) for row in self._query("SELECT DISTINCT year FROM fact_metrics_wide ORDER BY 1", ())],
+            'countries': [row[0] for row in self._query("SELECT DISTINCT country_name FROM fact_metrics_wide ORDER BY 1", ())]
+        }
+
+
+class DashboardQueries:
+    """
+    Cached dashboard questions over a FileSource or a WarehouseSource:
+    - top_producers(product, year, n, metric): the n countries with the largest metric value
+    - country_series(country, metric, product): the metric of a country per year (all products summed without product)
+    - continent_shares(product, year, metric): metric totals per continent and their share of the world total
+    Results are cached (see ResultCache) and returned as new DataFrames, so callers may modify them.
+    When the pipeline publishes a new run (or the extract changes), the cache is cleared and the source reloaded.
+    """
+
+    def __init__(self, source, cache: ResultCache = None):
+        self.source = source
+        self.cache = cache if cache is not None else ResultCache()
+        self._loaded_version = None
+        self._loaded = False
+        self._refresh_lock = threading.Lock()
+
+    def top_producers(self, product: str, year: int, n: int = DEFAULT_TOP_N, metric: str = 'production') -> pd.DataFrame:
+        year, n = int(year), int(n)
+        _check_metric(metric, PRODUCT_METRICS)
+        if n < 1:
+            raise ValueError(f"n must be positive, got {n}")
+        return self._cached(('top_producers', product, year, n, metric),
+                            lambda: self.source.top_producers(product, year, n, metric))
+
+    def country_series(self, country: str, metric: str = 'production', product: str = None) -> pd.DataFrame:
+        _check_metric(metric, METRICS)
+        return self._cached(('country_series', country, metric, product),
+                            lambda: self.source.country_series(country, metric, product))
+
+    def continent_shares(self, product: str, year: int, metric: str = 'production') -> pd.DataFrame:
+        year = int(year)
+        _check_metric(metric, PRODUCT_METRICS)
+        return self._cached(('continent_shares', product, year, metric),
+                            lambda: self.source.continent_shares(product, year, metric))
+
+    def dimensions(self) -> dict:
+        """
+        Products, years and countries available to the queries.
+        """
+        return self._cached(('dimensions',), self.source.dimensions,
+                            copy=lambda dimensions: {name: list(values) for name, values in dimensions.items()})
+
+    def _cached(self, key: tuple, compute, copy=pd.DataFrame.copy):
+        version = self.cache.current_run_id()
+        with self._refresh_lock:
+            if not self._loaded or version != self._loaded_version:
+                self.source.refresh()
+                self._loaded, self._loaded_version = True, version
+        return copy(self.cache.get_or_compute(key, compute))
+
+
+def create_queries(backend: str = 'files', max_entries: int = DEFAULT_MAX_ENTRIES, ttl_s: float = DEFAULT_TTL_S,
+                   pool=None) -> DashboardQueries:
+    """
+    DashboardQueries configured from the environment:
+    - files: S3_BUCKET_PROJECT_1 / S3_PREFIX_TRANSFORMED (and STORAGE_URL) locate fact_metrics_wide.parquet
+    - warehouse: RDS_* variables (pooled connections, see get_db_pool)
+    Both invalidate cached results when the dispatcher publishes a new run (transformed/_latest_run.json).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown query backend '{backend}', expected one of {BACKENDS}")
+    s3_client = get_s3_client()
+    bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+
+    if backend == 'files':
+        source = FileSource(s3_client, bucket, f"{transformed_prefix}fact_metrics_wide.parquet")
+    else:
+        from src.helpers.db_utils import get_db_pool
+        source = WarehouseSource(pool or get_db_pool())
+
+    run_key = latest_run_key(transformed_prefix)
+    cache = ResultCache(max_entries, ttl_s,
+                        run_id=lambda: (read_latest_run_id(s3_client, bucket, run_key), source.version()))
+    return DashboardQueries(source, cache)
+
+
+def _check_metric(metric: str, allowed: tuple) -> None:
+    # Metric names are interpolated into SQL as column names: only known columns are accepted
+    if metric not in allowed:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {allowed}")
+
+
+def _with_shares(totals: pd.DataFrame) -> pd.DataFrame:
+    totals = totals.sort_values(['value', 'continent_name'], ascending=[False, True], kind='stable')
+    world = totals['value'].sum()
+    totals['share'] = totals['value'] / world if world else float('nan')
+    return _result(totals, CONTINENT_SHARES_COLUMNS)
+
+
+def _result(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    result = df[columns].reset_index(drop=True)
+    for column in ('country_name', 'continent_name'):
+        if column in result:
+            result[column] = result[column].astype(str)
+    result['value'] = result['value'].astype('float64')
+    return result
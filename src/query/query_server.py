@@ -0,0 +1,113 @@
+import sys
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from src.query.dashboard_queries import BACKENDS, DEFAULT_TOP_N, create_queries
+from src.helpers.result_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Endpoint -> (DashboardQueries method, required parameters, optional parameters with defaults)
+ROUTES = {
+    '/top-producers': ('top_producers', ('product', 'year'), {'n': DEFAULT_TOP_N, 'metric': 'production'}),
+    '/country-series': ('country_series', ('country',), {'metric': 'production', 'product': None}),
+    '/continent-shares': ('continent_shares', ('product', 'year'), {'metric': 'production'})
+}
+
+
+def make_handler(queries):
+    """
+    Request handler class answering GET requests from a DashboardQueries instance:
+    - /top-producers?product=Wheat&year=2020[&n=10][&metric=production]
+    - /country-series?country=Poland[&metric=production][&product=Wheat]
+    - /continent-shares?product=Wheat&year=2020[&metric=production]
+    - /dimensions, /cache-stats, /health
+    Query results are returned as {"query": ..., "params": ..., "rows": [{column: value}, ...]}.
+    """
+
+    class QueryRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if url.path == '/health':
+                    return self._send(200, {'status': 'ok'})
+                if url.path == '/cache-stats':
+                    return self._send(200, queries.cache.stats())
+                if url.path == '/dimensions':
+                    return self._send(200, queries.dimensions())
+                if url.path not in ROUTES:
+                    return self._send(404, {'error': f"Unknown endpoint '{url.path}'", 'endpoints': sorted(ROUTES)})
+
+                method, required, optional = ROUTES[url.path]
+                missing = [name for name in required if name not in params]
+                if missing:
+                    return self._send(400, {'error': f"Missing parameters: {', '.join(missing)}"})
+                arguments = dict(optional, **{name: params[name] for name in (*required, *optional) if name in params})
+                result = getattr(queries, method)(**arguments)
+                return self._send(200, {'query': method, 'params': arguments, 'rows': _records(result)})
+            except ValueError as error:
+                return self._send(400, {'error': str(error)})
+            except Exception as error:
+                print(f"Query {self.path} failed: {error}")
+                return self._send(500, {'error': 'Query failed'})
+
+        def _send(self, status: int, body) -> None:
+            payload = json.dumps(body, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate the output of benchmarks; errors are printed above
+            pass
+
+    return QueryRequestHandler
+
+
+def serve(queries, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """
+    HTTP server (one thread per request) for a DashboardQueries instance; call serve_forever() on it.
+    Port 0 picks a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(queries))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None) -> int:
+    """
+    CLI: serve the dashboard queries on a local HTTP endpoint (environment as for create_queries).
+    """
+    parser = argparse.ArgumentParser(description='Serve cached dashboard queries over HTTP.')
+    parser.add_argument('--backend', choices=BACKENDS, default='files')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help='Cached results kept (LRU)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL_S, help='Seconds a cached result stays valid')
+    args = parser.parse_args(argv)
+
+    server = serve(create_queries(args.backend, args.max_entries, args.ttl), args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Serving dashboard queries ({args.backend}) on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _records(df) -> list:
+    # NaN is not valid JSON: missing values become null
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
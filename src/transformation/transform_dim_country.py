@@ -1,69 +1,112 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO
-import zipfile
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate dim_country table for the data warehouse.
-    - Extracts country data from FAO ZIP file in S3.
-    - Enriches data with continent info using mapping file in S3 (resources zone).
-    - Saves transformed dimension table into transformed zone on S3.
+    - Extracts areas from the code lists of all FAO sources in S3 (*_AreaCodes.csv members, with a
+      streaming distinct scan of the data file where an archive has none).
+    - Enriches data with continent info and ISO3 codes using mapping files in S3 (resources zone).
+    - Saves transformed dimension table and precomputed country alias table into transformed zone on S3.
     """
+
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.country_index import parse_m49_codes, build_alias_table
+    from src.helpers.fao_code_lists import fao_area_spec, read_fao_areas, merge_code_lists
+    from src.helpers.table_stats import put_table_with_stats
     
     # Environment variables
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
     resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
+    slim_prefix = os.environ.get('S3_PREFIX_SLIM', 'slim/')
     
     # Filenames
     zip_key = f'{raw_prefix}faostat_production.zip'
-    csv_inside_zip = 'Value_of_Production_E_All_Data.csv'
+    food_balance_key = f'{raw_prefix}FAO/FoodBalance/faostat_consumption.zip'
+    trade_key = f'{raw_prefix}FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv'
     mapping_key = f'{resources_prefix}m49_continents.csv'
+    iso3_key = f'{resources_prefix}m49_iso3.csv'
+    aliases_key = f'{resources_prefix}country_aliases.csv'
     
-    # Initialize boto3 client
-    s3_client = boto3.client('s3')
+    # FAO sources in id order: production first, so existing country_ids stay stable when areas are added.
+    # Specs are only used by the fallback scan (sources without an area code list).
+    AREA_SOURCES = [
+        (zip_key, fao_area_spec('fao_production_areas', 'Value_of_Production_E_All_Data.csv')),
+        (food_balance_key, fao_area_spec('fao_food_balance_areas', 'FoodBalanceSheets_E_All_Data.csv')),
+        (trade_key, fao_area_spec('fao_trade_areas'))
+    ]
     
-    # Load ZIP file from S3 and extract target CSV file
-    zip_obj = s3_client.get_object(Bucket=s3_bucket, Key=zip_key)
-    zip_bytes = BytesIO(zip_obj['Body'].read())
+    # Initialize boto3 client
+    s3_client = get_s3_client()
     
-    with zipfile.ZipFile(zip_bytes, 'r') as zip_file:
-        with zip_file.open(csv_inside_zip) as csv_file:
-            df_raw = pd.read_csv(csv_file, encoding='utf-8')
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[zip_key, food_balance_key, trade_key, mapping_key, iso3_key, aliases_key],
+        outputs=[f"{transformed_prefix}dim_country.csv", f"{transformed_prefix}country_aliases.csv"],
+        config={'slim_specs': [spec.fingerprint() for _, spec in AREA_SOURCES]},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
     
-    # Extract country columns
-    df_countries = df_raw[['Area Code (M49)', 'Area']].drop_duplicates().copy()
+    # Load areas of every FAO source and clean M49 codes (remove leading quote and cast to int)
+    area_lists = []
+    for source_key, spec in AREA_SOURCES:
+        areas = read_fao_areas(s3_client, s3_bucket, source_key, spec, slim_prefix)
+        area_lists.append(areas.assign(m49_code=parse_m49_codes(areas['Area Code (M49)'])))
     
-    # Clean M49 codes — remove leading quote and cast to int
-    df_countries['m49_code'] = df_countries['Area Code (M49)'].str.replace("'",  "").astype(int)
+    # Merge code lists (one row per M49 code, first source wins)
+    df_countries = merge_code_lists(area_lists, key='m49_code')
     
-    # Load mapping file with continents from S3
-    mapping_obj = s3_client.get_object(Bucket=s3_bucket, Key=mapping_key)
-    mapping_data = mapping_obj['Body'].read()
-    df_mapping = pd.read_csv(BytesIO(mapping_data), encoding='utf-8')
+    # Load mapping files (continents, ISO3 codes, curated aliases) from S3
+    df_mapping = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=mapping_key)['Body'].read()), encoding='utf-8')
+    df_iso3 = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=iso3_key)['Body'].read()), encoding='utf-8')
+    df_aliases = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=aliases_key)['Body'].read()), encoding='utf-8')
+    df_mapping['m49_code'] = parse_m49_codes(df_mapping['m49_code'])
+    df_iso3['m49_code'] = parse_m49_codes(df_iso3['m49_code'])
     
-    # Merge countries with continents
-    df_enriched = pd.merge(df_countries, df_mapping, on='m49_code', how='left')
+    # Merge countries with continents and ISO3 codes
+    df_enriched = pd.merge(df_countries, df_mapping[['m49_code', 'continent_name']], on='m49_code', how='left')
+    df_enriched = pd.merge(df_enriched, df_iso3, on='m49_code', how='left')
     
     # Generate surrogate key for country_id (start from 1)
     df_enriched.reset_index(drop=True, inplace=True)
     df_enriched['country_id'] = df_enriched.index + 1
     
     # Build final dimension table
-    dim_country = df_enriched[['country_id', 'Area', 'continent']]
-    dim_country.rename(columns={'Area': 'country_name', 'continent': 'continent_name'}, inplace=True)
+    dim_country = df_enriched[['country_id', 'Area', 'continent_name', 'm49_code', 'iso3_code']]
+    dim_country = dim_country.rename(columns={'Area': 'country_name'})
     dim_country = dim_country[dim_country['continent_name'].notna()]
     
-    # Write transformed file to S3 (transformed zone)
+    # Precompute alias table (FAO names, M49 resource names, curated spellings) for name-based lookups
+    country_aliases = build_alias_table(dim_country, [
+        df_mapping.rename(columns={'country_name': 'alias'}),
+        df_aliases
+    ])
+    
+    # Write transformed files to S3 (transformed zone)
+    # (each with its statistics sidecar)
     csv_buffer = BytesIO()
     dim_country.to_csv(csv_buffer, index=False)
+    put_table_with_stats(s3_client, s3_bucket, f"{transformed_prefix}dim_country.csv", dim_country, csv_buffer.getvalue(),
+                         keys=['country_id', 'm49_code'])
     
-    s3_client.put_object(Bucket=s3_bucket, Key=f"{transformed_prefix}dim_country.csv", Body=csv_buffer.getvalue())
+    aliases_buffer = BytesIO()
+    country_aliases.to_csv(aliases_buffer, index=False)
+    put_table_with_stats(s3_client, s3_bucket, f"{transformed_prefix}country_aliases.csv", country_aliases,
+                         aliases_buffer.getvalue())
     
-    return {
+    return memo.save({
         'statusCode': 200,
         'body': 'Transformation of dim_country completed successfully!'
-    }
\ No newline at end of file
+    })
\ No newline at end of file
@@ -1,14 +1,22 @@
-import pandas as pd
-import boto3
 import os
 import io
 import datetime
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     Lambda function to generate dim_date table and store it as CSV in S3.
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.table_stats import put_table_with_stats
+
     # Get bucket and prefix from environment variables
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
@@ -18,6 +26,19 @@ def lambda_handler(event, context):
     current_year = datetime.date.today().year
     end_year = current_year + 1
 
+    # Skip the run when the date range and code are unchanged since the last run
+    s3 = get_s3_client()
+    s3_key = f"{transformed_prefix}dim_date.csv"
+    memo = TransformMemo(
+        s3, s3_bucket,
+        inputs=[],
+        outputs=[s3_key],
+        config={'start_year': start_year, 'end_year': end_year},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
+
     # Generate monthly date range
     date_range = pd.date_range(start=f'{start_year}-01-01', 
                                 end=f'{end_year}-12-31', 
@@ -46,12 +67,10 @@ def lambda_handler(event, context):
     csv_buffer = io.StringIO()
     dim_date.to_csv(csv_buffer, index=False)
 
-    # Upload to S3
-    s3 = boto3.client('s3')
-    s3_key = f"{transformed_prefix}dim_date.csv"
-    s3.put_object(Bucket=s3_bucket, Key=s3_key, Body=csv_buffer.getvalue())
+    # Upload to S3 (with the statistics sidecar)
+    put_table_with_stats(s3, s3_bucket, s3_key, dim_date, csv_buffer.getvalue(), keys=['date_id'])
 
-    return {
+    return memo.save({
         'statusCode': 200,
         'body': 'dim_date.csv successfully created and uploaded to S3'
-    }
+    })
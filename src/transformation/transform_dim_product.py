@@ -1,65 +1,61 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO
-import zipfile
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
-    AWS Lambda function to process dim_product data from FAO source file stored in S3 (raw zone),
+    AWS Lambda function to build dim_product from the product catalog stored in S3 (resources zone),
     and save transformed file to S3 (transformed zone).
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.product_catalog import ProductCatalog
+    from src.helpers.table_stats import put_table_with_stats
+
     # Read AWS S3 environment variables for bucket and prefixes
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
-    raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
 
-    # Name of the ZIP file and CSV inside it
-    zip_file_key = f'{raw_prefix}faostat_production.zip'
-    csv_inside_zip = 'Value_of_Production_E_All_Data.csv'
+    # Products of interest are defined by the central product catalog
+    product_catalog_key = f'{resources_prefix}product_catalog.csv'
 
-    # Read ZIP file from S3
-    s3_client = boto3.client('s3')
-    zip_obj = s3_client.get_object(Bucket=s3_bucket, Key=zip_file_key)
-    zip_bytes = BytesIO(zip_obj['Body'].read())
+    s3_client = get_s3_client()
 
-    # Unzip the file directly in memory
-    with zipfile.ZipFile(zip_bytes, 'r') as zip_file:
-        with zip_file.open(csv_inside_zip) as csv_file:
-            df_raw = pd.read_csv(csv_file, encoding='utf-8')
-
-    # Define dictionary of products of interest
-    PRODUCTS_OF_INTEREST = {
-        "Wheat": "Wheat",
-        "Maize (corn)": "Maize",
-        "Rice": "Rice",
-        "Soya beans": "Soya",
-        "Potatoes": "Potatoes"
-    }
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[product_catalog_key],
+        outputs=[f"{transformed_prefix}dim_product.csv"],
+        config={},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
 
-    # Extract relevant columns & filter products
-    df_products = df_raw[['Item Code', 'Item']].drop_duplicates()
-    df_filtered = df_products[df_products['Item'].isin(PRODUCTS_OF_INTEREST.keys())].copy()
-    df_filtered['product_name'] = df_filtered['Item'].map(PRODUCTS_OF_INTEREST)
+    # Canonical products in catalog order: the shipped catalog lists them in the order of the existing product_ids,
+    # so new products must be appended at the end to keep the ids of the warehouse and fact files
+    catalog = ProductCatalog.load(s3_client, s3_bucket, product_catalog_key)
+    products = catalog.products()
 
     # Generate surrogate key
-    df_filtered.reset_index(drop=True, inplace=True)
-    df_filtered['product_id'] = df_filtered.index + 1
-    dim_product = df_filtered[['product_id', 'product_name']]
+    dim_product = pd.DataFrame({'product_id': range(1, len(products) + 1), 'product_name': products})
 
     # Convert to CSV buffer
     csv_buffer = BytesIO()
     dim_product.to_csv(csv_buffer, index=False)
 
-    # Upload transformed file to S3 (transformed zone)
-    s3_client.put_object(
-        Bucket=s3_bucket,
-        Key=f"{transformed_prefix}dim_product.csv",
-        Body=csv_buffer.getvalue()
-    )
+    # Upload transformed file and its statistics sidecar to S3 (transformed zone)
+    put_table_with_stats(s3_client, s3_bucket, f"{transformed_prefix}dim_product.csv", dim_product, csv_buffer.getvalue(),
+                         keys=['product_id'])
 
-    return {
+    return memo.save({
         'statusCode': 200,
         'body': 'Transformation of dim_product completed successfully!'
-    }
+    })
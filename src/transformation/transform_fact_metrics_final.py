@@ -1,15 +1,24 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+from src.helpers.run_ledger import dropna_rows
 
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate unified fact_metrics table (long format) from 4 transformed CSVs in S3,
     and store the final table in the transformed zone.
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.table_stats import put_table_with_stats
+
     # Environment config
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
@@ -24,17 +33,30 @@ def lambda_handler(event, context):
     output_key = f"{transformed_prefix}fact_metrics.csv"
 
     # Init S3
-    s3_client = boto3.client('s3')
+    s3_client = get_s3_client()
+
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=list(input_keys.values()),
+        outputs=[output_key],
+        config={},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
 
     # Expected columns
     TARGET_COLUMNS = ["date_id", "product_id", "country_id", "metric_type", "value"]
     frames = []
 
-    # Read and normalize all partial fact tables
-    for metric_name, key in input_keys.items():
-        obj = s3_client.get_object(Bucket=s3_bucket, Key=key)
-        df = pd.read_csv(BytesIO(obj['Body'].read()))
+    # Read all partial fact tables concurrently
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        futures = {metric_name: prefetch.csv(key) for metric_name, key in input_keys.items()}
+        partials = {metric_name: future.result() for metric_name, future in futures.items()}
 
+    # Normalize partial fact tables (in input_keys order, so fact_ids stay stable)
+    for metric_name, df in partials.items():
         if "value" not in df.columns:
             df["value"] = pd.NA
 
@@ -43,7 +65,7 @@ def lambda_handler(event, context):
 
     # Concatenate all dataframes
     fact_metrics = pd.concat(frames, ignore_index=True)
-    fact_metrics.dropna(subset=["date_id", "product_id", "country_id", "metric_type"], inplace=True)
+    fact_metrics = dropna_rows(fact_metrics, "final_union", subset=["date_id", "product_id", "country_id", "metric_type"])
 
     # Add fact_id
     fact_metrics.reset_index(drop=True, inplace=True)
@@ -53,9 +75,9 @@ def lambda_handler(event, context):
     # Export to CSV and upload to S3
     csv_buffer = BytesIO()
     fact_metrics.to_csv(csv_buffer, index=False)
-    s3_client.put_object(Bucket=s3_bucket, Key=output_key, Body=csv_buffer.getvalue())
+    put_table_with_stats(s3_client, s3_bucket, output_key, fact_metrics, csv_buffer.getvalue(), keys=['fact_id'])
 
-    return {
+    return memo.save({
         'statusCode': 200,
         'body': 'Final unified fact_metrics table generated successfully!'
-    }
+    })
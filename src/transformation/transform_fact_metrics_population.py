@@ -1,25 +1,39 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO
-import zipfile
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+from src.helpers.run_ledger import dropna_rows
 
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
-    AWS Lambda function to generate fact_metrics (population) from World Bank CSV ZIP stored in S3 (raw zone),
-    and save the transformed CSV to S3 (transformed zone).
+    AWS Lambda function to generate fact_metrics (population) from the World Bank population store in S3 (raw zone,
+    kept up to date by fetch_wb_population), and save the transformed CSV to S3 (transformed zone).
+    Years are taken from the store, so no year range or source file name is hardcoded.
+    - {"mode": "parallel"} resolves and joins country partitions on all cores ("workers", "executor");
+      the output is identical to a single run.
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    from src.helpers.country_index import CountryIndex
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.population_store import read_population_store
+    from src.helpers.table_stats import put_table_with_stats
+    from src.helpers.sharding import merge_unmatched_reports
+    from src.helpers.parallel_transform import available_cores, partition_by_key, run_partitions, concat_in_order
+
     # Environment config
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
 
     # File keys
-    zip_key = f"{raw_prefix}WB/wb_population.zip"
-    internal_csv = "API_SP.POP.TOTL_DS2_en_csv_v2_127006.csv"
+    store_key = f"{raw_prefix}WB/wb_population.parquet"
     dim_country_key = f"{transformed_prefix}dim_country.csv"
+    country_aliases_key = f"{transformed_prefix}country_aliases.csv"
     dim_date_key = f"{transformed_prefix}dim_date.csv"
     output_key = f"{transformed_prefix}fact_metrics_population.csv"
 
@@ -27,39 +41,71 @@ def lambda_handler(event, context):
     METRIC_TYPE = "population"
     TECHNICAL_PRODUCT_ID = 0
 
+    # Execution mode
+    event = event or {}
+    mode = event.get('mode', 'single')
+
     # Init S3 client
-    s3_client = boto3.client('s3')
-
-    # Load zip and extract CSV
-    zip_obj = s3_client.get_object(Bucket=s3_bucket, Key=zip_key)
-    with zipfile.ZipFile(BytesIO(zip_obj['Body'].read()), 'r') as z:
-        with z.open(internal_csv) as f:
-            df_raw = pd.read_csv(f, skiprows=4)
-
-    # Filter columns
-    df_filtered = df_raw[['Country Name'] + [str(y) for y in range(1960, 2025)]].copy()
-    df_filtered.rename(columns={'Country Name': 'country_name'}, inplace=True)
-
-    # Melt to long format
-    df_melted = df_filtered.melt(id_vars='country_name', var_name='year', value_name='value')
-    df_melted['year'] = df_melted['year'].astype(int)
-    df_melted['product_id'] = TECHNICAL_PRODUCT_ID
-    df_melted['metric_type'] = METRIC_TYPE
-
-    # Load dimension tables
-    dim_country_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_country_key)
-    dim_date_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_date_key)
-    dim_country = pd.read_csv(BytesIO(dim_country_obj['Body'].read()))
-    dim_date = pd.read_csv(BytesIO(dim_date_obj['Body'].read()))
+    s3_client = get_s3_client()
+
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[store_key, dim_country_key, country_aliases_key, dim_date_key],
+        outputs=[output_key],
+        config={'metric_type': METRIC_TYPE, 'product_id': TECHNICAL_PRODUCT_ID},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
+
+    # Fetch the population store (long format: country_code, country_name, year, value) and dimensions concurrently
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        raw_future = prefetch.submit(read_population_store, s3_client, s3_bucket, store_key)
+        dim_country_future = prefetch.csv(dim_country_key)
+        country_aliases_future = prefetch.csv(country_aliases_key)
+        dim_date_future = prefetch.csv(dim_date_key)
+        df_raw = raw_future.result()
+        dim_country = dim_country_future.result()
+        country_aliases = country_aliases_future.result()
+        dim_date = dim_date_future.result()
     dim_date_filtered = dim_date[dim_date['month'] == 1][['date_id', 'year']]
 
-    # Join with dimensions
-    df = df_melted.merge(dim_country[['country_id', 'country_name']], on='country_name', how='left')
-    df = df.merge(dim_date_filtered, on='year', how='left')
+    def build_facts(df_rows):
+        # Resolve countries by ISO3 code, falling back to the alias table for codes missing in dim_country
+        df_rows = df_rows.copy()
+        country_index = CountryIndex(dim_country, country_aliases)
+        df_rows['country_id'] = country_index.resolve_iso3(df_rows['country_code'], source=METRIC_TYPE)
+        unresolved = df_rows['country_id'].isna()
+        if unresolved.any():
+            df_rows.loc[unresolved, 'country_id'] = country_index.resolve_names(
+                df_rows.loc[unresolved, 'country_name'], source=f'{METRIC_TYPE}_names'
+            )
+
+        # Store rows are already long (one non-null value per country and year, ordered by year)
+        df_melted = df_rows[['country_id', 'year', 'value', '_row']].copy()
+        df_melted['product_id'] = TECHNICAL_PRODUCT_ID
+        df_melted['metric_type'] = METRIC_TYPE
+
+        # Join with dimensions
+        df = df_melted.merge(dim_date_filtered, on='year', how='left')
+
+        fact_rows = df[['date_id', 'product_id', 'country_id', 'metric_type', 'value', '_row']]
+        fact_rows = dropna_rows(fact_rows, 'population_facts', subset=['value', 'date_id', 'country_id'])
+        return fact_rows, country_index.report()
+
+    # Store row positions restore the store order after a partitioned run
+    df_raw['_row'] = range(len(df_raw))
+    if mode == 'parallel':
+        workers = int(event.get('workers') or available_cores())
+        partitions = partition_by_key(df_raw['country_code'], workers)
+        results = run_partitions(build_facts, df_raw, partitions, workers=workers, executor=event.get('executor', 'process'))
+    else:
+        results = [build_facts(df_raw)]
+    unmatched = merge_unmatched_reports(report for _, report in results)
 
     # Final table
-    fact_metrics = df[['date_id', 'product_id', 'country_id', 'metric_type', 'value']].copy()
-    fact_metrics.dropna(subset=['value', 'date_id', 'country_id'], inplace=True)
+    fact_metrics = concat_in_order([df_part for df_part, _ in results], ['_row'])
 
     # Add fact_id
     fact_metrics.reset_index(drop=True, inplace=True)
@@ -70,9 +116,12 @@ def lambda_handler(event, context):
     # Export to CSV and upload to S3
     csv_buffer = BytesIO()
     fact_metrics.to_csv(csv_buffer, index=False)
-    s3_client.put_object(Bucket=s3_bucket, Key=output_key, Body=csv_buffer.getvalue())
+    put_table_with_stats(s3_client, s3_bucket, output_key, fact_metrics, csv_buffer.getvalue(), keys=['fact_id'])
+
+    print(f"Unmatched countries: {unmatched}")
 
-    return {
+    return memo.save({
         'statusCode': 200,
-        'body': 'Transformation of fact_metrics_population completed successfully!'
-    }
+        'body': 'Transformation of fact_metrics_population completed successfully!',
+        'unmatched_countries': unmatched
+    })
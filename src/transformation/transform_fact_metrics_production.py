@@ -1,87 +1,126 @@
-import boto3
-import pandas as pd
 import os
-from io import BytesIO
-import zipfile
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+from src.helpers.run_ledger import dropna_rows
 
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate fact_metrics data for production from FAOSTAT ZIP file stored in S3 (raw zone),
     and save the transformed CSV to S3 (transformed zone).
+    - Items are taken from the central product catalog (resources zone).
+    - {"mode": "product_batches"} processes catalog products in parallel batches ("batch_size", "max_workers")
+      and also writes one partition per product.
+    - {"mode": "parallel"} reshapes and joins country partitions on all cores ("workers", "executor");
+      the output is identical to a single run.
+    - A single run switches to chunked execution when the estimated working set does not fit in memory:
+      the slim artifact is streamed batch by batch (same output).
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    from src.helpers.country_index import CountryIndex
+    from src.helpers.fao_fact_modes import FaoFactRun
+    from src.helpers.slim_cache import SlimSpec
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.reshape import ORDER_COLUMNS, stack_years
+    from src.helpers.product_catalog import ProductCatalog, FAO_FOOD_BALANCE
+
     # Environment config
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    slim_prefix = os.environ.get('S3_PREFIX_SLIM', 'slim/')
+    resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
 
     # File keys
     source_zip_key = f"{raw_prefix}FAO/FoodBalance/faostat_consumption.zip"
     dim_country_key = f"{transformed_prefix}dim_country.csv"
     dim_product_key = f"{transformed_prefix}dim_product.csv"
     dim_date_key = f"{transformed_prefix}dim_date.csv"
+    product_catalog_key = f"{resources_prefix}product_catalog.csv"
     output_fact_metrics_key = f"{transformed_prefix}fact_metrics_production.csv"
+    partition_prefix = f"{transformed_prefix}partitions/fact_metrics_production/"
     csv_filename = "FoodBalanceSheets_E_All_Data.csv"
 
-    # Product and metric config
+    # Metric config (products come from the catalog)
     METRIC_TYPE = 'production'
-    PRODUCTS_MAPPING = {
-        'Wheat and products': 'Wheat',
-        'Rice and products': 'Rice',
-        'Maize and products': 'Maize',
-        'Potatoes and products': 'Potatoes',
-        'Sweet potatoes': 'Potatoes',
-        'Soyabeans': 'Soya'
-    }
-
-    # Read and extract zip
-    s3_client = boto3.client('s3')
-    zip_obj = s3_client.get_object(Bucket=s3_bucket, Key=source_zip_key)
-    zip_bytes = BytesIO(zip_obj['Body'].read())
-    with zipfile.ZipFile(zip_bytes, 'r') as zip_file:
-        with zip_file.open(csv_filename) as f:
-            df_raw = pd.read_csv(f, encoding='utf-8')
-
-    # Filter relevant data
-    df_filtered = df_raw[(df_raw['Element Code'] == 5510) & (df_raw['Element'] == 'Production')].copy()
-    df_filtered = df_filtered[df_filtered['Item'].isin(PRODUCTS_MAPPING.keys())].copy()
-    df_filtered['product_name'] = df_filtered['Item'].map(PRODUCTS_MAPPING)
-
-    # Melt year columns
-    year_cols = [col for col in df_filtered.columns if col.startswith('Y') and not col.endswith(('F', 'N'))]
-    df_melted = df_filtered.melt(id_vars=['Area', 'product_name'], value_vars=year_cols,
-                                 var_name='year_str', value_name='value')
-
-    # Parse year
-    df_melted['year'] = df_melted['year_str'].str.extract(r'Y(\d{4})').astype(int)
-    df_melted['metric_type'] = METRIC_TYPE
-    df_melted.rename(columns={'Area': 'country_name'}, inplace=True)
-
-    # Load dimensions
-    dim_country = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=dim_country_key)['Body'].read()))
-    dim_product = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=dim_product_key)['Body'].read()))
-    dim_date = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=dim_date_key)['Body'].read()))
+    event = event or {}
+    mode = event.get('mode', 'single')
+
+    s3_client = get_s3_client()
+
+    # Skip the run when inputs (including the catalog), code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[source_zip_key, product_catalog_key, dim_country_key, dim_product_key, dim_date_key],
+        outputs=[output_fact_metrics_key],
+        config={'metric_type': METRIC_TYPE, 'mode': mode},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
+
+    # Fetch the catalog and dimensions concurrently, then the slim artifact (rebuilt only when the raw file changes)
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        catalog_future = prefetch.bytes(product_catalog_key)
+        dim_country_future = prefetch.csv(dim_country_key)
+        dim_product_future = prefetch.csv(dim_product_key)
+        dim_date_future = prefetch.csv(dim_date_key)
+
+        catalog = ProductCatalog.from_csv_bytes(catalog_future.result())
+        PRODUCTS_MAPPING = catalog.code_mapping(FAO_FOOD_BALANCE)
+        SLIM_SPEC = SlimSpec(
+            name='fao_food_balance_production',
+            member=csv_filename,
+            columns=('Area Code (M49)', 'Item Code', 'Element Code', 'Element'),
+            year_pattern=r'Y\d{4}',
+            filters={'Element Code': [5510], 'Item Code': catalog.item_codes(FAO_FOOD_BALANCE)},
+            categories=('Area Code (M49)', 'Element'),
+            read_csv_kwargs={'encoding': 'utf-8'}
+        )
+
+        def select_rows(df_raw):
+            # Filter relevant data
+            df_filtered = df_raw[(df_raw['Element Code'] == 5510) & (df_raw['Element'] == 'Production')]
+            df_filtered = df_filtered[df_filtered['Item Code'].isin(PRODUCTS_MAPPING.keys())].copy()
+            df_filtered['product_name'] = df_filtered['Item Code'].map(PRODUCTS_MAPPING)
+            return df_filtered
+
+        # Single runs go chunked when the estimated working set does not fit in memory
+        run = FaoFactRun(s3_client, s3_bucket, 'fact_metrics_production', source_zip_key, SLIM_SPEC, slim_prefix,
+                         select_rows, mode)
+        run.load_rows()
+
+        # Load dimensions
+        dim_country = dim_country_future.result()
+        dim_product = dim_product_future.result()
+        dim_date = dim_date_future.result()
     dim_date = dim_date[dim_date['month'] == 1][['date_id', 'year']]
 
-    # Join dimensions
-    df = df_melted.merge(dim_country[['country_id', 'country_name']], on='country_name', how='left')
-    df = df.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
-    df = df.merge(dim_date, on='year', how='left')
+    def build_facts(df_rows, order_keys=False):
+        # Stack non-null year values (Y2000 -> 2000; flag columns like Y2000F are skipped)
+        df_melted = stack_years(df_rows, ['country_id', 'product_name'], order_keys=order_keys)
+        df_melted['metric_type'] = METRIC_TYPE
+
+        # Join dimensions
+        df = df_melted.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
+        df = df.merge(dim_date, on='year', how='left')
+
+        fact_rows = df[['date_id', 'product_id', 'country_id', 'metric_type', 'value'] + (ORDER_COLUMNS if order_keys else [])]
+        return dropna_rows(fact_rows, 'production_facts', subset=['value', 'date_id', 'product_id', 'country_id'])
 
-    # Final table
-    fact_metrics = df[['date_id', 'product_id', 'country_id', 'metric_type', 'value']].copy()
-    fact_metrics.dropna(subset=['value', 'date_id', 'product_id', 'country_id'], inplace=True)
-    fact_metrics.reset_index(drop=True, inplace=True)
-    fact_metrics['fact_id'] = fact_metrics.index + 1
-    fact_metrics = fact_metrics[['fact_id'] + [col for col in fact_metrics.columns if col != 'fact_id']]
+    # Countries are resolved by M49 code (before melting, once per source row); the mode decides how facts are built
+    country_index = CountryIndex(dim_country)
+    run.write(event, build_facts, country_index, METRIC_TYPE, output_fact_metrics_key, partition_prefix,
+              dim_product, catalog)
 
-    # Save to S3
-    csv_buffer = BytesIO()
-    fact_metrics.to_csv(csv_buffer, index=False)
-    s3_client.put_object(Bucket=s3_bucket, Key=output_fact_metrics_key, Body=csv_buffer.getvalue())
+    print(f"Unmatched countries: {country_index.report()}")
 
-    return {
+    return memo.save({
         'statusCode': 200,
-        'body': 'Transformation of fact_metrics_production completed successfully!'
-    }
+        'body': 'Transformation of fact_metrics_production completed successfully!',
+        'unmatched_countries': country_index.report()
+    })
@@ -1,88 +1,304 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+from src.helpers.run_ledger import dropna_rows
 
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate fact_metrics (trade) from FAOSTAT CSV stored in S3 (raw zone),
     and save the transformed CSV to S3 (transformed zone).
+    Execution modes (event "mode"):
+    - "single" (default): transform the whole trade matrix in this invocation.
+    - "coordinate": split the rows into "shard_count" shards by Area Code, run one "shard" invocation per shard
+      (local process pool, or the TRADE_WORKER_FUNCTION Lambda) and "reduce" the shard outputs.
+    - "shard" / "reduce": worker and reducer steps; the reducer assigns global fact_ids,
+      so the output is byte-identical to a single run.
+    - "product_batches": process catalog products in parallel batches ("batch_size", "max_workers")
+      and also write one partition per product.
+    - "parallel": transform country partitions on all cores of this invocation ("workers", "executor")
+      and reduce them like the shards (same output as a single run).
+    - A "single" run switches to chunked execution when the estimated working set does not fit in memory:
+      the slim artifact is streamed batch by batch and reduced like the shards (same output).
+    Items are taken from the central product catalog (resources zone).
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.memory_guard import CHUNKED
+    from src.helpers.slim_cache import (
+        SlimSpec, ensure_slim_file, iter_slim_batches, read_slim_file, read_slim_frame, slim_execution_mode
+    )
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.country_index import CountryIndex, parse_m49_codes
+    from src.helpers.sharding import assign_shards, shard_key, fan_out, merge_unmatched_reports
+    from src.helpers.parallel_transform import available_cores, partition_by_key, run_partitions
+    from src.helpers.product_catalog import ProductCatalog, FAO_TRADE
+    from src.helpers.product_batches import (
+        DEFAULT_BATCH_SIZE, DEFAULT_MAX_WORKERS, FACT_COLUMNS, write_product_partitions, combine_partitions
+    )
+
     # Environment config
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    slim_prefix = os.environ.get('S3_PREFIX_SLIM', 'slim/')
+    resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
 
     # File keys
     source_csv_key = f"{raw_prefix}FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv"
     dim_country_key = f"{transformed_prefix}dim_country.csv"
     dim_product_key = f"{transformed_prefix}dim_product.csv"
     dim_date_key = f"{transformed_prefix}dim_date.csv"
+    product_catalog_key = f"{resources_prefix}product_catalog.csv"
     output_key = f"{transformed_prefix}fact_metrics_trade.csv"
+    shard_prefix = f"{transformed_prefix}shards/fact_metrics_trade/"
+    partition_prefix = f"{transformed_prefix}partitions/fact_metrics_trade/"
 
-    # Constants
+    # Constants (products come from the catalog)
     METRIC_TYPE_MAP = {5610: 'import', 5910: 'export'}
-    PRODUCTS_MAPPING = {
-        'Wheat': 'Wheat',
-        'Maize (corn)': 'Maize',
-        'Green corn (maize)': 'Maize',
-        'Rice': 'Rice',
-        'Soya beans': 'Soya',
-        'Potatoes': 'Potatoes'
-    }
+
+    def trade_slim_spec(catalog):
+        return SlimSpec(
+            name='fao_trade',
+            columns=('Area Code (M49)', 'Item Code', 'Element Code'),
+            year_pattern=r'Y\d{4}',
+            filters={'Element Code': sorted(METRIC_TYPE_MAP.keys()), 'Item Code': catalog.item_codes(FAO_TRADE)},
+            categories=('Area Code (M49)',)
+        )
+
+    # Execution mode
+    event = event or {}
+    mode = event.get('mode', 'single')
+    shard_count = int(event.get('shard_count', 1))
 
     # Init S3 client
-    s3_client = boto3.client('s3')
-
-    # Load source data
-    source_obj = s3_client.get_object(Bucket=s3_bucket, Key=source_csv_key)
-    df_raw = pd.read_csv(BytesIO(source_obj['Body'].read()))
-
-    # Filter rows
-    df_filtered = df_raw[df_raw['Element Code'].isin(METRIC_TYPE_MAP.keys())]
-    df_filtered = df_filtered[df_filtered['Item'].isin(PRODUCTS_MAPPING.keys())].copy()
-    df_filtered['product_name'] = df_filtered['Item'].map(PRODUCTS_MAPPING)
-    df_filtered['metric_type'] = df_filtered['Element Code'].map(METRIC_TYPE_MAP)
-
-    # Melt year columns
-    year_cols = [col for col in df_filtered.columns if col.startswith('Y')]
-    df_melted = df_filtered.melt(id_vars=['Area', 'product_name', 'metric_type'],
-                                 value_vars=year_cols,
-                                 var_name='year_str', value_name='value')
-    df_melted['year'] = df_melted['year_str'].str.extract(r'Y(\d{4})').astype(int)
-    df_melted.rename(columns={'Area': 'country_name'}, inplace=True)
-
-    # Load dimensions
-    dim_country_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_country_key)
-    dim_product_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_product_key)
-    dim_date_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_date_key)
-    dim_country = pd.read_csv(BytesIO(dim_country_obj['Body'].read()))
-    dim_product = pd.read_csv(BytesIO(dim_product_obj['Body'].read()))
-    dim_date = pd.read_csv(BytesIO(dim_date_obj['Body'].read()))
+    s3_client = get_s3_client()
+
+    # Reducer: merge shard outputs and assign global fact_ids
+    if mode == 'reduce':
+        keys = [shard_key(shard_prefix, i, shard_count) for i in range(shard_count)]
+        with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+            futures = [prefetch.bytes(key) for key in keys]
+            frames = [pd.read_parquet(BytesIO(future.result())) for future in futures]
+        _write_csv(s3_client, s3_bucket, output_key, finalize_trade_facts(frames))
+        s3_client.delete_objects(Bucket=s3_bucket, Delete={'Objects': [{'Key': key} for key in keys]})
+        return {
+            'statusCode': 200,
+            'body': f'Reduced {shard_count} fact_metrics_trade shards.'
+        }
+
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = None
+    if mode in ('single', 'coordinate', 'product_batches', 'parallel'):
+        memo = TransformMemo(
+            s3_client, s3_bucket,
+            inputs=[source_csv_key, product_catalog_key, dim_country_key, dim_product_key, dim_date_key],
+            outputs=[output_key],
+            config={'metric_types': METRIC_TYPE_MAP, 'output_order': 'product' if mode == 'product_batches' else 'source'},
+            handler_file=__file__
+        )
+        if memo.is_fresh(event):
+            return memo.cached_response()
+
+    # Coordinator: build the slim source once, fan out one worker per shard (reading only the slim file), then reduce
+    if mode == 'coordinate':
+        catalog = ProductCatalog.from_csv_bytes(s3_client.get_object(Bucket=s3_bucket, Key=product_catalog_key)['Body'].read())
+        slim_key = ensure_slim_file(s3_client, s3_bucket, source_csv_key, trade_slim_spec(catalog), slim_prefix)
+        worker_function = os.environ.get('TRADE_WORKER_FUNCTION')
+        executor = event.get('executor', 'lambda' if worker_function else 'process')
+        shard_events = [{'mode': 'shard', 'shard_index': i, 'shard_count': shard_count, 'slim_key': slim_key}
+                        for i in range(shard_count)]
+        shard_responses = fan_out(__name__, shard_events, executor=executor, function_name=worker_function)
+        lambda_handler({'mode': 'reduce', 'shard_count': shard_count}, context)
+
+        unmatched = merge_unmatched_reports(response['unmatched_countries'] for response in shard_responses)
+        print(f"Unmatched countries: {unmatched}")
+        return memo.save({
+            'statusCode': 200,
+            'body': f'Transformation of fact_metrics_trade completed successfully ({shard_count} shards)!',
+            'unmatched_countries': unmatched
+        })
+
+    # Fetch the catalog and dimensions concurrently, then source data (slim artifact, rebuilt only when the raw file changes)
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        catalog_future = prefetch.bytes(product_catalog_key)
+        dim_country_future = prefetch.csv(dim_country_key)
+        dim_product_future = prefetch.csv(dim_product_key)
+        dim_date_future = prefetch.csv(dim_date_key)
+
+        catalog = ProductCatalog.from_csv_bytes(catalog_future.result())
+        PRODUCTS_MAPPING = catalog.code_mapping(FAO_TRADE)
+
+        def select_rows(df_raw, first_row=0):
+            # Filter rows (row positions are the global order keys shared by all shards)
+            df_filtered = df_raw[df_raw['Element Code'].isin(METRIC_TYPE_MAP.keys())]
+            df_filtered = df_filtered[df_filtered['Item Code'].isin(PRODUCTS_MAPPING.keys())].copy()
+            df_filtered['product_name'] = df_filtered['Item Code'].map(PRODUCTS_MAPPING)
+            df_filtered['metric_type'] = df_filtered['Element Code'].map(METRIC_TYPE_MAP)
+            df_filtered['_row'] = range(first_row, first_row + len(df_filtered))
+            return df_filtered
+
+        # Single runs go chunked when the estimated working set does not fit in memory
+        execution_mode = None
+        if mode == 'single':
+            execution_mode, reason = slim_execution_mode(s3_client, s3_bucket, source_csv_key, trade_slim_spec(catalog))
+            print(f"fact_metrics_trade: {execution_mode} execution ({reason})")
+        if mode == 'shard' and event.get('slim_key'):
+            # Shard of a coordinated run: the coordinator already built the slim file
+            df_filtered = select_rows(read_slim_file(s3_client, s3_bucket, event['slim_key']))
+        elif execution_mode != CHUNKED:
+            df_filtered = select_rows(read_slim_frame(s3_client, s3_bucket, source_csv_key, trade_slim_spec(catalog), slim_prefix))
+
+        # Load dimensions
+        dim_country = dim_country_future.result()
+        dim_product = dim_product_future.result()
+        dim_date = dim_date_future.result()
+
+    # Worker: transform only the rows of this shard and store them for the reducer
+    if mode == 'shard':
+        shard_index = int(event['shard_index'])
+        in_shard = assign_shards(parse_m49_codes(df_filtered['Area Code (M49)']), shard_count) == shard_index
+        df_shard, unmatched = transform_trade_rows(df_filtered[in_shard], dim_country, dim_product, dim_date)
+
+        buffer = BytesIO()
+        df_shard.to_parquet(buffer, index=False)
+        s3_client.put_object(Bucket=s3_bucket, Key=shard_key(shard_prefix, shard_index, shard_count), Body=buffer.getvalue())
+        return {
+            'statusCode': 200,
+            'body': f'fact_metrics_trade shard {shard_index + 1}/{shard_count} completed.',
+            'rows': len(df_shard),
+            'unmatched_countries': unmatched
+        }
+
+    # Product batches: per-product partitions, combined into the usual table (rows grouped by product)
+    if mode == 'product_batches':
+        def build_facts(df_rows):
+            fact_rows, _ = transform_trade_rows(df_rows, dim_country, dim_product, dim_date)
+            fact_rows = fact_rows.sort_values(['_year_pos', '_row'], kind='stable')[FACT_COLUMNS]
+            return dropna_rows(fact_rows, 'trade_facts', subset=['value', 'date_id', 'product_id', 'country_id'])
+
+        partitions = write_product_partitions(
+            s3_client, s3_bucket, partition_prefix, df_filtered, build_facts, dim_product, catalog,
+            batch_size=int(event.get('batch_size', DEFAULT_BATCH_SIZE)),
+            max_workers=int(event.get('max_workers', DEFAULT_MAX_WORKERS))
+        )
+        s3_client.put_object(Bucket=s3_bucket, Key=output_key, Body=combine_partitions(partitions))
+
+        # Country matching is reported once for all rows (batches share the same countries)
+        country_index = CountryIndex(dim_country)
+        country_index.resolve_m49(df_filtered['Area Code (M49)'], source='trade')
+        print(f"Unmatched countries: {country_index.report()}")
+        return memo.save({
+            'statusCode': 200,
+            'body': f'Transformation of fact_metrics_trade completed successfully ({len(partitions)} product partitions)!',
+            'unmatched_countries': country_index.report()
+        })
+
+    # Parallel: country partitions on all cores, reduced like shards
+    if mode == 'parallel':
+        workers = int(event.get('workers') or available_cores())
+        partitions = partition_by_key(df_filtered['Area Code (M49)'], workers)
+        results = run_partitions(lambda df_rows: transform_trade_rows(df_rows, dim_country, dim_product, dim_date),
+                                 df_filtered, partitions, workers=workers, executor=event.get('executor', 'process'))
+        _write_csv(s3_client, s3_bucket, output_key, finalize_trade_facts([df_part for df_part, _ in results]))
+
+        unmatched = merge_unmatched_reports(report for _, report in results)
+        print(f"Unmatched countries: {unmatched}")
+        return memo.save({
+            'statusCode': 200,
+            'body': f'Transformation of fact_metrics_trade completed successfully ({len(partitions)} partitions)!',
+            'unmatched_countries': unmatched
+        })
+
+    # Chunked: slim rows batch by batch (one country index, so unmatched keys are counted once), reduced like shards
+    if execution_mode == CHUNKED:
+        slim_key = ensure_slim_file(s3_client, s3_bucket, source_csv_key, trade_slim_spec(catalog), slim_prefix)
+        country_index = CountryIndex(dim_country)
+        frames, first_row = [], 0
+        for df_batch in iter_slim_batches(s3_client, s3_bucket, slim_key):
+            df_rows = select_rows(df_batch, first_row)
+            first_row += len(df_rows)
+            frames.append(transform_trade_rows(df_rows, dim_country, dim_product, dim_date, country_index)[0])
+        _write_csv(s3_client, s3_bucket, output_key, finalize_trade_facts(frames))
+
+        print(f"Unmatched countries: {country_index.report()}")
+        return memo.save({
+            'statusCode': 200,
+            'body': 'Transformation of fact_metrics_trade completed successfully!',
+            'unmatched_countries': country_index.report()
+        })
+
+    # Single invocation: the whole matrix is one shard
+    df_trade, unmatched = transform_trade_rows(df_filtered, dim_country, dim_product, dim_date)
+    _write_csv(s3_client, s3_bucket, output_key, finalize_trade_facts([df_trade]))
+
+    print(f"Unmatched countries: {unmatched}")
+
+    return memo.save({
+        'statusCode': 200,
+        'body': 'Transformation of fact_metrics_trade completed successfully!',
+        'unmatched_countries': unmatched
+    })
+
+
+def transform_trade_rows(df_filtered, dim_country, dim_product, dim_date, country_index=None):
+    """
+    Transform filtered trade rows (any subset of them) into fact rows with their global order keys
+    (_year_pos, _row). Returns (fact rows, unmatched country report).
+    - country_index: resolver shared by several calls (its report covers all of them); a new one by default
+    """
+    from src.helpers.country_index import CountryIndex
+    from src.helpers.reshape import parse_year_columns, stack_years
+
     dim_date_filtered = dim_date[dim_date['month'] == 1][['date_id', 'year']]
+    df_filtered = df_filtered.copy()
+
+    # Resolve countries by M49 code (before melting, once per source row)
+    country_index = country_index or CountryIndex(dim_country)
+    df_filtered['country_id'] = country_index.resolve_m49(df_filtered['Area Code (M49)'], source='trade')
+
+    # Stack non-null year values (most trade cells are empty, so they are never materialized)
+    df_melted = stack_years(df_filtered, ['country_id', 'product_name', 'metric_type', '_row'])
+    year_position = {year: pos for pos, year in enumerate(parse_year_columns(df_filtered.columns).values())}
 
     # Join dimensions
-    df_trade = df_melted.merge(dim_country[['country_id', 'country_name']], on='country_name', how='left')
-    df_trade = df_trade.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
+    df_trade = df_melted.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
     df_trade = df_trade.merge(dim_date_filtered, on='year', how='left')
 
-    # Final table
-    fact_metrics = df_trade[['date_id', 'product_id', 'country_id', 'metric_type', 'value']].copy()
-    fact_metrics.dropna(subset=['value', 'date_id', 'product_id', 'country_id'], inplace=True)
+    # Plain column types, so shard outputs concatenate like a single frame
+    df_trade['country_id'] = df_trade['country_id'].astype('Int64')
+    df_trade['metric_type'] = df_trade['metric_type'].astype(str)
+    df_trade['_row'] = df_trade['_row'].astype('int64')
+    df_trade['_year_pos'] = df_trade['year'].map(year_position).astype('int64')
+    return df_trade[['_year_pos', '_row', 'date_id', 'product_id', 'country_id', 'metric_type', 'value']], country_index.report()
+
+
+def finalize_trade_facts(frames):
+    """
+    Merge fact rows of one or more shards into the final table: global (year, source row) order,
+    rows with missing keys dropped, fact_id assigned.
+    """
+    import pandas as pd
+
+    fact_metrics = pd.concat(frames, ignore_index=True)
+    fact_metrics.sort_values(['_year_pos', '_row'], kind='stable', inplace=True)
+    fact_metrics = fact_metrics[['date_id', 'product_id', 'country_id', 'metric_type', 'value']]
+    fact_metrics = dropna_rows(fact_metrics, 'trade_facts', subset=['value', 'date_id', 'product_id', 'country_id'])
 
     # Add fact_id
     fact_metrics.reset_index(drop=True, inplace=True)
     fact_metrics['fact_id'] = fact_metrics.index + 1
-    fact_metrics = fact_metrics[['fact_id'] + [col for col in fact_metrics.columns if col != 'fact_id']]
+    return fact_metrics[['fact_id'] + [col for col in fact_metrics.columns if col != 'fact_id']]
 
-    # Save to S3
-    csv_buffer = BytesIO()
-    fact_metrics.to_csv(csv_buffer, index=False)
-    s3_client.put_object(Bucket=s3_bucket, Key=output_key, Body=csv_buffer.getvalue())
 
-    return {
-        'statusCode': 200,
-        'body': 'Transformation of fact_metrics_trade completed successfully!'
-    }
+def _write_csv(s3_client, s3_bucket, key, df):
+    from src.helpers.table_stats import put_table_with_stats
+
+    csv_buffer = BytesIO()
+    df.to_csv(csv_buffer, index=False)
+    put_table_with_stats(s3_client, s3_bucket, key, df, csv_buffer.getvalue(), keys=['fact_id'])
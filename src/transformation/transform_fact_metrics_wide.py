@@ -0,0 +1,109 @@
+import os
+from io import BytesIO
+
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+from src.helpers.run_ledger import record_rows
+
+# Metric columns of the wide extract, in output order (population is a country-level metric)
+PRODUCT_METRICS = ['production', 'consumption', 'import', 'export']
+WIDE_COLUMNS = [
+    'year', 'country_id', 'country_name', 'continent_name', 'product_id', 'product_name'
+] + PRODUCT_METRICS + ['population']
+
+
+@track_peak_rss
+def lambda_handler(event, context):
+    """
+    AWS Lambda function to build the denormalized wide extract for Tableau from fact_metrics and the dimensions:
+    - one row per country x product x year, with metrics pivoted into columns
+    - population (a country-year metric) is repeated on every product row of that country and year
+    - stored as typed Parquet (categorical names, narrow integer keys) in the transformed zone
+    """
+
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    from src.helpers.s3_prefetch import S3Prefetcher
+
+    # Environment config
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+
+    # File keys
+    fact_metrics_key = f"{transformed_prefix}fact_metrics.csv"
+    dim_product_key = f"{transformed_prefix}dim_product.csv"
+    dim_country_key = f"{transformed_prefix}dim_country.csv"
+    dim_date_key = f"{transformed_prefix}dim_date.csv"
+    output_key = f"{transformed_prefix}fact_metrics_wide.parquet"
+
+    s3_client = get_s3_client()
+
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[fact_metrics_key, dim_product_key, dim_country_key, dim_date_key],
+        outputs=[output_key],
+        config={'columns': WIDE_COLUMNS},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
+
+    # Read fact table and dimensions concurrently
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        futures = [prefetch.csv(key) for key in (fact_metrics_key, dim_product_key, dim_country_key, dim_date_key)]
+        fact_metrics, dim_product, dim_country, dim_date = [future.result() for future in futures]
+
+    wide = build_wide_extract(fact_metrics, dim_product, dim_country, dim_date)
+
+    # Save to Parquet and upload to S3
+    buffer = BytesIO()
+    wide.to_parquet(buffer, index=False)
+    s3_client.put_object(Bucket=s3_bucket, Key=output_key, Body=buffer.getvalue())
+    record_rows('output', len(wide))
+
+    return memo.save({
+        'statusCode': 200,
+        'body': 'Wide fact_metrics extract generated successfully!',
+        'rows': len(wide)
+    })
+
+
+def build_wide_extract(fact_metrics, dim_product, dim_country, dim_date):
+    """
+    Pivot fact_metrics to one row per country x product x year and join the dimension names.
+    Cells without facts stay empty (NaN); facts of the same cell are summed.
+    """
+    facts = fact_metrics.merge(dim_date[['date_id', 'year']], on='date_id', how='inner')
+    is_population = facts['metric_type'] == 'population'
+
+    # Pivot product metrics (min_count keeps "no value" apart from 0)
+    wide = (
+        facts[~is_population]
+        .groupby(['country_id', 'product_id', 'year', 'metric_type'])['value']
+        .sum(min_count=1)
+        .unstack('metric_type')
+        .reindex(columns=PRODUCT_METRICS)
+    )
+    wide.columns.name = None
+
+    # Population is keyed by country and year only
+    population = facts[is_population].groupby(['country_id', 'year'])['value'].sum(min_count=1).rename('population')
+    wide = wide.join(population, on=['country_id', 'year']).reset_index()
+
+    # Dimension names
+    wide = wide.merge(dim_country[['country_id', 'country_name', 'continent_name']], on='country_id', how='left')
+    wide = wide.merge(dim_product[['product_id', 'product_name']], on='product_id', how='left')
+    wide = wide.sort_values(['country_id', 'product_id', 'year'], kind='stable').reset_index(drop=True)
+
+    # Compact types for the extract
+    wide = wide.astype({
+        'year': 'int16',
+        'country_id': 'int32',
+        'product_id': 'int32',
+        'country_name': 'category',
+        'continent_name': 'category',
+        'product_name': 'category'
+    })
+    wide[PRODUCT_METRICS + ['population']] = wide[PRODUCT_METRICS + ['population']].astype('float64')
+    return wide[WIDE_COLUMNS]
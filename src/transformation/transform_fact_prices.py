@@ -1,44 +1,94 @@
-import boto3
-import pandas as pd
 import os
 from io import BytesIO, StringIO
 
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+
+
+@track_peak_rss
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate fact_prices from World Bank source Excel file stored in S3 (raw zone),
     and save the transformed CSV to S3 (transformed zone).
+    - By default only months newer than the persisted state are computed and appended
+      (pass {"full_refresh": true} in the event to recompute everything).
+    - Multi-horizon features (YoY on the same month, rolling means, volatility, drawdown, real prices) are
+      recomputed over the whole history on every run; real prices use the optional deflator resource
+      (price_deflator.csv: year, month, deflator with 100 = base period).
     """
 
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import pandas as pd
+    from src.helpers.slim_cache import SlimSpec, read_slim_frame
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.product_catalog import ProductCatalog, WB_CMO
+    from src.helpers.price_features import (
+        FEATURE_COLUMNS, HORIZON_COLUMNS, compute_price_features, compute_horizon_features, refresh_current_year,
+        history_hash, state_to_json
+    )
+    from src.helpers.table_stats import put_table_with_stats
+
     # Environment config
     s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
     raw_prefix = os.environ.get('S3_PREFIX_RAW', 'raw/')
     transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+    resources_prefix = os.environ.get('S3_PREFIX_RESOURCES', 'resources/')
+    slim_prefix = os.environ.get('S3_PREFIX_SLIM', 'slim/')
 
     # File keys
     source_excel_key = f'{raw_prefix}WB/CMO-Historical-Data-Monthly.xlsx'
+    product_catalog_key = f'{resources_prefix}product_catalog.csv'
     dim_product_key = f'{transformed_prefix}dim_product.csv'
     dim_date_key = f'{transformed_prefix}dim_date.csv'
     output_fact_prices_key = f'{transformed_prefix}fact_prices.csv'
+    state_key = f'{transformed_prefix}fact_prices_state.json'
+    deflator_key = f'{resources_prefix}price_deflator.csv'
     sheet_name = 'Monthly Prices'
 
-    s3_client = boto3.client('s3')
+    s3_client = get_s3_client()
+
+    # Products of interest (CMO column -> product name) come from the central product catalog
+    catalog = ProductCatalog.load(s3_client, s3_bucket, product_catalog_key)
+    PRODUCT_MAPPING = catalog.name_mapping(WB_CMO)
+
+    # The sheet header is on row 5, followed by a units row; the date column has no header
+    SLIM_SPEC = SlimSpec(
+        name='wb_cmo_monthly_prices',
+        columns=tuple(PRODUCT_MAPPING.keys()),
+        sheet_name=sheet_name,
+        header_row=4,
+        skip_after_header=1,
+        first_column_name='year_month'
+    )
+
+    # The deflator is optional: without it real prices are left empty
+    has_deflator = _object_exists(s3_client, s3_bucket, deflator_key)
 
-    # Load Excel file from S3
-    excel_obj = s3_client.get_object(Bucket=s3_bucket, Key=source_excel_key)
-    df_raw = pd.read_excel(BytesIO(excel_obj['Body'].read()), sheet_name=sheet_name, header=4)
+    # Skip the run when inputs, code and config are unchanged since the last run (a full refresh always runs)
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[source_excel_key, product_catalog_key, dim_product_key, dim_date_key] + ([deflator_key] if has_deflator else []),
+        outputs=[output_fact_prices_key, state_key],
+        config={'products': PRODUCT_MAPPING, 'slim_spec': SLIM_SPEC.fingerprint()},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event, force=(event or {}).get('full_refresh', False)):
+        return memo.cached_response(body='fact_prices is up to date, inputs unchanged.', mode='incremental', rows_appended=0)
 
-    # Clean and rename columns
-    df_raw.drop(index=0, inplace=True)
-    df_raw.rename(columns={df_raw.columns[0]: 'year_month'}, inplace=True)
-    df_raw.columns = df_raw.columns.str.strip()
+    # Fetch typed price columns (Excel is converted once per source version, then read from the slim zone)
+    # together with the dimension tables
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        raw_future = prefetch.submit(read_slim_frame, s3_client, s3_bucket, source_excel_key, SLIM_SPEC, slim_prefix)
+        dim_product_future = prefetch.csv(dim_product_key)
+        dim_date_future = prefetch.csv(dim_date_key)
+        deflator_future = prefetch.csv(deflator_key) if has_deflator else None
+        df_raw = raw_future.result()
+        dim_product = dim_product_future.result()
+        dim_date = dim_date_future.result()
+        deflator = deflator_future.result() if has_deflator else None
 
     # Select and rename products
-    PRODUCT_MAPPING = {
-        'Soybeans': 'Soya',
-        'Maize': 'Maize',
-        'Rice, Thai 5%': 'Rice',
-        'Wheat, US HRW': 'Wheat'
-    }
     selected_columns = ['year_month'] + list(PRODUCT_MAPPING.keys())
     df_filtered = df_raw[selected_columns].copy()
     df_filtered.rename(columns=PRODUCT_MAPPING, inplace=True)
@@ -50,41 +100,140 @@ def lambda_handler(event, context):
     df_melted['month'] = df_melted['date'].dt.month
     df_melted.sort_values(by=['product_name', 'date'], inplace=True)
 
-    # Feature engineering
-    df_melted['avg_annual_price'] = df_melted.groupby(['product_name', 'year'])['price_usd_per_ton'].transform('mean')
-    df_melted['price_month_change_pct'] = df_melted.groupby('product_name')['price_usd_per_ton'].pct_change() * 100
-    df_melted['price_annual_change_pct'] = df_melted.groupby('product_name')['avg_annual_price'].pct_change() * 100
+    # Incremental mode: continue from the persisted state unless a full refresh is requested
+    previous = None
+    if not (event or {}).get('full_refresh'):
+        previous = _load_previous_run(s3_client, s3_bucket, state_key, output_fact_prices_key,
+                                      df_melted, dim_product, dim_date)
 
-    # Load dimension tables from S3
-    dim_product_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_product_key)
-    dim_date_obj = s3_client.get_object(Bucket=s3_bucket, Key=dim_date_key)
-    dim_product = pd.read_csv(BytesIO(dim_product_obj['Body'].read()))
-    dim_date = pd.read_csv(BytesIO(dim_date_obj['Body'].read()))
+    if previous is not None:
+        state, existing = previous
+        last_months = pd.DataFrame.from_dict(state['products'], orient='index')[['last_year', 'last_month']]
+        last_months = df_melted[['product_name']].join(last_months, on='product_name')
+        is_new = (df_melted['year'] * 100 + df_melted['month']) > (last_months['last_year'] * 100 + last_months['last_month'])
+        df_new = df_melted[is_new]
+
+        if df_new.empty:
+            return memo.save({
+                'statusCode': 200,
+                'body': 'fact_prices is up to date, no new months to append.',
+                'mode': 'incremental',
+                'rows_appended': 0
+            })
+
+        # Compute features only for the new months and refresh the affected current year
+        df_features, product_state = compute_price_features(df_new, state['products'])
+        existing = refresh_current_year(existing, df_features, state['products'])
+        next_price_id = state['max_price_id'] + 1
+        mode = 'incremental'
+    else:
+        existing = None
+        df_features, product_state = compute_price_features(df_melted)
+        next_price_id = 1
+        mode = 'full'
+
+    # Multi-horizon features over the whole history (one vectorized pass), for new and persisted rows alike
+    horizon = compute_horizon_features(df_melted[['product_name', 'year', 'month', 'price_usd_per_ton']], deflator)
+    horizon = horizon[['product_name', 'year', 'month'] + HORIZON_COLUMNS]
+    df_features = df_features.merge(horizon, on=['product_name', 'year', 'month'], how='left')
+    if existing is not None:
+        existing = existing.drop(columns=HORIZON_COLUMNS, errors='ignore').merge(
+            horizon, on=['product_name', 'year', 'month'], how='left')
 
     # Join dimensions
-    df_melted = df_melted.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
-    df_melted = df_melted.merge(dim_date[['date_id', 'year', 'month']], on=['year', 'month'], how='left')
+    df_features = df_features.merge(dim_product[['product_id', 'product_name']], on='product_name', how='left')
+    df_features = df_features.merge(dim_date[['date_id', 'year', 'month']], on=['year', 'month'], how='left')
+
+    # New rows get price_ids in (month, product) order, so appended months never renumber existing rows
+    df_features.sort_values(by=['year', 'month', 'product_name'], inplace=True)
+    df_features.reset_index(drop=True, inplace=True)
+    df_features['price_id'] = df_features.index + next_price_id
 
     # Final fact table
-    fact_prices = df_melted[['date_id', 'product_id', 'price_usd_per_ton',
-                             'avg_annual_price', 'price_annual_change_pct',
-                             'price_month_change_pct']].copy()
-    fact_prices.reset_index(drop=True, inplace=True)
-    fact_prices['price_id'] = fact_prices.index + 1
-    fact_prices = fact_prices[['price_id'] + [col for col in fact_prices.columns if col != 'price_id']]
-    fact_prices[['avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct']] = \
-        fact_prices[['avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct']].round(2)
-
-    # Save to CSV and upload to S3
+    fact_columns = ['price_id', 'date_id', 'product_id', 'price_usd_per_ton',
+                    'avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct'] + HORIZON_COLUMNS
+    frames = [df_features[fact_columns]] if existing is None else [existing[fact_columns], df_features[fact_columns]]
+    fact_prices = pd.concat(frames, ignore_index=True)
+    fact_prices[['price_id', 'date_id', 'product_id']] = fact_prices[['price_id', 'date_id', 'product_id']].astype('Int64')
+    fact_prices[FEATURE_COLUMNS + HORIZON_COLUMNS] = fact_prices[FEATURE_COLUMNS + HORIZON_COLUMNS].round(2)
+
+    # Persist state for the next incremental run (history hashes detect revised months)
+    for product_name, product_prices in df_melted.groupby('product_name'):
+        product_state[product_name]['history_hash'] = history_hash(product_prices)
+
+    # Save to CSV and upload to S3 (with the statistics sidecar)
     csv_buffer = BytesIO()
     fact_prices.to_csv(csv_buffer, index=False, encoding='utf-8')
+    put_table_with_stats(s3_client, s3_bucket, output_fact_prices_key, fact_prices, csv_buffer.getvalue(), keys=['price_id'])
     s3_client.put_object(
         Bucket=s3_bucket,
-        Key=output_fact_prices_key,
-        Body=csv_buffer.getvalue()
-)
+        Key=state_key,
+        Body=state_to_json(product_state, int(fact_prices['price_id'].max()), len(fact_prices))
+    )
 
-    return {
+    return memo.save({
         'statusCode': 200,
-        'body': 'Transformation of fact_prices completed successfully!'
-    }
+        'body': 'Transformation of fact_prices completed successfully!',
+        'mode': mode,
+        'rows_appended': len(df_features)
+    })
+
+
+def _object_exists(s3_client, s3_bucket, key):
+    from botocore.exceptions import ClientError
+    try:
+        s3_client.head_object(Bucket=s3_bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return False
+        raise
+    return True
+
+
+def _load_previous_run(s3_client, s3_bucket, state_key, fact_prices_key, df_melted, dim_product, dim_date):
+    """
+    Load the persisted state and fact_prices of the previous run.
+    Returns (state, existing rows with product_name/year/month) or None when an incremental run
+    would not match a full recompute (no state, new products, revised history, out-of-order months).
+    """
+    import pandas as pd
+    from botocore.exceptions import ClientError
+    from src.helpers.price_features import history_hash, state_from_json
+
+    try:
+        state = state_from_json(s3_client.get_object(Bucket=s3_bucket, Key=state_key)['Body'].read())
+        existing = pd.read_csv(BytesIO(s3_client.get_object(Bucket=s3_bucket, Key=fact_prices_key)['Body'].read()))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+
+    if len(existing) != state['row_count'] or existing['price_id'].max() != state['max_price_id']:
+        print("Persisted fact_prices does not match its state, running full recompute.")
+        return None
+    if set(df_melted['product_name']) != set(state['products']):
+        print("Product set changed, running full recompute.")
+        return None
+
+    # Every persisted month must be unchanged in the source
+    for product_name, product_state in state['products'].items():
+        product_prices = df_melted[df_melted['product_name'] == product_name]
+        persisted = (product_prices['year'] * 100 + product_prices['month']) <= \
+            product_state['last_year'] * 100 + product_state['last_month']
+        if history_hash(product_prices[persisted]) != product_state['history_hash']:
+            print(f"Price history of {product_name} was revised, running full recompute.")
+            return None
+
+    existing = existing.merge(dim_product[['product_id', 'product_name']], on='product_id', how='left')
+    existing = existing.merge(dim_date[['date_id', 'year', 'month']], on='date_id', how='left')
+
+    # Appended price_ids must continue the (month, product) order of the persisted rows
+    last_persisted = max((p['last_year'], p['last_month'], name) for name, p in state['products'].items())
+    for product_name, product_state in state['products'].items():
+        product_prices = df_melted[df_melted['product_name'] == product_name]
+        new_months = product_prices[(product_prices['year'] * 100 + product_prices['month']) >
+                                    product_state['last_year'] * 100 + product_state['last_month']]
+        if not new_months.empty and (new_months['year'].iloc[0], new_months['month'].iloc[0], product_name) < last_persisted:
+            print(f"New months of {product_name} precede persisted rows, running full recompute.")
+            return None
+    return state, existing
@@ -0,0 +1,64 @@
+import os
+from io import BytesIO
+
+from src.helpers.s3_utils import get_s3_client
+from src.helpers.transform_memo import TransformMemo
+from src.helpers.memory_guard import track_peak_rss
+
+
+@track_peak_rss
+def lambda_handler(event, context):
+    """
+    AWS Lambda function to build the dense metric cube [metric_type, product, country, year] from fact_metrics
+    and the dimension tables, and store it in the transformed zone as values.npy + axes.json
+    (load it with MetricCube.from_s3 / MetricCube.load for memory-mapped queries).
+    """
+
+    # Heavy imports are deferred to the first invocation (cached in sys.modules for warm starts)
+    import numpy as np
+    from src.helpers.s3_prefetch import S3Prefetcher
+    from src.helpers.metric_cube import build_metric_cube, VALUES_FILE, AXES_FILE
+
+    # Environment config
+    s3_bucket = os.environ['S3_BUCKET_PROJECT_1']
+    transformed_prefix = os.environ.get('S3_PREFIX_TRANSFORMED', 'transformed/')
+
+    # File keys
+    fact_metrics_key = f"{transformed_prefix}fact_metrics.csv"
+    dim_product_key = f"{transformed_prefix}dim_product.csv"
+    dim_country_key = f"{transformed_prefix}dim_country.csv"
+    dim_date_key = f"{transformed_prefix}dim_date.csv"
+    cube_prefix = f"{transformed_prefix}metric_cube/"
+
+    s3_client = get_s3_client()
+
+    # Skip the run when inputs, code and config are unchanged since the last run
+    memo = TransformMemo(
+        s3_client, s3_bucket,
+        inputs=[fact_metrics_key, dim_product_key, dim_country_key, dim_date_key],
+        outputs=[f"{cube_prefix}{VALUES_FILE}", f"{cube_prefix}{AXES_FILE}"],
+        config={},
+        handler_file=__file__
+    )
+    if memo.is_fresh(event):
+        return memo.cached_response()
+
+    # Read fact table and dimensions concurrently
+    with S3Prefetcher(s3_client, s3_bucket) as prefetch:
+        futures = [prefetch.csv(key) for key in (fact_metrics_key, dim_product_key, dim_country_key, dim_date_key)]
+        fact_metrics, dim_product, dim_country, dim_date = [future.result() for future in futures]
+
+    cube = build_metric_cube(fact_metrics, dim_product, dim_country, dim_date)
+
+    # Upload the .npy payload and its axes
+    values_buffer = BytesIO()
+    np.save(values_buffer, cube.values)
+    s3_client.put_object(Bucket=s3_bucket, Key=f"{cube_prefix}{VALUES_FILE}", Body=values_buffer.getvalue())
+    s3_client.put_object(Bucket=s3_bucket, Key=f"{cube_prefix}{AXES_FILE}", Body=cube.axes_json().encode('utf-8'))
+
+    return memo.save({
+        'statusCode': 200,
+        'body': 'Metric cube generated successfully!',
+        'shape': list(cube.shape),
+        'filled_cells': int((~np.isnan(cube.values)).sum())
+    })
@@ -0,0 +1,141 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from src.extraction.fetch_wb_population import lambda_handler
+from src.helpers.population_store import read_population_store
+
+BUCKET = "test-bucket"
+STORE_KEY = "raw/WB/wb_population.parquet"
+
+
+def _record(iso3, name, year, value, country_id="XX"):
+    return {"indicator": {"id": "SP.POP.TOTL", "value": "Population, total"},
+            "country": {"id": country_id, "value": name}, "countryiso3code": iso3,
+            "date": str(year), "value": value, "unit": "", "obs_status": "", "decimal": 0}
+
+
+class WorldBankStandIn:
+    """
+    Local stand-in for the paged indicator API: serves self.records filtered by date=<start>:<end>,
+    newest year first like the real API, and records every request.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                stand_in.requests.append((urlparse(self.path).path, query))
+                body = json.dumps(stand_in.page(query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v2"
+
+    def page(self, query):
+        records = sorted(self.records, key=lambda r: -int(r["date"]))
+        if "date" in query:
+            start, end = (int(year) for year in query["date"].split(":"))
+            records = [r for r in records if start <= int(r["date"]) <= end]
+        per_page, page = int(query["per_page"]), int(query["page"])
+        pages = -(-len(records) // per_page)
+        meta = {"page": page, "pages": pages, "per_page": per_page, "total": len(records)}
+        return [meta, records[(page - 1) * per_page:page * per_page] or None]
+
+
+@pytest.fixture
+def stand_in():
+    api = WorldBankStandIn()
+    thread = threading.Thread(target=api.server.serve_forever, daemon=True)
+    thread.start()
+    yield api
+    api.server.shutdown()
+    api.server.server_close()
+
+
+@pytest.fixture
+def s3_setup(stand_in):
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        os.environ["S3_BUCKET_PROJECT_1"] = BUCKET
+        os.environ["S3_PREFIX_RAW"] = "raw/"
+        os.environ["WB_API_URL"] = stand_in.url
+        yield client
+        del os.environ["WB_API_URL"]
+
+
+def test_first_run_fetches_all_pages_into_typed_store(s3_setup, stand_in):
+    stand_in.records = [_record("AFG", "Afghanistan", year, 100 + year - 2000) for year in (2000, 2001)] + [
+        _record("TUR", "Türkiye", 2000, 200), _record("TUR", "Türkiye", 2001, None),
+        _record("", "Africa Eastern and Southern", 2000, 500, country_id="ZH")
+    ]
+
+    result = lambda_handler({"per_page": 2}, None)
+
+    assert result["status"] == "success"
+    assert result["pages"] == 3 and result["watermark"] == 2001
+    assert "date" not in stand_in.requests[0][1]
+    assert sorted(int(query["page"]) for _, query in stand_in.requests) == [1, 2, 3]
+
+    store = read_population_store(s3_setup, BUCKET, STORE_KEY)
+    assert str(store["year"].dtype) == "int16" and str(store["country_code"].dtype) == "category"
+    # Missing values are not stored; aggregates without ISO3 keep their API id
+    assert store[["country_code", "year", "value"]].values.tolist() == [
+        ["AFG", 2000, 100], ["TUR", 2000, 200], ["ZH", 2000, 500], ["AFG", 2001, 101]
+    ]
+    assert s3_setup.head_object(Bucket=BUCKET, Key=STORE_KEY)["Metadata"]["watermark"] == "2001"
+
+
+def test_next_run_fetches_only_trailing_years(s3_setup, stand_in):
+    stand_in.records = [_record("AFG", "Afghanistan", year, 100 + year - 1995) for year in range(1995, 2002)]
+    lambda_handler({}, None)
+
+    stand_in.records.append(_record("AFG", "Afghanistan", 2002, 107))
+    stand_in.requests.clear()
+    result = lambda_handler({}, None)
+
+    current_year = datetime.now(timezone.utc).year
+    assert [query["date"] for _, query in stand_in.requests] == [f"1999:{current_year}"]
+    assert result["fetched_rows"] == 4 and result["previous_watermark"] == 2001 and result["watermark"] == 2002
+
+    store = read_population_store(s3_setup, BUCKET, STORE_KEY)
+    assert store["year"].tolist() == list(range(1995, 2003))
+
+    # Nothing new published: the store is left untouched
+    last_modified = s3_setup.head_object(Bucket=BUCKET, Key=STORE_KEY)["LastModified"]
+    assert lambda_handler({}, None)["status"] == "up_to_date"
+    assert s3_setup.head_object(Bucket=BUCKET, Key=STORE_KEY)["LastModified"] == last_modified
+
+
+def test_late_rows_below_the_watermark_are_fetched_again(s3_setup, stand_in):
+    stand_in.records = [_record("AFG", "Afghanistan", 2001, 101), _record("AFG", "Afghanistan", 2002, 102),
+                        _record("TUR", "Türkiye", 2001, 201)]
+    lambda_handler({}, None)
+
+    # Türkiye publishes 2002 after the watermark already reached 2002
+    stand_in.records.append(_record("TUR", "Türkiye", 2002, 202))
+    result = lambda_handler({}, None)
+
+    assert result["status"] == "success" and result["watermark"] == 2002
+    store = read_population_store(s3_setup, BUCKET, STORE_KEY)
+    assert store[["country_code", "year", "value"]].values.tolist() == [
+        ["AFG", 2001, 101], ["TUR", 2001, 201], ["AFG", 2002, 102], ["TUR", 2002, 202]
+    ]
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from src.helpers.country_index import CountryIndex, build_alias_table, normalize_country_name, parse_m49_codes
+
+
+def make_dim_country():
+    return pd.DataFrame({
+        "country_id": [1, 2, 3],
+        "country_name": ["Türkiye", "Viet Nam", "China, Hong Kong SAR"],
+        "continent_name": ["Asia", "Asia", "Asia"],
+        "m49_code": [792, 704, 344],
+        "iso3_code": ["TUR", "VNM", "HKG"]
+    })
+
+
+def test_normalize_country_name():
+    assert normalize_country_name("Türkiye") == "turkiye"
+    assert normalize_country_name("  Korea, Rep. ") == "korea rep"
+    assert normalize_country_name(None) == ""
+
+
+def test_parse_m49_codes_strips_fao_quote():
+    codes = parse_m49_codes(pd.Series(["'004", "'792", None]))
+    assert codes.tolist()[:2] == [4, 792]
+    assert codes.isna().tolist() == [False, False, True]
+
+
+def test_resolve_m49_reports_unmatched():
+    index = CountryIndex(make_dim_country())
+
+    # '001' (World) is an aggregate area and is not part of dim_country
+    ids = index.resolve_m49(pd.Series(["'792", "'704", "'001", "'001"]), source="production")
+
+    assert ids.tolist()[:2] == [1, 2]
+    assert ids.isna().sum() == 2
+    assert index.report() == {"production": {"rows": 2, "keys": 1}}
+
+
+def test_resolve_iso3_and_alias_names():
+    dim_country = make_dim_country()
+    curated = pd.DataFrame({"alias": ["Hong Kong SAR, China", "Turkey"], "m49_code": ["344", "792"]})
+    index = CountryIndex(dim_country, build_alias_table(dim_country, [curated]))
+
+    assert index.resolve_iso3(pd.Series(["vnm", "HKG", "WLD"])).tolist()[:2] == [2, 3]
+    names = index.resolve_names(pd.Series(["Hong Kong SAR, China", "Turkey", "Turkiye", "Atlantis"]), source="names")
+    assert names.tolist()[:3] == [3, 1, 1]
+    assert index.report()["names"] == {"rows": 1, "keys": 1}
@@ -0,0 +1,54 @@
+import zipfile
+import boto3
+import pandas as pd
+import pytest
+from io import BytesIO
+from moto import mock_aws
+
+from src.helpers.fao_code_lists import fao_area_spec, read_code_list_member, read_fao_areas, merge_code_lists
+
+BUCKET = "test-bucket"
+
+
+def _zip(members):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, content in members.items():
+            z.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_read_code_list_member_reads_only_the_code_list(s3_setup):
+    s3_setup.put_object(Bucket=BUCKET, Key="raw/prod.zip", Body=_zip({
+        "Prod_E_All_Data.csv": "Area Code,Area Code (M49),Area\n40,'152,Chile\n",
+        "Prod_E_AreaCodes.csv": "Area Code,M49 Code,Area\n2,'004,Afghanistan\n".encode("latin-1")
+    }))
+
+    areas = read_code_list_member(s3_setup, BUCKET, "raw/prod.zip")
+    assert areas[["Area Code (M49)", "Area"]].values.tolist() == [["'004", "Afghanistan"]]
+    assert read_code_list_member(s3_setup, BUCKET, "raw/trade.csv") is None
+
+
+def test_read_fao_areas_falls_back_to_distinct_scan(s3_setup):
+    s3_setup.put_object(Bucket=BUCKET, Key="raw/prod.zip", Body=_zip({
+        "Prod_E_All_Data.csv": "Area Code,Area Code (M49),Area,Item\n2,'004,Afghanistan,Wheat\n2,'004,Afghanistan,Rice\n"
+    }))
+
+    areas = read_fao_areas(s3_setup, BUCKET, "raw/prod.zip", fao_area_spec("prod_areas", "Prod_E_All_Data.csv"))
+    assert areas.values.tolist() == [["'004", "Afghanistan"]]
+
+
+def test_merge_code_lists_keeps_first_source():
+    first = pd.DataFrame({"m49_code": [4, 792], "Area": ["Afghanistan", "Türkiye"]})
+    second = pd.DataFrame({"m49_code": [792, 76], "Area": ["Turkey", "Brazil"]})
+
+    merged = merge_code_lists([first, second], key="m49_code")
+    assert merged.values.tolist() == [[4, "Afghanistan"], [792, "Türkiye"], [76, "Brazil"]]
@@ -0,0 +1,30 @@
+import pytest
+
+from src.helpers.import_profiler import discover_handlers, parse_importtime, profile_import
+
+SAMPLE_IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:      1649 |      38527 | site
+import time:       199 |        199 |     src
+import time:       186 |        384 |   src.transformation
+import time:     90000 |     250000 |   pandas
+import time:      3166 |     253550 | src.transformation.transform_x
+"""
+
+
+def test_parse_importtime_counts_only_the_module_subtree():
+    profile = parse_importtime(SAMPLE_IMPORTTIME, "src.transformation.transform_x")
+
+    assert profile["import_ms"] == 253.55
+    assert profile["heavy_imports"] == ["pandas"]
+    assert profile["slowest"][0]["name"] == "src.transformation.transform_x"
+
+
+@pytest.mark.parametrize("module", discover_handlers())
+def test_handler_cold_start_within_budget(module):
+    """
+    Every Lambda handler module must load without heavy imports and within its import budget.
+    """
+    profile = profile_import(module)
+
+    assert profile["heavy_imports"] == [], f"{module} imports {profile['heavy_imports']} at module load"
+    assert profile["within_budget"], f"{module} import took {profile['import_ms']} ms (budget {profile['budget_ms']} ms)"
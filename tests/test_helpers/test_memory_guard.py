@@ -0,0 +1,45 @@
+import pytest
+
+from src.helpers.memory_guard import (
+    CHUNKED, IN_MEMORY, MB, PeakRSSTracker, choose_execution_mode, memory_limit_bytes, track_peak_rss
+)
+
+
+def test_lambda_memory_size_is_the_limit(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "512")
+    assert memory_limit_bytes() == 512 * MB
+
+
+def test_mode_follows_the_memory_budget(monkeypatch):
+    monkeypatch.delenv("EXECUTION_MODE", raising=False)
+
+    assert choose_execution_mode(50 * MB, available_bytes=100 * MB)[0] == IN_MEMORY
+    mode, reason = choose_execution_mode(70 * MB, available_bytes=100 * MB)
+    assert mode == CHUNKED
+    assert "estimated working set 70.0 MB, budget 60.0 MB" in reason
+
+
+def test_mode_can_be_forced(monkeypatch):
+    monkeypatch.setenv("EXECUTION_MODE", CHUNKED)
+    assert choose_execution_mode(1, available_bytes=100 * MB) == (CHUNKED, "forced by EXECUTION_MODE=chunked")
+
+    with pytest.raises(ValueError):
+        choose_execution_mode(1, override="streaming")
+
+
+def test_peak_rss_covers_allocations_inside_the_block():
+    with PeakRSSTracker(interval_s=0.01) as tracker:
+        payload = bytearray(64 * MB)
+        payload[::4096] = b"x" * len(payload[::4096])
+        del payload
+
+    assert tracker.peak_bytes - tracker.start_bytes >= 32 * MB
+
+
+def test_decorated_handler_reports_peak_rss():
+    handler = track_peak_rss(lambda event, context: {"statusCode": 200})
+
+    response = handler({}, None)
+
+    assert response["statusCode"] == 200
+    assert response["peak_rss_mb"] > 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.helpers.metric_cube import MetricCube, build_metric_cube
+
+DIM_PRODUCT = pd.DataFrame({'product_id': [1, 2], 'product_name': ['Wheat', 'Rice']})
+DIM_COUNTRY = pd.DataFrame({
+    'country_id': [1, 2, 3],
+    'country_name': ['Afghanistan', 'Albania', 'Algeria'],
+    'continent_name': ['Asia', 'Europe', 'Africa'],
+    'm49_code': [4, 8, 12],
+    'iso3_code': ['AFG', 'ALB', 'DZA']
+})
+DIM_DATE = pd.DataFrame({'date_id': [1, 13, 25], 'year': [2000, 2001, 2002]})
+FACT_METRICS = pd.DataFrame({
+    'fact_id': range(1, 9),
+    'date_id': [1, 1, 13, 25, 1, 1, 25, 1],
+    'product_id': [1, 1, 1, 2, 2, 1, 1, 0],
+    'country_id': [1, 2, 1, 3, 2, 1, 3, 1],
+    'metric_type': ['production', 'production', 'production', 'production', 'import', 'production', 'import', 'population'],
+    'value': [10.0, 20.0, 30.0, 5.0, 7.0, 2.0, 0.0, 1000.0]
+})
+
+
+@pytest.fixture
+def cube():
+    return build_metric_cube(FACT_METRICS, DIM_PRODUCT, DIM_COUNTRY, DIM_DATE)
+
+
+def test_cube_axes_and_cells(cube):
+    assert cube.shape == (3, 3, 3, 3)
+    assert cube.axes['product'] == [0, 1, 2]
+    assert cube.labels['product'] == ['N/A', 'Wheat', 'Rice']
+    # Facts of the same cell are summed, missing cells stay NaN and zeros stay zeros
+    assert cube.select(metric_type='production', product=1, country=1, year=2000) == 12.0
+    assert np.isnan(cube.select(metric_type='production', product=2, country=1, year=2000))
+    assert cube.select(metric_type='import', product=1, country=3, year=2002) == 0.0
+    assert cube.select(metric_type='production', product=1, country=[2, 1], year=2000).tolist() == [20.0, 12.0]
+
+
+def test_aggregations_match_group_by(cube):
+    facts = FACT_METRICS.merge(DIM_DATE, on='date_id')
+    expected = facts.groupby(['metric_type', 'product_id', 'year'])['value'].sum()
+
+    totals = cube.aggregate('sum', over='country')
+    for (metric_type, product_id, year), value in expected.items():
+        assert totals[cube.index('metric_type', metric_type), cube.index('product', product_id), cube.index('year', year)] == value
+
+    assert cube.aggregate('count', over=('country', 'year'), metric_type='production').tolist() == [0, 3, 1]
+    assert np.isnan(cube.aggregate('mean', over='country', metric_type='import', product=1, year=2000))
+
+
+def test_rollup_and_ranking(cube):
+    rollup = cube.rollup('continent', metric_type='production', product=1, year=2000)
+    assert {label: float(value) for label, value in rollup.items() if not np.isnan(value)} == {'Asia': 12.0, 'Europe': 20.0}
+
+    assert cube.ranking(metric_type='production', product=1, year=2000) == [(2, 20.0), (1, 12.0)]
+    with pytest.raises(ValueError):
+        cube.ranking(metric_type='production', year=2000)
+    with pytest.raises(ValueError):
+        cube.select(product=99)
+
+
+def test_saved_cube_is_memory_mapped(cube, tmp_path):
+    cube.save(str(tmp_path))
+    loaded = MetricCube.load(str(tmp_path))
+
+    assert isinstance(loaded.values, np.memmap)
+    assert loaded.axes == cube.axes and loaded.labels == cube.labels
+    np.testing.assert_array_equal(loaded.values, cube.values)
+    assert loaded.select(metric_type='population', product=0, country=1, year=2000) == 1000.0
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.helpers.parallel_transform import partition_by_key, run_partitions, concat_in_order
+
+
+def test_partition_by_key_keeps_keys_together_and_balances_rows():
+    keys = pd.Series(["POL"] * 6 + ["DEU"] * 3 + ["FRA"] * 3 + ["ITA"] * 2 + [None] * 2).sample(frac=1, random_state=0)
+
+    partitions = partition_by_key(keys, 3)
+
+    assert sorted(np.concatenate(partitions).tolist()) == list(range(len(keys)))
+    values = keys.reset_index(drop=True)
+    for rows in partitions:
+        assert list(rows) == sorted(rows)
+        for other in partitions:
+            if other is not rows:
+                assert not set(values[rows].fillna("<NA>")) & set(values[other].fillna("<NA>"))
+    assert sorted(len(rows) for rows in partitions) == [5, 5, 6]
+
+    # Never more partitions than keys
+    assert len(partition_by_key(pd.Series(["POL", "POL"]), 4)) == 1
+
+
+def _stack(df_rows):
+    # Long rows with their order keys, like the transforms build them
+    long_rows = df_rows.melt(id_vars=["country", "_row"], var_name="year", value_name="value").dropna(subset=["value"])
+    long_rows["_year_pos"] = long_rows["year"].map({"Y2000": 0, "Y2001": 1})
+    return long_rows
+
+
+@pytest.mark.parametrize("executor", ["process", "serial"])
+@pytest.mark.parametrize("workers", [1, 2, 5])
+def test_run_partitions_reproduces_the_single_run_order(executor, workers):
+    df = pd.DataFrame({
+        "country": ["POL", "DEU", "POL", "FRA", "DEU", "ITA", "FRA"],
+        "Y2000": [1.0, 2.0, None, 4.0, 5.0, 6.0, None],
+        "Y2001": [8.0, None, 10.0, 11.0, 12.0, None, 14.0]
+    })
+    df["_row"] = np.arange(len(df))
+    expected = _stack(df).sort_values(["_year_pos", "_row"]).drop(columns=["_year_pos", "_row"]).reset_index(drop=True)
+
+    frames = run_partitions(_stack, df, partition_by_key(df["country"], workers), workers=workers, executor=executor)
+
+    pd.testing.assert_frame_equal(concat_in_order(frames), expected)
+
+
+def _fail(df_rows):
+    raise KeyError("missing dimension")
+
+
+def test_run_partitions_reports_worker_errors():
+    df = pd.DataFrame({"country": ["POL", "DEU"]})
+
+    with pytest.raises(RuntimeError, match="missing dimension"):
+        run_partitions(_fail, df, partition_by_key(df["country"], 2), workers=2)
+    with pytest.raises(ValueError):
+        run_partitions(_fail, df, [np.arange(2)], executor="threads")
@@ -0,0 +1,104 @@
+import struct
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.helpers.pg_copy import PGCOPY_HEADER, BinaryCopyStream, copy_dataframe, encode_binary_copy
+
+COLUMN_TYPES = {"id": "int4", "metric": "text", "value": "numeric(10,2)", "ratio": "float8", "count": "int8"}
+
+
+def _decode_numeric(raw):
+    ndigits, weight, sign, dscale = struct.unpack_from(">hhHh", raw)
+    digits = struct.unpack_from(f">{ndigits}h", raw, 8)
+    value = sum(Decimal(d) * Decimal(10000) ** (weight - i) for i, d in enumerate(digits))
+    return (-value if sign == 0x4000 else value).quantize(Decimal(1).scaleb(-dscale))
+
+
+DECODERS = {
+    "int4": lambda raw: struct.unpack(">i", raw)[0],
+    "int8": lambda raw: struct.unpack(">q", raw)[0],
+    "float8": lambda raw: struct.unpack(">d", raw)[0],
+    "text": lambda raw: raw.decode("utf-8"),
+    "numeric(10,2)": _decode_numeric
+}
+
+
+def _decode(payload, column_types):
+    # Minimal reader of the PostgreSQL binary COPY format
+    assert payload.startswith(PGCOPY_HEADER)
+    position, rows = len(PGCOPY_HEADER), []
+    while True:
+        (n_fields,) = struct.unpack_from(">h", payload, position)
+        position += 2
+        if n_fields == -1:
+            break
+        row = []
+        for pg_type in column_types.values():
+            (length,) = struct.unpack_from(">i", payload, position)
+            position += 4
+            row.append(None if length == -1 else DECODERS[pg_type](payload[position:position + length]))
+            position += max(length, 0)
+        rows.append(row)
+    assert position == len(payload)
+    return rows
+
+
+def test_binary_copy_round_trips_typed_and_null_values():
+    df = pd.DataFrame({
+        "id": [1, 2, 3],
+        "metric": ["import", "", None],
+        "value": [12345.675, -0.5, np.nan],
+        "ratio": [1.5, np.nan, -2.25],
+        "count": pd.array([7, None, -3], dtype="Int64")
+    })
+
+    # Small batches: every batch has its own numeric digit layout
+    payload = b"".join(encode_binary_copy(df, COLUMN_TYPES, batch_rows=2))
+
+    assert _decode(payload, COLUMN_TYPES) == [
+        [1, "import", Decimal("12345.68"), 1.5, 7],
+        [2, "", Decimal("-0.50"), None, None],
+        [3, None, None, -2.25, -3]
+    ]
+
+
+def test_binary_copy_rejects_lossy_values():
+    with pytest.raises(ValueError):
+        list(encode_binary_copy(pd.DataFrame({"id": [1.5]}), {"id": "int4"}))
+    with pytest.raises(ValueError):
+        list(encode_binary_copy(pd.DataFrame({"id": [2 ** 31]}), {"id": "int4"}))
+    # Population-sized values overflow numeric(10,2): the error names the column
+    with pytest.raises(ValueError, match="Column value .* numeric\\(10,2\\)"):
+        list(encode_binary_copy(pd.DataFrame({"value": [1.4e9]}), {"value": "numeric(10,2)"}))
+    assert len(b"".join(encode_binary_copy(pd.DataFrame({"value": [1.4e9]}), {"value": "numeric(14,2)"}))) > 0
+
+
+def test_copy_dataframe_selects_format():
+    df = pd.DataFrame({"id": [1, 2], "metric": ["a", "b"]})
+    cursor = mock.Mock()
+
+    copy_dataframe(cursor, "t", df, {"id": "int4", "metric": "text"}, "binary")
+    sql, stream = cursor.copy_expert.call_args.args
+    assert sql == "COPY t(id, metric) FROM STDIN (FORMAT binary)"
+    assert isinstance(stream, BinaryCopyStream) and stream.read(len(PGCOPY_HEADER)) == PGCOPY_HEADER
+
+    # Small reads (as copy_expert does) cross chunk boundaries and return the payload unchanged
+    chunks = list(encode_binary_copy(pd.DataFrame({"id": range(10)}), {"id": "int4"}, batch_rows=3))
+    stream, parts = BinaryCopyStream(chunks), []
+    while part := stream.read(5):
+        parts.append(part)
+    assert b"".join(parts) == b"".join(chunks) and all(len(part) == 5 for part in parts[:-1])
+    assert BinaryCopyStream(chunks).read() == b"".join(chunks)
+
+    copy_dataframe(cursor, "t", df, {"id": "int4", "metric": "text"}, "csv")
+    sql, buffer = cursor.copy_expert.call_args.args
+    assert sql == "COPY t(id, metric) FROM STDIN WITH CSV"
+    assert isinstance(buffer, StringIO) and buffer.getvalue() == "1,a\n2,b\n"
+
+    with pytest.raises(ValueError):
+        copy_dataframe(cursor, "t", df, {"id": "int4"}, "parquet")
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.helpers.price_features import compute_horizon_features
+
+
+def _prices():
+    rng = np.random.default_rng(0)
+    rows = [(product, year, month, float(rng.uniform(50, 150)))
+            for product in ("Maize", "Wheat") for year in range(2000, 2004) for month in range(1, 13)
+            if (product, year, month) != ("Wheat", 2001, 5)]
+    # Shuffled input: features must not depend on row order
+    return pd.DataFrame(rows, columns=["product_name", "year", "month", "price_usd_per_ton"]).sample(frac=1, random_state=1)
+
+
+def _pandas_reference(df):
+    frames = []
+    for product, group in df.groupby("product_name"):
+        series = group.set_index(pd.PeriodIndex.from_fields(year=group["year"], month=group["month"], freq="M"))["price_usd_per_ton"]
+        series = series.sort_index()
+        series = series.reindex(pd.period_range(series.index.min(), series.index.max(), freq="M"))
+        frames.append(pd.DataFrame({
+            "product_name": product, "year": series.index.year, "month": series.index.month,
+            "price_yoy_change_pct": (series / series.shift(12) - 1) * 100,
+            "price_rolling_mean_6m": series.rolling(6).mean(),
+            "price_volatility_12m": ((series / series.shift(1) - 1) * 100).rolling(12).std(),
+            "price_drawdown_12m_pct": (series / series.rolling(12, min_periods=1).max() - 1) * 100
+        }))
+    return pd.concat(frames)
+
+
+def test_horizon_features_match_per_group_pandas():
+    df = _prices()
+    features = compute_horizon_features(df)
+
+    assert features.index.equals(df.index)
+    merged = features.merge(_pandas_reference(df), on=["product_name", "year", "month"], suffixes=("", "_ref"))
+    assert len(merged) == len(df)
+    for col in ["price_yoy_change_pct", "price_rolling_mean_6m", "price_volatility_12m", "price_drawdown_12m_pct"]:
+        np.testing.assert_allclose(merged[col], merged[f"{col}_ref"], equal_nan=True)
+
+    # The missing month breaks Wheat's windows instead of shifting them
+    wheat_june = features[(features["product_name"] == "Wheat") & (features["year"] == 2001) & (features["month"] == 6)]
+    assert wheat_june["price_rolling_mean_3m"].isna().all()
+
+
+def test_real_prices_and_duplicate_months():
+    df = pd.DataFrame({"product_name": ["Rice", "Rice"], "year": [2020, 2020], "month": [1, 2],
+                       "price_usd_per_ton": [100.0, 300.0]})
+    deflator = pd.DataFrame({"year": [2019, 2020], "month": [12, 2], "deflator": [50.0, 150.0]})
+
+    features = compute_horizon_features(df, deflator)
+    assert features["real_price_usd_per_ton"].tolist()[1] == 200.0
+    assert np.isnan(features["real_price_usd_per_ton"].tolist()[0])
+
+    with pytest.raises(ValueError):
+        compute_horizon_features(pd.concat([df, df]))
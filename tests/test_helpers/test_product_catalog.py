@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from src.helpers.product_catalog import ProductCatalog, FAO_TRADE, WB_CMO
+from src.helpers.product_batches import combine_partitions
+
+CATALOG_CSV = b"""source,item_code,item_name,product_name
+fao_trade,15,Wheat,Wheat
+fao_trade,27,Rice,Rice
+fao_trade,56,Maize (corn),Maize
+fao_trade,446,Maize (green),Maize
+wb_cmo,,"Wheat, US HRW",Wheat
+"""
+
+
+def test_items_map_to_canonical_products_in_catalog_order():
+    catalog = ProductCatalog.from_csv_bytes(CATALOG_CSV)
+
+    assert catalog.products() == ['Wheat', 'Rice', 'Maize']
+    assert catalog.item_codes(FAO_TRADE) == [15, 27, 56, 446]
+    assert catalog.code_mapping(FAO_TRADE)[446] == 'Maize'
+    assert catalog.name_mapping(WB_CMO) == {'Wheat, US HRW': 'Wheat'}
+    assert catalog.batches(2) == [['Wheat', 'Rice'], ['Maize']]
+    assert catalog.batches(2, products={'Maize', 'Wheat'}) == [['Wheat', 'Maize']]
+
+
+def test_invalid_catalogs_are_rejected():
+    with pytest.raises(ValueError):
+        ProductCatalog(pd.DataFrame({'source': ['fao_trade'], 'item_code': [15]}))
+    with pytest.raises(ValueError):
+        ProductCatalog.from_csv_bytes(CATALOG_CSV + b"fao_trade,15,Wheat,Wheat\n")
+    with pytest.raises(ValueError):
+        ProductCatalog.from_csv_bytes(CATALOG_CSV).item_codes('fao_unknown')
+
+
+def test_partitions_combine_with_running_fact_id():
+    partitions = [
+        (1, 'p/product_id=1.csv', b"date_id,product_id,country_id,metric_type,value\n1,1,4,import,10.0\n2,1,4,import,5.0\n"),
+        (2, 'p/product_id=2.csv', b"date_id,product_id,country_id,metric_type,value\n1,2,8,export,1.0\n")
+    ]
+
+    assert combine_partitions(partitions) == (
+        b"fact_id,date_id,product_id,country_id,metric_type,value\n"
+        b"1,1,1,4,import,10.0\n2,2,1,4,import,5.0\n3,1,2,8,export,1.0\n"
+    )
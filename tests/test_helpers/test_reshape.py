@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from src.helpers.reshape import parse_year_columns, stack_years
+
+
+def _wide_frame():
+    return pd.DataFrame({
+        'country_id': pd.array([1, 2, None], dtype='Int64'),
+        'product_name': pd.Categorical(['wheat', 'rice', 'wheat'], categories=['rice', 'soy', 'wheat']),
+        'Y2000': [1.0, np.nan, 3.0],
+        'Y2000F': ['E', 'E', 'E'],
+        'Y2001': [np.nan, np.nan, 6.0],
+        'Y2002': [7.0, 8.0, np.nan]
+    })
+
+
+def test_parse_year_columns_skips_flag_columns():
+    assert parse_year_columns(['Area', 'Y2000', 'Y2000F', 'Y2001']) == {'Y2000': 2000, 'Y2001': 2001}
+    assert parse_year_columns(['Country Code', '1960', '2024'], r'(\d{4})') == {'1960': 1960, '2024': 2024}
+
+
+def test_stack_years_matches_melt_and_dropna():
+    df = _wide_frame()
+
+    stacked = stack_years(df, ['country_id', 'product_name'])
+
+    expected = df.melt(id_vars=['country_id', 'product_name'], value_vars=['Y2000', 'Y2001', 'Y2002'],
+                       var_name='year_str', value_name='value')
+    expected['year'] = expected['year_str'].str.extract(r'Y(\d{4})').astype('int64')
+    expected = expected.dropna(subset=['value']).reset_index(drop=True)
+
+    assert stacked.columns.tolist() == ['country_id', 'product_name', 'year', 'value']
+    assert stacked['year'].dtype == 'int64' and stacked['value'].dtype == 'float64'
+    assert stacked['year'].tolist() == expected['year'].tolist()
+    assert stacked['value'].tolist() == expected['value'].tolist()
+    assert stacked['product_name'].astype(str).tolist() == expected['product_name'].astype(str).tolist()
+    assert stacked['country_id'].astype('Int64').tolist() == expected['country_id'].tolist()
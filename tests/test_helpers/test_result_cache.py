@@ -0,0 +1,70 @@
+from src.helpers.result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResultCache(ttl_s=60, clock=clock)
+    calls = []
+
+    def compute():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert cache.get_or_compute("q", compute) == 1
+    clock.now = 59
+    assert cache.get_or_compute("q", compute) == 1
+    clock.now = 61
+    assert cache.get_or_compute("q", compute) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)  # "b" is now the least recently used
+    cache.get_or_compute("c", lambda: 3)
+
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["evictions"] == 2
+
+
+def test_run_id_is_polled_at_most_once_per_interval():
+    clock = FakeClock()
+    runs = {"id": "run-1", "polls": 0}
+
+    def run_id():
+        runs["polls"] += 1
+        return runs["id"]
+
+    cache = ResultCache(run_id=run_id, run_check_interval_s=5, clock=clock)
+    cache.get_or_compute("q", lambda: "old")
+    runs["id"] = "run-2"
+    clock.now = 1
+    assert cache.get_or_compute("q", lambda: "new") == "old"
+    clock.now = 6
+    assert cache.get_or_compute("q", lambda: "new") == "new"
+    assert runs["polls"] == 2
+
+
+def test_result_computed_during_a_run_change_is_not_kept():
+    runs = {"id": "run-1"}
+    cache = ResultCache(run_id=lambda: runs["id"], run_check_interval_s=0)
+
+    def compute():
+        # A new run is published while the query runs: its result may mix both runs
+        runs["id"] = "run-2"
+        cache.current_run_id()
+        return "stale"
+
+    assert cache.get_or_compute("q", compute) == "stale"
+    assert cache.get_or_compute("q", lambda: "fresh") == "fresh"
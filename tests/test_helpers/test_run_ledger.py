@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from src.helpers.storage import MemoryStorageClient
+from src.helpers.run_ledger import (MeteredClient, RunLedger, SQLiteRunLedger, compare_run, dropna_rows, main, open_ledger,
+                                    record_rows)
+
+BUCKET = "test-bucket"
+
+
+def _record(run, step="transform_fact_metrics_production", status="ok", duration_s=10.0, output_rows=1000,
+            dropped=None):
+    return {"run_id": f"run-{run:02d}", "step": step, "started_at": f"2026-01-{run:02d}T00:00:00+00:00",
+            "status": status, "duration_s": duration_s, "peak_rss_mb": 200.0, "input_rows": 5000,
+            "output_rows": output_rows, "dropped_rows": dropped or {"production_facts": 40},
+            "s3_bytes_read": 1000, "s3_bytes_written": 500}
+
+
+def _history():
+    # Ordinary run-to-run noise: duration within a few percent
+    return [_record(run, duration_s=duration) for run, duration in enumerate([10.0, 10.4, 9.8, 10.1, 10.3, 9.9], start=1)]
+
+
+def test_step_record_counts_rows_drops_and_bytes(tmp_path):
+    client = MeteredClient(MemoryStorageClient())
+    client.put_object(Bucket=BUCKET, Key="raw/input.csv", Body=b"a,b\n1,2\n3,\n")
+    ledger = SQLiteRunLedger(str(tmp_path / "ledger.db"))
+
+    with ledger.record("run-1", "transform_fact_metrics_production") as record:
+        df = pd.read_csv(client.get_object(Bucket=BUCKET, Key="raw/input.csv")["Body"])
+        record_rows("input", len(df))
+        df = dropna_rows(df, "production_facts", subset=["b"])
+        record_rows("output", len(df))
+        record.response = {"statusCode": 200}
+    with pytest.raises(RuntimeError):
+        with ledger.record("run-1", "transform_fact_metrics_wide"):
+            raise RuntimeError("boom")
+
+    rows = {row["step"]: row for row in ledger.records()}
+    ledger.close()
+    production = rows["transform_fact_metrics_production"]
+    assert (production["status"], production["input_rows"], production["output_rows"]) == ("ok", 2, 1)
+    assert production["dropped_rows"] == {"production_facts": 1}
+    assert (production["s3_bytes_read"], production["s3_bytes_written"]) == (11, 0)
+    assert production["peak_rss_mb"] > 0
+    # Failed steps are recorded too; the put_object above ran outside any step
+    assert rows["transform_fact_metrics_wide"]["status"] == "error"
+
+    # Outside a recorded step the counters are no-ops
+    assert len(dropna_rows(pd.DataFrame({"b": [None]}), "production_facts")) == 0
+
+
+def test_compare_run_flags_regressions_not_noise():
+    assert compare_run(_history() + [_record(7, duration_s=10.5)]) == []
+
+    findings = compare_run(_history() + [_record(7, duration_s=14.0, output_rows=900,
+                                                 dropped={"production_facts": 40, "country_mapping": 120})])
+    # Dropped rows are compared per dropna site: a new site has no baseline percentage and sorts first
+    assert [finding["metric"] for finding in findings] == ["dropped_rows[country_mapping]", "duration_s", "output_rows"]
+    assert findings[1]["baseline_median"] == pytest.approx(10.05)
+    assert findings[2]["change_pct"] == -10.0
+
+    # Cached and failed runs are not part of the baseline; too short a baseline reports nothing
+    history = [_record(run, status="cached", duration_s=0.1) for run in range(1, 7)]
+    assert compare_run(history + [_record(7)]) == []
+    assert compare_run(_history()[:2] + [_record(7, duration_s=30.0)]) == []
+
+
+def test_cli_exit_code_reports_regressions(tmp_path, capsys):
+    url = f"sqlite://{tmp_path / 'ledger.db'}"
+    ledger = open_ledger(url)
+    for row in _history():
+        ledger.append(row)
+    ledger.close()
+
+    assert main(["--ledger", url]) == 0
+    ledger = open_ledger(url)
+    ledger.append(_record(7, output_rows=500))
+    ledger.close()
+    assert main(["--ledger", url, "--output", str(tmp_path / "report.json")]) == 1
+    assert "REGRESSION transform_fact_metrics_production output_rows" in capsys.readouterr().out
+    assert open_ledger("") is None
+
+
+def test_cli_prints_missing_measurements(tmp_path, capsys):
+    url = f"sqlite://{tmp_path / 'ledger.db'}"
+    ledger = open_ledger(url)
+    row = _record(1)
+    row.update(duration_s=None, peak_rss_mb=None)
+    ledger.append(row)
+    # Re-recording a step replaces its row
+    ledger.append(row)
+    assert len(ledger.records()) == 1
+    ledger.close()
+
+    assert main(["--ledger", url]) == 0
+    assert "transform_fact_metrics_production" in capsys.readouterr().out
+    with pytest.raises(TypeError):
+        RunLedger()
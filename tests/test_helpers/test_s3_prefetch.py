@@ -0,0 +1,51 @@
+import threading
+import boto3
+import pytest
+from moto import mock_aws
+from botocore.exceptions import ClientError
+
+from src.helpers.s3_prefetch import S3Prefetcher
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key="transformed/dim_a.csv", Body=b"id,name\n1,a\n2,b\n")
+        client.put_object(Bucket=BUCKET, Key="transformed/dim_b.csv", Body=b"id;value\n1;3.5\n")
+        yield client
+
+
+def test_prefetch_returns_parsed_frames_and_bytes(s3_setup):
+    with S3Prefetcher(s3_setup, BUCKET) as prefetch:
+        dim_a = prefetch.csv("transformed/dim_a.csv")
+        dim_b = prefetch.csv("transformed/dim_b.csv", sep=";")
+        raw = prefetch.bytes("transformed/dim_a.csv")
+
+        assert dim_a.result()["name"].tolist() == ["a", "b"]
+        assert dim_b.result()["value"].tolist() == [3.5]
+        assert raw.result().startswith(b"id,name")
+
+
+def test_prefetch_runs_loaders_concurrently(s3_setup):
+    # Both loaders must be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def loader(key):
+        barrier.wait()
+        return s3_setup.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+    with S3Prefetcher(s3_setup, BUCKET) as prefetch:
+        first = prefetch.submit(loader, "transformed/dim_a.csv")
+        second = prefetch.submit(loader, "transformed/dim_b.csv")
+        assert first.result() and second.result()
+
+
+def test_prefetch_surfaces_errors_on_result(s3_setup):
+    with S3Prefetcher(s3_setup, BUCKET) as prefetch:
+        missing = prefetch.csv("transformed/missing.csv")
+        with pytest.raises(ClientError):
+            missing.result()
@@ -0,0 +1,161 @@
+import zipfile
+import boto3
+import pandas as pd
+import pytest
+from io import BytesIO
+from moto import mock_aws
+
+from src.helpers.slim_cache import (
+    SlimSpec, build_slim_frame, write_slim_file_spilled, estimate_slim_working_set, iter_slim_batches, read_slim_file,
+    read_slim_frame, get_etag, slim_key_for
+)
+from src.helpers.storage import MemoryStorageClient
+
+BUCKET = "test-bucket"
+RAW_KEY = "raw/trade.csv"
+
+SPEC = SlimSpec(
+    name="trade",
+    columns=("Area", "Item", "Element Code"),
+    year_pattern=r"Y\d{4}",
+    filters={"Element Code": [5610], "Item": ["Wheat"]},
+    categories=("Area", "Item")
+)
+
+RAW_CSV = """Area,Item,Element Code,Unit,Y2000,Y2001
+Poland,Wheat,5610,t,1,2
+Poland,Wheat,5622,1000 USD,3,4
+Poland,Rice,5610,t,5,
+Chad,Wheat,5610,t,,7
+"""
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key=RAW_KEY, Body=RAW_CSV.encode())
+        yield client
+
+
+def test_build_slim_frame_prunes_filters_and_types():
+    df = build_slim_frame(RAW_CSV.encode(), SPEC)
+
+    assert list(df.columns) == ["Area", "Item", "Element Code", "Y2000", "Y2001"]
+    assert df["Area"].tolist() == ["Poland", "Chad"]
+    assert isinstance(df["Item"].dtype, pd.CategoricalDtype)
+    assert df["Y2000"].dtype == "float64"
+
+
+def test_build_slim_frame_from_zip_member_distinct():
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as z:
+        z.writestr("data.csv", RAW_CSV)
+    spec = SlimSpec(name="items", columns=("Item",), member="*.csv", distinct=True)
+
+    df = build_slim_frame(zip_buffer.getvalue(), spec)
+    assert df["Item"].tolist() == ["Wheat", "Rice"]
+
+
+def test_read_slim_frame_reuses_and_rebuilds_on_etag_change(s3_setup):
+    s3 = s3_setup
+
+    # First run builds and stores the slim artifact
+    first = read_slim_frame(s3, BUCKET, RAW_KEY, SPEC)
+    first_key = slim_key_for(SPEC, get_etag(s3, BUCKET, RAW_KEY))
+    s3.head_object(Bucket=BUCKET, Key=first_key)
+
+    # Second run reads the stored artifact instead of rebuilding it
+    stored = s3.get_object(Bucket=BUCKET, Key=first_key)["LastModified"]
+    second = read_slim_frame(s3, BUCKET, RAW_KEY, SPEC)
+    pd.testing.assert_frame_equal(first, second)
+    assert s3.get_object(Bucket=BUCKET, Key=first_key)["LastModified"] == stored
+
+    # A new raw version produces a new artifact
+    s3.put_object(Bucket=BUCKET, Key=RAW_KEY, Body=(RAW_CSV + "Peru,Wheat,5610,t,8,9\n").encode())
+    third = read_slim_frame(s3, BUCKET, RAW_KEY, SPEC)
+    assert third["Area"].tolist() == ["Poland", "Chad", "Peru"]
+    assert slim_key_for(SPEC, get_etag(s3, BUCKET, RAW_KEY)) != first_key
+    assert len(s3.list_objects_v2(Bucket=BUCKET, Prefix="slim/trade/")["Contents"]) == 2
+
+
+def test_build_slim_frame_from_excel_sheet():
+    # CMO-like layout: 4 title rows, header with an unlabeled date column, then a units row
+    sheet = pd.DataFrame({
+        "": ["($/mt)", "1960M01", "1960M02"],
+        " Maize ": ["($/mt)", 45, 44.5],
+        "Coffee": ["($/kg)", 1, 2],
+        "Wheat, US HRW": ["($/mt)", 60, "…"]
+    })
+    excel_buffer = BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+        sheet.to_excel(writer, sheet_name="Monthly Prices", index=False, startrow=4)
+    spec = SlimSpec(name="prices", columns=("Maize", "Wheat, US HRW"), sheet_name="Monthly Prices",
+                    header_row=4, skip_after_header=1, first_column_name="year_month")
+
+    df = build_slim_frame(excel_buffer.getvalue(), spec)
+
+    assert list(df.columns) == ["year_month", "Maize", "Wheat, US HRW"]
+    assert df["year_month"].tolist() == ["1960M01", "1960M02"]
+    assert df["Maize"].tolist() == [45.0, 44.5]
+    assert df["Wheat, US HRW"].isna().tolist() == [False, True]
+
+
+def _zipped(csv_text, name="data.csv"):
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(name, csv_text)
+    return zip_buffer.getvalue()
+
+
+def test_spilled_build_matches_in_memory_build(tmp_path, monkeypatch):
+    # Small chunks: categories appear in a different order in every chunk (Poland, Chad, then Austria)
+    monkeypatch.setattr("src.helpers.slim_cache.CHUNK_SIZE", 3)
+    header, rows = RAW_CSV.split("\n", 1)
+    raw = _zipped(header + "\n" + rows * 50 + "Austria,Wheat,5610,t,8,9\n")
+    spec = SlimSpec(name="trade", columns=SPEC.columns, member="*.csv", year_pattern=SPEC.year_pattern,
+                    filters=SPEC.filters, categories=SPEC.categories)
+    client = MemoryStorageClient()
+
+    for spec in (spec, SlimSpec(**dict(spec.__dict__, distinct=True))):
+        with open(tmp_path / "raw.zip", "wb") as f:
+            f.write(raw)
+        with open(tmp_path / "raw.zip", "rb") as raw_file:
+            rows_written = write_slim_file_spilled(raw_file, spec, str(tmp_path / "slim.parquet"))
+        with open(tmp_path / "slim.parquet", "rb") as f:
+            client.put_object(Bucket=BUCKET, Key="slim/trade.parquet", Body=f)
+
+        expected = build_slim_frame(raw, spec)
+        assert rows_written == len(expected) == (3 if spec.distinct else 101)
+        pd.testing.assert_frame_equal(read_slim_file(client, BUCKET, "slim/trade.parquet"), expected)
+
+    # Chunked transforms stream the artifact; batches keep their global row positions
+    batches = list(iter_slim_batches(client, BUCKET, "slim/trade.parquet", batch_rows=2))
+    assert all(len(batch) <= 2 for batch in batches)
+    assert [row for batch in batches for row in batch.index] == [0, 1, 2]
+    assert pd.concat(batches)["Area"].astype(str).tolist() == expected["Area"].astype(str).tolist()
+
+
+def test_estimate_reads_zip_member_size_and_column_layout(s3_setup):
+    header, rows = RAW_CSV.split("\n", 1)
+    csv_text = header + "\n" + rows * 20
+    s3_setup.put_object(Bucket=BUCKET, Key="raw/trade.zip", Body=_zipped(csv_text))
+    spec = SlimSpec(name="trade", columns=SPEC.columns, member="*.csv", year_pattern=SPEC.year_pattern)
+
+    estimate = estimate_slim_working_set(s3_setup, BUCKET, "raw/trade.zip", spec)
+
+    assert estimate["uncompressed_bytes"] == len(csv_text.encode())
+    assert estimate["kept_fraction"] == pytest.approx(5 / 6, abs=1e-4)  # all columns but 'Unit'
+    assert estimate["estimated_bytes"] > estimate["raw_bytes"]
+
+
+def test_read_slim_frame_switches_to_chunked_mode_under_memory_pressure(s3_setup, monkeypatch, capsys):
+    monkeypatch.delenv("EXECUTION_MODE", raising=False)
+    monkeypatch.setattr("src.helpers.memory_guard.available_memory_bytes", lambda: 10)
+    expected = build_slim_frame(RAW_CSV.encode(), SPEC)
+
+    df = read_slim_frame(s3_setup, BUCKET, RAW_KEY, SPEC)
+
+    assert "chunked mode" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,170 @@
+import os
+import pandas as pd
+import pytest
+from io import StringIO
+
+from src.helpers import storage
+from src.helpers.storage import (LocalStorageClient, MemoryStorageClient, MappedFile, get_storage_client, open_object,
+                                 parquet_source)
+
+BUCKET = "test-bucket"
+
+CATALOG = """source,item_code,item_name,product_name
+fao_production,15,Wheat,Wheat
+fao_production,27,Rice,Rice
+wb_cmo,,Soybeans,Soya
+"""
+
+
+@pytest.fixture(params=["local", "memory"])
+def client(request, tmp_path):
+    return LocalStorageClient(str(tmp_path)) if request.param == "local" else MemoryStorageClient()
+
+
+def test_put_get_head_and_range(client):
+    client.put_object(Bucket=BUCKET, Key="raw/a.csv", Body=b"0123456789", Metadata={"watermark": "2023"})
+
+    assert client.get_object(Bucket=BUCKET, Key="raw/a.csv")["Body"].read() == b"0123456789"
+    assert client.get_object(Bucket=BUCKET, Key="raw/a.csv", Range="bytes=2-5")["Body"].read() == b"2345"
+    assert client.get_object(Bucket=BUCKET, Key="raw/a.csv", Range="bytes=8-")["Body"].read() == b"89"
+
+    head = client.head_object(Bucket=BUCKET, Key="raw/a.csv")
+    assert head["ContentLength"] == 10
+    assert head["Metadata"] == {"watermark": "2023"}
+
+    # Rewriting the object changes the ETag (the memo cache relies on it)
+    client.put_object(Bucket=BUCKET, Key="raw/a.csv", Body=b"changed")
+    assert client.head_object(Bucket=BUCKET, Key="raw/a.csv")["ETag"] != head["ETag"]
+    assert client.head_object(Bucket=BUCKET, Key="raw/a.csv")["Metadata"] == {}
+
+
+def test_missing_objects_raise_s3_errors(client):
+    with pytest.raises(client.exceptions.NoSuchKey):
+        client.get_object(Bucket=BUCKET, Key="missing.csv")
+    with pytest.raises(client.exceptions.ClientError) as error:
+        client.head_object(Bucket=BUCKET, Key="missing.csv")
+    assert error.value.response["Error"]["Code"] == "404"
+
+
+def test_list_and_delete(client):
+    for key in ("transformed/b.csv", "transformed/a.csv", "raw/c.csv"):
+        client.put_object(Bucket=BUCKET, Key=key, Body=b"x", Metadata={"k": "v"})
+
+    pages = client.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix="transformed/")
+    assert [item["Key"] for page in pages for item in page.get("Contents", [])] == ["transformed/a.csv", "transformed/b.csv"]
+
+    client.delete_objects(Bucket=BUCKET, Delete={"Objects": [{"Key": "transformed/a.csv"}, {"Key": "transformed/b.csv"}]})
+    assert "Contents" not in client.list_objects_v2(Bucket=BUCKET, Prefix="transformed/")
+    assert [item["Key"] for item in client.list_objects_v2(Bucket=BUCKET)["Contents"]] == ["raw/c.csv"]
+
+
+def test_local_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "MMAP_THRESHOLD", 16)
+    client = LocalStorageClient(str(tmp_path))
+    client.put_object(Bucket=BUCKET, Key="raw/large.bin", Body=bytes(range(64)))
+    client.put_object(Bucket=BUCKET, Key="raw/small.bin", Body=b"tiny")
+
+    with open_object(client, BUCKET, "raw/large.bin") as f:
+        assert isinstance(f, MappedFile)
+        f.seek(60)
+        assert f.read() == bytes([60, 61, 62, 63])
+        assert f.getbuffer()[:3].tobytes() == bytes([0, 1, 2])
+        f.seek(62)
+        buffer = bytearray(4)
+        assert (f.readinto(buffer), bytes(buffer[:2]), f.tell()) == (2, bytes([62, 63]), 64)
+    with open_object(client, BUCKET, "raw/small.bin") as f:
+        assert not isinstance(f, MappedFile)
+        assert f.read() == b"tiny"
+
+    # Files written outside the client are visible as objects
+    assert (tmp_path / "raw" / "large.bin").stat().st_size == 64
+
+
+def test_parquet_reads_use_the_mapping_itself(tmp_path, monkeypatch):
+    import pyarrow as pa
+
+    monkeypatch.setattr(storage, "MMAP_THRESHOLD", 16)
+    client = LocalStorageClient(str(tmp_path))
+    df = pd.DataFrame({"year": range(100), "product_name": ["Wheat", "Rice"] * 50})
+    (tmp_path / "transformed").mkdir()
+    df.to_parquet(tmp_path / "transformed" / "wide.parquet", index=False)
+
+    with open_object(client, BUCKET, "transformed/wide.parquet") as f:
+        source = parquet_source(f)
+        # Pages are decoded from the mapped memory, never copied out through read()
+        assert isinstance(source, pa.BufferReader) and source.size() == len(f.getbuffer())
+        assert pd.read_parquet(source).equals(df)
+        # Closing while a view is still alive leaves the mapping to the last view
+    assert f.closed
+    del source
+
+    plain = StringIO("not parquet")
+    assert parquet_source(plain) is plain
+
+
+def test_local_keys_cannot_escape_the_root(tmp_path):
+    with pytest.raises(ValueError):
+        LocalStorageClient(str(tmp_path)).put_object(Bucket=BUCKET, Key="../outside.csv", Body=b"x")
+
+
+def test_storage_url_schemes(tmp_path):
+    assert isinstance(get_storage_client(f"file://{tmp_path}"), LocalStorageClient)
+    assert get_storage_client(f"file://{tmp_path}").root == str(tmp_path)
+    assert get_storage_client("file://data").root == os.path.abspath("data")
+    assert isinstance(get_storage_client("memory://test-storage"), MemoryStorageClient)
+    assert get_storage_client("memory://test-storage") is get_storage_client("memory://test-storage")
+    with pytest.raises(ValueError):
+        get_storage_client("ftp://host/dir")
+
+
+def test_handler_runs_on_local_storage_without_moto(tmp_path, monkeypatch):
+    from src.transformation.transform_dim_product import lambda_handler
+
+    monkeypatch.setenv("STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("S3_BUCKET_PROJECT_1", BUCKET)
+    monkeypatch.setenv("S3_PREFIX_TRANSFORMED", "transformed/")
+    monkeypatch.setenv("S3_PREFIX_RESOURCES", "resources/")
+    (tmp_path / "resources").mkdir()
+    (tmp_path / "resources" / "product_catalog.csv").write_text(CATALOG)
+
+    result = lambda_handler({}, {})
+
+    assert result["statusCode"] == 200
+    df = pd.read_csv(tmp_path / "transformed" / "dim_product.csv")
+    assert df["product_name"].tolist() == ["Wheat", "Rice", "Soya"]
+
+
+def test_run_all_validations_reads_through_storage(monkeypatch):
+    from src.helpers.validation import run_all_validations
+
+    client = get_storage_client("memory://validation")
+    monkeypatch.setenv("S3_BUCKET_PROJECT_1", BUCKET)
+    monkeypatch.setenv("S3_PREFIX_TRANSFORMED", "transformed/")
+    monkeypatch.setenv("S3_PREFIX_RESOURCES", "resources/")
+    client.put_object(Bucket=BUCKET, Key="resources/product_catalog.csv", Body=CATALOG)
+
+    frames = {
+        "dim_country.csv": pd.DataFrame({"country_id": [1], "country_name": ["Poland"], "continent_name": ["Europe"],
+                                         "m49_code": [616], "iso3_code": ["POL"]}),
+        "dim_date.csv": pd.DataFrame({"date_id": [1], "all_date": ["2020-01-01"], "year": [2020], "month": [1],
+                                      "month_name": ["January"], "quarter": [1]}),
+        "dim_product.csv": pd.DataFrame({"product_id": [0, 1], "product_name": ["N/A", "Wheat"]}),
+        "fact_prices.csv": pd.DataFrame({"price_id": [1], "date_id": [1], "product_id": [1], "price_usd_per_ton": [200.0],
+                                         "avg_annual_price": [200.0], "price_annual_change_pct": [None],
+                                         "price_month_change_pct": [None], "price_yoy_change_pct": [None],
+                                         "price_rolling_mean_3m": [None], "price_rolling_mean_6m": [None],
+                                         "price_rolling_mean_12m": [None], "price_volatility_12m": [None],
+                                         "price_drawdown_12m_pct": [0.0], "real_price_usd_per_ton": [None]}),
+        "fact_metrics.csv": pd.DataFrame({"fact_id": [1], "date_id": [1], "product_id": [1], "country_id": [1],
+                                          "metric_type": ["production"], "value": [10.0]})
+    }
+    for filename, df in frames.items():
+        buffer = StringIO()
+        df.to_csv(buffer, index=False)
+        client.put_object(Bucket=BUCKET, Key=f"transformed/{filename}", Body=buffer.getvalue())
+
+    run_all_validations("memory://validation")
+
+    client.put_object(Bucket=BUCKET, Key="transformed/fact_metrics.csv", Body="fact_id\n1\n")
+    with pytest.raises(ValueError):
+        run_all_validations("memory://validation")
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+from io import BytesIO
+
+from src.helpers.storage import MemoryStorageClient, get_storage_client
+from src.helpers.table_stats import (
+    compute_table_stats, content_hash, estimate_distinct, put_table_with_stats, read_table_stats, stats_key, csv_dtypes
+)
+
+BUCKET = "test-bucket"
+
+
+def _csv(df):
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _fact_metrics():
+    return pd.DataFrame({
+        "fact_id": [1, 2, 3, 4], "date_id": [1, 1, 13, 13], "product_id": [1, 2, 1, 0], "country_id": [4, 4, 4, 4],
+        "metric_type": ["production", "export", "production", "population"], "value": [10.5, None, 3.0, 38041754.0]
+    })
+
+
+def test_compute_table_stats_matches_a_rescan_of_the_file():
+    df = _fact_metrics()
+    payload = _csv(df)
+
+    stats = compute_table_stats(df, payload, keys=["fact_id"])
+
+    assert stats["row_count"] == 4
+    assert stats["columns"] == list(df.columns)
+    assert stats["column_stats"]["fact_id"] == {"dtype": "int64", "nulls": 0, "min": 1, "max": 4, "distinct": 4}
+    assert stats["column_stats"]["value"]["nulls"] == 1
+    assert (stats["column_stats"]["value"]["min"], stats["column_stats"]["value"]["max"]) == (3.0, 38041754.0)
+    assert stats["column_stats"]["metric_type"]["values"] == ["export", "population", "production"]
+
+    # The file read back gives the same statistics (apart from the creation time)
+    rescanned = compute_table_stats(pd.read_csv(BytesIO(payload)), payload, keys=["fact_id"])
+    assert {k: v for k, v in rescanned.items() if k != "created_at"} == {k: v for k, v in stats.items() if k != "created_at"}
+
+
+def test_content_hash_ignores_row_order_but_not_content():
+    df = _fact_metrics()
+    shuffled = df.sample(frac=1, random_state=1)
+    changed = df.assign(value=df["value"].fillna(0))
+
+    assert content_hash(_csv(df)) == content_hash(_csv(shuffled))
+    assert content_hash(_csv(df)) != content_hash(_csv(changed))
+
+
+@pytest.mark.parametrize("n_distinct", [1, 50, 5000, 200000])
+def test_estimate_distinct_is_close_to_the_exact_count(n_distinct):
+    values = pd.Series(np.arange(3 * n_distinct) % n_distinct)
+
+    assert estimate_distinct(values) == pytest.approx(n_distinct, rel=0.03)
+    assert estimate_distinct(values.astype(str)) == pytest.approx(n_distinct, rel=0.03)
+
+
+def test_sidecar_is_ignored_once_the_output_changes():
+    client = MemoryStorageClient()
+    df = _fact_metrics()
+
+    put_table_with_stats(client, BUCKET, "transformed/fact_metrics.csv", df, _csv(df), keys=["fact_id"])
+    stats = read_table_stats(client, BUCKET, "transformed/fact_metrics.csv")
+    assert stats["row_count"] == 4 and stats["key"] == "transformed/fact_metrics.csv"
+    assert csv_dtypes(stats) == {"fact_id": "int64", "date_id": "int64", "product_id": "int64", "country_id": "int64",
+                                 "value": "float64"}
+
+    # Rewritten without a sidecar (e.g. the partitioned mode): the old sidecar is stale
+    client.put_object(Bucket=BUCKET, Key="transformed/fact_metrics.csv", Body=_csv(df.head(2)))
+    assert read_table_stats(client, BUCKET, "transformed/fact_metrics.csv") is None
+    assert read_table_stats(client, BUCKET, "transformed/missing.csv") is None
+
+
+def _write_transformed_files(client):
+    catalog = "source,item_code,item_name,product_name\nfao_production,15,Wheat,Wheat\n"
+    client.put_object(Bucket=BUCKET, Key="resources/product_catalog.csv", Body=catalog)
+    frames = {
+        "dim_country.csv": (pd.DataFrame({"country_id": [1], "country_name": ["Poland"], "continent_name": ["Europe"],
+                                          "m49_code": [616], "iso3_code": ["POL"]}), ["country_id", "m49_code"]),
+        "dim_date.csv": (pd.DataFrame({"date_id": [1], "all_date": pd.to_datetime(["2020-01-01"]), "year": [2020],
+                                       "month": [1], "month_name": ["January"], "quarter": [1]}), ["date_id"]),
+        "dim_product.csv": (pd.DataFrame({"product_id": [1], "product_name": ["Wheat"]}), ["product_id"]),
+        "fact_prices.csv": (pd.DataFrame({"price_id": [1], "date_id": [1], "product_id": [1], "price_usd_per_ton": [200.0],
+                                          "avg_annual_price": [200.0], "price_annual_change_pct": [None],
+                                          "price_month_change_pct": [None], "price_yoy_change_pct": [None],
+                                          "price_rolling_mean_3m": [None], "price_rolling_mean_6m": [None],
+                                          "price_rolling_mean_12m": [None], "price_volatility_12m": [None],
+                                          "price_drawdown_12m_pct": [None], "real_price_usd_per_ton": [None]}), ["price_id"]),
+        "fact_metrics.csv": (_fact_metrics().fillna({"value": 0}), ["fact_id"])
+    }
+    for filename, (df, keys) in frames.items():
+        put_table_with_stats(client, BUCKET, f"transformed/{filename}", df, _csv(df), keys=keys)
+
+
+def test_validation_uses_sidecars_and_rescans_only_when_needed(monkeypatch):
+    from src.helpers.validation import run_all_validations
+
+    monkeypatch.setenv("S3_BUCKET_PROJECT_1", BUCKET)
+    monkeypatch.setenv("S3_PREFIX_TRANSFORMED", "transformed/")
+    monkeypatch.setenv("S3_PREFIX_RESOURCES", "resources/")
+    client = get_storage_client("memory://table-stats")
+    _write_transformed_files(client)
+
+    assert run_all_validations("memory://table-stats") == {
+        "dim_country.csv": "sidecar", "dim_date.csv": "sidecar", "dim_product.csv": "rescan",
+        "fact_prices.csv": "sidecar", "fact_metrics.csv": "sidecar"
+    }
+
+    # Missing sidecar: rescan
+    client.delete_object(Bucket=BUCKET, Key=stats_key("transformed/dim_country.csv"))
+    assert run_all_validations("memory://table-stats")["dim_country.csv"] == "rescan"
+
+    # The sidecar reports a problem: the rescan confirms it with the usual error
+    df = _fact_metrics()
+    put_table_with_stats(client, BUCKET, "transformed/fact_metrics.csv", df, _csv(df), keys=["fact_id"])
+    with pytest.raises(ValueError, match="out of expected range"):
+        run_all_validations("memory://table-stats")
@@ -0,0 +1,61 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from src.helpers.transform_memo import TransformMemo
+
+BUCKET = "test-bucket"
+INPUTS = ["raw/source.csv", "transformed/dim_product.csv"]
+OUTPUT = "transformed/fact.csv"
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key="raw/source.csv", Body=b"a,b\n1,2\n")
+        client.put_object(Bucket=BUCKET, Key="transformed/dim_product.csv", Body=b"product_id,product_name\n1,Wheat\n")
+        yield client
+
+
+def _run(client, event=None, config=None):
+    """
+    Minimal memoized transform: returns (response, whether the transform body ran).
+    """
+    memo = TransformMemo(client, BUCKET, INPUTS, [OUTPUT], config or {'products': {'Wheat': 'Wheat'}}, __file__)
+    if memo.is_fresh(event):
+        return memo.cached_response(), False
+    client.put_object(Bucket=BUCKET, Key=OUTPUT, Body=b"fact_id\n1\n")
+    return memo.save({'statusCode': 200, 'body': 'done'}), True
+
+
+def test_second_run_with_unchanged_inputs_is_a_cache_hit(s3_setup):
+    first, ran_first = _run(s3_setup)
+    second, ran_second = _run(s3_setup)
+
+    assert ran_first and first['cache_hit'] is False
+    assert not ran_second and second == {'statusCode': 200, 'body': 'done', 'cache_hit': True}
+    assert s3_setup.head_object(Bucket=BUCKET, Key=f"{OUTPUT}.fingerprint.json")
+
+
+def test_changed_input_config_or_output_invalidates(s3_setup):
+    _run(s3_setup)
+
+    # New dimension content
+    s3_setup.put_object(Bucket=BUCKET, Key="transformed/dim_product.csv", Body=b"product_id,product_name\n1,Rice\n")
+    assert _run(s3_setup)[1]
+
+    # New config
+    assert _run(s3_setup, config={'products': {'Rice': 'Rice'}})[1]
+
+    # Output removed behind the memo's back
+    s3_setup.delete_object(Bucket=BUCKET, Key=OUTPUT)
+    assert _run(s3_setup, config={'products': {'Rice': 'Rice'}})[1]
+
+
+def test_force_refresh_always_runs(s3_setup):
+    _run(s3_setup)
+    response, ran = _run(s3_setup, event={'force_refresh': True})
+
+    assert ran and response['cache_hit'] is False
@@ -0,0 +1,148 @@
+import pandas as pd
+import pytest
+from io import BytesIO
+
+from src.helpers.storage import MemoryStorageClient
+from src.helpers.table_stats import put_table_with_stats, read_table_stats
+from src.helpers.versioned_zone import VersionedZoneClient, join_partitions, split_partitions, zone_client
+
+BUCKET = "test-bucket"
+KEY = "transformed/fact_metrics_production.csv"
+
+
+def _facts(value_2021=22.0):
+    df = pd.DataFrame({
+        "date_id": [13, 13, 25, 25, 37],
+        "product_id": [1, 2, 1, 2, 1],
+        "country_id": [4, 4, 4, 4, 4],
+        "metric_type": ["production"] * 5,
+        "value": [10.0, 11.0, 20.0, value_2021, 30.0]
+    })
+    df.insert(0, "fact_id", range(1, len(df) + 1))
+    return df
+
+
+def _csv(df):
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def zone():
+    return VersionedZoneClient(MemoryStorageClient(), "transformed/")
+
+
+def test_partitions_join_back_to_the_written_payload():
+    payload = _csv(_facts())
+
+    partitions, row_number_column = split_partitions(payload)
+
+    assert row_number_column == "fact_id"
+    assert [(label, rows) for label, _, rows in partitions] == [
+        ("production/date_id=13", 2), ("production/date_id=25", 2), ("production/date_id=37", 1)
+    ]
+    # Partitions do not store the row numbers, so removing a row does not change later partitions
+    assert partitions[0][1] == b"date_id,product_id,country_id,metric_type,value\n13,1,4,production,10.0\n13,2,4,production,11.0\n"
+    assert join_partitions([part for _, part, _ in partitions], row_number_column) == payload
+
+    # Tables without the partition columns are stored as one partition
+    dims = _csv(pd.DataFrame({"product_id": [0, 1], "product_name": ["N/A", "Wheat"]}))
+    assert split_partitions(dims) == ([("all", dims, 2)], None)
+
+
+def test_rewrite_uploads_only_changed_partitions(zone):
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(_facts()))
+    response = zone.put_table(Bucket=BUCKET, Key=KEY, Body=_csv(_facts(value_2021=23.0)), Frame=_facts(value_2021=23.0))
+
+    assert (response["partitions"], response["reused_partitions"]) == (3, 2)
+    assert zone.get_object(Bucket=BUCKET, Key=KEY)["Body"].read() == _csv(_facts(value_2021=23.0))
+    with zone.open_object(Bucket=BUCKET, Key=KEY) as f:
+        assert pd.read_csv(f)["value"].tolist() == [10.0, 11.0, 20.0, 23.0, 30.0]
+    assert zone.head_object(Bucket=BUCKET, Key=KEY)["ETag"] == response["ETag"]
+    parts = zone.client.list_objects_v2(Bucket=BUCKET, Prefix="transformed/_versions/parts/")["Contents"]
+    assert len(parts) == 4
+
+
+def test_rollback_restores_the_previous_run(zone):
+    zone.begin_run(BUCKET, "run-1")
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(_facts()))
+    zone.end_run()
+
+    # A run writing two tables is rolled back as a whole
+    zone.begin_run(BUCKET, "run-2")
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(_facts(value_2021=99.0)))
+    zone.put_object(Bucket=BUCKET, Key="transformed/dim_product.csv", Body=b"product_id,product_name\n1,Wheat\n")
+    zone.end_run()
+    assert [entry["run_id"] for entry in zone.history(BUCKET)] == ["run-1", "run-2"]
+
+    pointer = zone.rollback(BUCKET)
+    assert pointer["run_id"] == "run-1"
+    assert zone.get_object(Bucket=BUCKET, Key=KEY)["Body"].read() == _csv(_facts())
+    with pytest.raises(zone.exceptions.ClientError):
+        zone.head_object(Bucket=BUCKET, Key="transformed/dim_product.csv")
+
+    # Roll forward again by run ID; run-1 has no earlier snapshot
+    zone.rollback(BUCKET, "run-2")
+    assert pd.read_csv(zone.open_object(Bucket=BUCKET, Key=KEY))["value"].iloc[3] == 99.0
+    zone.rollback(BUCKET, "run-1")
+    with pytest.raises(ValueError, match="first snapshot"):
+        zone.rollback(BUCKET)
+
+
+def test_every_output_is_versioned_and_other_keys_pass_through(zone):
+    zone.begin_run(BUCKET, "run-1")
+    zone.put_object(Bucket=BUCKET, Key="transformed/fact_metrics_wide.parquet", Body=b"PAR1-v1")
+    zone.put_object(Bucket=BUCKET, Key="transformed/metric_cube/axes.json", Body=b'{"v": 1}')
+    zone.end_run()
+    zone.begin_run(BUCKET, "run-2")
+    zone.put_object(Bucket=BUCKET, Key="transformed/fact_metrics_wide.parquet", Body=b"PAR1-v2")
+    zone.put_object(Bucket=BUCKET, Key="transformed/metric_cube/values.npy", Body=b"NPY")
+    zone.end_run()
+
+    # Rolling back restores the extracts and the cube of run-1 (run-2 added values.npy)
+    zone.rollback(BUCKET)
+    assert zone.get_object(Bucket=BUCKET, Key="transformed/fact_metrics_wide.parquet")["Body"].read() == b"PAR1-v1"
+    listing = zone.list_objects_v2(Bucket=BUCKET, Prefix="transformed/metric_cube/")
+    assert [item["Key"] for item in listing["Contents"]] == ["transformed/metric_cube/axes.json"]
+    with pytest.raises(zone.exceptions.ClientError):
+        zone.head_object(Bucket=BUCKET, Key="transformed/metric_cube/values.npy")
+
+    # Flat files written before the zone was versioned stay readable; shard work files are not versioned
+    zone.client.put_object(Bucket=BUCKET, Key="transformed/dim_date.csv", Body=b"date_id\n1\n")
+    zone.put_object(Bucket=BUCKET, Key="transformed/shards/fact_metrics_trade/00000-of-00002.parquet", Body=b"S")
+    assert zone.get_object(Bucket=BUCKET, Key="transformed/dim_date.csv")["Body"].read() == b"date_id\n1\n"
+    assert zone.client.get_object(Bucket=BUCKET, Key="transformed/shards/fact_metrics_trade/00000-of-00002.parquet")
+    assert "transformed/dim_date.csv" not in zone.current_manifest(BUCKET)["tables"]
+
+
+def test_failed_run_never_becomes_current(zone):
+    zone.begin_run(BUCKET, "run-1")
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(_facts()))
+    zone.end_run()
+
+    zone.begin_run(BUCKET, "run-2")
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(_facts(value_2021=99.0)))
+    zone.put_object(Bucket=BUCKET, Key="transformed/fact_metrics_wide.parquet", Body=b"PAR1")
+    # Later steps of the run read what earlier steps wrote; the pointer has not moved yet
+    assert zone.get_object(Bucket=BUCKET, Key=KEY)["Body"].read() == _csv(_facts(value_2021=99.0))
+    assert zone.read_pointer(BUCKET)["run_id"] == "run-1"
+    assert zone.end_run(succeeded=False) is None
+
+    assert zone.get_object(Bucket=BUCKET, Key=KEY)["Body"].read() == _csv(_facts())
+    assert "Contents" not in zone.list_objects_v2(Bucket=BUCKET, Prefix="transformed/fact_metrics_wide")
+    assert [entry["run_id"] for entry in zone.history(BUCKET)] == ["run-1"]
+
+
+def test_statistics_sidecars_describe_versioned_tables(monkeypatch, zone):
+    df = _facts()
+    put_table_with_stats(zone, BUCKET, KEY, df, _csv(df), keys=["fact_id"])
+
+    assert read_table_stats(zone, BUCKET, KEY)["row_count"] == 5
+    zone.put_object(Bucket=BUCKET, Key=KEY, Body=_csv(df.head(2)))
+    assert read_table_stats(zone, BUCKET, KEY) is None
+
+    monkeypatch.setenv("TRANSFORMED_LAYOUT", "versioned")
+    assert isinstance(zone_client(zone.client), VersionedZoneClient)
+    monkeypatch.setenv("TRANSFORMED_LAYOUT", "files")
+    assert zone_client(zone.client) is zone.client
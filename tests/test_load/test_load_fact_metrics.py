@@ -0,0 +1,81 @@
+import os
+import pandas as pd
+import pytest
+from unittest import mock
+
+from src.load.load_fact_metrics import lambda_handler
+
+
+def _mock_connection(mock_get_conn):
+    mock_cursor = mock.Mock()
+    mock_conn = mock.Mock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_get_conn.return_value = mock_conn
+    return mock_conn, mock_cursor
+
+
+@mock.patch("src.load.load_fact_metrics.get_s3_client")
+@mock.patch("src.helpers.table_stats.read_table_stats", return_value=None)
+@mock.patch("src.load.load_fact_metrics.get_db_connection")
+@mock.patch("src.load.load_fact_metrics.read_csv_from_s3")
+def test_load_fact_metrics_uses_binary_copy_by_default(mock_read_csv, mock_get_conn, mock_read_stats, mock_s3_client):
+    mock_read_csv.return_value = pd.DataFrame({
+        "fact_id": [1, 2], "date_id": [1, 13], "product_id": [1, 0], "country_id": [4, 4],
+        "metric_type": ["production", "population"], "value": [10.5, 38041754.0]
+    })
+    mock_conn, mock_cursor = _mock_connection(mock_get_conn)
+    os.environ['S3_BUCKET_PROJECT_1'] = "test-bucket"
+    os.environ['S3_PREFIX_TRANSFORMED'] = "transformed/"
+
+    result = lambda_handler()
+
+    assert result["statusCode"] == 200 and result["rows"] == 2 and result["copy_format"] == "binary"
+    mock_cursor.execute.assert_called_once_with("TRUNCATE TABLE fact_metrics")
+    sql, stream = mock_cursor.copy_expert.call_args.args
+    assert sql == "COPY fact_metrics(fact_id, date_id, product_id, country_id, metric_type, value) FROM STDIN (FORMAT binary)"
+    assert stream.read().endswith(b"\xff\xff")
+    mock_conn.commit.assert_called_once()
+
+
+@mock.patch("src.load.load_fact_metrics.get_s3_client")
+@mock.patch("src.helpers.table_stats.read_table_stats", return_value=None)
+@mock.patch("src.load.load_fact_metrics.get_db_connection")
+@mock.patch("src.load.load_fact_metrics.read_csv_from_s3")
+def test_load_fact_metrics_csv_copy_on_request(mock_read_csv, mock_get_conn, mock_read_stats, mock_s3_client):
+    mock_read_csv.return_value = pd.DataFrame({
+        "fact_id": [1], "date_id": [1], "product_id": [1], "country_id": [4], "metric_type": ["export"], "value": [None]
+    })
+    _, mock_cursor = _mock_connection(mock_get_conn)
+    os.environ['S3_BUCKET_PROJECT_1'] = "test-bucket"
+
+    assert lambda_handler({"copy_format": "csv"})["copy_format"] == "csv"
+    sql, buffer = mock_cursor.copy_expert.call_args.args
+    assert sql.endswith("FROM STDIN WITH CSV")
+    assert buffer.getvalue() == "1,1,1,4,export,\n"
+
+
+@mock.patch("src.load.load_fact_metrics.get_s3_client")
+@mock.patch("src.helpers.table_stats.read_table_stats")
+@mock.patch("src.load.load_fact_metrics.get_db_connection")
+@mock.patch("src.load.load_fact_metrics.read_csv_from_s3")
+def test_load_fact_metrics_uses_statistics_sidecar(mock_read_csv, mock_get_conn, mock_read_stats, mock_s3_client, capsys):
+    mock_read_csv.return_value = pd.DataFrame({
+        "fact_id": [1, 2], "date_id": [1, 13], "product_id": [1, 0], "country_id": [4, 4],
+        "metric_type": ["production", "population"], "value": [10.5, 38041754.0]
+    })
+    mock_read_stats.return_value = {"row_count": 2, "column_stats": {
+        "fact_id": {"dtype": "int64"}, "metric_type": {"dtype": "str"}, "value": {"dtype": "float64"}
+    }}
+    _, mock_cursor = _mock_connection(mock_get_conn)
+    os.environ['S3_BUCKET_PROJECT_1'] = "test-bucket"
+
+    # Numeric columns are parsed with the recorded types, progress is reported against the recorded row count
+    assert lambda_handler()["rows"] == 2
+    assert mock_read_csv.call_args.kwargs["dtype"] == {"fact_id": "int64", "value": "float64"}
+    mock_cursor.copy_expert.call_args.args[1].read()
+    assert "fact_metrics: 2/2 rows sent (100%)" in capsys.readouterr().out
+
+    # A file that does not match its sidecar is not loaded
+    mock_read_stats.return_value = {"row_count": 3, "column_stats": {}}
+    with pytest.raises(ValueError):
+        lambda_handler()
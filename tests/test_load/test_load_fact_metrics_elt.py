@@ -0,0 +1,97 @@
+import os
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from src.load.load_fact_metrics_elt import lambda_handler, STAGING_COLUMNS
+from src.helpers.population_store import merge_population, write_population_store
+
+BUCKET = "test-bucket"
+
+FOOD_BALANCE_CSV = """Area Code,Area Code (M49),Area,Item Code,Item,Element Code,Element,Unit,Y2000,Y2000F,Y2001,Y2001F
+2,'004,Afghanistan,2511,Wheat and products,5510,Production,1000 t,10,E,11,E
+2,'004,Afghanistan,2511,Wheat and products,5142,Food,1000 t,7,E,,E
+2,'004,Afghanistan,2511,Wheat and products,5301,Domestic supply quantity,1000 t,99,E,99,E
+2,'004,Afghanistan,2000,Other,5510,Production,1000 t,1,E,1,E
+"""
+TRADE_CSV = """Area Code,Area Code (M49),Area,Item Code,Item,Element Code,Element,Unit,Y2000,Y2001
+4,'008,Albania,27,Rice,5610,Import quantity,t,5,
+4,'008,Albania,27,Rice,5622,Import value,1000 USD,1,1
+"""
+POPULATION = pd.DataFrame({
+    "country_code": ["AFG", "XXX", "AFG"], "country_name": ["Afghanistan", "Türkiye", "Afghanistan"],
+    "year": [2000, 2000, 2001], "value": [100, 200, 101]
+})
+CATALOG_CSV = """source,item_code,item_name,product_name
+fao_food_balance,2511,Wheat and products,Wheat
+fao_trade,27,Rice,Rice
+"""
+
+
+def _zipped(name, text):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(name, text)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key="raw/FAO/FoodBalance/faostat_consumption.zip",
+                          Body=_zipped("FoodBalanceSheets_E_All_Data.csv", FOOD_BALANCE_CSV))
+        client.put_object(Bucket=BUCKET, Key="raw/FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv", Body=TRADE_CSV.encode())
+        write_population_store(client, BUCKET, "raw/WB/wb_population.parquet", merge_population(None, POPULATION))
+        client.put_object(Bucket=BUCKET, Key="resources/product_catalog.csv", Body=CATALOG_CSV.encode())
+        client.put_object(Bucket=BUCKET, Key="transformed/country_aliases.csv", Body=b"alias,country_id\nturkiye,2\nturkiye,3\n")
+
+        os.environ["S3_BUCKET_PROJECT_1"] = BUCKET
+        os.environ["S3_PREFIX_RAW"] = "raw/"
+        os.environ["S3_PREFIX_TRANSFORMED"] = "transformed/"
+        os.environ["S3_PREFIX_RESOURCES"] = "resources/"
+        yield client
+
+
+@mock.patch("src.load.load_fact_metrics_elt.get_db_connection")
+def test_elt_stages_long_rows_and_runs_set_based_sql(mock_get_conn, s3_setup):
+    mock_cursor = mock.Mock()
+    mock_cursor.fetchone.return_value = (5,)
+    mock_cursor.fetchall.return_value = [("wb_population", 1)]
+    mock_conn = mock.Mock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_get_conn.return_value = mock_conn
+
+    result = lambda_handler()
+
+    assert result["statusCode"] == 200
+    assert result["fact_rows"] == 5
+    assert result["unmatched_rows"] == {"wb_population": 1}
+
+    # Staging DDL first, then the set-based transform
+    executed = [call.args[0] for call in mock_cursor.execute.call_args_list]
+    assert "CREATE UNLOGGED TABLE IF NOT EXISTS stg_metric_rows" in executed[0]
+    assert "INSERT INTO fact_metrics" in executed[1] and "ROW_NUMBER() OVER" in executed[1]
+
+    copies = {call.args[0].split("(")[0]: call.args[1].getvalue() for call in mock_cursor.copy_expert.call_args_list}
+    assert set(copies) == {"COPY stg_metric_rows", "COPY stg_product_items", "COPY stg_metric_elements", "COPY stg_country_aliases"}
+
+    staged = pd.read_csv(StringIO(copies["COPY stg_metric_rows"]), names=STAGING_COLUMNS)
+    # Only catalog items and metric elements are staged, one row per non-null year value (no key resolution yet)
+    assert len(staged) == result["staged_rows"] == 7
+    food = staged[staged["source"] == "fao_food_balance"]
+    assert food[["m49_code", "item_code", "element_code", "year", "value"]].values.tolist() == [
+        [4, 2511, 5510, 2000, 10.0], [4, 2511, 5142, 2000, 7.0], [4, 2511, 5510, 2001, 11.0]
+    ]
+    population = staged[staged["source"] == "wb_population"]
+    assert population[["iso3_code", "country_alias"]].drop_duplicates().values.tolist() == [["AFG", "afghanistan"], ["XXX", "turkiye"]]
+    # A duplicated alias is staged once (first wins), so the alias join cannot multiply fact rows
+    assert copies["COPY stg_country_aliases"] == "turkiye,2\n"
+    assert "CREATE UNIQUE INDEX IF NOT EXISTS stg_country_aliases_alias_key" in executed[0]
+    mock_conn.commit.assert_called_once()
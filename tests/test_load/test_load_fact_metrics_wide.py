@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+from unittest import mock
+
+from src.load.load_fact_metrics_wide import lambda_handler, WIDE_COLUMNS
+
+
+@mock.patch("src.load.load_fact_metrics_wide.get_db_connection")
+@mock.patch("src.load.load_fact_metrics_wide.read_parquet_from_s3")
+def test_lambda_handler_load_fact_metrics_wide(mock_read_parquet, mock_get_conn):
+    """
+    Unit test for lambda_handler in load_fact_metrics_wide.py.
+    Mocks S3 read and PostgreSQL connection; missing metrics must be copied as empty (NULL) fields.
+    """
+    mock_read_parquet.return_value = pd.DataFrame({
+        'year': [2000], 'country_id': [1], 'country_name': ['Afghanistan'], 'continent_name': ['Asia'],
+        'product_id': [1], 'product_name': ['Wheat'], 'production': [100.0], 'consumption': [np.nan],
+        'import': [7.0], 'export': [np.nan], 'population': [20000.0]
+    })[WIDE_COLUMNS]
+
+    mock_cursor = mock.Mock()
+    mock_conn = mock.Mock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_get_conn.return_value = mock_conn
+
+    os.environ['S3_BUCKET_PROJECT_1'] = "test-bucket"
+    os.environ['S3_PREFIX_TRANSFORMED'] = "transformed/"
+
+    result = lambda_handler()
+
+    assert result["statusCode"] == 200
+    assert result["rows"] == 1
+    mock_read_parquet.assert_called_once_with("test-bucket", "transformed/fact_metrics_wide.parquet")
+    mock_cursor.execute.assert_called_once_with("TRUNCATE TABLE fact_metrics_wide")
+
+    sql, buffer = mock_cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY fact_metrics_wide(year, country_id,")
+    assert buffer.getvalue() == "2000,1,Afghanistan,Asia,1,Wheat,100.0,,7.0,,20000.0\n"
+    mock_conn.commit.assert_called_once()
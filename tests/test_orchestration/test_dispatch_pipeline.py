@@ -0,0 +1,122 @@
+import os
+import types
+import importlib
+import pytest
+
+from src.helpers.pipeline_registry import PIPELINE, plan_runs, resolve_registry, topological_order
+from src.orchestration import dispatch_pipeline
+from src.orchestration.dispatch_pipeline import changed_keys_from_event, fake_s3_event, lambda_handler
+
+PREFIXES = {'raw': 'raw/', 'transformed': 'transformed/', 'resources': 'resources/'}
+
+
+def test_prices_source_change_runs_only_fact_prices():
+    assert plan_runs(['raw/WB/CMO-Historical-Data-Monthly.xlsx'], prefixes=PREFIXES) == ['transform_fact_prices', 'load_fact_prices']
+
+
+def test_resource_change_runs_dim_country_and_downstream_in_order():
+    plan = plan_runs(['resources/m49_continents.csv'], prefixes=PREFIXES)
+
+    assert plan[0] == 'transform_dim_country'
+    assert plan[-1] == 'load_fact_metrics_wide'
+    assert set(plan) == {
+        'transform_dim_country', 'transform_fact_metrics_production', 'transform_fact_metrics_consumption',
+        'transform_fact_metrics_trade', 'transform_fact_metrics_population', 'transform_fact_metrics_final',
+        'transform_fact_metrics_wide', 'transform_metric_cube', 'load_fact_metrics', 'load_fact_metrics_wide'
+    }
+
+
+def test_unregistered_keys_plan_nothing():
+    assert plan_runs(['slim/fao_trade/abc.parquet'], prefixes=PREFIXES) == []
+
+
+def test_cycle_is_rejected():
+    registry = {
+        'a': {'module': 'a', 'inputs': ['b.csv'], 'outputs': ['a.csv']},
+        'b': {'module': 'b', 'inputs': ['a.csv'], 'outputs': ['b.csv']}
+    }
+    with pytest.raises(ValueError):
+        topological_order(['a', 'b'], registry)
+
+
+@pytest.mark.parametrize("step", list(PIPELINE))
+def test_registry_matches_handler_sources(step):
+    """
+    Every registered input file name must appear in the step's handler source.
+    """
+    module = importlib.import_module(PIPELINE[step]['module'])
+    with open(module.__file__, encoding='utf-8') as f:
+        source = f.read()
+    for key in resolve_registry(prefixes=PREFIXES)[step]['inputs']:
+        assert os.path.basename(key) in source, f"{step} does not read {key}"
+
+
+def test_s3_event_keys_are_decoded():
+    event = fake_s3_event(['raw/FAO/Trade/Trade Crops.csv', 'raw/FAO/Trade/Trade Crops.csv'])
+    event['Records'].append({'eventName': 'ObjectRemoved:Delete', 's3': {'object': {'key': 'raw/x.csv'}}})
+
+    assert event['Records'][0]['s3']['object']['key'] == 'raw/FAO/Trade/Trade+Crops.csv'
+    assert changed_keys_from_event(event) == ['raw/FAO/Trade/Trade Crops.csv']
+    assert changed_keys_from_event({'changed_keys': ['resources/m49_iso3.csv']}) == ['resources/m49_iso3.csv']
+
+
+def test_dispatcher_runs_affected_steps_in_order(monkeypatch):
+    calls = []
+
+    def fake_import(name):
+        return types.SimpleNamespace(lambda_handler=lambda event, context: calls.append((name, event)) or {'statusCode': 200})
+
+    published = []
+    monkeypatch.setattr(dispatch_pipeline.importlib, 'import_module', fake_import)
+    monkeypatch.setattr(dispatch_pipeline, 'get_s3_client', lambda: None)
+    monkeypatch.setattr(dispatch_pipeline, 'write_latest_run', lambda client, bucket, key, run: published.append((key, run)))
+    monkeypatch.setenv('S3_BUCKET_PROJECT_1', 'test-bucket')
+    monkeypatch.setenv('S3_PREFIX_TRANSFORMED', 'transformed/')
+    response = lambda_handler(fake_s3_event(['transformed/dim_product.csv']), None)
+
+    assert [name for name, _ in calls] == [PIPELINE[step]['module'] for step in response['planned_steps']]
+    assert response['planned_steps'][-1] == 'load_fact_metrics_wide'
+    assert 'load_dim_product' in response['planned_steps']
+    assert 'transform_dim_country' not in response['planned_steps']
+    assert all(event == {} for _, event in calls)
+    # The finished run is published as the latest one
+    assert published == [('transformed/_latest_run.json', {
+        'run_id': response['run_id'], 'steps': response['planned_steps'], 'changed_keys': ['transformed/dim_product.csv']
+    })]
+
+
+def test_dry_run_does_not_run_steps(monkeypatch):
+    monkeypatch.setattr(dispatch_pipeline.importlib, 'import_module', lambda name: pytest.fail("step was run"))
+
+    response = lambda_handler({'changed_keys': ['raw/WB/wb_population.parquet'], 'dry_run': True}, None)
+
+    assert response['planned_steps'] == [
+        'transform_fact_metrics_population', 'transform_fact_metrics_final', 'transform_fact_metrics_wide',
+        'transform_metric_cube', 'load_fact_metrics', 'load_fact_metrics_wide'
+    ]
+    assert response['results'] == {}
+
+
+def test_failed_run_does_not_publish_its_snapshot(monkeypatch):
+    from src.helpers.storage import MemoryStorageClient
+    from src.helpers.versioned_zone import VersionedZoneClient
+
+    zone = VersionedZoneClient(MemoryStorageClient(), 'transformed/')
+    zone.put_object(Bucket='test-bucket', Key='transformed/dim_product.csv', Body=b'product_id\n1\n')
+
+    def step(name):
+        def handler(event, context):
+            zone.put_object(Bucket='test-bucket', Key='transformed/dim_product.csv', Body=b'product_id\n2\n')
+            if name == PIPELINE['load_dim_product']['module']:
+                raise RuntimeError("load failed")
+            return {'statusCode': 200}
+        return types.SimpleNamespace(lambda_handler=handler)
+
+    monkeypatch.setattr(dispatch_pipeline.importlib, 'import_module', step)
+    monkeypatch.setattr(dispatch_pipeline, 'get_s3_client', lambda: zone)
+    monkeypatch.setenv('S3_BUCKET_PROJECT_1', 'test-bucket')
+    with pytest.raises(RuntimeError, match="load failed"):
+        lambda_handler(fake_s3_event(['resources/product_catalog.csv']), None)
+
+    assert zone.get_object(Bucket='test-bucket', Key='transformed/dim_product.csv')['Body'].read() == b'product_id\n1\n'
+    assert len(zone.history('test-bucket')) == 1
@@ -0,0 +1,127 @@
+import json
+import threading
+import pandas as pd
+import pytest
+from io import BytesIO
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+from src.helpers.storage import MemoryStorageClient
+from src.helpers.result_cache import ResultCache
+from src.helpers.pipeline_runs import read_latest_run_id, write_latest_run
+from src.query.dashboard_queries import DashboardQueries, FileSource
+from src.query.query_server import serve
+
+BUCKET = "test-bucket"
+WIDE_KEY = "transformed/fact_metrics_wide.parquet"
+RUN_KEY = "transformed/_latest_run.json"
+
+
+def _wide(scale=1.0):
+    rows = [
+        # year, country_id, country_name, continent_name, product_id, product_name, production, consumption, import, export, population
+        (2020, 1, "Poland", "Europe", 1, "Wheat", 20.0, 15.0, 1.0, 6.0, 38.0),
+        (2020, 1, "Poland", "Europe", 2, "Maize", 7.0, 9.0, 2.0, None, 38.0),
+        (2020, 2, "France", "Europe", 1, "Wheat", 30.0, 18.0, None, 12.0, 67.0),
+        (2020, 3, "China", "Asia", 1, "Wheat", 130.0, 140.0, 10.0, 1.0, 1400.0),
+        (2020, 4, "India", "Asia", 1, "Wheat", 100.0, 98.0, 0.0, 2.0, 1380.0),
+        (2020, 5, "Egypt", "Africa", 1, "Wheat", None, 20.0, 12.0, 0.0, 102.0),
+        (2021, 1, "Poland", "Europe", 1, "Wheat", 22.0, 16.0, 1.0, 7.0, 37.9),
+        (2021, 1, "Poland", "Europe", 2, "Maize", 8.0, 9.5, 2.0, 0.5, 37.9),
+    ]
+    wide = pd.DataFrame(rows, columns=["year", "country_id", "country_name", "continent_name", "product_id",
+                                       "product_name", "production", "consumption", "import", "export", "population"])
+    wide["production"] *= scale
+    return wide
+
+
+def _put_wide(client, wide):
+    buffer = BytesIO()
+    wide.to_parquet(buffer, index=False)
+    client.put_object(Bucket=BUCKET, Key=WIDE_KEY, Body=buffer.getvalue())
+
+
+@pytest.fixture
+def client():
+    client = MemoryStorageClient()
+    _put_wide(client, _wide())
+    return client
+
+
+def _queries(client, **cache_options):
+    source = FileSource(client, BUCKET, WIDE_KEY)
+    cache = ResultCache(run_id=lambda: (read_latest_run_id(client, BUCKET, RUN_KEY), source.version()),
+                        run_check_interval_s=0, **cache_options)
+    return DashboardQueries(source, cache)
+
+
+def test_top_producers_ranks_countries_and_skips_missing_values(client):
+    queries = _queries(client)
+
+    top = queries.top_producers("Wheat", 2020, n=3)
+    assert top.to_dict("list") == {"rank": [1, 2, 3], "country_name": ["China", "India", "France"],
+                                   "value": [130.0, 100.0, 30.0]}
+
+    # Egypt has no production value: it is not ranked (but it is for imports)
+    assert "Egypt" not in queries.top_producers("Wheat", 2020, n=10)["country_name"].tolist()
+    assert queries.top_producers("Wheat", 2020, n=1, metric="import")["country_name"].tolist() == ["Egypt"]
+    assert queries.top_producers("Rice", 2020).empty
+
+
+def test_country_series_sums_products_and_takes_population_once(client):
+    queries = _queries(client)
+
+    assert queries.country_series("Poland").to_dict("list") == {"year": [2020, 2021], "value": [27.0, 30.0]}
+    assert queries.country_series("Poland", product="Maize")["value"].tolist() == [7.0, 8.0]
+    assert queries.country_series("Poland", metric="population")["value"].tolist() == [38.0, 37.9]
+
+
+def test_continent_shares_add_up_to_one(client):
+    shares = _queries(client).continent_shares("Wheat", 2020)
+
+    assert shares["continent_name"].tolist() == ["Asia", "Europe"]
+    assert shares["value"].tolist() == [230.0, 50.0]
+    assert shares["share"].sum() == pytest.approx(1.0)
+    assert shares["share"].iloc[0] == pytest.approx(230 / 280)
+
+
+def test_unknown_metric_is_rejected(client):
+    with pytest.raises(ValueError, match="Unknown metric"):
+        _queries(client).top_producers("Wheat", 2020, metric="price; DROP TABLE fact_metrics_wide")
+
+
+def test_results_are_cached_and_invalidated_by_a_new_run(client):
+    queries = _queries(client)
+
+    first = queries.top_producers("Wheat", 2020)
+    first.loc[0, "value"] = -1  # Callers get copies: the cached result is unchanged
+    assert queries.top_producers("Wheat", 2020)["value"].iloc[0] == 130.0
+    assert queries.cache.stats()["hits"] == 1
+
+    # A pipeline run rewrites the extract and publishes its run ID: the next query sees the new data
+    _put_wide(client, _wide(scale=2.0))
+    write_latest_run(client, BUCKET, RUN_KEY, {"run_id": "run-2", "steps": ["transform_fact_metrics_wide"]})
+    assert queries.top_producers("Wheat", 2020)["value"].iloc[0] == 260.0
+    assert queries.cache.stats()["invalidations"] == 1
+
+
+def test_http_endpoint_round_trip(client):
+    server = serve(_queries(client), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urlopen(f"{url}/top-producers?product=Wheat&year=2020&n=2") as response:
+            body = json.loads(response.read())
+        assert body["rows"] == [{"rank": 1, "country_name": "China", "value": 130.0},
+                                {"rank": 2, "country_name": "India", "value": 100.0}]
+
+        with urlopen(f"{url}/continent-shares?product=Wheat&year=2020&metric=export") as response:
+            assert [row["continent_name"] for row in json.loads(response.read())["rows"]] == ["Europe", "Asia", "Africa"]
+
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{url}/country-series?metric=production")
+        assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,77 @@
+import os
+import zipfile
+import boto3
+import pandas as pd
+import pytest
+from io import BytesIO, StringIO
+from moto import mock_aws
+
+from src.transformation.transform_dim_country import lambda_handler
+
+
+@pytest.fixture
+def setup_s3_mock():
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        bucket = "test-bucket"
+        s3.create_bucket(Bucket=bucket)
+
+        # Sample FAO rows (as they would appear inside the ZIP), including an aggregate area
+        csv_content = """Area Code,Area Code (M49),Area,Item
+1,'004,Afghanistan,Wheat
+1,'004,Afghanistan,Rice
+223,'792,Türkiye,Wheat
+5000,'001,World,Wheat
+"""
+        zip_buffer = BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            zipf.writestr("Value_of_Production_E_All_Data.csv", csv_content)
+        s3.put_object(Bucket=bucket, Key="raw/faostat_production.zip", Body=zip_buffer.getvalue())
+
+        # Food balance archive with an area code list (the data member must not be scanned)
+        zip_buffer = BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            zipf.writestr("FoodBalanceSheets_E_All_Data.csv", "Area Code,Area Code (M49),Area,Item\n40,'152,Chile,Wheat\n")
+            zipf.writestr("FoodBalanceSheets_E_AreaCodes.csv", "Area Code,M49 Code,Area\n2,'004,Afghanistan\n21,'076,Brazil\n")
+        s3.put_object(Bucket=bucket, Key="raw/FAO/FoodBalance/faostat_consumption.zip", Body=zip_buffer.getvalue())
+
+        # Trade is a plain CSV (no code list), so its distinct areas are scanned
+        s3.put_object(Bucket=bucket, Key="raw/FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv",
+                      Body="Area Code,Area Code (M49),Area,Item\n223,'792,Türkiye,Wheat\n59,'818,Egypt,Wheat\n".encode("utf-8"))
+
+        # Resources zone: continents, ISO3 codes and curated aliases
+        s3.put_object(Bucket=bucket, Key="resources/m49_continents.csv",
+                      Body=b"m49_code,country_name,continent_name\n004,Afghanistan,Asia\n792,Turkey,Asia\n"
+                           b"076,Brazil,South America\n818,Egypt,Africa\n152,Chile,South America\n")
+        s3.put_object(Bucket=bucket, Key="resources/m49_iso3.csv",
+                      Body=b"m49_code,iso3_code\n004,AFG\n792,TUR\n076,BRA\n818,EGY\n152,CHL\n")
+        s3.put_object(Bucket=bucket, Key="resources/country_aliases.csv",
+                      Body=b"alias,m49_code\nTurkiye,792\n")
+
+        os.environ["S3_BUCKET_PROJECT_1"] = bucket
+        os.environ["S3_PREFIX_RAW"] = "raw/"
+        os.environ["S3_PREFIX_TRANSFORMED"] = "transformed/"
+        os.environ["S3_PREFIX_RESOURCES"] = "resources/"
+
+        yield s3, bucket
+
+
+def test_transform_dim_country_lambda(setup_s3_mock):
+    s3, bucket = setup_s3_mock
+
+    result = lambda_handler({}, {})
+    assert result["statusCode"] == 200
+
+    dim_country = pd.read_csv(BytesIO(s3.get_object(Bucket=bucket, Key="transformed/dim_country.csv")["Body"].read()))
+    assert list(dim_country.columns) == ["country_id", "country_name", "continent_name", "m49_code", "iso3_code"]
+    # Areas of all FAO sources, production first; Brazil comes from the food balance code list,
+    # Egypt from the trade scan, and Chile (only in the food balance data member) is not read
+    assert dim_country["m49_code"].tolist() == [4, 792, 76, 818]
+    assert dim_country["iso3_code"].tolist() == ["AFG", "TUR", "BRA", "EGY"]
+    assert dim_country.loc[dim_country["m49_code"] == 792, "country_name"].item() == "Türkiye"
+
+    # Alias table resolves FAO names, M49 resource names and curated spellings
+    aliases = pd.read_csv(StringIO(s3.get_object(Bucket=bucket, Key="transformed/country_aliases.csv")["Body"].read().decode("utf-8")))
+    alias_map = dict(zip(aliases["alias"], aliases["country_id"]))
+    assert alias_map["turkiye"] == alias_map["turkey"] == 2
+    assert alias_map["afghanistan"] == 1
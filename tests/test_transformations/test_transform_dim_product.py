@@ -1,13 +1,15 @@
 import pandas as pd
 import pytest
-from io import StringIO, BytesIO
+from io import StringIO
 from src.transformation.transform_dim_product import lambda_handler
 
 # Mock boto3 and environment setup
 import boto3
 from moto import mock_aws
-import zipfile
 import os
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
 
 @pytest.fixture
 def setup_s3_mock():
@@ -17,30 +19,25 @@ def setup_s3_mock():
         bucket = "test-bucket"
         s3.create_bucket(Bucket=bucket)
 
-        # Sample CSV data (as it would appear inside the ZIP)
-        csv_content = """Item Code,Item
-15,Wheat
-27,Rice
-30,Maize (corn)
-42,Soya beans
-50,Potatoes
-60,Other
+        # Sample product catalog (several source items map to the same product)
+        catalog_content = """source,item_code,item_name,product_name
+fao_production,15,Wheat,Wheat
+fao_production,27,Rice,Rice
+fao_production,56,Maize (corn),Maize
+fao_production,236,Soya beans,Soya
+fao_production,116,Potatoes,Potatoes
+fao_food_balance,2511,Wheat and products,Wheat
+fao_food_balance,2555,Soyabeans,Soya
+wb_cmo,,Soybeans,Soya
 """
 
-        # Create in-memory ZIP with CSV inside
-        csv_buffer = StringIO(csv_content)
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.writestr("Value_of_Production_E_All_Data.csv", csv_buffer.getvalue())
-        zip_buffer.seek(0)
-
-        # Upload ZIP to mocked S3
-        s3.put_object(Bucket=bucket, Key="raw/faostat_production.zip", Body=zip_buffer.read())
+        # Upload catalog to mocked S3 (resources zone)
+        s3.put_object(Bucket=bucket, Key="resources/product_catalog.csv", Body=catalog_content.encode())
 
         # Set environment variables expected by lambda_handler
         os.environ["S3_BUCKET_PROJECT_1"] = bucket
-        os.environ["S3_PREFIX_RAW"] = "raw/"
         os.environ["S3_PREFIX_TRANSFORMED"] = "transformed/"
+        os.environ["S3_PREFIX_RESOURCES"] = "resources/"
 
         yield s3, bucket
 
@@ -60,10 +57,23 @@ def test_transform_dim_product_lambda(setup_s3_mock):
 
     df_result = pd.read_csv(StringIO(content))
 
-    # Check correctness
-    assert df_result.shape[0] == 5  # Only 5 products of interest
+    # Check correctness: one row per canonical product, ids in catalog order
+    assert df_result.shape[0] == 5
     assert list(df_result.columns) == ["product_id", "product_name"]
-    assert set(df_result["product_name"]) == {"Wheat", "Maize", "Rice", "Soya", "Potatoes"}
+    assert df_result["product_name"].tolist() == ["Wheat", "Rice", "Maize", "Soya", "Potatoes"]
+    assert df_result["product_id"].tolist() == [1, 2, 3, 4, 5]
 
 
+def test_shipped_catalog_keeps_the_existing_product_ids(setup_s3_mock):
+    s3, bucket = setup_s3_mock
+    s3.put_object(Bucket=bucket, Key="resources/product_catalog.csv",
+                  Body=(DATA_DIR / "resources" / "product_catalog.csv").read_bytes())
+
+    lambda_handler({}, {})
 
+    df_result = pd.read_csv(s3.get_object(Bucket=bucket, Key="transformed/dim_product.csv")["Body"])
+    existing = pd.read_csv(DATA_DIR / "transformed" / "dim_product.csv")
+    # The committed dimension (and the facts built on it) must not be remapped by a rebuild
+    merged = existing.merge(df_result, on="product_name", suffixes=("_existing", "_new"))
+    assert merged["product_id_existing"].tolist() == merged["product_id_new"].tolist()
+    assert set(df_result["product_name"]) <= set(existing["product_name"])
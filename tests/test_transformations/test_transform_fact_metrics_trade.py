@@ -0,0 +1,162 @@
+import os
+from io import StringIO
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from moto import mock_aws
+
+from src.helpers import slim_cache
+from src.helpers.country_index import parse_m49_codes
+from src.helpers.sharding import assign_shards
+from src.transformation.transform_fact_metrics_trade import lambda_handler, transform_trade_rows, finalize_trade_facts
+
+BUCKET = "test-bucket"
+
+TRADE_CSV = """Area Code,Area Code (M49),Area,Item Code,Item,Element Code,Element,Unit,Y2000,Y2001,Y2002
+4,'004,Afghanistan,15,Wheat,5610,Import quantity,t,10,,30
+4,'004,Afghanistan,15,Wheat,5910,Export quantity,t,,2,
+8,'008,Albania,27,Rice,5610,Import quantity,t,5,6,7
+8,'008,Albania,27,Rice,5622,Import value,1000 USD,1,1,1
+12,'012,Algeria,56,Maize (corn),5910,Export quantity,t,,,9
+31,'031,Azerbaijan,236,Soya beans,5610,Import quantity,t,4,,
+999,'999,Unknown,15,Wheat,5610,Import quantity,t,1,1,1
+"""
+
+CATALOG_CSV = """source,item_code,item_name,product_name
+fao_trade,15,Wheat,Wheat
+fao_trade,27,Rice,Rice
+fao_trade,56,Maize (corn),Maize
+fao_trade,236,Soya beans,Soya
+"""
+
+DIM_COUNTRY = pd.DataFrame({
+    'country_id': [1, 2, 3, 4],
+    'country_name': ['Afghanistan', 'Albania', 'Algeria', 'Azerbaijan'],
+    'continent_name': ['Asia', 'Europe', 'Africa', 'Asia'],
+    'm49_code': [4, 8, 12, 31],
+    'iso3_code': ['AFG', 'ALB', 'DZA', 'AZE']
+})
+DIM_PRODUCT = pd.DataFrame({'product_id': [1, 2, 3, 4], 'product_name': ['Wheat', 'Rice', 'Maize', 'Soya']})
+DIM_DATE = pd.DataFrame({
+    'date_id': [1, 13, 25],
+    'all_date': ['2000-01-01', '2001-01-01', '2002-01-01'],
+    'year': [2000, 2001, 2002],
+    'month': [1, 1, 1],
+    'month_name': ['January'] * 3,
+    'quarter': [1, 1, 1]
+})
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key="raw/FAO/Trade/Trade_CropsLivestock_E_All_Data_NOFLAG.csv", Body=TRADE_CSV.encode())
+        for name, df in [('dim_country', DIM_COUNTRY), ('dim_product', DIM_PRODUCT), ('dim_date', DIM_DATE)]:
+            client.put_object(Bucket=BUCKET, Key=f"transformed/{name}.csv", Body=df.to_csv(index=False).encode())
+        client.put_object(Bucket=BUCKET, Key="resources/product_catalog.csv", Body=CATALOG_CSV.encode())
+
+        os.environ["S3_BUCKET_PROJECT_1"] = BUCKET
+        os.environ["S3_PREFIX_RAW"] = "raw/"
+        os.environ["S3_PREFIX_TRANSFORMED"] = "transformed/"
+        os.environ["S3_PREFIX_RESOURCES"] = "resources/"
+        yield client
+
+
+def _output(client):
+    return client.get_object(Bucket=BUCKET, Key="transformed/fact_metrics_trade.csv")["Body"].read()
+
+
+def test_sharded_run_is_byte_identical_to_single_run(s3_setup):
+    single = lambda_handler({}, None)
+    expected = _output(s3_setup)
+
+    sharded = lambda_handler({'mode': 'coordinate', 'shard_count': 3, 'executor': 'thread', 'force_refresh': True}, None)
+
+    assert _output(s3_setup) == expected
+    assert sharded['unmatched_countries'] == single['unmatched_countries'] == {'trade': {'rows': 1, 'keys': 1}}
+    # Shard outputs are removed by the reducer
+    assert 'Contents' not in s3_setup.list_objects_v2(Bucket=BUCKET, Prefix="transformed/shards/")
+
+
+def test_coordinator_builds_the_slim_file_once(s3_setup):
+    # Cold slim cache: shards must read the coordinator's artifact instead of each parsing the raw file
+    with mock.patch("src.helpers.slim_cache._build_slim_artifact", wraps=slim_cache._build_slim_artifact) as build:
+        lambda_handler({'mode': 'coordinate', 'shard_count': 3, 'executor': 'thread'}, None)
+
+    assert build.call_count == 1
+    assert len(s3_setup.list_objects_v2(Bucket=BUCKET, Prefix="slim/fao_trade/")["Contents"]) == 1
+
+
+def test_chunked_execution_is_byte_identical_to_single_run(s3_setup, monkeypatch):
+    single = lambda_handler({}, None)
+    expected = _output(s3_setup)
+
+    # Under memory pressure the slim file is streamed in batches smaller than a country's rows
+    monkeypatch.setenv("EXECUTION_MODE", "chunked")
+    monkeypatch.setattr("src.helpers.slim_cache.CHUNK_SIZE", 2)
+    chunked = lambda_handler({'force_refresh': True}, None)
+
+    assert _output(s3_setup) == expected
+    assert chunked['unmatched_countries'] == single['unmatched_countries']
+
+
+def test_parallel_mode_is_byte_identical_to_single_run(s3_setup):
+    single = lambda_handler({}, None)
+    expected = _output(s3_setup)
+
+    for executor in ('process', 'serial'):
+        parallel = lambda_handler({'mode': 'parallel', 'workers': 3, 'executor': executor, 'force_refresh': True}, None)
+
+        assert _output(s3_setup) == expected
+        assert parallel['unmatched_countries'] == single['unmatched_countries']
+
+
+def _fact_rows(payload):
+    df = pd.read_csv(StringIO(payload.decode()))
+    return df.drop(columns='fact_id').sort_values(['product_id', 'date_id', 'country_id', 'metric_type']).reset_index(drop=True)
+
+
+def test_product_batches_match_single_run(s3_setup):
+    lambda_handler({}, None)
+    expected = _output(s3_setup)
+
+    response = lambda_handler({'mode': 'product_batches', 'batch_size': 2, 'force_refresh': True}, None)
+
+    # Combined output holds the same facts, ordered by product
+    combined = _output(s3_setup)
+    pd.testing.assert_frame_equal(_fact_rows(combined), _fact_rows(expected))
+    assert pd.read_csv(StringIO(combined.decode()))['fact_id'].tolist() == list(range(1, len(_fact_rows(expected)) + 1))
+    assert response['unmatched_countries'] == {'trade': {'rows': 1, 'keys': 1}}
+    partitions = s3_setup.list_objects_v2(Bucket=BUCKET, Prefix="transformed/partitions/fact_metrics_trade/")
+    assert sorted(obj['Key'].rsplit('/', 1)[1] for obj in partitions['Contents']) == [
+        'product_id=1.csv', 'product_id=2.csv', 'product_id=3.csv', 'product_id=4.csv'
+    ]
+
+
+def _filtered_rows():
+    df = pd.read_csv(StringIO(TRADE_CSV))
+    df = df[df['Element Code'].isin([5610, 5910])].copy()
+    df['product_name'] = df['Item'].map({'Wheat': 'Wheat', 'Rice': 'Rice', 'Maize (corn)': 'Maize', 'Soya beans': 'Soya'})
+    df['metric_type'] = df['Element Code'].map({5610: 'import', 5910: 'export'})
+    df['_row'] = np.arange(len(df))
+    return df
+
+
+def test_process_pool_shards_reduce_to_single_output():
+    df = _filtered_rows()
+    single, _ = transform_trade_rows(df, DIM_COUNTRY, DIM_PRODUCT, DIM_DATE)
+    expected = finalize_trade_facts([single]).to_csv(index=False)
+
+    shard_count = 2
+    shards = assign_shards(parse_m49_codes(df['Area Code (M49)']), shard_count)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(transform_trade_rows, df[shards == i], DIM_COUNTRY, DIM_PRODUCT, DIM_DATE)
+                   for i in range(shard_count)]
+        frames = [future.result()[0] for future in futures]
+
+    assert finalize_trade_facts(frames).to_csv(index=False) == expected
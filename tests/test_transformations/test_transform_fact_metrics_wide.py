@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from src.transformation.transform_fact_metrics_wide import lambda_handler, WIDE_COLUMNS
+
+BUCKET = "test-bucket"
+
+DIM_COUNTRY = pd.DataFrame({
+    'country_id': [1, 2],
+    'country_name': ['Afghanistan', 'Albania'],
+    'continent_name': ['Asia', 'Europe'],
+    'm49_code': [4, 8],
+    'iso3_code': ['AFG', 'ALB']
+})
+DIM_PRODUCT = pd.DataFrame({'product_id': [1, 2], 'product_name': ['Wheat', 'Rice']})
+DIM_DATE = pd.DataFrame({
+    'date_id': [1, 13],
+    'all_date': ['2000-01-01', '2001-01-01'],
+    'year': [2000, 2001],
+    'month': [1, 1],
+    'month_name': ['January'] * 2,
+    'quarter': [1, 1]
+})
+FACT_METRICS = pd.DataFrame({
+    'fact_id': range(1, 9),
+    'date_id': [1, 1, 1, 13, 1, 1, 13, 1],
+    'product_id': [1, 1, 1, 1, 2, 0, 0, 0],
+    'country_id': [1, 1, 1, 1, 2, 1, 1, 2],
+    'metric_type': ['production', 'import', 'import', 'production', 'export', 'population', 'population', 'population'],
+    'value': [100.0, 5.0, 2.0, 0.0, 9.0, 20000.0, 21000.0, 3000.0]
+})
+
+
+@pytest.fixture
+def s3_setup():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for name, df in [('fact_metrics', FACT_METRICS), ('dim_country', DIM_COUNTRY),
+                         ('dim_product', DIM_PRODUCT), ('dim_date', DIM_DATE)]:
+            client.put_object(Bucket=BUCKET, Key=f"transformed/{name}.csv", Body=df.to_csv(index=False).encode())
+
+        os.environ["S3_BUCKET_PROJECT_1"] = BUCKET
+        os.environ["S3_PREFIX_TRANSFORMED"] = "transformed/"
+        yield client
+
+
+def test_wide_extract_pivots_metrics_per_country_product_year(s3_setup):
+    result = lambda_handler({}, None)
+    assert result["statusCode"] == 200
+    assert result["rows"] == 3
+
+    obj = s3_setup.get_object(Bucket=BUCKET, Key="transformed/fact_metrics_wide.parquet")
+    wide = pd.read_parquet(BytesIO(obj["Body"].read()))
+
+    assert list(wide.columns) == WIDE_COLUMNS
+    assert wide['year'].dtype == 'int16' and wide['product_name'].dtype == 'category'
+
+    afg_2000 = wide[(wide['country_id'] == 1) & (wide['year'] == 2000)].iloc[0]
+    assert (afg_2000['product_name'], afg_2000['production'], afg_2000['import'], afg_2000['population']) == \
+        ('Wheat', 100.0, 7.0, 20000.0)
+    assert np.isnan(afg_2000['export'])
+
+    # A zero stays a zero, missing metrics stay empty
+    afg_2001 = wide[(wide['country_id'] == 1) & (wide['year'] == 2001)].iloc[0]
+    assert afg_2001['production'] == 0.0 and np.isnan(afg_2001['import'])
+    assert afg_2001['population'] == 21000.0
+
+    alb = wide[wide['country_id'] == 2].iloc[0]
+    assert (alb['continent_name'], alb['product_name'], alb['export'], alb['population']) == ('Europe', 'Rice', 9.0, 3000.0)
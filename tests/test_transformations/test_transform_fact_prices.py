@@ -1,5 +1,6 @@
 import os
 import boto3
+import numpy as np
 import pandas as pd
 import pytest
 from io import BytesIO
@@ -7,6 +8,13 @@ from moto import mock_aws
 
 from src.transformation.transform_fact_prices import lambda_handler
 
+CATALOG_CSV = """source,item_code,item_name,product_name
+wb_cmo,,Soybeans,Soya
+wb_cmo,,Maize,Maize
+wb_cmo,,"Rice, Thai 5%",Rice
+wb_cmo,,"Wheat, US HRW",Wheat
+"""
+
 @pytest.fixture
 def setup_s3_mock():
     with mock_aws():
@@ -67,9 +75,17 @@ def setup_s3_mock():
             Body=buffer_date.getvalue()
         )
 
+        # Upload product catalog (CMO price columns -> products)
+        s3.put_object(
+            Bucket=bucket,
+            Key="resources/product_catalog.csv",
+            Body=CATALOG_CSV.encode()
+        )
+
         os.environ['S3_BUCKET_PROJECT_1'] = bucket
         os.environ['S3_PREFIX_RAW'] = "raw/"
         os.environ['S3_PREFIX_TRANSFORMED'] = "transformed/"
+        os.environ['S3_PREFIX_RESOURCES'] = "resources/"
 
         yield s3
 
@@ -94,7 +110,87 @@ def test_transform_fact_prices_lambda(setup_s3_mock):
 
     # Check expected columns and some values
     expected_columns = ['price_id', 'date_id', 'product_id', 'price_usd_per_ton',
-                        'avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct']
+                        'avg_annual_price', 'price_annual_change_pct', 'price_month_change_pct',
+                        'price_yoy_change_pct', 'price_rolling_mean_3m', 'price_rolling_mean_6m', 'price_rolling_mean_12m',
+                        'price_volatility_12m', 'price_drawdown_12m_pct', 'real_price_usd_per_ton']
     assert list(df.columns) == expected_columns
     assert not df.empty
     assert df['price_usd_per_ton'].notna().all()
+
+    # Two months of rising prices: no complete window or year-ago month, no deflator means no real prices
+    assert df['price_rolling_mean_3m'].isna().all() and df['price_yoy_change_pct'].isna().all()
+    assert (df['price_drawdown_12m_pct'] == 0).all()
+    assert df['real_price_usd_per_ton'].isna().all()
+
+
+def test_transform_fact_prices_real_prices_use_deflator(setup_s3_mock):
+    s3 = setup_s3_mock
+    bucket = os.environ['S3_BUCKET_PROJECT_1']
+    # Units row (skipped by the slim spec) followed by four months of Maize prices
+    monthly = pd.DataFrame({
+        "Date": ["", "2020M01", "2020M02", "2020M03", "2020M04"],
+        "Soybeans": [None, 350, 360, 370, 380],
+        "Maize": [None, 180, 185, 190, 171],
+        "Rice, Thai 5%": [None, 500, 510, 520, 530],
+        "Wheat, US HRW": [None, 220, 230, 240, 250]
+    })
+    excel_buffer = BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+        monthly.to_excel(writer, sheet_name="Monthly Prices", index=False, startrow=4)
+    s3.put_object(Bucket=bucket, Key="raw/WB/CMO-Historical-Data-Monthly.xlsx", Body=excel_buffer.getvalue())
+    dim_date = pd.DataFrame({"date_id": [1, 2, 3, 4], "year": [2020] * 4, "month": [1, 2, 3, 4]})
+    s3.put_object(Bucket=bucket, Key="transformed/dim_date.csv", Body=dim_date.to_csv(index=False).encode())
+    s3.put_object(Bucket=bucket, Key="resources/price_deflator.csv",
+                  Body=b"year,month,deflator\n2020,1,100\n2020,2,125\n2020,3,200\n")
+
+    lambda_handler({}, {})
+    df = pd.read_csv(BytesIO(s3.get_object(Bucket=bucket, Key="transformed/fact_prices.csv")['Body'].read()))
+
+    maize = df[df['product_id'] == 2]
+    assert maize['real_price_usd_per_ton'].tolist()[:3] == [180.0, 148.0, 95.0]
+    assert np.isnan(maize['real_price_usd_per_ton'].tolist()[3])
+    assert maize['price_rolling_mean_3m'].tolist()[2:] == [185.0, 182.0]
+    assert maize['price_drawdown_12m_pct'].tolist() == [0.0, 0.0, 0.0, -10.0]
+
+
+def test_transform_fact_prices_incremental_matches_full_recompute(setup_s3_mock):
+    """
+    Appending a new month incrementally must give the same output as a full recompute.
+    """
+    s3 = setup_s3_mock
+    bucket = os.environ['S3_BUCKET_PROJECT_1']
+
+    # First run has no state yet, so it recomputes everything
+    assert lambda_handler({}, {})['mode'] == 'full'
+
+    # The source grows by one month (and dim_date covers it)
+    monthly = pd.DataFrame({
+        "Date": ["2020M01", "2020M02", "2020M03", "2020M04"],
+        "Soybeans": [350, 360, 370, 380],
+        "Maize": [180, 185, 190, 170],
+        "Rice, Thai 5%": [500, 510, 520, 530],
+        "Wheat, US HRW": [220, 230, 240, 250]
+    })
+    excel_buffer = BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+        monthly.to_excel(writer, sheet_name="Monthly Prices", index=False, startrow=4)
+    s3.put_object(Bucket=bucket, Key="raw/WB/CMO-Historical-Data-Monthly.xlsx", Body=excel_buffer.getvalue())
+    dim_date = pd.DataFrame({"date_id": [1, 2, 3, 4], "year": [2020] * 4, "month": [1, 2, 3, 4]})
+    s3.put_object(Bucket=bucket, Key="transformed/dim_date.csv", Body=dim_date.to_csv(index=False).encode())
+
+    result = lambda_handler({}, {})
+    assert result['mode'] == 'incremental'
+    assert result['rows_appended'] == 4
+    incremental = s3.get_object(Bucket=bucket, Key="transformed/fact_prices.csv")['Body'].read()
+
+    lambda_handler({'full_refresh': True}, {})
+    full = s3.get_object(Bucket=bucket, Key="transformed/fact_prices.csv")['Body'].read()
+    assert incremental == full
+
+    # Existing rows keep their price_id, the annual average of 2020 is refreshed
+    df = pd.read_csv(BytesIO(full))
+    assert df['price_id'].tolist() == list(range(1, 13))
+    assert df.loc[df['product_id'] == 2, 'avg_annual_price'].tolist() == [181.67] * 3
+
+    # Nothing new: the run is a no-op
+    assert lambda_handler({}, {})['rows_appended'] == 0